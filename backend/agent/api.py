@@ -16,9 +16,11 @@ from services.supabase import DBConnection
 from services import redis
 from utils.auth_utils import get_current_user_id_from_jwt, get_user_id_from_stream_auth, verify_thread_access
 from utils.logger import logger
-from services.billing import check_billing_status, can_use_model
+from services.billing import check_billing_status, can_use_model, get_subscription_tier_name
 from utils.config import config, EnvMode
-from sandbox.sandbox import create_sandbox, get_or_start_sandbox, LocalDockerSandboxWrapper
+from sandbox.sandbox import create_sandbox, get_project_sandbox, select_resource_profile, LocalDockerSandboxWrapper
+from sandbox import local_docker_handler
+from sandbox.warm_pool import warm_pool
 from services.llm import make_llm_api_call, is_ollama_model_available
 from run_agent_background import run_agent_background, _cleanup_redis_response_list, update_agent_run_status
 from agent.run import run_agent # Added for direct streaming
@@ -55,6 +57,7 @@ class AgentCreateRequest(BaseModel):
     is_default: Optional[bool] = False
     avatar: Optional[str] = None
     avatar_color: Optional[str] = None
+    sandbox_resource_profile: Optional[str] = None
 
 class AgentUpdateRequest(BaseModel):
     name: Optional[str] = None
@@ -66,6 +69,7 @@ class AgentUpdateRequest(BaseModel):
     is_default: Optional[bool] = None
     avatar: Optional[str] = None
     avatar_color: Optional[str] = None
+    sandbox_resource_profile: Optional[str] = None
 
 class AgentResponse(BaseModel):
     agent_id: str
@@ -83,6 +87,7 @@ class AgentResponse(BaseModel):
     tags: Optional[List[str]] = []
     avatar: Optional[str]
     avatar_color: Optional[str]
+    sandbox_resource_profile: Optional[str] = None
     created_at: str
     updated_at: str
 
@@ -450,7 +455,7 @@ async def start_agent(
         # sandbox_id = sandbox_info['id'] # project_id is used directly now
 
         # Pass project_id and the Supabase client (client)
-        sandbox = await get_or_start_sandbox(project_id, client)
+        sandbox = await get_project_sandbox(project_id, client)
         if not sandbox:
             logger.error(f"Failed to get or start sandbox for project {project_id}. Agent cannot run.")
             raise HTTPException(status_code=500, detail=f"Failed to get or start sandbox for project {project_id}. Agent cannot run.")
@@ -588,6 +593,7 @@ async def get_thread_agent(thread_id: str, user_id: str = Depends(get_current_us
                 tags=agent_data.get('tags', []),
                 avatar=agent_data.get('avatar'),
                 avatar_color=agent_data.get('avatar_color'),
+                sandbox_resource_profile=agent_data.get('sandbox_resource_profile'),
                 created_at=agent_data['created_at'],
                 updated_at=agent_data['updated_at']
             ),
@@ -967,11 +973,24 @@ async def initiate_agent_with_files(
     if not can_run:
         raise HTTPException(status_code=402, detail={"message": message, "subscription": subscription})
 
+    # Find a sandbox, or room for one, before creating any rows, so a refusal leaves nothing behind
+    # (take a pre-started one from the warm pool when available)
+    project_id = str(uuid.uuid4())
+    resource_profile = select_resource_profile(agent_config, get_subscription_tier_name(subscription))
+    warm_sandbox = None
+    if warm_pool.enabled and resource_profile == config.SANDBOX_RESOURCE_PROFILE:
+        warm_sandbox = await warm_pool.acquire(project_id)
+    if not warm_sandbox and config.SANDBOX_TYPE == 'local_docker':
+        # Queue for host headroom instead of failing straight away when the host is full
+        refusal = await local_docker_handler.wait_for_placement_async(resource_profile, config.SANDBOX_PLACEMENT_WAIT_SECONDS)
+        if refusal:
+            raise HTTPException(status_code=503, detail=f"No capacity for a new sandbox right now: {refusal}")
+
     try:
         # 1. Create Project
         placeholder_name = f"{prompt[:30]}..." if len(prompt) > 30 else prompt
         project = await client.table('projects').insert({
-            "project_id": str(uuid.uuid4()), "account_id": account_id, "name": placeholder_name,
+            "project_id": project_id, "account_id": account_id, "name": placeholder_name,
             "created_at": datetime.now(timezone.utc).isoformat()
         }).execute()
         project_id = project.data[0]['project_id']
@@ -1009,8 +1028,18 @@ async def initiate_agent_with_files(
         message_content = prompt
 
         # 3. Create Sandbox
-        sandbox_pass = str(uuid.uuid4())
-        sandbox = create_sandbox(sandbox_pass, project_id)
+        sandbox = None
+        if warm_sandbox:
+            sandbox, sandbox_pass = warm_sandbox.sandbox, warm_sandbox.password
+        else:
+            sandbox_pass = str(uuid.uuid4())
+            try:
+                sandbox = await create_sandbox(sandbox_pass, project_id, resource_profile)
+            except local_docker_handler.SandboxPlacementError as e:
+                # Another request took the headroom since the wait above; undo the rows made for this one
+                await client.table('threads').delete().eq('thread_id', thread_id).execute()
+                await client.table('projects').delete().eq('project_id', project_id).execute()
+                raise HTTPException(status_code=503, detail=f"No capacity for a new sandbox right now: {e}")
 
         if not sandbox:
             logger.error(f"Sandbox creation returned None for project {project_id}, cannot proceed with sandbox setup.")
@@ -1030,6 +1059,8 @@ async def initiate_agent_with_files(
                 'pass': sandbox_pass, # VNC password
                 'vnc_preview': vnc_preview_info['url'] if vnc_preview_info else None,
                 'sandbox_url': web_preview_info['url'] if web_preview_info else None,
+                'exec_port': getattr(sandbox, 'exec_port', None), # Host port of the in-container exec agent
+                'browser_api_port': getattr(sandbox, 'browser_api_port', None), # Host port of the browser automation API
                 'token': None # No token for direct localhost access
             }
         else: # Assuming Daytona path
@@ -1070,29 +1101,49 @@ async def initiate_agent_with_files(
             failed_uploads = []
             current_sandbox_id_for_logging = sandbox.id
 
-            for file_obj in files:
-                if file_obj.filename:
-                    try:
+            if hasattr(sandbox.fs, 'upload_files'):
+                # Stream every upload straight from the request into one archive, without reading files into memory
+                upload_entries = []
+                for file_obj in files:
+                    if file_obj.filename:
                         safe_filename = file_obj.filename.replace('/', '_').replace('\\', '_')
-                        target_path_in_container = f"/workspace/{safe_filename}"
+                        upload_entries.append((f"/workspace/{safe_filename}", file_obj.file))
+                try:
+                    if await sandbox.fs.upload_files(upload_entries):
+                        successful_uploads = [path for path, _ in upload_entries]
+                    else:
+                        logger.error(f"Batch upload of {len(upload_entries)} file(s) failed for sandbox {current_sandbox_id_for_logging}")
+                        failed_uploads = [file_obj.filename for file_obj in files if file_obj.filename]
+                except Exception as batch_error:
+                    logger.error(f"Error uploading files to sandbox {current_sandbox_id_for_logging}: {str(batch_error)}", exc_info=True)
+                    failed_uploads = [file_obj.filename for file_obj in files if file_obj.filename]
+                finally:
+                    for file_obj in files:
+                        await file_obj.close()
+            else:
+                for file_obj in files:
+                    if file_obj.filename:
+                        try:
+                            safe_filename = file_obj.filename.replace('/', '_').replace('\\', '_')
+                            target_path_in_container = f"/workspace/{safe_filename}"
 
-                        logger.info(f"Attempting to upload {safe_filename} to {target_path_in_container} in sandbox {current_sandbox_id_for_logging}")
-                        content = await file_obj.read()
+                            logger.info(f"Attempting to upload {safe_filename} to {target_path_in_container} in sandbox {current_sandbox_id_for_logging}")
+                            content = await file_obj.read()
 
-                        upload_successful = await sandbox.fs.upload_file(target_path_in_container, content)
+                            upload_successful = await sandbox.fs.upload_file(target_path_in_container, content)
 
-                        if upload_successful:
-                            logger.info(f"Successfully called upload for file {safe_filename} to sandbox path {target_path_in_container}")
-                            successful_uploads.append(target_path_in_container)
-                        else:
-                            logger.error(f"Upload failed for {safe_filename} to {target_path_in_container} in sandbox {current_sandbox_id_for_logging}")
-                            failed_uploads.append(file_obj.filename)
+                            if upload_successful:
+                                logger.info(f"Successfully called upload for file {safe_filename} to sandbox path {target_path_in_container}")
+                                successful_uploads.append(target_path_in_container)
+                            else:
+                                logger.error(f"Upload failed for {safe_filename} to {target_path_in_container} in sandbox {current_sandbox_id_for_logging}")
+                                failed_uploads.append(file_obj.filename)
 
-                    except Exception as file_error:
-                        logger.error(f"Error processing file {file_obj.filename}: {str(file_error)}", exc_info=True)
-                        failed_uploads.append(file_obj.filename)
-                    finally:
-                        await file_obj.close()
+                        except Exception as file_error:
+                            logger.error(f"Error processing file {file_obj.filename}: {str(file_error)}", exc_info=True)
+                            failed_uploads.append(file_obj.filename)
+                        finally:
+                            await file_obj.close()
 
             if successful_uploads:
                 message_content += "\n\n"
@@ -1178,6 +1229,8 @@ async def initiate_agent_with_files(
             )
             return {"thread_id": thread_id, "agent_run_id": agent_run_id}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in agent initiation: {str(e)}\n{traceback.format_exc()}")
         # TODO: Clean up created project/thread if initiation fails mid-way
@@ -1334,6 +1387,7 @@ async def get_agents(
                 tags=agent.get('tags', []),
                 avatar=agent.get('avatar'),
                 avatar_color=agent.get('avatar_color'),
+                sandbox_resource_profile=agent.get('sandbox_resource_profile'),
                 created_at=agent['created_at'],
                 updated_at=agent['updated_at']
             ))
@@ -1390,6 +1444,7 @@ async def get_agent(agent_id: str, user_id: str = Depends(get_current_user_id_fr
             tags=agent_data.get('tags', []),
             avatar=agent_data.get('avatar'),
             avatar_color=agent_data.get('avatar_color'),
+            sandbox_resource_profile=agent_data.get('sandbox_resource_profile'),
             created_at=agent_data['created_at'],
             updated_at=agent_data['updated_at']
         )
@@ -1400,6 +1455,11 @@ async def get_agent(agent_id: str, user_id: str = Depends(get_current_user_id_fr
         logger.error(f"Error fetching agent {agent_id} for user {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch agent: {str(e)}")
 
+def _validate_sandbox_resource_profile(profile: Optional[str]) -> None:
+    """Reject unknown sandbox resource profiles. An empty string clears the agent's profile."""
+    if profile and not local_docker_handler.get_resource_profile(profile):
+        raise HTTPException(status_code=400, detail=f"Unknown sandbox resource profile '{profile}'. Available: {', '.join(local_docker_handler.RESOURCE_PROFILES)}")
+
 @router.post("/agents", response_model=AgentResponse)
 async def create_agent(
     agent_data: AgentCreateRequest,
@@ -1407,6 +1467,7 @@ async def create_agent(
 ):
     """Create a new agent."""
     logger.info(f"Creating new agent for user: {user_id}")
+    _validate_sandbox_resource_profile(agent_data.sandbox_resource_profile)
     client = await db.client
     
     try:
@@ -1430,7 +1491,8 @@ async def create_agent(
             "agentpress_tools": agent_data.agentpress_tools or {},
             "is_default": agent_data.is_default or False,
             "avatar": agent_data.avatar,
-            "avatar_color": agent_data.avatar_color
+            "avatar_color": agent_data.avatar_color,
+            "sandbox_resource_profile": agent_data.sandbox_resource_profile
         }
         
         new_agent = await client.table('agents').insert(insert_data).execute()
@@ -1457,6 +1519,7 @@ async def create_agent(
             tags=agent.get('tags', []),
             avatar=agent.get('avatar'),
             avatar_color=agent.get('avatar_color'),
+            sandbox_resource_profile=agent.get('sandbox_resource_profile'),
             created_at=agent['created_at'],
             updated_at=agent['updated_at']
         )
@@ -1475,6 +1538,7 @@ async def update_agent(
 ):
     """Update an existing agent."""
     logger.info(f"Updating agent {agent_id} for user: {user_id}")
+    _validate_sandbox_resource_profile(agent_data.sandbox_resource_profile)
     client = await db.client
     
     try:
@@ -1515,6 +1579,8 @@ async def update_agent(
             update_data["avatar"] = agent_data.avatar
         if agent_data.avatar_color is not None:
             update_data["avatar_color"] = agent_data.avatar_color
+        if agent_data.sandbox_resource_profile is not None:
+            update_data["sandbox_resource_profile"] = agent_data.sandbox_resource_profile or None
         
         if not update_data:
             # No fields to update, return existing agent
@@ -1552,6 +1618,7 @@ async def update_agent(
             tags=agent.get('tags', []),
             avatar=agent.get('avatar'),
             avatar_color=agent.get('avatar_color'),
+            sandbox_resource_profile=agent.get('sandbox_resource_profile'),
             created_at=agent['created_at'],
             updated_at=agent['updated_at']
         )
@@ -26,6 +26,7 @@ from agent.tools.expand_msg_tool import ExpandMessageTool
 from agent.tools.continue_task_tool import ContinueTaskTool
 from agent.prompt import get_system_prompt
 from utils.logger import logger
+from utils.s3_upload_utils import screenshot_store
 from utils.auth_utils import get_account_id_from_thread
 from services.billing import check_billing_status
 from agent.tools.sb_vision_tool import SandboxVisionTool
@@ -104,7 +105,7 @@ async def run_agent(
         logger.info("No agent specified - registering all tools for full Suna capabilities")
         thread_manager.add_tool(SandboxShellTool, project_id=project_id, thread_manager=thread_manager)
         thread_manager.add_tool(SandboxFilesTool, project_id=project_id, thread_manager=thread_manager)
-        thread_manager.add_tool(SandboxBrowserTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager)
+        thread_manager.add_tool(SandboxBrowserTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager, model_name=model_name)
         thread_manager.add_tool(SandboxDeployTool, project_id=project_id, thread_manager=thread_manager)
         thread_manager.add_tool(SandboxExposeTool, project_id=project_id, thread_manager=thread_manager)
         thread_manager.add_tool(ExpandMessageTool, thread_id=thread_id, thread_manager=thread_manager)
@@ -127,7 +128,7 @@ async def run_agent(
         if enabled_tools.get('sb_files_tool', {}).get('enabled', False):
             thread_manager.add_tool(SandboxFilesTool, project_id=project_id, thread_manager=thread_manager)
         if enabled_tools.get('sb_browser_tool', {}).get('enabled', False):
-            thread_manager.add_tool(SandboxBrowserTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager)
+            thread_manager.add_tool(SandboxBrowserTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager, model_name=model_name)
         if enabled_tools.get('sb_deploy_tool', {}).get('enabled', False):
             thread_manager.add_tool(SandboxDeployTool, project_id=project_id, thread_manager=thread_manager)
         if enabled_tools.get('sb_expose_tool', {}).get('enabled', False):
@@ -427,12 +428,18 @@ async def run_agent(
                     browser_content = raw_browser_content # Or handle as an error / default to empty dict
 
                 screenshot_base64 = browser_content.get("screenshot_base64")
-                screenshot_url = browser_content.get("screenshot_url")
+                # The browser tool stores the uploaded screenshot as image_url
+                screenshot_url = browser_content.get("image_url") or browser_content.get("screenshot_url")
+                screenshot_format = browser_content.get("screenshot_format") or "jpeg"
+                if screenshot_url and not await screenshot_store.wait_for(screenshot_url):
+                    logger.warning(f"Screenshot upload to {screenshot_url} failed, sending browser state without it")
+                    screenshot_url = None
                 
                 # Create a copy of the browser state without screenshot data
                 browser_state_text = browser_content.copy()
                 browser_state_text.pop('screenshot_base64', None)
                 browser_state_text.pop('screenshot_url', None)
+                browser_state_text.pop('image_url', None)
 
                 if browser_state_text:
                     temp_message_content_list.append({
@@ -453,7 +460,7 @@ async def run_agent(
                     temp_message_content_list.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{screenshot_base64}",
+                            "url": f"data:image/{screenshot_format};base64,{screenshot_base64}",
                         }
                     })
                 else:
@@ -1,14 +1,20 @@
 import os
+import io
+import json
+import math
 import time
 import base64
 import aiohttp
 import asyncio
 import logging
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, List, Tuple, Union
 import os
 
+from PIL import Image, ImageChops
+
 from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
-from sandbox.tool_base import SandboxToolsBase, Sandbox
+from daytona_sdk import Sandbox
+from sandbox.tool_base import SandboxToolsBase
 
 KEYBOARD_KEYS = [
     'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm',
@@ -22,15 +28,84 @@ KEYBOARD_KEYS = [
     'alt+tab', 'alt+f4', 'ctrl+alt+delete'
 ]
 
+# Frame-diff screenshots
+FRAME_TILE_SIZE = 64  # Changes are located to tiles of this many pixels
+FULL_FRAME_CHANGE_RATIO = 0.5  # Send the full frame when the changed regions cover more of the screen
+KEYFRAME_INTERVAL = 10  # Diff frames between full frames, so the model never depends on a long chain of diffs
+
+# Actions of perform_actions and the automation endpoint each one maps to
+ACTION_TYPES = {
+    "move_to": "mouse/move",
+    "click": "mouse/click",
+    "mouse_down": "mouse/down",
+    "mouse_up": "mouse/up",
+    "drag_to": "mouse/drag",
+    "scroll": "mouse/scroll",
+    "typing": "keyboard/write",
+    "press": "keyboard/press",
+    "hotkey": "keyboard/hotkey",
+    "wait": "wait",
+}
+
+
+def changed_regions(previous: Image.Image, current: Image.Image,
+                    tile_size: int = FRAME_TILE_SIZE) -> List[Tuple[int, int, int, int]]:
+    """Boxes (left, top, right, bottom) around the parts of current that differ from previous.
+
+    Changed tiles that touch are merged, so each separate change on screen gets one box.
+    """
+    width, height = current.size
+    if previous.size != current.size:
+        return [(0, 0, width, height)]
+    diff = ImageChops.difference(previous.convert("RGB"), current.convert("RGB"))
+    if diff.getbbox() is None:
+        return []
+
+    changed = set()
+    for row in range(math.ceil(height / tile_size)):
+        for col in range(math.ceil(width / tile_size)):
+            box = (col * tile_size, row * tile_size,
+                   min(width, (col + 1) * tile_size), min(height, (row + 1) * tile_size))
+            if diff.crop(box).getbbox():
+                changed.add((col, row))
+
+    boxes = []
+    while changed:
+        pending = [changed.pop()]
+        min_col = max_col = pending[0][0]
+        min_row = max_row = pending[0][1]
+        while pending:
+            col, row = pending.pop()
+            min_col, max_col = min(min_col, col), max(max_col, col)
+            min_row, max_row = min(min_row, row), max(max_row, row)
+            for neighbour in ((col + dc, row + dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1)):
+                if neighbour in changed:
+                    changed.remove(neighbour)
+                    pending.append(neighbour)
+        boxes.append((min_col * tile_size, min_row * tile_size,
+                      min(width, (max_col + 1) * tile_size), min(height, (max_row + 1) * tile_size)))
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
 class ComputerUseTool(SandboxToolsBase):
     """Computer automation tool for controlling the sandbox browser and GUI."""
     
-    def __init__(self, sandbox: Sandbox):
-        """Initialize automation tool with sandbox connection."""
-        super().__init__(sandbox)
+    def __init__(self, sandbox: Sandbox, frame_diff: bool = False, persist_screenshots: bool = False):
+        """Initialize automation tool with sandbox connection.
+
+        Args:
+            sandbox: Sandbox running the automation service
+            frame_diff: Return only the screen regions that changed since the last screenshot
+            persist_screenshots: Also write every screenshot to the local screenshots directory
+        """
+        super().__init__()
+        self._sandbox = sandbox
         self.session = None
         self.mouse_x = 0  # Track current mouse position
         self.mouse_y = 0
+        self.frame_diff = frame_diff
+        self.persist_screenshots = persist_screenshots
+        self.last_frame: Optional[Image.Image] = None  # Last screenshot returned, which diffs are relative to
+        self.frames_since_keyframe = 0
         # Get automation service URL using port 8000
         self.api_base_url = self.sandbox.get_preview_link(8000)
         logging.info(f"Initialized Computer Use Tool with API URL: {self.api_base_url}")
@@ -569,37 +644,32 @@ class ComputerUseTool(SandboxToolsBase):
             return ToolResult(success=False, output=f"Failed to drag: {str(e)}")
 
     async def get_screenshot_base64(self) -> Optional[dict]:
-        """Capture screen and return as base64 encoded image."""
+        """Capture screen and return as base64 encoded image.
+
+        With frame_diff, the result is either a full frame ("full_frame": True, "base64") or
+        the regions that changed since the previous result ("full_frame": False, "regions":
+        a list of x, y, width, height and base64 PNG crops; empty if nothing changed).
+        """
         try:
             result = await self._api_request("POST", "/automation/screenshot")
             
             if "image" in result:
                 base64_str = result["image"]
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
-                
-                # Save screenshot to file
-                screenshots_dir = "screenshots"
-                if not os.path.exists(screenshots_dir):
-                    os.makedirs(screenshots_dir)
-                
-                timestamped_filename = os.path.join(screenshots_dir, f"screenshot_{timestamp}.png")
-                latest_filename = "latest_screenshot.png"
-                
-                # Decode base64 string and save to file
                 img_data = base64.b64decode(base64_str)
-                with open(timestamped_filename, 'wb') as f:
-                    f.write(img_data)
-                
-                # Save a copy as the latest screenshot
-                with open(latest_filename, 'wb') as f:
-                    f.write(img_data)
-                
-                return {
+                screenshot = {
                     "content_type": "image/png",
-                    "base64": base64_str,
                     "timestamp": timestamp,
-                    "filename": timestamped_filename
                 }
+                
+                if self.persist_screenshots:
+                    screenshot["filename"] = await asyncio.to_thread(self._save_screenshot, img_data, timestamp)
+                
+                if self.frame_diff:
+                    screenshot.update(await asyncio.to_thread(self._frame_update, img_data, base64_str))
+                else:
+                    screenshot["base64"] = base64_str
+                return screenshot
             else:
                 return None
                 
@@ -607,6 +677,176 @@ class ComputerUseTool(SandboxToolsBase):
             print(f"[Screenshot] Error during screenshot process: {str(e)}")
             return None
 
+    def _save_screenshot(self, img_data: bytes, timestamp: str) -> str:
+        """Write a screenshot to the screenshots directory and as latest_screenshot.png"""
+        screenshots_dir = "screenshots"
+        if not os.path.exists(screenshots_dir):
+            os.makedirs(screenshots_dir)
+        
+        timestamped_filename = os.path.join(screenshots_dir, f"screenshot_{timestamp}.png")
+        with open(timestamped_filename, 'wb') as f:
+            f.write(img_data)
+        
+        # Save a copy as the latest screenshot
+        with open("latest_screenshot.png", 'wb') as f:
+            f.write(img_data)
+        return timestamped_filename
+
+    def _frame_update(self, img_data: bytes, base64_str: str) -> dict:
+        """Full frame or changed regions of a new screenshot, relative to the last one returned"""
+        frame = Image.open(io.BytesIO(img_data))
+        frame.load()
+        width, height = frame.size
+
+        regions = None
+        if self.last_frame is not None and self.frames_since_keyframe < KEYFRAME_INTERVAL:
+            boxes = changed_regions(self.last_frame, frame)
+            changed_area = sum((right - left) * (bottom - top) for left, top, right, bottom in boxes)
+            if changed_area <= FULL_FRAME_CHANGE_RATIO * width * height:
+                regions = boxes
+        self.last_frame = frame
+
+        if regions is None:
+            self.frames_since_keyframe = 0
+            return {"full_frame": True, "width": width, "height": height, "base64": base64_str}
+
+        self.frames_since_keyframe += 1
+        encoded_regions = []
+        for left, top, right, bottom in regions:
+            buffer = io.BytesIO()
+            frame.crop((left, top, right, bottom)).save(buffer, format="PNG")
+            encoded_regions.append({
+                "x": left, "y": top, "width": right - left, "height": bottom - top,
+                "base64": base64.b64encode(buffer.getvalue()).decode("utf-8"),
+            })
+        return {"full_frame": False, "width": width, "height": height, "regions": encoded_regions}
+
+    def _action_events(self, actions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
+        """Requests of the composite /automation/actions endpoint for a list of actions, each
+        with the payload of the action's own endpoint. Also returns the final cursor position."""
+        x_pos, y_pos = self.mouse_x, self.mouse_y
+        events = []
+        for action in actions:
+            name = action.get("action")
+            if name not in ACTION_TYPES:
+                raise ValueError(f"unknown action {name!r}")
+            if name == "drag_to" and (action.get("x") is None or action.get("y") is None):
+                raise ValueError("drag_to needs x and y")
+            event: Dict[str, Any] = {"type": ACTION_TYPES[name]}
+            if name in ("move_to", "click", "mouse_down", "mouse_up", "drag_to"):
+                if action.get("x") is not None:
+                    x_pos = int(round(float(action["x"])))
+                if action.get("y") is not None:
+                    y_pos = int(round(float(action["y"])))
+                event.update({"x": x_pos, "y": y_pos})
+                if name == "click":
+                    event.update({"clicks": int(action.get("num_clicks", 1)), "button": str(action.get("button", "left")).lower()})
+                elif name in ("mouse_down", "mouse_up"):
+                    event["button"] = str(action.get("button", "left")).lower()
+                elif name == "drag_to":
+                    event.update({"duration": 0.3, "button": "left"})
+            elif name == "scroll":
+                event.update({"clicks": max(-10, min(10, int(float(action["amount"])))), "x": x_pos, "y": y_pos})
+            elif name == "typing":
+                event.update({"message": str(action["text"]), "interval": 0.01})
+            elif name == "press":
+                event.update({"keys": str(action["key"]).lower(), "presses": 1})
+            elif name == "hotkey":
+                event.update({"keys": str(action["keys"]).lower().strip().split('+'), "interval": 0.01})
+            elif name == "wait":
+                event["duration"] = max(0, min(10, float(action.get("duration", 0.5))))
+            events.append(event)
+        return events, (x_pos, y_pos)
+
+    async def _run_events_one_by_one(self, events: List[Dict[str, Any]]) -> Dict:
+        """Send composite action events to their individual endpoints, stopping at the first failure"""
+        for step, event in enumerate(events):
+            payload = {key: value for key, value in event.items() if key != "type"}
+            if event["type"] == "wait":
+                await asyncio.sleep(payload["duration"])
+                continue
+            result = await self._api_request("POST", f"/automation/{event['type']}", payload)
+            if not result.get("success", False):
+                return {"success": False, "error": f"step {step} ({event['type']}): {result.get('error', 'Unknown error')}"}
+        return {"success": True}
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "perform_actions",
+            "description": "Perform a sequence of mouse and keyboard actions in one go, e.g. click a field, type and press enter. Stops at the first failing action.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "actions": {
+                        "type": "array",
+                        "description": "Actions to perform in order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "action": {
+                                    "type": "string",
+                                    "enum": list(ACTION_TYPES)
+                                },
+                                "x": {"type": "number", "description": "X coordinate (pointer actions; default: current position)"},
+                                "y": {"type": "number", "description": "Y coordinate (pointer actions; default: current position)"},
+                                "button": {"type": "string", "enum": ["left", "right", "middle"]},
+                                "num_clicks": {"type": "integer", "enum": [1, 2, 3]},
+                                "amount": {"type": "integer", "description": "Scroll amount (positive for up, negative for down)"},
+                                "text": {"type": "string", "description": "Text for typing"},
+                                "key": {"type": "string", "description": "Key for press", "enum": KEYBOARD_KEYS},
+                                "keys": {"type": "string", "description": "Key combination for hotkey", "enum": KEYBOARD_KEYS},
+                                "duration": {"type": "number", "description": "Seconds for wait"}
+                            },
+                            "required": ["action"]
+                        }
+                    }
+                },
+                "required": ["actions"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="perform-actions",
+        mappings=[
+            {"param_name": "actions", "node_type": "content", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="perform_actions">
+        <parameter name="actions">[{"action": "click", "x": 400, "y": 220}, {"action": "typing", "text": "quarterly report"}, {"action": "press", "key": "enter"}]</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def perform_actions(self, actions: Union[List[Dict[str, Any]], str]) -> ToolResult:
+        """Perform a sequence of mouse and keyboard actions in one request."""
+        try:
+            if isinstance(actions, str):
+                actions = json.loads(actions)
+            if not isinstance(actions, list) or not actions:
+                return ToolResult(success=False, output="actions must be a non-empty list")
+            events, (x_int, y_int) = self._action_events(actions)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            return ToolResult(success=False, output=f"Invalid actions: {str(e)}")
+
+        try:
+            # Executed atomically by the automation service, without other input in between
+            result = await self._api_request("POST", "/automation/actions", {"actions": events})
+            if result.get("detail") == "Not Found":
+                # Automation service without the composite endpoint: one request per action
+                result = await self._run_events_one_by_one(events)
+            
+            if result.get("success", False):
+                self.mouse_x = x_int
+                self.mouse_y = y_int
+                return ToolResult(success=True,
+                                output=f"Performed {len(events)} actions, cursor at ({x_int}, {y_int})")
+            else:
+                return ToolResult(success=False, output=f"Failed to perform actions: {result.get('error', 'Unknown error')}")
+        except Exception as e:
+            return ToolResult(success=False, output=f"Failed to perform actions: {str(e)}")
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -2,10 +2,10 @@ import os
 import json
 import logging
 import asyncio
-from typing import Dict, List, Any, Optional, Union # Ensure Optional is imported
+from typing import Dict, List, Any, Optional, Union, AsyncGenerator # Ensure Optional is imported
 from datetime import datetime
 
-from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool import Tool, ToolResult, ToolProgress, openapi_schema, xml_schema
 from agentpress.thread_manager import ThreadManager
 from pydantic import BaseModel # Add this import if not present
 
@@ -134,7 +134,7 @@ class DeepResearchToolUpdated(Tool):
     async def _ensure_sandbox(self) -> Any:
         """Ensure we have a valid sandbox instance."""
         if self._sandbox is None:
-            from sandbox.sandbox import get_or_start_sandbox
+            from sandbox.sandbox import get_project_sandbox
 
             if self.thread_manager is None or self.thread_manager.db is None:
                 logger.error("ThreadManager or DB client not available, cannot ensure sandbox.")
@@ -145,7 +145,7 @@ class DeepResearchToolUpdated(Tool):
                 client = await self.thread_manager.db.client
 
                 # Get or start the sandbox
-                self._sandbox = await get_or_start_sandbox(self.project_id, client)
+                self._sandbox = await get_project_sandbox(self.project_id, client)
 
                 if self._sandbox is None:
                     raise ValueError(f"Failed to get or start sandbox for project {self.project_id}")
@@ -207,15 +207,15 @@ class DeepResearchToolUpdated(Tool):
         </function_calls>
         '''
     )
-    async def run(self, parameters: ActualDeepResearchToolParameters) -> ToolResult:
+    async def run(self, parameters: ActualDeepResearchToolParameters) -> AsyncGenerator[Union[ToolProgress, ToolResult], None]:
         """
         Perform deep research on a topic by searching multiple sources, analyzing content, and synthesizing information.
 
         Args:
             parameters: The parameters for the research task
 
-        Returns:
-            List of ToolResult containing the research report and metadata
+        Yields:
+            ToolProgress events for each research phase, then a ToolResult containing the research report and metadata
         """
         logger.info(f"Running {self.name} with parameters: {parameters}")
 
@@ -231,7 +231,8 @@ class DeepResearchToolUpdated(Tool):
                 # Assuming ToolResult.error is a static method that creates a ToolResult instance
                 # If ToolResult.error is not defined, use self.fail_response
                 # For consistency with fail_response elsewhere in the class:
-                return self.fail_response("A research topic is required.")
+                yield self.fail_response("A research topic is required.")
+                return
 
             if parameters.depth not in ["basic", "standard", "deep"]:
                 parameters.depth = "standard"
@@ -251,32 +252,36 @@ class DeepResearchToolUpdated(Tool):
 
             # Generate search queries based on the topic
             queries = await self._generate_search_queries(parameters.topic, search_params[parameters.depth]["queries"])
+            yield self.progress_response(f"Generated {len(queries)} search queries", output="\n".join(queries))
 
             # Perform searches and collect results
             search_results = await self._perform_searches(queries, search_params[parameters.depth]["results_per_query"])
+            yield self.progress_response(f"Found {len(search_results)} unique sources")
 
             # Extract and analyze content from search results
             analyzed_content = await self._analyze_content(search_results, min(parameters.sources, len(search_results)))
+            yield self.progress_response(f"Analyzed {len(analyzed_content)} sources")
 
             # Synthesize information into a coherent report
             report = await self._synthesize_information(parameters.topic, analyzed_content, parameters.depth)
+            yield self.progress_response(f"Writing {parameters.format} report")
 
             # Generate the final report in the requested format
             report_path = await self._generate_report(parameters.topic, report, parameters.format)
 
             # Return success with the report path and metadata
-            return ToolResult(
-                output=DeepResearchToolUpdatedOutput(
+            yield self.success_response(
+                DeepResearchToolUpdatedOutput(
                     report_path=report_path,
                     message=f"Research on '{parameters.topic}' completed successfully.",
                     sources_analyzed=len(analyzed_content),
-                )
+                ).model_dump()
             )
 
         except Exception as e:
             error_message = str(e)
             logger.error(f"Error performing deep research on '{parameters.topic}': {error_message}")
-            return self.fail_response(f"Error performing research: {error_message[:200]}")
+            yield self.fail_response(f"Error performing research: {error_message[:200]}")
 
     async def _generate_search_queries(self, topic: str, num_queries: int) -> List[str]:
         """Generate multiple search queries based on the main topic."""
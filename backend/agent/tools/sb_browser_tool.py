@@ -1,30 +1,178 @@
+import asyncio
+import base64
 import traceback
 import json
-from typing import Optional # Ensure Optional is imported
+import shlex
+from typing import Any, Dict, List, Optional, Union # Ensure Optional is imported
+from urllib.parse import urlencode
 
 from agentpress.tool import ToolResult, openapi_schema, xml_schema # Direct import
 from agentpress.thread_manager import ThreadManager # Direct import
 from sandbox.tool_base import SandboxToolsBase # Direct import
+from sandbox.browser_client import BrowserAPIClient, BrowserAPIError, BrowserAPIUnreachable, get_browser_api_client # Direct import
 from utils.logger import logger # Direct import
-from utils.s3_upload_utils import upload_base64_image # Direct import
+from utils.s3_upload_utils import screenshot_store # Direct import
+
+# Screenshot settings sent to the browser service, by model name fragment (first match wins).
+# Vision encoders resize to roughly 1-1.5k pixels on the long edge anyway, so sending more
+# only costs transfer and upload time.
+SCREENSHOT_SETTINGS_BY_MODEL = [
+    ("claude", {"format": "webp", "quality": 75, "max_width": 1280}),
+    ("gpt", {"format": "webp", "quality": 70, "max_width": 1024}),
+    ("gemini", {"format": "webp", "quality": 70, "max_width": 1280}),
+]
+DEFAULT_SCREENSHOT_SETTINGS = {"format": "jpeg", "quality": 60, "max_width": 1280}
+
+# Routing policies of the browser service behind browser_set_loading_mode
+LOADING_MODES = {
+    "full": {},
+    "lean": {"block_trackers": True, "block_resource_types": ["font"], "max_media_bytes": 2 * 1024 * 1024},
+    "text_only": {"block_trackers": True, "text_only": True},
+}
+
+
+# Told to the model when the browser service had closed this thread's session, by reason
+SESSION_RESET_NOTES = {
+    "idle": "The browser session was closed after being idle and has been reopened: "
+            "earlier tabs, cookies and logins are gone.",
+    "evicted": "The browser session was closed to make room for other sessions and has been reopened: "
+               "earlier tabs, cookies and logins are gone.",
+}
+
+
+def screenshot_settings_for_model(model_name: Optional[str]) -> Dict[str, Any]:
+    """Screenshot format, quality and size for the model that will look at the screenshots"""
+    name = (model_name or "").lower()
+    for fragment, settings in SCREENSHOT_SETTINGS_BY_MODEL:
+        if fragment in name:
+            return dict(settings)
+    return dict(DEFAULT_SCREENSHOT_SETTINGS)
 
 
 class SandboxBrowserTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities."""
     
     # NOTE: project_id, thread_manager (and thread_id if applicable) are Optional to allow default instantiation.
-    def __init__(self, project_id: Optional[str] = None, thread_id: Optional[str] = None, thread_manager: Optional[ThreadManager] = None):
+    def __init__(self, project_id: Optional[str] = None, thread_id: Optional[str] = None, thread_manager: Optional[ThreadManager] = None,
+                 model_name: Optional[str] = None):
         # super().__init__ can handle Optional project_id/thread_manager.
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
+        # Each thread browses in its own browser context (tabs, cookies) inside the sandbox
+        self.browser_session_id = thread_id
+        self.screenshot_settings = screenshot_settings_for_model(model_name)
+        # Last screenshot the service sent us and where it was uploaded, so an unchanged
+        # viewport is neither transferred nor uploaded again
+        self.last_screenshot_id: Optional[str] = None
+        self.last_image_url: Optional[str] = None
+        self._browser_api: Optional[BrowserAPIClient] = None
+        self._browser_api_sandbox_id: Optional[str] = None
+
+    def _screenshot_header(self, transport: str) -> str:
+        """X-Screenshot-Settings header for the next action"""
+        settings = {**self.screenshot_settings, "transport": transport}
+        if self.last_screenshot_id:
+            settings["known_screenshot_id"] = self.last_screenshot_id
+        return json.dumps(settings)
+
+    def _request_headers(self, transport: str) -> Dict[str, str]:
+        """Headers of every browser API request"""
+        headers = {"X-Screenshot-Settings": self._screenshot_header(transport)}
+        if self.browser_session_id:
+            headers["X-Browser-Session"] = self.browser_session_id
+        return headers
+
+    def _get_browser_api(self) -> Optional[BrowserAPIClient]:
+        """HTTP client for the sandbox's browser API, or None to go through curl in the sandbox"""
+        if self._browser_api_sandbox_id != self.sandbox.id:
+            self._browser_api = get_browser_api_client(self.sandbox)
+            self._browser_api_sandbox_id = self.sandbox.id
+            if self._browser_api is None:
+                logger.info(f"Sandbox {self.sandbox.id} does not expose the browser API, using curl in the sandbox")
+        return self._browser_api
+
+    async def _call_via_exec(self, endpoint: str, params: Optional[dict], method: str) -> dict:
+        """Call the browser API with curl inside the sandbox (sandboxes without a reachable API port)"""
+        url = f"http://localhost:8003/api/automation/{endpoint}"
+        if method == "GET" and params:
+            url = f"{url}?{urlencode(params)}"
+        curl_cmd = f"curl -s -X {method} {shlex.quote(url)} -H 'Content-Type: application/json'"
+        for name, value in self._request_headers("file").items():
+            curl_cmd += f" -H {shlex.quote(f'{name}: {value}')}"
+        if method != "GET" and params is not None:
+            curl_cmd += f" -d {shlex.quote(json.dumps(params))}"
+        logger.debug(f"\033[95mExecuting curl command:\033[0m {curl_cmd}")
+
+        if self.sandbox_type == 'local_docker':
+            # Non-blocking exec so other runs keep streaming while the action runs
+            raw_response = await self.sandbox.process.execute_async(curl_cmd, timeout=30)
+        else:
+            raw_response = self.sandbox.process.execute(curl_cmd, timeout=30)
+
+        stdout = raw_response.result
+        stdout_str = stdout.decode('utf-8', errors='replace') if isinstance(stdout, bytes) else (stdout or "")
+        stderr = raw_response.stderr
+        stderr_str = stderr.decode('utf-8', errors='replace') if isinstance(stderr, bytes) else (stderr or "")
+
+        if raw_response.exit_code != 0:
+            raise BrowserAPIError(
+                f"Browser automation request failed with exit code {raw_response.exit_code}.\n"
+                f"Stdout: {stdout_str[:500]}\n"
+                f"Stderr: {stderr_str[:500]}"
+            )
+        if not stdout_str.strip():
+            raise BrowserAPIError("Empty response from browser service.")
+        try:
+            response_json = json.loads(stdout_str)
+        except json.JSONDecodeError:
+            raise BrowserAPIError(f"Response from browser service was not valid JSON: {stdout_str[:200]}")
+        if not isinstance(response_json, dict):
+            raise BrowserAPIError(f"Response from browser service was not a JSON object: {stdout_str[:200]}")
+        return response_json
+
+    async def _store_screenshot(self, response_json: dict) -> None:
+        """Replace the screenshot in a browser service response with its storage image_url"""
+        screenshot_id = response_json.get("screenshot_id")
+        content_type = f"image/{response_json.get('screenshot_format') or 'jpeg'}"
+        screenshot_path = response_json.pop("screenshot_path", None)
+        screenshot_base64 = response_json.pop("screenshot_base64", None)
+
+        if response_json.get("screenshot_unchanged") and screenshot_id == self.last_screenshot_id and self.last_image_url:
+            response_json["image_url"] = self.last_image_url
+            logger.debug(f"Screenshot {screenshot_id} unchanged, reusing {self.last_image_url}")
+            return
 
-    async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
+        browser_api = self._browser_api if self._browser_api_sandbox_id == self.sandbox.id else None
+        if not (screenshot_path or screenshot_base64 or (screenshot_id and browser_api)):
+            return
+
+        try:
+            if screenshot_base64:
+                # Inline screenshots come from browser services that predate screenshot settings
+                image_data = base64.b64decode(screenshot_base64)
+            elif screenshot_path:
+                image_data = await asyncio.to_thread(self.sandbox.fs.download_file, screenshot_path)
+            else:
+                image_data = await browser_api.get_screenshot(screenshot_id)
+            # Uploads in the background; run_agent waits for it before the model fetches the URL
+            image_url = await screenshot_store.store(image_data, content_type, scope=self.thread_id)
+            response_json["image_url"] = image_url
+            self.last_screenshot_id, self.last_image_url = screenshot_id, image_url
+            logger.debug(f"Storing screenshot at {image_url}")
+        except Exception as e:
+            logger.error(f"Failed to upload screenshot: {e}")
+            response_json["image_upload_error"] = str(e)
+
+    async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST",
+                                      record_state: bool = True) -> ToolResult:
         """Execute a browser automation action through the API
         
         Args:
             endpoint (str): The API endpoint to call
             params (dict, optional): Parameters to send. Defaults to None.
             method (str, optional): HTTP method to use. Defaults to "POST".
+            record_state (bool, optional): Whether the response is a browser state to store as the
+                thread's latest browser_state message. Defaults to True.
             
         Returns:
             ToolResult: Result of the execution
@@ -32,141 +180,83 @@ class SandboxBrowserTool(SandboxToolsBase):
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
-            
-            # Build the curl command
-            url = f"http://localhost:8003/api/automation/{endpoint}"
-            
-            if method == "GET" and params:
-                query_params = "&".join([f"{k}={v}" for k, v in params.items()])
-                url = f"{url}?{query_params}"
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-            else:
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-                if params:
-                    json_data = json.dumps(params)
-                    curl_cmd += f" -d '{json_data}'"
-            
-            logger.debug("\033[95mExecuting curl command:\033[0m")
-            logger.debug(f"{curl_cmd}")
-            
-            # Assuming self.sandbox.process.execute now returns (exit_code, (stdout_bytes, stderr_bytes))
-            # as per the implied change in the subtask description.
-            raw_response = self.sandbox.process.execute(curl_cmd, timeout=30)
-            
-            exit_code = raw_response.exit_code
-            # stdout_str = raw_response.result if raw_response.result is not None else ""
-            # stderr_str = raw_response.stderr if raw_response.stderr is not None else ""
-
-            # Temporary variables from raw_response
-            temp_stdout = raw_response.result
-            temp_stderr = raw_response.stderr
-
-            if isinstance(temp_stdout, bytes):
-                stdout_str = temp_stdout.decode('utf-8', errors='replace')
-            elif isinstance(temp_stdout, str):
-                stdout_str = temp_stdout
-            else:
-                logger.warning(f"SandboxBrowserTool: stdout_bytes is neither bytes nor str: {type(temp_stdout)}. Using empty string.")
-                stdout_str = ""
-
-            if isinstance(temp_stderr, bytes):
-                stderr_str = temp_stderr.decode('utf-8', errors='replace')
-            elif isinstance(temp_stderr, str):
-                stderr_str = temp_stderr
-            else:
-                logger.warning(f"SandboxBrowserTool: stderr_bytes is neither bytes nor str: {type(temp_stderr)}. Using empty string.")
-                stderr_str = ""
 
-            logger.debug(f"SandboxBrowserTool: exit_code: {exit_code}")
-            # logger.debug(f"SandboxBrowserTool: stdout_str before JSON parsing: '{stdout_str}'") # Removed as per request
-            logger.debug(f"SandboxBrowserTool: stderr_str: '{stderr_str}'")
+            browser_api = self._get_browser_api()
+            try:
+                if browser_api:
+                    try:
+                        # Screenshots are fetched as binary by id, not inlined in the JSON
+                        response_json = await browser_api.call(endpoint, params, method, headers=self._request_headers("reference"))
+                    except BrowserAPIUnreachable as e:
+                        # No connection could be opened, so the request was never sent: the sandbox was probably
+                        # restarted on other host ports. Run the action through the sandbox itself; the next
+                        # action builds a client from fresh ports. Errors after connecting fail the action instead,
+                        # since replaying could click, type or submit twice.
+                        logger.warning(f"SandboxBrowserTool: {e}, retrying through the sandbox")
+                        self._browser_api, self._browser_api_sandbox_id = None, None
+                        await self._refresh_sandbox()
+                        response_json = await self._call_via_exec(endpoint, params, method)
+                else:
+                    response_json = await self._call_via_exec(endpoint, params, method)
+            except BrowserAPIError as e:
+                logger.error(f"SandboxBrowserTool: {e}")
+                return self.fail_response(str(e))
 
-            if exit_code == 0:
-                # stdout_str is defined from the previous step
-                stripped_stdout_str = stdout_str.strip() # Keep stripping for the actual parsing
-
-                # Crucial log requested by user
-                logger.debug(f"SandboxBrowserTool: Attempting to parse JSON from stdout_str: '{stdout_str}'") # Log CRUCIAL
-
-                if not stdout_str or not stripped_stdout_str: # Check if original or stripped string is empty
-                    logger.error("SandboxBrowserTool: stdout_str is empty or only whitespace, cannot parse JSON.")
-                    return self.fail_response("Empty response from browser service.")
-
-                if not (stripped_stdout_str.startswith('{') and stripped_stdout_str.endswith('}')):
-                    logger.error(f"SandboxBrowserTool: stdout_str does not appear to be a JSON object: '{stdout_str}'")
-                    return self.fail_response(f"Response from browser service was not valid JSON: {stdout_str[:200]}")
-
-                try:
-                    # Use stripped_stdout_str for JSON parsing
-                    response_json = json.loads(stripped_stdout_str)
-
-                    if endpoint == 'input_text' and response_json.get("message") and "Element is not an <input>, <textarea>, <select> or [contenteditable]" in response_json.get("message"):
-                        return self.fail_response(
-                            "Action failed: The element targeted for text input is not an input field. "
-                            "Please ensure the element is an <input>, <textarea>, <select>, or has [contenteditable] attribute. "
-                            "You can use `browser_list_interactive_elements` to get a list of suitable elements."
-                        )
+            if endpoint == 'input_text' and response_json.get("message") and "Element is not an <input>, <textarea>, <select> or [contenteditable]" in response_json.get("message"):
+                return self.fail_response(
+                    "Action failed: The element targeted for text input is not an input field. "
+                    "Please ensure the element is an <input>, <textarea>, <select>, or has [contenteditable] attribute. "
+                    "You can use `browser_list_interactive_elements` to get a list of suitable elements."
+                )
 
-                    if not "content" in response_json:
-                        response_json["content"] = ""
-                    
-                    if not "role" in response_json:
-                        response_json["role"] = "assistant"
+            if not record_state:
+                return self.success_response(response_json)
 
-                    logger.info("Browser automation request completed successfully")
+            if not "content" in response_json:
+                response_json["content"] = ""
+            
+            if not "role" in response_json:
+                response_json["role"] = "assistant"
 
-                    if "screenshot_base64" in response_json:
-                        try:
-                            image_url = await upload_base64_image(response_json["screenshot_base64"])
-                            response_json["image_url"] = image_url
-                            # Remove base64 data from response_json to keep it clean
-                            del response_json["screenshot_base64"]
-                            logger.debug(f"Uploaded screenshot to {image_url}")
-                        except Exception as e:
-                            logger.error(f"Failed to upload screenshot: {e}")
-                            response_json["image_upload_error"] = str(e)
+            logger.info("Browser automation request completed successfully")
 
-                    added_message = await self.thread_manager.add_message(
-                        thread_id=self.thread_id,
-                        type="browser_state",
-                        content=response_json,
-                        is_llm_message=False
-                    )
+            await self._store_screenshot(response_json)
 
-                    success_response = {
-                        "success": True,
-                        "message": response_json.get("message", "Browser action completed successfully")
-                    }
+            added_message = await self.thread_manager.add_message(
+                thread_id=self.thread_id,
+                type="browser_state",
+                content=response_json,
+                is_llm_message=False
+            )
 
-                    if added_message and 'message_id' in added_message:
-                        success_response['message_id'] = added_message['message_id']
-                    if response_json.get("url"):
-                        success_response["url"] = response_json["url"]
-                    if response_json.get("title"):
-                        success_response["title"] = response_json["title"]
-                    if response_json.get("element_count"):
-                        success_response["elements_found"] = response_json["element_count"]
-                    if response_json.get("pixels_below"):
-                        success_response["scrollable_content"] = response_json["pixels_below"] > 0
-                    if response_json.get("ocr_text"):
-                        success_response["ocr_text"] = response_json["ocr_text"]
-                    if response_json.get("image_url"):
-                        success_response["image_url"] = response_json["image_url"]
+            success_response = {
+                "success": True,
+                "message": response_json.get("message", "Browser action completed successfully")
+            }
 
-                    return self.success_response(success_response)
+            # The screenshot is referenced only through the browser_state message, which screenshot
+            # retention updates when the image is deleted
+            if added_message and 'message_id' in added_message:
+                success_response['message_id'] = added_message['message_id']
+            if response_json.get("url"):
+                success_response["url"] = response_json["url"]
+            if response_json.get("title"):
+                success_response["title"] = response_json["title"]
+            if response_json.get("element_count"):
+                success_response["elements_found"] = response_json["element_count"]
+            if response_json.get("pixels_below"):
+                success_response["scrollable_content"] = response_json["pixels_below"] > 0
+            if response_json.get("ocr_text"):
+                success_response["ocr_text"] = response_json["ocr_text"]
+            if response_json.get("requests_blocked"):
+                success_response["requests_blocked"] = response_json["requests_blocked"]
+            if response_json.get("step_results"):
+                success_response["step_results"] = response_json["step_results"]
+            if response_json.get("session_reset"):
+                success_response["session_reset"] = SESSION_RESET_NOTES.get(
+                    response_json["session_reset"], SESSION_RESET_NOTES["evicted"])
 
-                except json.JSONDecodeError as e:
-                    logger.error(f"SandboxBrowserTool: Failed to parse response JSON. Raw stdout_str: '{stdout_str}'. Error: {e}")
-                    return self.fail_response(f"Failed to parse response JSON: {e}. Raw output: {stdout_str[:200]}")
-            else:
-                # Construct a meaningful error message from exit_code, stdout_str, stderr_str
-                error_message = (
-                    f"Browser automation request failed with exit code {exit_code}.\n"
-                    f"Stdout: {stdout_str[:500]}\n"
-                    f"Stderr: {stderr_str[:500]}"
-                )
-                logger.error(error_message)
-                return self.fail_response(error_message)
+            return self.success_response(success_response)
 
         except Exception as e:
             logger.error(f"Error executing browser action: {e}")
@@ -1006,6 +1096,73 @@ class SandboxBrowserTool(SandboxToolsBase):
         logger.debug(f"\033[95mClicking at coordinates: ({x}, {y})\033[0m")
         return await self._execute_browser_action("click_coordinates", {"x": x, "y": y})
 
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_batch",
+            "description": "Perform several browser actions in order, e.g. filling and submitting a form, and get the browser state once at the end. Stops at the first failing step. Element indices are the ones from the latest browser state.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "steps": {
+                        "type": "array",
+                        "description": "Actions to perform in order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "action": {
+                                    "type": "string",
+                                    "enum": ["input_text", "click_element", "click_coordinates", "send_keys", "scroll_down", "scroll_up", "wait_for_selector", "wait"]
+                                },
+                                "index": {"type": "integer", "description": "Element index for input_text and click_element"},
+                                "text": {"type": "string", "description": "Text for input_text"},
+                                "keys": {"type": "string", "description": "Keys for send_keys, e.g. 'Enter'"},
+                                "x": {"type": "integer", "description": "X coordinate for click_coordinates"},
+                                "y": {"type": "integer", "description": "Y coordinate for click_coordinates"},
+                                "amount": {"type": "integer", "description": "Pixels for scroll_down/scroll_up (default: one page)"},
+                                "selector": {"type": "string", "description": "CSS selector for wait_for_selector"},
+                                "seconds": {"type": "number", "description": "Seconds for wait"}
+                            },
+                            "required": ["action"]
+                        }
+                    }
+                },
+                "required": ["steps"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-batch",
+        mappings=[
+            {"param_name": "steps", "node_type": "content", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="browser_batch">
+        <parameter name="steps">[{"action": "input_text", "index": 3, "text": "jane@example.com"}, {"action": "input_text", "index": 4, "text": "Jane"}, {"action": "click_element", "index": 7}, {"action": "wait_for_selector", "selector": ".confirmation"}]</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def browser_batch(self, steps: Union[List[Dict[str, Any]], str]) -> ToolResult:
+        """Perform several browser actions and capture the state once at the end
+        
+        Args:
+            steps (list): Actions to perform in order (list or JSON string)
+            
+        Returns:
+            dict: Result of the execution
+        """
+        if isinstance(steps, str):
+            try:
+                steps = json.loads(steps)
+            except json.JSONDecodeError as e:
+                return self.fail_response(f"steps must be a JSON list of actions: {e}")
+        if not isinstance(steps, list) or not steps:
+            return self.fail_response("steps must be a non-empty list of actions")
+        logger.debug(f"\033[95mRunning a batch of {len(steps)} browser actions\033[0m")
+        return await self._execute_browser_action("batch", {"steps": steps})
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -1034,4 +1191,114 @@ class SandboxBrowserTool(SandboxToolsBase):
             dict: Result of the execution
         """
         logger.debug(f"\033[95mListing interactive elements\033[0m")
-        return await self._execute_browser_action("list_interactive_elements", {})
\ No newline at end of file
+        return await self._execute_browser_action("list_interactive_elements", {})
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_read_screen_text",
+            "description": "Read the text visible on the current page with OCR, optionally only inside a region. Use this for text that is not in the page's HTML, such as text in images, canvases or embedded PDFs.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "x": {
+                        "type": "integer",
+                        "description": "Left edge of the region, in the same coordinates as browser_click_coordinates"
+                    },
+                    "y": {
+                        "type": "integer",
+                        "description": "Top edge of the region"
+                    },
+                    "width": {
+                        "type": "integer",
+                        "description": "Width of the region"
+                    },
+                    "height": {
+                        "type": "integer",
+                        "description": "Height of the region"
+                    }
+                }
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-read-screen-text",
+        mappings=[
+            {"param_name": "x", "node_type": "attribute", "path": "."},
+            {"param_name": "y", "node_type": "attribute", "path": "."},
+            {"param_name": "width", "node_type": "attribute", "path": "."},
+            {"param_name": "height", "node_type": "attribute", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="browser_read_screen_text">
+        <parameter name="x">0</parameter>
+        <parameter name="y">100</parameter>
+        <parameter name="width">600</parameter>
+        <parameter name="height">300</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def browser_read_screen_text(self, x: int = None, y: int = None, width: int = None, height: int = None) -> ToolResult:
+        """Read the text on the current screen (or a region of it) with OCR
+        
+        Args:
+            x (int, optional): Left edge of the region
+            y (int, optional): Top edge of the region
+            width (int, optional): Width of the region
+            height (int, optional): Height of the region
+            
+        Returns:
+            dict: Result of the execution
+        """
+        params = {}
+        if None not in (x, y, width, height):
+            params["region"] = {"x": x, "y": y, "width": width, "height": height}
+        logger.debug(f"\033[95mReading screen text: {params}\033[0m")
+        return await self._execute_browser_action("ocr", params, record_state=False)
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_set_loading_mode",
+            "description": "Choose what pages load from now on in this browser session. 'lean' skips ads, trackers, web fonts and images or videos over 2 MB; 'text_only' also skips all images, videos and stylesheets, which makes reading and extracting text much faster; 'full' loads everything (the default).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "mode": {
+                        "type": "string",
+                        "enum": ["full", "lean", "text_only"],
+                        "description": "What pages load"
+                    }
+                },
+                "required": ["mode"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-set-loading-mode",
+        mappings=[
+            {"param_name": "mode", "node_type": "content", "path": "."}
+        ],
+        example='''
+        <function_calls>
+        <invoke name="browser_set_loading_mode">
+        <parameter name="mode">text_only</parameter>
+        </invoke>
+        </function_calls>
+        '''
+    )
+    async def browser_set_loading_mode(self, mode: str) -> ToolResult:
+        """Set the routing policy of this browser session
+        
+        Args:
+            mode (str): "full", "lean" or "text_only"
+            
+        Returns:
+            dict: Result of the execution
+        """
+        if mode not in LOADING_MODES:
+            return self.fail_response(f"Unknown loading mode '{mode}', use one of: {', '.join(LOADING_MODES)}")
+        logger.debug(f"\033[95mSetting browser loading mode: {mode}\033[0m")
+        return await self._execute_browser_action("routing_policy", LOADING_MODES[mode], record_state=False)
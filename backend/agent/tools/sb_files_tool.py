@@ -1,8 +1,10 @@
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase    
-from utils.files_utils import should_exclude_file, clean_path
+from utils.files_utils import should_exclude_file, clean_path, EXCLUDED_DIRS, EXCLUDED_FILES, EXCLUDED_EXT
 from agentpress.thread_manager import ThreadManager
 from utils.logger import logger
+from typing import Dict, Optional
+import asyncio
 import os
 
 class SandboxFilesTool(SandboxToolsBase):
@@ -12,6 +14,10 @@ class SandboxFilesTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.SNIPPET_LINES = 4  # Number of context lines to show around edits
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
+        # Snapshot kept by get_workspace_state, synced from the sandbox's workspace manifest
+        self._workspace_manifest_id: Optional[str] = None
+        self._workspace_version = 0
+        self._workspace_files: Dict[str, dict] = {}
 
     def clean_path(self, path: str) -> str:
         """Clean and normalize a path to be relative to /workspace"""
@@ -29,29 +35,120 @@ class SandboxFilesTool(SandboxToolsBase):
         except Exception:
             return False
 
+    async def _download_file(self, path: str) -> bytes:
+        """Read a file from the sandbox without blocking the event loop"""
+        if hasattr(self.sandbox.fs, 'download_file_async'):
+            return await self.sandbox.fs.download_file_async(path)
+        return await asyncio.to_thread(self.sandbox.fs.download_file, path)
+
+    async def get_workspace_changes(self, since_version: int = 0, manifest_id: Optional[str] = None) -> Optional[dict]:
+        """Get the files changed in the workspace since a manifest version, without their content.
+
+        The sandbox keeps a hash manifest of the workspace and only re-hashes files whose
+        size or mtime changed. Returns {"manifest_id", "version", "full", "changed", "deleted"},
+        where "changed" holds {"path", "size", "mtime", "hash"} records relative to /workspace.
+        If "full" is true the given version could not be diffed against and "changed" lists
+        every file. Returns None if the sandbox does not support manifests.
+        """
+        await self._ensure_sandbox()
+        if not hasattr(self.sandbox.fs, 'get_workspace_changes_async'):
+            return None
+
+        changes = await self.sandbox.fs.get_workspace_changes_async(
+            self.workspace_path, since_version=since_version, manifest_id=manifest_id,
+            exclude_dirs=EXCLUDED_DIRS, exclude_files=EXCLUDED_FILES, exclude_exts=EXCLUDED_EXT
+        )
+        if changes is None:
+            return None
+        changes["changed"] = [entry for entry in changes["changed"] if not self._should_exclude_file(entry["path"])]
+        return changes
+
     async def get_workspace_state(self) -> dict:
-        """Get the current workspace state by reading all files"""
+        """Get the current workspace state with the content of every text file.
+
+        The state is kept between calls and brought up to date from the workspace
+        manifest, so only files whose content hash changed are downloaded again.
+        """
+        try:
+            changes = await self.get_workspace_changes(self._workspace_version, self._workspace_manifest_id)
+            if changes is None:
+                return await self._read_full_workspace_state()
+
+            if changes["full"]:
+                # Keep cached content: files whose hash is unchanged are not downloaded again
+                cached = self._workspace_files
+                self._workspace_files = {}
+            else:
+                cached = self._workspace_files
+                for rel_path in changes["deleted"]:
+                    self._workspace_files.pop(rel_path, None)
+
+            complete = True
+            for entry in changes["changed"]:
+                rel_path = entry["path"]
+                previous = cached.get(rel_path)
+                if previous and previous["hash"] == entry["hash"]:
+                    content = previous["content"]
+                else:
+                    try:
+                        content = (await self._download_file(f"{self.workspace_path}/{rel_path}")).decode()
+                    except UnicodeDecodeError:
+                        content = None  # Binary file: tracked so it is not downloaded again, but not reported
+                    except Exception as e:
+                        logger.warning(f"Error reading file {rel_path}: {e}")
+                        complete = False
+                        continue
+                self._workspace_files[rel_path] = {
+                    "content": content,
+                    "is_dir": False,
+                    "size": entry["size"],
+                    "modified": entry["mtime"],
+                    "hash": entry["hash"],
+                }
+
+            # A file that could not be read is retried on the next call through a full resync
+            self._workspace_manifest_id = changes["manifest_id"] if complete else None
+            self._workspace_version = changes["version"]
+
+            return {rel_path: dict(state) for rel_path, state in self._workspace_files.items() if state["content"] is not None}
+
+        except Exception as e:
+            logger.error(f"Error getting workspace state: {str(e)}")
+            return {}
+
+    async def _read_full_workspace_state(self) -> dict:
+        """Get the workspace state by listing and reading every file, for sandboxes without manifests"""
         files_state = {}
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            files = self.sandbox.fs.list_files(self.workspace_path)
-            for file_info in files:
-                rel_path = file_info.name
-                
+            if hasattr(self.sandbox.fs, 'list_files_async'):
+                # Whole tree in one structured pass, without descending into excluded directories
+                entries = await self.sandbox.fs.list_files_async(self.workspace_path, max_depth=None, prune_dirs=EXCLUDED_DIRS)
+                files = [
+                    (entry["path"][len(self.workspace_path) + 1:], entry["type"] == "directory", entry["size"], entry["mtime"])
+                    for entry in entries
+                ]
+            else:
+                files = [
+                    (file_info.name, file_info.is_dir, file_info.size, file_info.mod_time)
+                    for file_info in self.sandbox.fs.list_files(self.workspace_path)
+                ]
+
+            for rel_path, is_dir, size, mod_time in files:
                 # Skip excluded files and directories
-                if self._should_exclude_file(rel_path) or file_info.is_dir:
+                if self._should_exclude_file(rel_path) or is_dir:
                     continue
 
                 try:
                     full_path = f"{self.workspace_path}/{rel_path}"
-                    content = self.sandbox.fs.download_file(full_path).decode()
+                    content = (await self._download_file(full_path)).decode()
                     files_state[rel_path] = {
                         "content": content,
-                        "is_dir": file_info.is_dir,
-                        "size": file_info.size,
-                        "modified": file_info.mod_time
+                        "is_dir": is_dir,
+                        "size": size,
+                        "modified": mod_time
                     }
                 except Exception as e:
                     print(f"Error reading file {rel_path}: {e}")
@@ -1,14 +1,23 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncGenerator, Union
+import shlex
 import time
 from uuid import uuid4
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, ToolProgress, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
 from sandbox import local_docker_handler # Added import
+from sandbox.exec_channel import ExecChannelUnavailable
 from utils.logger import logger # Added import
 
 # NOTE: This tool has a dependency on tmux being installed in the sandbox environment.
 
+# Longest single wait for a blocking command before streaming its partial output
+COMPLETION_WAIT_SLICE_SECONDS = 5
+# Each tmux session's output is appended here (via pipe-pane) so it can be read incrementally by byte offset
+SESSION_LOG_DIR = "/tmp/.tmux_logs"
+# Upper bound on the command output returned by a single call
+MAX_OUTPUT_BYTES = 100_000
+
 class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
     Uses sessions for maintaining state between commands and provides comprehensive process management."""
@@ -16,6 +25,7 @@ class SandboxShellTool(SandboxToolsBase):
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self._sessions: Dict[str, str] = {}  # Maps session names to session IDs
+        self._output_cursors: Dict[str, int] = {}  # Maps tmux session names to the byte offset already returned
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
 
     async def _ensure_session(self, session_name: str = "default") -> str:
@@ -118,7 +128,9 @@ class SandboxShellTool(SandboxToolsBase):
         session_name: Optional[str] = None,
         blocking: bool = False,
         timeout: int = 60
-    ) -> ToolResult:
+    ) -> AsyncGenerator[Union[ToolProgress, ToolResult], None]:
+        # Streaming tool: blocking commands yield partial output while they run,
+        # then a final ToolResult.
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
@@ -133,59 +145,86 @@ class SandboxShellTool(SandboxToolsBase):
             if not session_name:
                 session_name = f"session_{str(uuid4())[:8]}"
             
-            # Check if tmux session already exists
-            check_session = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            session_exists = "not_exists" not in check_session.get("output", "")
-            
-            if not session_exists:
-                # Create a new tmux session
-                await self._execute_raw_command(f"tmux new-session -d -s {session_name}")
-                
+            # Create the tmux session unless it already exists (one round trip)
+            log_path = self._session_log_path(session_name)
+            create_result = await self._execute_raw_command(
+                f"tmux has-session -t {session_name} 2>/dev/null || "
+                f"{{ mkdir -p {SESSION_LOG_DIR} && rm -f {log_path} && tmux new-session -d -s {session_name} && "
+                f"tmux pipe-pane -t {session_name} 'cat >> {log_path}' && echo created; }}"
+            )
+            if "created" in create_result.get("output", ""):
+                self._output_cursors[session_name] = 0
+
             # Ensure we're in the correct directory and send command to tmux
             full_command = f"cd {cwd} && {command}"
-            wrapped_command = full_command.replace('"', '\\"')  # Escape double quotes
-            
+
+            if blocking:
+                # The command itself reports completion: it records its exit code
+                # and signals a tmux wait-for channel the moment it finishes.
+                done_signal = f"done_{uuid4().hex[:12]}"
+                exit_file = f"/tmp/.{done_signal}.exit"
+                full_command = f"{full_command}; echo $? > {exit_file}; tmux wait-for -S {done_signal}"
+
             # Send command to tmux session
-            await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_command}" Enter')
-            
+            await self._execute_raw_command(f"tmux send-keys -t {session_name} {shlex.quote(full_command)} Enter")
+
             if blocking:
-                # For blocking execution, wait and capture output
-                start_time = time.time()
-                while (time.time() - start_time) < timeout:
-                    # Wait a bit before checking
-                    time.sleep(2)
-                    
-                    # Check if session still exists (command might have exited)
-                    check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'ended'")
-                    if "ended" in check_result.get("output", ""):
+                deadline = time.monotonic() + timeout
+                exit_code = None
+                start_cursor = self._output_cursors.get(session_name, 0)
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
                         break
-                        
-                    # Get current output and check for common completion indicators
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    current_output = output_result.get("output", "")
-                    
-                    # Check for prompt indicators that suggest command completion
-                    last_lines = current_output.split('\n')[-3:]
-                    completion_indicators = ['$', '#', '>', 'Done', 'Completed', 'Finished', '✓']
-                    if any(indicator in line for indicator in completion_indicators for line in last_lines):
+
+                    # Block inside the sandbox until the command signals (returns within
+                    # milliseconds of exit) or the slice elapses so progress can be streamed.
+                    wait_seconds = max(1, int(min(COMPLETION_WAIT_SLICE_SECONDS, remaining)))
+                    wait_result = await self._execute_raw_command(
+                        f"test -f {exit_file} || timeout {wait_seconds} tmux wait-for {done_signal}; "
+                        f"cat {exit_file} 2>/dev/null && rm -f {exit_file} || tmux has-session -t {session_name} 2>/dev/null || echo ended",
+                        timeout=wait_seconds + 10
+                    )
+                    status = wait_result.get("output", "").strip().split('\n')[0].strip()
+                    if status.lstrip('-').isdigit():
+                        exit_code = int(status)
                         break
-                
-                # Capture final output
-                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                final_output = output_result.get("output", "")
-                
+                    if status == "ended":
+                        # Session was killed before the command could report back
+                        break
+
+                    # Still running: stream only the output produced since the previous check
+                    new_output = await self._read_session_output(session_name, self._output_cursors.get(session_name, 0))
+                    if new_output and new_output["output"]:
+                        self._output_cursors[session_name] = new_output["cursor"]
+                        yield self.progress_response(f"Command running in session '{session_name}'", output=new_output["output"])
+
+                # Capture final output: everything this command wrote, bounded to the last MAX_OUTPUT_BYTES
+                final = await self._read_session_output(session_name, start_cursor)
+                if final is not None:
+                    final_output = final["output"]
+                else:
+                    # Session was created before output logging existed
+                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
+                    final_output = output_result.get("output", "")
+
                 # Kill the session after capture
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
-                
-                return self.success_response({
+                await self._execute_raw_command(f"tmux kill-session -t {session_name}; rm -f {exit_file} {log_path}")
+                self._output_cursors.pop(session_name, None)
+
+                result = {
                     "output": final_output,
                     "session_name": session_name,
                     "cwd": cwd,
-                    "completed": True
-                })
+                    "exit_code": exit_code,
+                    "completed": exit_code is not None
+                }
+                if exit_code is None:
+                    result["message"] = f"Command did not finish within {timeout} seconds and was terminated."
+                yield self.success_response(result)
             else:
                 # For non-blocking, just return immediately
-                return self.success_response({
+                yield self.success_response({
                     "session_name": session_name,
                     "cwd": cwd,
                     "message": f"Command sent to tmux session '{session_name}'. Use check_command_output to view results.",
@@ -199,10 +238,51 @@ class SandboxShellTool(SandboxToolsBase):
                     await self._execute_raw_command(f"tmux kill-session -t {session_name}")
                 except:
                     pass
-            return self.fail_response(f"Error executing command: {str(e)}")
+            yield self.fail_response(f"Error executing command: {str(e)}")
+
+    def _session_log_path(self, session_name: str) -> str:
+        return f"{SESSION_LOG_DIR}/{session_name}.log"
+
+    async def _read_session_output(
+        self,
+        session_name: str,
+        start: int,
+        head_lines: Optional[int] = None,
+        tail_lines: Optional[int] = None,
+        grep: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Read a session's logged output after byte offset `start`, filtering inside the sandbox.
+
+        Returns {"output", "cursor", "truncated"} where cursor is the new end offset,
+        or None if the session has no output log.
+        """
+        log_path = self._session_log_path(session_name)
+        # Strip terminal escape sequences and carriage returns, then apply the requested windows
+        filters = ["sed -e 's|\\x1b\\[[0-9;?]*[ -/]*[@-~]||g' -e 's|\\x1b\\][^\\x07]*\\x07||g' -e 's|\\r$||'"]
+        if grep:
+            filters.append(f"grep -E -e {shlex.quote(grep)}")
+        if head_lines:
+            filters.append(f"head -n {int(head_lines)}")
+        if tail_lines:
+            filters.append(f"tail -n {int(tail_lines)}")
+        filters.append(f"tail -c {MAX_OUTPUT_BYTES + 1}")
+
+        result = await self._execute_raw_command(
+            f"test -f {log_path} || {{ echo nolog; exit 0; }}; "
+            f"size=$(stat -c %s {log_path}); start={int(start)}; [ \"$size\" -lt \"$start\" ] && start=0; echo $size; "
+            f"tail -c +$((start + 1)) {log_path} 2>/dev/null | head -c $((size - start)) | {' | '.join(filters)}"
+        )
+        header, _, body = result.get("output", "").partition('\n')
+        if not header.strip().isdigit():
+            return None
+
+        truncated = len(body.encode("utf-8", errors="replace")) > MAX_OUTPUT_BYTES
+        if truncated:
+            body = body.encode("utf-8", errors="replace")[-MAX_OUTPUT_BYTES:].decode("utf-8", errors="ignore")
+        return {"output": body, "cursor": int(header.strip()), "truncated": truncated}
 
-    async def _execute_raw_command(self, command: str) -> Dict[str, Any]:
-        """Execute a raw command directly in the sandbox, adapting to sandbox type."""
+    async def _execute_raw_command(self, command: str, timeout: int = 60) -> Dict[str, Any]:
+        """Execute a raw shell command directly in the sandbox, adapting to sandbox type."""
         await self._ensure_sandbox() # Ensures self.sandbox is set
 
         if self.sandbox_type == 'local_docker':
@@ -210,12 +290,27 @@ class SandboxShellTool(SandboxToolsBase):
                 logger.error("Local Docker sandbox not properly initialized in tool.")
                 return {"output": "Local Docker sandbox error in tool", "exit_code": -1}
 
-            stdout, stderr, exit_code = local_docker_handler.execute_command_in_container(
-                container_id=self.sandbox.id,
-                command=command,
-                workdir=self.workspace_path # Default workdir for raw commands
-            )
-            combined_output = stdout
+            stdout, stderr, exit_code = None, None, None
+            exec_channel = self.sandbox.get_exec_channel() if hasattr(self.sandbox, 'get_exec_channel') else None
+            if exec_channel:
+                # One framed message over the persistent in-container channel
+                # Only fall back when the request never reached the agent: after a timeout, an error
+                # frame or a dropped connection the command may have run, and must not run twice.
+                # Those errors propagate and the calling tool method returns them as a failure.
+                try:
+                    stdout, stderr, exit_code = await exec_channel.run(command, cwd=self.workspace_path, timeout=timeout)
+                except ExecChannelUnavailable as e:
+                    logger.warning(f"Exec channel unavailable for sandbox {self.sandbox.id}, falling back to docker exec: {e}")
+                    exit_code = None
+
+            if exit_code is None:
+                stdout, stderr, exit_code = await local_docker_handler.execute_command_in_container_async(
+                    container_id=self.sandbox.id,
+                    command=f"/bin/sh -c {shlex.quote(command)}", # exec_run does not go through a shell
+                    workdir=self.workspace_path, # Default workdir for raw commands
+                    timeout_seconds=timeout
+                )
+            combined_output = stdout or ""
             if stderr:
                 combined_output += "\n--- STDERR ---\n" + stderr
             return {"output": combined_output, "exit_code": exit_code}
@@ -239,7 +334,7 @@ class SandboxShellTool(SandboxToolsBase):
                 response = self.sandbox.process.execute_session_command(
                     session_id=session_id,
                     req=req,
-                    timeout=30  # Short timeout for utility commands
+                    timeout=timeout
                 )
 
                 logs = self.sandbox.process.get_session_command_logs(
@@ -255,7 +350,7 @@ class SandboxShellTool(SandboxToolsBase):
         "type": "function",
         "function": {
             "name": "check_command_output",
-            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands.",
+            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands. Only output produced since the previous check of the same session is returned.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -267,6 +362,23 @@ class SandboxShellTool(SandboxToolsBase):
                         "type": "boolean",
                         "description": "Whether to terminate the tmux session after checking. Set to true when you're done with the command.",
                         "default": False
+                    },
+                    "from_start": {
+                        "type": "boolean",
+                        "description": "Return output from the beginning of the session instead of only the output produced since the last check.",
+                        "default": False
+                    },
+                    "head_lines": {
+                        "type": "integer",
+                        "description": "Optional. Only return the first N lines of the new output."
+                    },
+                    "tail_lines": {
+                        "type": "integer",
+                        "description": "Optional. Only return the last N lines of the new output. Useful for long builds where only the latest status matters."
+                    },
+                    "grep": {
+                        "type": "string",
+                        "description": "Optional extended regular expression. Only lines of the new output matching it are returned, e.g. 'error|warning'."
                     }
                 },
                 "required": ["session_name"]
@@ -277,7 +389,11 @@ class SandboxShellTool(SandboxToolsBase):
         tag_name="check-command-output",
         mappings=[
             {"param_name": "session_name", "node_type": "attribute", "path": ".", "required": True},
-            {"param_name": "kill_session", "node_type": "attribute", "path": ".", "required": False}
+            {"param_name": "kill_session", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "from_start", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "head_lines", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "tail_lines", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "grep", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <function_calls>
@@ -293,12 +409,25 @@ class SandboxShellTool(SandboxToolsBase):
         <parameter name="kill_session">true</parameter>
         </invoke>
         </function_calls>
+
+        <!-- Example 3: Only the last lines containing errors -->
+        <function_calls>
+        <invoke name="check_command_output">
+        <parameter name="session_name">build_process</parameter>
+        <parameter name="grep">error|failed</parameter>
+        <parameter name="tail_lines">20</parameter>
+        </invoke>
+        </function_calls>
         '''
     )
     async def check_command_output(
         self,
         session_name: str,
-        kill_session: bool = False
+        kill_session: bool = False,
+        from_start: bool = False,
+        head_lines: Optional[int] = None,
+        tail_lines: Optional[int] = None,
+        grep: Optional[str] = None
     ) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -309,22 +438,38 @@ class SandboxShellTool(SandboxToolsBase):
             if "not_exists" in check_result.get("output", ""):
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
-            # Get output from tmux pane
-            output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-            output = output_result.get("output", "")
+            # Only return output produced after this session's cursor
+            start = 0 if from_start else self._output_cursors.get(session_name, 0)
+            log_output = await self._read_session_output(
+                session_name, start, head_lines=head_lines, tail_lines=tail_lines, grep=grep
+            )
+            if log_output is not None:
+                self._output_cursors[session_name] = log_output["cursor"]
+                output = log_output["output"]
+            else:
+                # Session was not started by this tool, so it has no output log
+                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
+                output = output_result.get("output", "")
             
             # Kill session if requested
             if kill_session:
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                await self._execute_raw_command(f"tmux kill-session -t {session_name}; rm -f {self._session_log_path(session_name)}")
+                self._output_cursors.pop(session_name, None)
                 termination_status = "Session terminated."
             else:
                 termination_status = "Session still running."
             
-            return self.success_response({
+            result = {
                 "output": output,
                 "session_name": session_name,
                 "status": termination_status
-            })
+            }
+            if log_output is not None:
+                result["cursor"] = log_output["cursor"]
+                result["new_bytes"] = log_output["cursor"] - start
+                if log_output["truncated"]:
+                    result["message"] = f"Output truncated to the last {MAX_OUTPUT_BYTES} bytes. Use head_lines, tail_lines or grep to narrow it."
+            return self.success_response(result)
                 
         except Exception as e:
             return self.fail_response(f"Error checking command output: {str(e)}")
@@ -373,7 +518,8 @@ class SandboxShellTool(SandboxToolsBase):
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
             # Kill the session
-            await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+            await self._execute_raw_command(f"tmux kill-session -t {session_name}; rm -f {self._session_log_path(session_name)}")
+            self._output_cursors.pop(session_name, None)
             
             return self.success_response({
                 "message": f"Tmux session '{session_name}' terminated successfully."
@@ -443,6 +589,7 @@ class SandboxShellTool(SandboxToolsBase):
         # Also clean up any tmux sessions
         try:
             await self._ensure_sandbox()
-            await self._execute_raw_command("tmux kill-server 2>/dev/null || true")
+            await self._execute_raw_command(f"tmux kill-server 2>/dev/null; rm -rf {SESSION_LOG_DIR}")
+            self._output_cursors.clear()
         except:
             pass
\ No newline at end of file
@@ -71,13 +71,13 @@ class SandboxWebsiteCreatorTool(Tool):
     async def _ensure_sandbox(self) -> Any:
         """Ensure we have a valid sandbox instance."""
         if self._sandbox is None:
-            from sandbox.sandbox import get_or_start_sandbox
+            from sandbox.sandbox import get_project_sandbox
             if self.thread_manager is None or self.thread_manager.db is None:
                 logger.error("ThreadManager or DB client not available, cannot ensure sandbox.")
                 raise ValueError("Database connection not available to ensure sandbox.")
             try:
                 client = await self.thread_manager.db.client
-                self._sandbox = await get_or_start_sandbox(self.project_id, client)
+                self._sandbox = await get_project_sandbox(self.project_id, client)
                 if self._sandbox is None:
                     raise ValueError(f"Failed to get or start sandbox for project {self.project_id}")
             except Exception as e:
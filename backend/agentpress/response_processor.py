@@ -17,7 +17,7 @@ from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple, Union, Callable, Literal
 from dataclasses import dataclass
 from utils.logger import logger # Direct import
-from .tool import ToolResult # Relative import
+from .tool import ToolResult, ToolProgress # Relative import
 from .tool_registry import ToolRegistry # Relative import
 from .xml_tool_parser import XMLToolParser # Relative import
 from langfuse.client import StatefulTraceClient
@@ -147,6 +147,7 @@ class ResponseProcessor:
         has_printed_thinking_prefix = False # Flag for printing thinking prefix only once
         agent_should_terminate = False # Flag to track if a terminating tool has been executed
         complete_native_tool_calls = [] # Initialize early for use in assistant_response_end
+        tool_progress_queue: asyncio.Queue = asyncio.Queue() # (tool_call, ToolProgress) events from streaming tools
 
         # Collect metadata for reconstructing LiteLLM response object
         streaming_metadata = {
@@ -267,7 +268,7 @@ class ResponseProcessor:
                                         if started_msg_obj: yield format_for_yield(started_msg_obj)
                                         yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                        execution_task = asyncio.create_task(self._execute_tool(tool_call))
+                                        execution_task = asyncio.create_task(self._execute_tool(tool_call, tool_progress_queue))
                                         pending_tool_executions.append({
                                             "task": execution_task, "tool_call": tool_call,
                                             "tool_index": tool_index, "context": context
@@ -337,13 +338,17 @@ class ResponseProcessor:
                                 if started_msg_obj: yield format_for_yield(started_msg_obj)
                                 yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                execution_task = asyncio.create_task(self._execute_tool(tool_call_data))
+                                execution_task = asyncio.create_task(self._execute_tool(tool_call_data, tool_progress_queue))
                                 pending_tool_executions.append({
                                     "task": execution_task, "tool_call": tool_call_data,
                                     "tool_index": tool_index, "context": context
                                 })
                                 tool_index += 1
 
+                # Forward progress from tools already running on stream (transient, not saved)
+                for progress_msg in self._drain_tool_progress(tool_progress_queue, thread_id, thread_run_id):
+                    yield progress_msg
+
                 if finish_reason == "xml_tool_limit_reached":
                     logger.info("Stopping stream processing after loop due to XML tool call limit")
                     self.trace.event(name="stopping_stream_processing_after_loop_due_to_xml_tool_call_limit", level="DEFAULT", status_message=(f"Stopping stream processing after loop due to XML tool call limit"))
@@ -387,7 +392,8 @@ class ResponseProcessor:
                 self.trace.event(name="waiting_for_pending_streamed_tool_executions", level="DEFAULT", status_message=(f"Waiting for {len(pending_tool_executions)} pending streamed tool executions"))
                 # ... (asyncio.wait logic) ...
                 pending_tasks = [execution["task"] for execution in pending_tool_executions]
-                done, _ = await asyncio.wait(pending_tasks)
+                async for progress_msg in self._forward_tool_progress(pending_tasks, tool_progress_queue, thread_id, thread_run_id):
+                    yield progress_msg
 
                 for execution in pending_tool_executions:
                     tool_idx = execution.get("tool_index", -1)
@@ -591,7 +597,12 @@ class ResponseProcessor:
                 elif final_tool_calls_to_process and not config.execute_on_stream:
                     logger.info(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream")
                     self.trace.event(name="executing_tools_after_stream", level="DEFAULT", status_message=(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream"))
-                    results_list = await self._execute_tools(final_tool_calls_to_process, config.tool_execution_strategy)
+                    execution_task = asyncio.create_task(self._execute_tools(
+                        final_tool_calls_to_process, config.tool_execution_strategy, tool_progress_queue
+                    ))
+                    async for progress_msg in self._forward_tool_progress([execution_task], tool_progress_queue, thread_id, thread_run_id):
+                        yield progress_msg
+                    results_list = execution_task.result()
                     current_tool_idx = 0
                     for tc, res in results_list:
                        # Map back using all_tool_data_map which has correct indices
@@ -1329,8 +1340,14 @@ class ResponseProcessor:
         return parsed_data
 
     # Tool execution methods
-    async def _execute_tool(self, tool_call: Dict[str, Any]) -> ToolResult:
-        """Execute a single tool call and return the result."""
+    async def _execute_tool(self, tool_call: Dict[str, Any], progress_queue: Optional[asyncio.Queue] = None) -> ToolResult:
+        """Execute a single tool call and return the result.
+
+        Args:
+            tool_call: Parsed tool call to execute
+            progress_queue: Optional queue receiving (tool_call, ToolProgress) events
+                from streaming tools. Progress is discarded when no queue is given.
+        """
         logger.debug(f"Executing tool with tool_call data: {tool_call}")
         # Ensure original_function_name is available for span naming even if tool_call is malformed
         original_function_name_for_span = tool_call.get("function_name", "unknown_tool")
@@ -1510,7 +1527,7 @@ class ResponseProcessor:
                         logger.warning(f"Original arguments was not a dict ('{type(arguments)}'), using empty dict for Pydantic model. This might be incorrect if arguments were expected.")
 
                     pydantic_params = pydantic_class_to_use(**processed_args)
-                    result = await tool_fn(parameters=pydantic_params)
+                    result = await self._consume_tool_output(tool_fn(parameters=pydantic_params), tool_call, progress_queue)
                 except Exception as e: # Catches Pydantic ValidationError and other instantiation errors
                     error_msg = f"Pydantic model instantiation or execution failed for '{original_function_name}' using '{pydantic_class_to_use.__name__}': {str(e)}. Arguments received: {arguments}"
                     logger.error(error_msg, exc_info=True)
@@ -1518,7 +1535,7 @@ class ResponseProcessor:
             else:
                 logger.info(f"Executing '{original_function_name}' using direct argument unpacking (Pydantic conditions not met or class not resolved). Arguments: {arguments}")
                 try:
-                    result = await tool_fn(**arguments)
+                    result = await self._consume_tool_output(tool_fn(**arguments), tool_call, progress_queue)
                 except TypeError as te:
                     # Specific check for "missing 1 required positional argument: 'parameters'"
                     if 'parameters' in str(te) and ('required positional argument' in str(te) or 'missing 1 required keyword-only argument' in str(te)):
@@ -1544,10 +1561,89 @@ class ResponseProcessor:
             span.end(status_message="tool_execution_error", output=f"Error executing tool: {str(e)}", level="ERROR")
             return ToolResult(success=False, output=f"Error executing tool {fn_for_error}: {str(e)}")
 
+    async def _consume_tool_output(self, tool_output: Any, tool_call: Dict[str, Any], progress_queue: Optional[asyncio.Queue] = None) -> ToolResult:
+        """Resolve the value returned by calling a tool method into its final ToolResult.
+
+        Regular tools return a coroutine, which is simply awaited. Streaming tools
+        return an async generator yielding ToolProgress events followed by a final
+        ToolResult; progress events are pushed onto progress_queue as they arrive.
+        """
+        if not inspect.isasyncgen(tool_output):
+            return await tool_output
+
+        function_name = tool_call.get("function_name", "unknown_tool")
+        final_result = None
+        try:
+            async for event in tool_output:
+                if isinstance(event, ToolResult):
+                    final_result = event
+                    break # The final result ends the stream
+                if isinstance(event, ToolProgress):
+                    if progress_queue is not None:
+                        progress_queue.put_nowait((tool_call, event))
+                else:
+                    logger.warning(f"Streaming tool '{function_name}' yielded unsupported event type {type(event)}; ignoring.")
+        finally:
+            await tool_output.aclose()
+
+        if final_result is None:
+            logger.error(f"Streaming tool '{function_name}' finished without yielding a ToolResult")
+            return ToolResult(success=False, output=f"Tool {function_name} finished without returning a result")
+        return final_result
+
+    def _format_tool_progress(self, tool_call: Dict[str, Any], progress: ToolProgress, thread_id: str, thread_run_id: str) -> Dict[str, Any]:
+        """Format a transient tool_progress status message (yielded, never saved)."""
+        now = datetime.now(timezone.utc).isoformat()
+        content = {
+            "role": "assistant", "status_type": "tool_progress",
+            "function_name": tool_call.get("function_name"), "xml_tag_name": tool_call.get("xml_tag_name"),
+            "tool_call_id": tool_call.get("id"),
+            "message": progress.message, "output": progress.output
+        }
+        return {
+            "message_id": None, "thread_id": thread_id, "type": "status", "is_llm_message": False,
+            "content": to_json_string(content),
+            "metadata": to_json_string({"thread_run_id": thread_run_id}),
+            "created_at": now, "updated_at": now
+        }
+
+    def _drain_tool_progress(self, progress_queue: asyncio.Queue, thread_id: str, thread_run_id: str) -> List[Dict[str, Any]]:
+        """Return formatted messages for every progress event currently queued, without waiting."""
+        messages = []
+        while not progress_queue.empty():
+            tool_call, progress = progress_queue.get_nowait()
+            messages.append(self._format_tool_progress(tool_call, progress, thread_id, thread_run_id))
+        return messages
+
+    async def _forward_tool_progress(
+        self,
+        tasks: List[asyncio.Task],
+        progress_queue: asyncio.Queue,
+        thread_id: str,
+        thread_run_id: str
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Wait for the given tool tasks, yielding progress messages as they arrive.
+
+        Completes once every task is done; task results are left on the tasks.
+        """
+        pending = set(tasks)
+        while pending:
+            getter = asyncio.create_task(progress_queue.get())
+            done, _ = await asyncio.wait(pending | {getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                tool_call, progress = getter.result()
+                yield self._format_tool_progress(tool_call, progress, thread_id, thread_run_id)
+            else:
+                getter.cancel()
+            pending -= done
+        for progress_msg in self._drain_tool_progress(progress_queue, thread_id, thread_run_id):
+            yield progress_msg
+
     async def _execute_tools(
         self, 
         tool_calls: List[Dict[str, Any]], 
-        execution_strategy: ToolExecutionStrategy = "sequential"
+        execution_strategy: ToolExecutionStrategy = "sequential",
+        progress_queue: Optional[asyncio.Queue] = None
     ) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls with the specified strategy.
         
@@ -1559,6 +1655,7 @@ class ResponseProcessor:
             execution_strategy: Strategy for executing tools:
                 - "sequential": Execute tools one after another, waiting for each to complete
                 - "parallel": Execute all tools simultaneously for better performance 
+            progress_queue: Optional queue receiving progress events from streaming tools
                 
         Returns:
             List of tuples containing the original tool call and its result
@@ -1567,14 +1664,14 @@ class ResponseProcessor:
         self.trace.event(name="executing_tools_with_strategy", level="DEFAULT", status_message=(f"Executing {len(tool_calls)} tools with strategy: {execution_strategy}"))
             
         if execution_strategy == "sequential":
-            return await self._execute_tools_sequentially(tool_calls)
+            return await self._execute_tools_sequentially(tool_calls, progress_queue)
         elif execution_strategy == "parallel":
-            return await self._execute_tools_in_parallel(tool_calls)
+            return await self._execute_tools_in_parallel(tool_calls, progress_queue)
         else:
             logger.warning(f"Unknown execution strategy: {execution_strategy}, falling back to sequential")
-            return await self._execute_tools_sequentially(tool_calls)
+            return await self._execute_tools_sequentially(tool_calls, progress_queue)
 
-    async def _execute_tools_sequentially(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
+    async def _execute_tools_sequentially(self, tool_calls: List[Dict[str, Any]], progress_queue: Optional[asyncio.Queue] = None) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls sequentially and return results.
         
         This method executes tool calls one after another, waiting for each tool to complete
@@ -1582,6 +1679,7 @@ class ResponseProcessor:
         
         Args:
             tool_calls: List of tool calls to execute
+            progress_queue: Optional queue receiving progress events from streaming tools
             
         Returns:
             List of tuples containing the original tool call and its result
@@ -1600,7 +1698,7 @@ class ResponseProcessor:
                 logger.debug(f"Executing tool {index+1}/{len(tool_calls)}: {tool_name}")
                 
                 try:
-                    result = await self._execute_tool(tool_call)
+                    result = await self._execute_tool(tool_call, progress_queue)
                     results.append((tool_call, result))
                     logger.debug(f"Completed tool {tool_name} with success={result.success}")
                     
@@ -1632,7 +1730,7 @@ class ResponseProcessor:
                             
             return (results if 'results' in locals() else []) + error_results
 
-    async def _execute_tools_in_parallel(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
+    async def _execute_tools_in_parallel(self, tool_calls: List[Dict[str, Any]], progress_queue: Optional[asyncio.Queue] = None) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls in parallel and return results.
         
         This method executes all tool calls simultaneously using asyncio.gather, which
@@ -1640,6 +1738,7 @@ class ResponseProcessor:
         
         Args:
             tool_calls: List of tool calls to execute
+            progress_queue: Optional queue receiving progress events from streaming tools
             
         Returns:
             List of tuples containing the original tool call and its result
@@ -1653,7 +1752,7 @@ class ResponseProcessor:
             self.trace.event(name="executing_tools_in_parallel", level="DEFAULT", status_message=(f"Executing {len(tool_calls)} tools in parallel: {tool_names}"))
             
             # Create tasks for all tool calls
-            tasks = [self._execute_tool(tool_call) for tool_call in tool_calls]
+            tasks = [self._execute_tool(tool_call, progress_queue) for tool_call in tool_calls]
             
             # Execute all tasks concurrently with error handling
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -5,6 +5,7 @@ This module defines the base classes and decorators for creating tools in AgentP
 - Tool base class for implementing tool functionality
 - Schema decorators for OpenAPI and XML tool definitions
 - Result containers for standardized tool outputs
+- Progress containers for tools that stream partial output before their result
 """
 
 from typing import Dict, Any, Union, Optional, List
@@ -93,6 +94,22 @@ class ToolResult:
     success: bool
     output: str
 
+@dataclass
+class ToolProgress:
+    """Container for intermediate output emitted by a streaming tool.
+
+    Tools that take a long time can be written as async generators: they yield
+    any number of ToolProgress events and finish by yielding a ToolResult.
+    Progress events are forwarded to the client as transient stream messages
+    and are never persisted or shown to the LLM.
+
+    Attributes:
+        message (str): Short human-readable description of the current step
+        output (str, optional): Partial output produced since the previous event
+    """
+    message: str = ""
+    output: Optional[str] = None
+
 @dataclass
 class ToolCall:
     """Represents a parsed call to a tool.
@@ -117,6 +134,7 @@ class Tool(ABC):
         get_schemas: Get all registered tool schemas
         success_response: Create a successful result
         fail_response: Create a failed result
+        progress_response: Create a progress event for streaming tools
     """
     
     def __init__(self):
@@ -168,6 +186,18 @@ class Tool(ABC):
         logger.debug(f"Tool {self.__class__.__name__} returned failed result: {msg}")
         return ToolResult(success=False, output=msg)
 
+    def progress_response(self, message: str, output: Optional[str] = None) -> ToolProgress:
+        """Create a progress event for a streaming tool.
+
+        Args:
+            message: Short description of the current step
+            output: Optional partial output produced since the previous event
+
+        Returns:
+            ToolProgress to be yielded before the final ToolResult
+        """
+        return ToolProgress(message=message, output=output)
+
 def _add_schema(func, schema: ToolSchema):
     """Helper to add schema to a function."""
     if not hasattr(func, 'tool_schemas'):
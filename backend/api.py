@@ -18,6 +18,8 @@ from pydantic import BaseModel
 # Import the agent API module
 from agent import api as agent_api
 from sandbox import api as sandbox_api
+from sandbox.warm_pool import warm_pool
+from sandbox.lifecycle import sandbox_lifecycle
 from services import billing as billing_api
 from services import transcription as transcription_api
 from services.mcp_custom import discover_custom_tools
@@ -60,6 +62,8 @@ async def lifespan(app: FastAPI):
         
         # Start background tasks
         # asyncio.create_task(agent_api.restore_running_agent_runs())
+        warm_pool.start()
+        sandbox_lifecycle.start()
         
         yield
         
@@ -67,6 +71,10 @@ async def lifespan(app: FastAPI):
         logger.info("Cleaning up agent resources")
         await agent_api.cleanup()
         
+        # Remove warm sandboxes that were never assigned to a project
+        await warm_pool.stop()
+        await sandbox_lifecycle.stop()
+        
         # Clean up Redis connection
         try:
             logger.info("Closing Redis connection")
@@ -146,6 +154,17 @@ async def health_check():
         "instance_id": instance_id
     }
 
+@app.get("/api/health/sandboxes")
+async def sandbox_occupancy():
+    """Sandbox counts per lifecycle tier (running, stopped, archived) and idle-stop/resume totals."""
+    if not sandbox_lifecycle.enabled:
+        return {"enabled": False}
+    try:
+        return {"enabled": True, **await sandbox_lifecycle.occupancy()}
+    except Exception as e:
+        logger.error(f"Failed to read sandbox occupancy: {e}")
+        raise HTTPException(status_code=503, detail="Sandbox occupancy unavailable")
+
 class CustomMCPDiscoverRequest(BaseModel):
     type: str
     config: Dict[str, Any]
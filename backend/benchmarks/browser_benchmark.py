@@ -0,0 +1,293 @@
+"""
+Latency benchmarks of the browser automation API (sandbox/docker/browser_api.py) against
+static fixture pages served from this process, with headless Chromium and no network.
+
+Usage (from the backend directory, with the browser service's dependencies installed:
+`pip install -r sandbox/docker/requirements.txt playwright && playwright install chromium`):
+
+    python -m benchmarks.browser_benchmark --output browser-$(git rev-parse --short HEAD).json
+    python -m benchmarks.results compare browser-old.json browser-new.json
+
+The API runs in-process and is called through its ASGI app, so every request goes through
+the same middlewares, validation and serialization as in the sandbox, without an HTTP hop.
+
+Fixtures:
+- simple: a short article with a form
+- table: a large DOM (a table of --table-rows rows)
+- spa: a single-page app that mutates its DOM every 100ms
+- slow: a page whose image and script take --slow-ms to load
+
+Every fixture is loaded with navigate_to and then driven with click_element, input_text,
+scroll_down and extract_content. For each endpoint, the benchmark records the client-side
+latency and the size of the response. It also records the stages the API reports in its
+Server-Timing header: action, settle, dom (DOM extraction), screenshot, ocr and serialize.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .results import BenchmarkResults
+
+BROWSER_API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sandbox', 'docker')
+SESSION_ID = 'benchmark'
+STAGES = ('action', 'settle', 'dom', 'screenshot', 'ocr', 'serialize', 'total')
+# Chromium resolves nothing but the fixture server, so no page can reach the network
+OFFLINE_LAUNCH_ARGS = '"--host-resolver-rules=MAP * ~NOTFOUND, EXCLUDE 127.0.0.1"'
+
+SUITES = ('simple', 'table', 'spa', 'slow')
+FULL = {
+    'iterations': 20,
+    'table_rows': 5000,
+    'slow_ms': 1500,
+}
+QUICK = {
+    'iterations': 3,
+    'table_rows': 1000,
+    'slow_ms': 500,
+}
+
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+FORM_HTML = """
+<form onsubmit="return false">
+  <input id="query" name="query" placeholder="Search">
+  <button id="go" type="button" onclick="document.getElementById('status').textContent = 'Clicked ' + Date.now()">Go</button>
+  <p id="status">Idle</p>
+</form>
+"""
+
+
+def fixture_pages(table_rows: int, slow_ms: int) -> Dict[str, str]:
+    """HTML of every fixture page, by path"""
+    paragraphs = "\n".join(f"<p>Paragraph {i}: {'Lorem ipsum dolor sit amet. ' * 8}</p>" for i in range(30))
+    rows = "\n".join(
+        f"<tr><td>{i}</td><td><a href='#row-{i}'>Item {i}</a></td><td>{i * 7 % 1000}</td>"
+        f"<td><input type='checkbox' name='select-{i}'></td><td>Category {i % 13}</td></tr>"
+        for i in range(table_rows)
+    )
+    return {
+        '/simple.html': f"""<!DOCTYPE html><html><head><title>Simple</title></head><body>
+<h1>Simple page</h1>{FORM_HTML}<a href="#more">More</a>{paragraphs}</body></html>""",
+
+        '/table.html': f"""<!DOCTYPE html><html><head><title>Table</title></head><body>
+<h1>{table_rows} rows</h1>{FORM_HTML}
+<table><thead><tr><th>#</th><th>Name</th><th>Value</th><th>Select</th><th>Category</th></tr></thead>
+<tbody>{rows}</tbody></table></body></html>""",
+
+        '/spa.html': f"""<!DOCTYPE html><html><head><title>SPA</title></head><body>
+<h1>Live feed</h1>{FORM_HTML}<p id="clock"></p><ul id="feed"></ul>
+<script>
+  let tick = 0;
+  setInterval(() => {{
+    tick++;
+    document.getElementById('clock').textContent = new Date().toISOString();
+    const feed = document.getElementById('feed');
+    const item = document.createElement('li');
+    item.innerHTML = '<a href="#event-' + tick + '">Event ' + tick + '</a>';
+    feed.prepend(item);
+    while (feed.children.length > 50) feed.lastChild.remove();
+  }}, 100);
+</script>{paragraphs}</body></html>""",
+
+        '/slow.html': f"""<!DOCTYPE html><html><head><title>Slow</title>
+<script async src="/slow/{slow_ms}/app.js"></script></head><body>
+<h1>Slow resources</h1>{FORM_HTML}<img src="/slow/{slow_ms}/hero.png" width="600" height="300" alt="Hero">
+{paragraphs}</body></html>""",
+    }
+
+
+class FixtureServer:
+    """Serves the fixture pages on a loopback port from a background thread.
+
+    /slow/<ms>/<name> answers after <ms> milliseconds, with a script or an image by extension.
+    """
+
+    def __init__(self, pages: Dict[str, str]):
+        encoded = {path: html.encode() for path, html in pages.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/slow/'):
+                    _, _, delay_ms, name = self.path.split('/', 3)
+                    time.sleep(int(delay_ms) / 1000)
+                    body, content_type = ((b"window.appLoaded = true;", 'application/javascript')
+                                          if name.endswith('.js') else (PIXEL_PNG, 'image/png'))
+                elif self.path in encoded:
+                    body, content_type = encoded[self.path], 'text/html; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> 'FixtureServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Stage durations in ms from a Server-Timing header such as 'dom;dur=12.5, total;dur=80.1'"""
+    stages = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur' and name:
+                stages[name] = float(value)
+    return stages
+
+
+def load_browser_api():
+    """Import the browser service in headless, offline mode"""
+    os.environ['BROWSER_HEADLESS'] = 'true'
+    os.environ['BROWSER_START_URL'] = 'about:blank'
+    os.environ['BROWSER_LAUNCH_ARGS'] = f"{os.environ.get('BROWSER_LAUNCH_ARGS', '')} {OFFLINE_LAUNCH_ARGS}".strip()
+    if BROWSER_API_DIR not in sys.path:
+        sys.path.insert(0, BROWSER_API_DIR)
+    import browser_api
+    return browser_api
+
+
+class FixtureRun:
+    """Drives the automation endpoints on one fixture page and collects their timings."""
+
+    def __init__(self, client: httpx.AsyncClient, headers: Dict[str, str]):
+        self.client = client
+        self.headers = headers
+        self.samples: Dict[str, Dict[str, List[float]]] = {}  # Endpoint -> stage -> ms
+        self.response_sizes: Dict[str, List[float]] = {}
+
+    async def call(self, endpoint: str, body: Any) -> Dict[str, Any]:
+        started = time.perf_counter()
+        response = await self.client.post(f"/api/automation/{endpoint}", json=body, headers=self.headers)
+        elapsed = (time.perf_counter() - started) * 1000
+        response.raise_for_status()
+        result = response.json()
+        if not result.get('success', True):
+            raise RuntimeError(f"{endpoint} failed: {result.get('error') or result.get('message')}")
+
+        stages = self.samples.setdefault(endpoint, {})
+        for stage, ms in parse_server_timing(response.headers.get('server-timing')).items():
+            stages.setdefault(stage, []).append(ms)
+        stages.setdefault('client', []).append(elapsed)
+        self.response_sizes.setdefault(endpoint, []).append(len(response.content) / 1024)
+        return result
+
+    async def iteration(self, url: str) -> None:
+        state = await self.call('navigate_to', {'url': url})
+        elements = state.get('interactive_elements') or []
+        button, text_input = _element_index(elements, 'button'), _element_index(elements, 'input')
+        if button is None or text_input is None:
+            raise RuntimeError(f"Fixture {url} has no button or input among its interactive elements")
+        await self.call('click_element', {'index': button})
+        await self.call('input_text', {'index': text_input, 'text': 'benchmark query'})
+        await self.call('scroll_down', {'amount': 500})
+        await self.call('extract_content', 'benchmark goal')
+
+    def record(self, results: BenchmarkResults, fixture: str) -> None:
+        for endpoint, stages in self.samples.items():
+            for stage in (*STAGES, 'client'):
+                if stage in stages:
+                    results.add_samples(f"browser.{fixture}.{endpoint}.{stage}", stages[stage])
+            results.add_samples(f"browser.{fixture}.{endpoint}.response_size", self.response_sizes[endpoint], unit="KiB")
+
+
+def _element_index(elements: List[Dict[str, Any]], tag_name: str) -> Optional[int]:
+    for element in elements:
+        if element.get('tag_name') == tag_name and element.get('type') != 'checkbox':
+            return element['index']
+    return None
+
+
+async def bench_fixture(results: BenchmarkResults, client: httpx.AsyncClient, headers: Dict[str, str],
+                        fixture: str, url: str, iterations: int) -> None:
+    print(f"{fixture} ({iterations} iterations)", file=sys.stderr)
+    fixture_run = FixtureRun(client, headers)
+    await fixture_run.iteration(url)  # Warm up: first navigation, DOM tracker injection, CDP session
+    fixture_run.samples.clear()
+    fixture_run.response_sizes.clear()
+    for _ in range(iterations):
+        await fixture_run.iteration(url)
+    fixture_run.record(results, fixture)
+
+
+async def run(args) -> BenchmarkResults:
+    params = dict(QUICK if args.quick else FULL)
+    if args.iterations:
+        params['iterations'] = args.iterations
+    suites = args.only.split(',') if args.only else list(SUITES)
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))} (available: {', '.join(SUITES)})")
+    screenshot_settings = json.loads(args.screenshot_settings) if args.screenshot_settings else {}
+
+    browser_api = load_browser_api()
+    service = browser_api.automation_service
+    await service.startup()
+    try:
+        results = BenchmarkResults(
+            "browser",
+            parameters={**params, 'suites': suites, 'screenshot_settings': screenshot_settings},
+            host={'chromium_version': service.browser.version},
+        )
+        headers = {'X-Browser-Session': SESSION_ID}
+        if screenshot_settings:
+            headers['X-Screenshot-Settings'] = json.dumps(screenshot_settings)
+        transport = httpx.ASGITransport(app=browser_api.api_app)
+        with FixtureServer(fixture_pages(params['table_rows'], params['slow_ms'])) as server:
+            async with httpx.AsyncClient(transport=transport, base_url="http://browser-api", timeout=120) as client:
+                for fixture in suites:
+                    await bench_fixture(results, client, headers, fixture, f"{server.base_url}/{fixture}.html",
+                                        params['iterations'])
+    finally:
+        await service.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the browser automation API on local fixture pages')
+    parser.add_argument('--only', default=None, help=f'Comma separated fixtures to run (default: all of {", ".join(SUITES)})')
+    parser.add_argument('--quick', action='store_true', help='Fewer iterations and a smaller table, for a fast sanity check')
+    parser.add_argument('--iterations', type=int, default=None, help='Iterations per fixture (overrides --quick)')
+    parser.add_argument('--screenshot-settings', default=None,
+                        help='X-Screenshot-Settings JSON for every request, e.g. \'{"format": "webp", "ocr": "always"}\'')
+    parser.add_argument('--output', default='-', help='Results file (default: stdout)')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    results.write(args.output)
+
+
+if __name__ == '__main__':
+    main()
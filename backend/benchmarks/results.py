@@ -0,0 +1,159 @@
+"""
+Machine-readable benchmark results.
+
+Each benchmark run writes one JSON document:
+
+    {
+      "suite": "sandbox",
+      "git_commit": "5cb3f99...",
+      "started_at": "2026-01-01T12:00:00+00:00",
+      "host": {...},
+      "parameters": {...},
+      "metrics": {
+        "exec_rtt.docker_exec": {"unit": "ms", "better": "lower", "samples": 50,
+                                 "mean": 41.2, "p50": 40.1, "p95": 48.9, "p99": 55.0, "min": 37.5, "max": 60.2},
+        "upload.1MiB": {"unit": "MiB/s", "better": "higher", "value": 180.4},
+        ...
+      }
+    }
+
+Two documents (e.g. from two commits) are compared with:
+
+    python -m benchmarks.results compare baseline.json candidate.json [--threshold 10]
+
+which prints every metric's change and exits with status 1 if any metric got
+worse by more than the threshold (in percent).
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkResults:
+    """Collects the metrics of one benchmark run."""
+
+    def __init__(self, suite: str, parameters: Optional[Dict[str, Any]] = None, host: Optional[Dict[str, Any]] = None):
+        self.document = {
+            "suite": suite,
+            "git_commit": git_commit(),
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(), **(host or {})},
+            "parameters": parameters or {},
+            "metrics": {},
+        }
+
+    @property
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return self.document["metrics"]
+
+    def add_samples(self, name: str, samples: Iterable[float], unit: str = "ms", better: str = "lower") -> Dict[str, Any]:
+        """Record a latency-style metric from individual samples."""
+        samples = list(samples)
+        if not samples:
+            return {}
+        metric = {
+            "unit": unit,
+            "better": better,
+            "samples": len(samples),
+            "mean": round(statistics.fmean(samples), 3),
+            "p50": round(percentile(samples, 50), 3),
+            "p95": round(percentile(samples, 95), 3),
+            "p99": round(percentile(samples, 99), 3),
+            "min": round(min(samples), 3),
+            "max": round(max(samples), 3),
+        }
+        self.metrics[name] = metric
+        print(f"  {name}: p50 {metric['p50']} {unit}, p95 {metric['p95']} {unit} ({len(samples)} samples)", file=sys.stderr)
+        return metric
+
+    def add_value(self, name: str, value: float, unit: str, better: str = "higher", **extra) -> Dict[str, Any]:
+        """Record a single-valued metric such as a throughput."""
+        metric = {"unit": unit, "better": better, "value": round(value, 3), **extra}
+        self.metrics[name] = metric
+        print(f"  {name}: {metric['value']} {unit}", file=sys.stderr)
+        return metric
+
+    def write(self, path: Optional[str]) -> None:
+        """Write the document to path, or to stdout if path is None or '-'."""
+        self.document["finished_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        output = json.dumps(self.document, indent=2, sort_keys=True)
+        if path in (None, '-'):
+            print(output)
+        else:
+            with open(path, 'w') as f:
+                f.write(output + "\n")
+            print(f"Results written to {path}", file=sys.stderr)
+
+
+def _headline(metric: Dict[str, Any]) -> Optional[float]:
+    """The number two runs are compared on: the median for sampled metrics, else the value."""
+    return metric.get("p50", metric.get("value"))
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold_pct: float = 10.0) -> List[Dict[str, Any]]:
+    """
+    Per-metric comparison of two result documents. A metric regressed if it moved in its
+    worse direction by more than threshold_pct percent.
+    """
+    rows = []
+    for name in sorted(set(baseline["metrics"]) | set(candidate["metrics"])):
+        before, after = baseline["metrics"].get(name), candidate["metrics"].get(name)
+        row = {"name": name, "before": _headline(before) if before else None,
+               "after": _headline(after) if after else None, "change_pct": None, "regressed": False,
+               "unit": (after or before)["unit"]}
+        if row["before"] and row["after"] is not None:
+            row["change_pct"] = (row["after"] - row["before"]) / row["before"] * 100
+            worse = row["change_pct"] if (after or before).get("better", "lower") == "lower" else -row["change_pct"]
+            row["regressed"] = worse > threshold_pct
+        rows.append(row)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compare_parser = subparsers.add_parser('compare', help='Show per-metric changes between two runs')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help='Percent change in the worse direction reported as a regression (default: 10)')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"{(baseline.get('git_commit') or '?')[:10]} -> {(candidate.get('git_commit') or '?')[:10]}")
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        change = f"{row['change_pct']:+.1f}%" if row['change_pct'] is not None else "n/a"
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(f"{row['name']:<45} {row['before']!s:>12} -> {row['after']!s:>12} {row['unit']:<6} {change:>8}{flag}")
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
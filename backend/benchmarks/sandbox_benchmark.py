@@ -0,0 +1,287 @@
+"""
+Benchmarks of the local Docker sandbox primitives, run against a real Docker daemon
+and the sandbox image.
+
+Usage (from the backend directory, with Docker running and the image pulled):
+
+    python -m benchmarks.sandbox_benchmark --output sandbox-$(git rev-parse --short HEAD).json
+    python -m benchmarks.results compare sandbox-old.json sandbox-new.json
+
+Measures:
+- cold_start: container start until `docker run` returns, until the exec agent answers
+  and until the browser automation API answers
+- exec_rtt: round trip of a no-op command through `docker exec` and the exec channel
+- upload / download: throughput by file size through the Docker archive API and the
+  exec channel
+- listing: recursive listing and full manifest scan time by tree size
+- concurrency: exec throughput and latency with N containers busy at once
+
+Every container the benchmark starts carries the agentpress_benchmark label and is
+removed when the run ends, also on failure.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from typing import Callable, Awaitable, Dict, List, Optional
+
+from utils.config import Configuration
+from sandbox import local_docker_handler
+from sandbox.exec_channel import ExecChannelError
+from sandbox.sandbox import LocalDockerSandboxWrapper, local_docker_sandbox_env
+from .results import BenchmarkResults
+
+BENCHMARK_LABEL = 'agentpress_benchmark'
+READY_TIMEOUT_SECONDS = 180
+READY_POLL_SECONDS = 0.05
+MiB = 1024 * 1024
+EXEC_CHANNEL_MAX_TRANSFER = 32 * MiB  # Base64 framing must stay under the channel's frame limit
+
+SUITES = ('cold_start', 'exec', 'transfer', 'listing', 'concurrency')
+FULL = {
+    'cold_starts': 5,
+    'exec_iterations': 200,
+    'transfer_sizes': [4 * 1024, 256 * 1024, MiB, 16 * MiB, 64 * MiB],
+    'transfer_repeats': 5,
+    'tree_sizes': [100, 1000, 10000],
+    'container_counts': [1, 2, 4, 8],
+    'execs_per_container': 50,
+}
+QUICK = {
+    'cold_starts': 2,
+    'exec_iterations': 30,
+    'transfer_sizes': [4 * 1024, MiB, 16 * MiB],
+    'transfer_repeats': 2,
+    'tree_sizes': [100, 1000],
+    'container_counts': [1, 4],
+    'execs_per_container': 10,
+}
+
+
+def _size_label(size: int) -> str:
+    return f"{size // MiB}MiB" if size >= MiB else f"{size // 1024}KiB"
+
+
+async def _timed(func: Callable[[], Awaitable]) -> float:
+    """Milliseconds taken by one awaited call."""
+    started = time.perf_counter()
+    await func()
+    return (time.perf_counter() - started) * 1000
+
+
+class SandboxFleet:
+    """Starts benchmark sandboxes and guarantees their removal."""
+
+    def __init__(self, image: str, resource_profile: Optional[str]):
+        self.image = image
+        self.resource_profile = resource_profile
+        self.sandboxes: List[LocalDockerSandboxWrapper] = []
+
+    async def start(self) -> Dict[str, float]:
+        """Start a sandbox and wait until it is usable. Returns the cold start phases in ms."""
+        password = str(uuid.uuid4())
+        started = time.perf_counter()
+        container_info = await local_docker_handler.start_sandbox_container_async(
+            image_name=self.image,
+            env_vars=local_docker_sandbox_env(password),
+            labels={BENCHMARK_LABEL: 'true'},
+            resource_profile=self.resource_profile,
+        )
+        if not container_info:
+            raise RuntimeError(f"Could not start a sandbox from image {self.image}")
+        container_started = time.perf_counter()
+        sandbox = LocalDockerSandboxWrapper(container_info, password)
+        self.sandboxes.append(sandbox)
+
+        exec_ready = await self._wait_for(sandbox, "true")
+        browser_ready = await self._wait_for(sandbox, "curl -sf -o /dev/null http://localhost:8003/api")
+        return {
+            'container': (container_started - started) * 1000,
+            'exec_ready': (exec_ready - started) * 1000,
+            'browser_api_ready': (browser_ready - started) * 1000,
+        }
+
+    async def _wait_for(self, sandbox: LocalDockerSandboxWrapper, probe: str) -> float:
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                _, _, exit_code = await sandbox.get_exec_channel().run(probe, timeout=10)
+                if exit_code == 0:
+                    return time.perf_counter()
+            except ExecChannelError:
+                pass  # Exec agent not listening yet
+            await asyncio.sleep(READY_POLL_SECONDS)
+        raise RuntimeError(f"Sandbox {sandbox.id} did not pass '{probe}' within {READY_TIMEOUT_SECONDS}s")
+
+    async def remove(self, sandbox: LocalDockerSandboxWrapper) -> None:
+        channel = sandbox.get_exec_channel()
+        if channel:
+            await channel.close()
+        await local_docker_handler.stop_and_remove_sandbox_container_async(sandbox.id)
+        self.sandboxes.remove(sandbox)
+
+    async def remove_all(self) -> None:
+        for sandbox in list(self.sandboxes):
+            await self.remove(sandbox)
+
+
+async def bench_cold_start(results: BenchmarkResults, fleet: SandboxFleet, runs: int) -> None:
+    print(f"Cold start ({runs} runs)", file=sys.stderr)
+    phases: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        for phase, ms in (await fleet.start()).items():
+            phases.setdefault(phase, []).append(ms)
+        await fleet.remove(fleet.sandboxes[-1])
+    for phase, samples in phases.items():
+        results.add_samples(f"cold_start.{phase}", samples)
+
+
+async def bench_exec_rtt(results: BenchmarkResults, sandbox: LocalDockerSandboxWrapper, iterations: int) -> None:
+    print(f"Exec round trip ({iterations} iterations)", file=sys.stderr)
+    channel = sandbox.get_exec_channel()
+    docker_exec = [await _timed(lambda: local_docker_handler.execute_command_in_container_async(sandbox.id, "true"))
+                   for _ in range(iterations)]
+    exec_channel = [await _timed(lambda: channel.run("true")) for _ in range(iterations)]
+    results.add_samples("exec_rtt.docker_exec", docker_exec)
+    results.add_samples("exec_rtt.exec_channel", exec_channel)
+
+
+async def bench_transfer(results: BenchmarkResults, sandbox: LocalDockerSandboxWrapper, sizes: List[int], repeats: int) -> None:
+    print(f"Upload/download throughput (sizes {', '.join(map(_size_label, sizes))})", file=sys.stderr)
+    channel = sandbox.get_exec_channel()
+
+    async def stream(path: str) -> None:
+        async for _ in local_docker_handler.stream_file_from_container_async(sandbox.id, path):
+            pass
+
+    for size in sizes:
+        label = _size_label(size)
+        data = os.urandom(size)
+        path = f"/workspace/bench_transfer_{label}.bin"
+        methods = {
+            'upload.docker': lambda: local_docker_handler.put_files_in_container_async(sandbox.id, [(path, data)]),
+            'download.docker': lambda: local_docker_handler.read_file_from_container_async(sandbox.id, path),
+            'download.docker_stream': lambda: stream(path),
+        }
+        if size <= EXEC_CHANNEL_MAX_TRANSFER:
+            methods['upload.exec_channel'] = lambda: channel.write_file(path, data)
+            methods['download.exec_channel'] = lambda: channel.read_file(path)
+
+        for name, method in methods.items():
+            samples = sorted([await _timed(method) for _ in range(repeats)])
+            median_seconds = samples[len(samples) // 2] / 1000
+            results.add_value(f"{name}.{label}", size / MiB / median_seconds, "MiB/s", samples=repeats)
+        await channel.run(f"rm -f {path}")
+
+
+async def bench_listing(results: BenchmarkResults, sandbox: LocalDockerSandboxWrapper, tree_sizes: List[int]) -> None:
+    print(f"Directory listing (trees of {', '.join(map(str, tree_sizes))} files)", file=sys.stderr)
+    channel = sandbox.get_exec_channel()
+    for tree_size in tree_sizes:
+        root = f"/workspace/bench_tree_{tree_size}"
+        # 100 files per directory, like a typical source tree
+        await channel.run(
+            "python3 -c \"import os,sys\n"
+            "root, n = sys.argv[1], int(sys.argv[2])\n"
+            "for i in range(n):\n"
+            "    d = os.path.join(root, 'd%d' % (i // 100))\n"
+            "    os.makedirs(d, exist_ok=True)\n"
+            "    open(os.path.join(d, 'f%d.txt' % i), 'w').write('x' * 64)\n"
+            f"\" {root} {tree_size}",
+            timeout=300,
+        )
+        listing = [await _timed(lambda: local_docker_handler.list_files_in_container_async(sandbox.id, root, max_depth=None))
+                   for _ in range(5)]
+        manifest = [await _timed(lambda: local_docker_handler.scan_workspace_manifest_in_container_async(
+                        sandbox.id, {"root": root, "manifest_id": str(uuid.uuid4())}))
+                    for _ in range(5)]
+        results.add_samples(f"listing.recursive.{tree_size}_files", listing)
+        results.add_samples(f"listing.manifest_full_scan.{tree_size}_files", manifest)
+        await channel.run(f"rm -rf {root}", timeout=300)
+
+
+async def bench_concurrency(results: BenchmarkResults, fleet: SandboxFleet, container_counts: List[int],
+                            execs_per_container: int) -> None:
+    print(f"Concurrent exec scaling ({', '.join(map(str, container_counts))} containers)", file=sys.stderr)
+    while len(fleet.sandboxes) < max(container_counts):
+        await asyncio.gather(*(fleet.start() for _ in range(max(container_counts) - len(fleet.sandboxes))))
+
+    async def worker(run_one: Callable[[], Awaitable], latencies: List[float]) -> None:
+        for _ in range(execs_per_container):
+            latencies.append(await _timed(run_one))
+
+    for count in container_counts:
+        sandboxes = fleet.sandboxes[:count]
+        for transport in ('docker_exec', 'exec_channel'):
+            latencies: List[float] = []
+            if transport == 'docker_exec':
+                runners = [lambda s=s: local_docker_handler.execute_command_in_container_async(s.id, "true") for s in sandboxes]
+            else:
+                runners = [lambda s=s: s.get_exec_channel().run("true") for s in sandboxes]
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(run_one, latencies) for run_one in runners))
+            elapsed = time.perf_counter() - started
+            results.add_value(f"concurrency.{transport}.{count}_containers.throughput", len(latencies) / elapsed, "ops/s")
+            results.add_samples(f"concurrency.{transport}.{count}_containers.latency", latencies)
+
+
+async def run(args) -> BenchmarkResults:
+    params = dict(QUICK if args.quick else FULL)
+    suites = args.only.split(',') if args.only else list(SUITES)
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))} (available: {', '.join(SUITES)})")
+
+    results = BenchmarkResults(
+        "sandbox",
+        parameters={**params, 'image': args.image, 'resource_profile': args.resource_profile, 'suites': suites,
+                    'docker_io_max_concurrency': local_docker_handler.DOCKER_IO_MAX_CONCURRENCY},
+        host={'docker_server_version': await asyncio.to_thread(_docker_version)},
+    )
+    fleet = SandboxFleet(args.image, args.resource_profile)
+    try:
+        if 'cold_start' in suites:
+            await bench_cold_start(results, fleet, params['cold_starts'])
+        if set(suites) & {'exec', 'transfer', 'listing'}:
+            await fleet.start()
+            sandbox = fleet.sandboxes[0]
+            if 'exec' in suites:
+                await bench_exec_rtt(results, sandbox, params['exec_iterations'])
+            if 'transfer' in suites:
+                await bench_transfer(results, sandbox, params['transfer_sizes'], params['transfer_repeats'])
+            if 'listing' in suites:
+                await bench_listing(results, sandbox, params['tree_sizes'])
+        if 'concurrency' in suites:
+            await bench_concurrency(results, fleet, params['container_counts'], params['execs_per_container'])
+    finally:
+        await fleet.remove_all()
+    return results
+
+
+def _docker_version() -> Optional[str]:
+    client = local_docker_handler._get_or_initialize_client()
+    return client.version().get('Version') if client else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark local Docker sandbox operations')
+    parser.add_argument('--image', default=Configuration.SANDBOX_IMAGE_NAME,
+                        help=f'Sandbox image (default: {Configuration.SANDBOX_IMAGE_NAME})')
+    parser.add_argument('--resource-profile', default=None,
+                        help='Resource profile for the benchmark containers (default: unconstrained)')
+    parser.add_argument('--only', default=None, help=f'Comma separated suites to run (default: all of {", ".join(SUITES)})')
+    parser.add_argument('--quick', action='store_true', help='Fewer iterations and sizes, for a fast sanity check')
+    parser.add_argument('--output', default='-', help='Results file (default: stdout)')
+    args = parser.parse_args()
+
+    if not local_docker_handler._get_or_initialize_client():
+        raise SystemExit("Docker daemon not reachable; the sandbox benchmark needs a local Docker daemon")
+    results = asyncio.run(run(args))
+    results.write(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@ from services import redis
 from dramatiq.brokers.rabbitmq import RabbitmqBroker
 import os
 from services.langfuse import langfuse
+from utils.s3_upload_utils import screenshot_store
 
 rabbitmq_host = os.getenv('RABBITMQ_HOST', 'rabbitmq')
 rabbitmq_port = int(os.getenv('RABBITMQ_PORT', 5672))
@@ -239,11 +240,21 @@ async def run_agent_background(
         # Remove the instance-specific active run key
         await _cleanup_redis_instance_key(agent_run_id)
 
+        # Finish background screenshot uploads and apply screenshot retention
+        await _cleanup_screenshots(thread_id)
+
         # Wait for 5 seconds for any pending redis operations to complete
         await asyncio.sleep(5)
 
         logger.info(f"Agent run background task fully completed for: {agent_run_id} (Instance: {instance_id}) with final status: {final_status}")
 
+async def _cleanup_screenshots(thread_id: str):
+    """Wait for a run's screenshot uploads and delete screenshots past the retention policy."""
+    try:
+        await screenshot_store.end_run(thread_id)
+    except Exception as e:
+        logger.warning(f"Failed to clean up screenshots of thread {thread_id}: {str(e)}")
+
 async def _cleanup_redis_instance_key(agent_run_id: str):
     """Clean up the instance-specific Redis key for an agent run."""
     if not instance_id:
@@ -1,13 +1,16 @@
 import os
 import urllib.parse
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Form, Depends, Request
-from fastapi.responses import Response
+from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Form, Depends, Request, Query
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
-from sandbox.sandbox import get_or_start_sandbox, delete_sandbox
+from sandbox.sandbox import get_project_sandbox, delete_sandbox
+from sandbox.lifecycle import sandbox_lifecycle
 from utils.logger import logger
+from utils.files_utils import EXCLUDED_DIRS, EXCLUDED_EXT, EXCLUDED_FILES, should_exclude_file
 from utils.auth_utils import get_optional_user_id
 from services.supabase import DBConnection
 
@@ -15,6 +18,13 @@ from services.supabase import DBConnection
 router = APIRouter(tags=["sandbox"])
 db = None
 
+# Directory listing limits
+DEFAULT_LIST_PAGE_SIZE = 500
+MAX_LIST_PAGE_SIZE = 5000
+MAX_LIST_DEPTH = 10
+# find -iname patterns for the excluded files, so filtered entries do not use up a page
+LISTING_SKIP_PATTERNS = sorted(EXCLUDED_FILES | {f"*{ext}" for ext in EXCLUDED_EXT})
+
 def initialize(_db: DBConnection):
     """Initialize the sandbox API with resources from the main API."""
     global db
@@ -131,10 +141,12 @@ async def get_sandbox_by_id_safely(client, sandbox_id: str):
     
     try:
         # Get the sandbox
-        sandbox = await get_or_start_sandbox(project_id, client)
+        sandbox = await get_project_sandbox(project_id, client)
         # Extract just the sandbox object from the tuple (sandbox, sandbox_id, sandbox_pass)
         # sandbox = sandbox_tuple[0]
-            
+
+        # Someone is looking at this sandbox: keep it from being stopped for idleness
+        await sandbox_lifecycle.record_activity(sandbox, project_id)
         return sandbox
     except Exception as e:
         logger.error(f"Error retrieving sandbox {sandbox_id}: {str(e)}")
@@ -162,11 +174,16 @@ async def create_file(
         # Get sandbox using the safer method
         sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
         
-        # Read file content directly from the uploaded file
-        content = await file.read()
-        
-        # Create file using raw binary content
-        sandbox.fs.upload_file(path, content)
+        if hasattr(sandbox.fs, 'upload_files'):
+            # Stream the upload into the sandbox without reading it into memory
+            if not await sandbox.fs.upload_files([(path, file.file)]):
+                raise Exception(f"Failed to upload file to {path}")
+        else:
+            # Read file content directly from the uploaded file
+            content = await file.read()
+            
+            # Create file using raw binary content
+            sandbox.fs.upload_file(path, content)
         logger.info(f"File created at {path} in sandbox {sandbox_id}")
         
         return {"status": "success", "created": True, "path": path}
@@ -178,10 +195,19 @@ async def create_file(
 async def list_files(
     sandbox_id: str, 
     path: str,
+    depth: int = Query(1, ge=1, le=MAX_LIST_DEPTH),
+    exclude: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIST_PAGE_SIZE, ge=1, le=MAX_LIST_PAGE_SIZE),
     request: Request = None,
     user_id: Optional[str] = Depends(get_optional_user_id)
 ):
-    """List files and directories at the specified path"""
+    """List files and directories at the specified path.
+
+    depth > 1 lists recursively (local Docker sandboxes only). exclude=true skips dependency/build directories and
+    files matched by the workspace exclude rules. Results are ordered by path; pass
+    the returned next_cursor as cursor to fetch the following page.
+    """
     # Normalize the path to handle UTF-8 encoding correctly
     path = normalize_path(path)
     
@@ -195,30 +221,134 @@ async def list_files(
         # Get sandbox using the safer method
         sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
         
-        # List files
-        files = sandbox.fs.list_files(path)
-        result = []
-        
-        for file in files:
-            # Convert file information to our model
-            # Ensure forward slashes are used for paths, regardless of OS
-            full_path = f"{path.rstrip('/')}/{file.name}" if path != '/' else f"/{file.name}"
-            file_info = FileInfo(
-                name=file.name,
-                path=full_path, # Use the constructed path
-                is_dir=file.is_dir,
-                size=file.size,
-                mod_time=str(file.mod_time),
-                permissions=getattr(file, 'permissions', None)
+        page = []
+        next_cursor = None
+        if hasattr(sandbox.fs, 'list_files_async'):
+            # Local Docker: one find pass inside the container that also sorts, applies the cursor
+            # and stops after limit + 1 entries, so only one page crosses the exec connection
+            entries = await sandbox.fs.list_files_async(
+                path, max_depth=depth,
+                prune_dirs=EXCLUDED_DIRS if exclude else None,
+                skip_files=LISTING_SKIP_PATTERNS if exclude else None,
+                after=cursor, limit=limit + 1
             )
-            result.append(file_info)
+            # Keyset pagination on path: stable even if entries are added or removed between pages
+            if len(entries) > limit:
+                entries = entries[:limit]
+                next_cursor = entries[-1]["path"]
+            for entry in entries:
+                if exclude and entry["type"] != "directory" and should_exclude_file(entry["path"][len(path.rstrip('/')) + 1:]):
+                    continue
+                page.append(FileInfo(
+                    name=entry["name"],
+                    path=entry["path"],
+                    is_dir=entry["type"] == "directory",
+                    size=entry["size"],
+                    mod_time=datetime.fromtimestamp(entry["mtime"], tz=timezone.utc).isoformat(),
+                    permissions=format(entry["mode"], '03o')
+                ))
+        else:
+            if depth > 1:
+                raise HTTPException(status_code=400, detail="Recursive listing (depth > 1) is only supported for local Docker sandboxes")
+            result = []
+            files = sandbox.fs.list_files(path)
+            for file in files:
+                # Convert file information to our model
+                # Ensure forward slashes are used for paths, regardless of OS
+                full_path = f"{path.rstrip('/')}/{file.name}" if path != '/' else f"/{file.name}"
+                if exclude and (file.name in EXCLUDED_DIRS if file.is_dir else should_exclude_file(file.name)):
+                    continue
+                file_info = FileInfo(
+                    name=file.name,
+                    path=full_path, # Use the constructed path
+                    is_dir=file.is_dir,
+                    size=file.size,
+                    mod_time=str(file.mod_time),
+                    permissions=getattr(file, 'permissions', None)
+                )
+                result.append(file_info)
+            result.sort(key=lambda file_info: file_info.path)
+
+            if cursor:
+                result = [file_info for file_info in result if file_info.path > cursor]
+            page = result[:limit]
+            next_cursor = page[-1].path if len(result) > limit else None
         
-        logger.info(f"Successfully listed {len(result)} files in sandbox {sandbox_id}")
-        return {"files": [file.dict() for file in result]}
+        logger.info(f"Successfully listed {len(page)} files in sandbox {sandbox_id}")
+        return {"files": [file.dict() for file in page], "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing files in sandbox {sandbox_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _parse_range_header(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range "bytes=" Range header into an inclusive (start, end) pair.
+    Returns None if the header should be ignored (malformed or multi-range) and
+    raises ValueError if the range cannot be satisfied for a file of this size.
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    start_str, separator, end_str = spec.strip().partition('-')
+    if not separator or not (start_str or end_str) or not all(part.isdigit() for part in (start_str, end_str) if part):
+        return None
+    if not start_str:
+        # Suffix range: the last N bytes
+        suffix_length = int(end_str)
+        if suffix_length == 0 or size == 0:
+            raise ValueError("unsatisfiable suffix range")
+        return max(size - suffix_length, 0), size - 1
+    start = int(start_str)
+    end = int(end_str) if end_str else size - 1
+    if end_str and end < start:
+        return None
+    if start >= size:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+async def _stream_file_response(sandbox, sandbox_id: str, path: str, request: Optional[Request], content_disposition: str):
+    """Streams a sandbox file with ETag, conditional GET and single-range support, one chunk in memory at a time."""
+    info = await sandbox.fs.get_file_info_async(path)
+    if not info or info["type"] == "directory":
+        raise HTTPException(status_code=404, detail=f"Failed to download file: {path} not found")
+
+    size = info["size"]
+    etag = f'"{size:x}-{int(info["mtime"] * 1_000_000):x}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Content-Disposition": content_disposition}
+    request_headers = request.headers if request is not None else {}
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(',')]):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    byte_range = None
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range_header(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "ETag": etag})
+
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        logger.info(f"Streaming bytes {start}-{end} of {path} from sandbox {sandbox_id}")
+        return StreamingResponse(
+            sandbox.fs.stream_file_async(path, start, end - start + 1),
+            status_code=206, media_type="application/octet-stream", headers=headers
+        )
+
+    headers["Content-Length"] = str(size)
+    logger.info(f"Streaming {path} ({size} bytes) from sandbox {sandbox_id}")
+    return StreamingResponse(
+        sandbox.fs.stream_file_async(path, 0, size),
+        media_type="application/octet-stream", headers=headers
+    )
+
 @router.get("/sandboxes/{sandbox_id}/files/content")
 async def read_file(
     sandbox_id: str, 
@@ -244,6 +374,15 @@ async def read_file(
         # Get sandbox using the safer method
         sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
         
+        filename = os.path.basename(path)
+        # Ensure proper encoding by explicitly using UTF-8 for the filename in Content-Disposition header
+        # This applies RFC 5987 encoding for the filename to support non-ASCII characters
+        encoded_filename = filename.encode('utf-8').decode('latin-1')
+        content_disposition = f"attachment; filename*=UTF-8''{encoded_filename}"
+
+        if hasattr(sandbox.fs, 'stream_file_async'):
+            return await _stream_file_response(sandbox, sandbox_id, path, request, content_disposition)
+
         # Read file directly - don't check existence first with a separate call
         try:
             content = sandbox.fs.download_file(path)
@@ -255,14 +394,8 @@ async def read_file(
             )
         
         # Return a Response object with the content directly
-        filename = os.path.basename(path)
         logger.info(f"Successfully read file {filename} from sandbox {sandbox_id}")
         
-        # Ensure proper encoding by explicitly using UTF-8 for the filename in Content-Disposition header
-        # This applies RFC 5987 encoding for the filename to support non-ASCII characters
-        encoded_filename = filename.encode('utf-8').decode('latin-1')
-        content_disposition = f"attachment; filename*=UTF-8''{encoded_filename}"
-        
         return Response(
             content=content,
             media_type="application/octet-stream",
@@ -376,7 +509,8 @@ async def ensure_project_sandbox_active(
         
         # Get or start the sandbox
         logger.info(f"Ensuring sandbox is active for project {project_id}")
-        sandbox = await get_or_start_sandbox(project_id, client)
+        sandbox = await get_project_sandbox(project_id, client)
+        await sandbox_lifecycle.record_activity(sandbox, project_id)
         
         logger.info(f"Successfully ensured sandbox {sandbox_id} is active for project {project_id}")
         
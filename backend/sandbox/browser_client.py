@@ -0,0 +1,114 @@
+"""
+Client for the in-sandbox browser automation API (sandbox/docker/browser_api.py).
+
+Calls go straight to the API over HTTP, through the sandbox's loopback port mapping
+(local Docker) or its preview URL (Daytona), on a keep-alive connection pool shared by
+all sandboxes. This replaces running curl through a Docker exec for every action.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+import httpx
+
+from utils.logger import logger
+
+BROWSER_API_PORT = 8003
+REQUEST_TIMEOUT = httpx.Timeout(90.0, connect=5.0)  # Actions wait for page loads of up to 60s
+RESPONSE_LIMIT = 64 * 1024 * 1024
+
+
+class BrowserAPIError(Exception):
+    """Raised when the browser API is unreachable or answers with an error."""
+    pass
+
+
+class BrowserAPIUnreachable(BrowserAPIError):
+    """Raised when no connection to the browser API could be opened (refused or timed out while
+    connecting), so the request was never sent and may be retried another way."""
+    pass
+
+
+# One connection pool per event loop; connections are reused across sandboxes, tools and runs
+_http_clients: Dict[int, httpx.AsyncClient] = {}
+
+
+def _http_client() -> httpx.AsyncClient:
+    key = id(asyncio.get_running_loop())
+    client = _http_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+        )
+        _http_clients[key] = client
+    return client
+
+
+class BrowserAPIClient:
+    """Browser API of one sandbox."""
+
+    def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = headers or {}
+
+    async def _read(self, method: str, path: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> bytes:
+        """Stream a response body, refusing bodies over RESPONSE_LIMIT"""
+        url = f"{self.base_url}/api/automation/{path}"
+        try:
+            async with _http_client().stream(method, url, headers={**self.headers, **(headers or {})}, **kwargs) as response:
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > RESPONSE_LIMIT:
+                        raise BrowserAPIError(f"Response from {path} is larger than {RESPONSE_LIMIT} bytes")
+                    chunks.append(chunk)
+                body = b"".join(chunks)
+        except httpx.HTTPError as e:
+            # Read errors and protocol errors can follow a delivered request (the API crashed or
+            # reset mid-action), so only connection failures count as unreachable
+            if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+                raise BrowserAPIUnreachable(f"Browser API at {self.base_url} is unreachable: {e!r}") from e
+            raise BrowserAPIError(f"Browser API request to {path} failed: {e!r}") from e
+
+        if response.status_code >= 400:
+            raise BrowserAPIError(f"Browser API returned {response.status_code} for {path}: {body[:500].decode(errors='replace')}")
+        return body
+
+    async def call(self, endpoint: str, params: Optional[dict] = None, method: str = "POST",
+                   headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Run an automation endpoint and return its JSON result"""
+        if method == "GET":
+            body = await self._read(method, endpoint, headers, params=params or None)
+        else:
+            body = await self._read(method, endpoint, headers, json=params if params is not None else {})
+        try:
+            result = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise BrowserAPIError(f"Response from {endpoint} was not valid JSON: {body[:200].decode(errors='replace')}") from e
+        if not isinstance(result, dict):
+            raise BrowserAPIError(f"Response from {endpoint} was not a JSON object")
+        return result
+
+    async def get_screenshot(self, screenshot_id: str) -> bytes:
+        """Binary image of a recent screenshot"""
+        return await self._read("GET", f"screenshots/{screenshot_id}")
+
+
+def get_browser_api_client(sandbox: Any) -> Optional[BrowserAPIClient]:
+    """Client for the sandbox's browser API, or None if the sandbox does not expose it
+    (e.g. local containers created before the port was mapped)."""
+    try:
+        link = sandbox.get_preview_link(BROWSER_API_PORT)
+    except Exception as e:
+        logger.debug(f"No browser API link for sandbox {getattr(sandbox, 'id', '?')}: {e}")
+        return None
+
+    if isinstance(link, dict):
+        url, token = link.get("url"), link.get("token")
+    else:
+        url, token = getattr(link, "url", None), getattr(link, "token", None)
+    if not url:
+        return None
+    return BrowserAPIClient(url, {"X-Daytona-Preview-Token": token} if token else None)
@@ -1,16 +1,27 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Body
-from playwright.async_api import async_playwright, Browser, Page
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Request, Response
+from fastapi.responses import JSONResponse
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import asyncio
+import contextlib
+import contextvars
+import hashlib
 import json
 import logging
 import base64
 from dataclasses import dataclass, field
+from collections import OrderedDict
 from datetime import datetime
 import os
 import random
+import shlex
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import cached_property
+from urllib.parse import urlparse
 import traceback
 import pytesseract
 from PIL import Image
@@ -75,6 +86,95 @@ class DoneAction(BaseModel):
     success: bool = True
     text: str = ""
 
+class BatchStep(BaseModel):
+    # One of: input_text, click_element, click_coordinates, send_keys, scroll_down,
+    # scroll_up, wait_for_selector, wait
+    action: str
+    index: Optional[int] = None  # input_text, click_element
+    text: Optional[str] = None  # input_text
+    keys: Optional[str] = None  # send_keys
+    x: Optional[int] = None  # click_coordinates
+    y: Optional[int] = None
+    amount: Optional[int] = None  # scroll_down, scroll_up: pixels, default one page
+    selector: Optional[str] = None  # wait_for_selector: CSS selector that must become visible
+    timeout_ms: int = 5000  # Per step
+    seconds: Optional[float] = None  # wait
+
+class BatchAction(BaseModel):
+    steps: List[BatchStep]
+    stop_on_error: bool = True  # Skip the remaining steps after a failed one
+
+class RoutingPolicy(BaseModel):
+    """Which requests a session's pages may make. An empty policy loads everything."""
+    # Playwright resource types: document, stylesheet, image, media, font, script, xhr, fetch, ...
+    block_resource_types: List[str] = []
+    blocked_domains: List[str] = []  # Also blocks their subdomains
+    block_trackers: bool = False  # Common ad and analytics domains (TRACKER_DOMAINS)
+    max_media_bytes: Optional[int] = None  # Abort images and media larger than this
+    text_only: bool = False  # No images, media, fonts or stylesheets, for reading pages
+
+    def is_empty(self) -> bool:
+        return not (self.block_resource_types or self.blocked_domains or self.block_trackers
+                    or self.max_media_bytes or self.text_only)
+
+    def block_reason(self, resource_type: str, host: str) -> Optional[str]:
+        if resource_type in self.block_resource_types or (self.text_only and resource_type in TEXT_ONLY_BLOCKED_TYPES):
+            return f"type:{resource_type}"
+        domains = self.blocked_domains + (TRACKER_DOMAINS if self.block_trackers else [])
+        for domain in domains:
+            if host == domain or host.endswith("." + domain):
+                return f"domain:{domain}"
+        return None
+
+def parse_byte_range(header: str) -> Optional[tuple]:
+    """(start, end or None) of a single "bytes=start-[end]" Range header, None for other forms"""
+    unit, _, spec = header.strip().partition("=")
+    start, dash, end = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or not dash or "," in spec or not start.isdigit():
+        return None
+    if end and not end.isdigit():
+        return None
+    return int(start), int(end) if end else None
+
+class Region(BaseModel):
+    # Viewport CSS pixels, like click coordinates
+    x: int
+    y: int
+    width: int
+    height: int
+
+class OCRAction(BaseModel):
+    screenshot_id: Optional[str] = None  # A recent screenshot; defaults to a new one of the viewport
+    region: Optional[Region] = None
+
+class ScreenshotSettings(BaseModel):
+    """How the state screenshot after each action is taken and returned.
+
+    Defaults can be changed per browser session with /automation/screenshot_settings; a client
+    can override them for a single request with a JSON object in the X-Screenshot-Settings header.
+    """
+    # Wait before capturing: "dom_quiet" (no DOM mutations for quiet_window_ms),
+    # "network_quiet" (no requests for 500ms), "networkidle" (legacy, up to 60s) or "none"
+    settle: str = "dom_quiet"
+    settle_timeout_ms: int = 2000
+    quiet_window_ms: int = 250
+    format: str = "jpeg"  # "jpeg" or "webp"
+    quality: int = 60
+    max_width: Optional[int] = None  # Downscale wider viewports to this width
+    # Skip the image when the DOM did not change since the frame the client says it already
+    # has and the viewport looks the same (perceptual hash distance <= hash_threshold of 256 bits)
+    skip_unchanged: bool = True
+    hash_threshold: int = 4
+    known_screenshot_id: Optional[str] = None
+    # "inline": base64 in the JSON result; "file": written to screenshot_path; "reference": id only.
+    # All are also served as binary by GET /automation/screenshots/{screenshot_id}
+    transport: str = "inline"
+    # OCR of the state screenshot: "auto" only when the page has less than ocr_min_dom_text
+    # characters of text (canvas, images, PDF viewers), "always" or "never".
+    # /automation/ocr reads any recent screenshot or a region of it on demand.
+    ocr: str = "auto"
+    ocr_min_dom_text: int = 200
+
 #######################################################
 # DOM Structure Models
 #######################################################
@@ -246,6 +346,460 @@ class DOMState:
     pixels_above: int = 0
     pixels_below: int = 0
 
+#######################################################
+# Incremental DOM snapshots
+#######################################################
+
+# Installed once per document (on the first snapshot) and kept there: gives every
+# interactive element a stable ID, watches the DOM with a MutationObserver, and on
+# each snapshot only re-examines what changed since the previous one. Returns either
+# a full snapshot or the added, changed and removed elements.
+DOM_TRACKER_JS = """
+(options) => {
+    if (!window.__agentpressDom) {
+        const SELECTOR = 'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])';
+        const state = {
+            documentId: Math.random().toString(36).slice(2),
+            version: 0,
+            nextId: 1,
+            ids: new WeakMap(),     // element -> stable ID
+            elements: new Map(),    // ID -> element, for every reported element
+            reported: new Map(),    // ID -> JSON of its last reported description
+            dirty: new Set(),       // Nodes whose subtree changed since the last snapshot
+            geometryDirty: false,   // Scrolled or resized since the last snapshot
+            orderDirty: false,
+        };
+
+        const idOf = (el) => {
+            let id = state.ids.get(el);
+            if (!id) {
+                id = state.nextId++;
+                state.ids.set(el, id);
+            }
+            return id;
+        };
+
+        const isVisible = (el) => {
+            const style = window.getComputedStyle(el);
+            const rect = el.getBoundingClientRect();
+            return style.display !== 'none' &&
+                   style.visibility !== 'hidden' &&
+                   style.opacity !== '0' &&
+                   rect.width > 0 &&
+                   rect.height > 0;
+        };
+
+        const describe = (el, id) => {
+            const attributes = {};
+            for (const attr of el.attributes) {
+                attributes[attr.name] = attr.value;
+            }
+            const rect = el.getBoundingClientRect();
+            return {
+                index: id,
+                tagName: el.tagName.toLowerCase(),
+                text: el.innerText || el.value || '',
+                attributes: attributes,
+                isVisible: true,
+                isInteractive: true,
+                // Viewport coordinates are derived from these and the scroll position,
+                // so scrolling only reports the elements entering or leaving the viewport
+                pageCoordinates: {
+                    x: rect.left + window.scrollX,
+                    y: rect.top + window.scrollY,
+                    width: rect.width,
+                    height: rect.height
+                },
+                isInViewport: rect.top >= 0 &&
+                              rect.left >= 0 &&
+                              rect.bottom <= window.innerHeight &&
+                              rect.right <= window.innerWidth
+            };
+        };
+
+        // Compare el with its last reported description and record the difference in out
+        const update = (el, out) => {
+            const id = idOf(el);
+            if (!el.isConnected || !el.matches(SELECTOR) || !isVisible(el)) {
+                if (state.reported.delete(id)) {
+                    state.elements.delete(id);
+                    out.removed.push(id);
+                }
+                return;
+            }
+            const description = describe(el, id);
+            const json = JSON.stringify(description);
+            const previous = state.reported.get(id);
+            if (previous === json) {
+                return;
+            }
+            state.reported.set(id, json);
+            state.elements.set(id, el);
+            (previous === undefined ? out.added : out.changed).push(description);
+        };
+
+        const documentOrder = () => Array.from(document.querySelectorAll(SELECTOR))
+            .map((el) => state.ids.get(el))
+            .filter((id) => id && state.reported.has(id));
+
+        new MutationObserver((mutations) => {
+            for (const mutation of mutations) {
+                if (mutation.type === 'childList') {
+                    state.orderDirty = true;
+                    state.dirty.add(mutation.target);
+                    mutation.addedNodes.forEach((node) => state.dirty.add(node));
+                } else if (mutation.type === 'characterData') {
+                    state.dirty.add(mutation.target.parentElement);
+                } else {
+                    state.dirty.add(mutation.target);
+                }
+            }
+        }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+
+        const markGeometry = () => { state.geometryDirty = true; };
+        window.addEventListener('scroll', markGeometry, {capture: true, passive: true});
+        window.addEventListener('resize', markGeometry, {passive: true});
+        // Typing changes an input's value property, which is not a DOM mutation
+        const markTarget = (event) => { if (event.target instanceof Element) state.dirty.add(event.target); };
+        document.addEventListener('input', markTarget, true);
+        document.addEventListener('change', markTarget, true);
+
+        window.__agentpressDom = {
+            get: (id) => state.elements.get(id) || null,
+
+            snapshot(options) {
+                const since = options || {};
+                const full = since.full || since.documentId !== state.documentId || since.version !== state.version;
+                const out = {
+                    documentId: state.documentId,
+                    version: ++state.version,
+                    full: full,
+                    // Anything on the page changed since the last snapshot, tracked elements or not
+                    mutated: full || state.dirty.size > 0 || state.geometryDirty,
+                    scroll: {x: window.scrollX, y: window.scrollY},
+                    added: [],
+                    changed: [],
+                    removed: []
+                };
+
+                if (full) {
+                    state.reported.clear();
+                    state.elements.clear();
+                    document.querySelectorAll(SELECTOR).forEach((el) => update(el, out));
+                    out.order = documentOrder();
+                } else {
+                    const candidates = new Set();
+                    for (let node of state.dirty) {
+                        if (node && !(node instanceof Element)) {
+                            node = node.parentElement;
+                        }
+                        if (!node) {
+                            continue;
+                        }
+                        const owner = node.closest(SELECTOR);
+                        if (owner) {
+                            candidates.add(owner);
+                        }
+                        if (node.isConnected) {
+                            node.querySelectorAll(SELECTOR).forEach((el) => candidates.add(el));
+                        }
+                    }
+                    for (const el of state.elements.values()) {
+                        if (state.geometryDirty || !el.isConnected) {
+                            candidates.add(el);
+                        }
+                    }
+                    candidates.forEach((el) => update(el, out));
+                    if (state.orderDirty || out.added.length) {
+                        out.order = documentOrder();
+                    }
+                }
+
+                state.dirty.clear();
+                state.geometryDirty = false;
+                state.orderDirty = false;
+                return out;
+            }
+        };
+    }
+    return window.__agentpressDom.snapshot(options);
+}
+"""
+
+
+def element_node_from_snapshot(el: Dict[str, Any], scroll: Dict[str, Any]) -> DOMElementNode:
+    """Build a DOMElementNode (with its text child) from an element description of DOM_TRACKER_JS."""
+    page_coordinates = None
+    viewport_coordinates = None
+    if 'pageCoordinates' in el:
+        coords = el['pageCoordinates']
+        page_coordinates = CoordinateSet(
+            x=coords.get('x', 0),
+            y=coords.get('y', 0),
+            width=coords.get('width', 0),
+            height=coords.get('height', 0)
+        )
+        viewport_coordinates = CoordinateSet(
+            x=page_coordinates.x - scroll.get('x', 0),
+            y=page_coordinates.y - scroll.get('y', 0),
+            width=page_coordinates.width,
+            height=page_coordinates.height
+        )
+
+    element_node = DOMElementNode(
+        is_visible=el.get('isVisible', True),
+        tag_name=el.get('tagName', 'div'),
+        attributes=el.get('attributes', {}),
+        is_interactive=el.get('isInteractive', True),
+        is_in_viewport=el.get('isInViewport', False),
+        highlight_index=el['index'],
+        page_coordinates=page_coordinates,
+        viewport_coordinates=viewport_coordinates
+    )
+
+    # Add a text node if there's text content
+    if el.get('text'):
+        text_node = DOMTextNode(is_visible=True, text=el.get('text', ''))
+        text_node.parent = element_node
+        element_node.children.append(text_node)
+    return element_node
+
+
+class DOMSnapshotCache:
+    """
+    Selector map of one page, patched with the incremental snapshots of DOM_TRACKER_JS.
+    Element indices are the tracker's stable element IDs, so an element keeps its index
+    for as long as it stays on the page. The formatted line and summary of each element
+    are cached until the element changes.
+    """
+
+    def __init__(self):
+        self.document_id: Optional[str] = None
+        self.version: Optional[int] = None
+        self.epoch = 0  # Bumped by every snapshot in which the page changed
+        self.elements: Dict[int, DOMElementNode] = {}
+        self.order: List[int] = []
+        self._lines: Dict[int, str] = {}
+        self._summaries: Dict[int, Dict[str, Any]] = {}
+
+    def since(self) -> Dict[str, Any]:
+        """Argument for DOM_TRACKER_JS: the snapshot this cache is at."""
+        return {'documentId': self.document_id, 'version': self.version}
+
+    def apply(self, snapshot: Dict[str, Any]) -> None:
+        if snapshot['full']:
+            self.elements.clear()
+            self._lines.clear()
+            self._summaries.clear()
+        for element_id in snapshot['removed']:
+            self.elements.pop(element_id, None)
+            self._lines.pop(element_id, None)
+            self._summaries.pop(element_id, None)
+        for el in snapshot['added'] + snapshot['changed']:
+            self.elements[el['index']] = element_node_from_snapshot(el, snapshot['scroll'])
+            self._lines.pop(el['index'], None)
+            self._summaries.pop(el['index'], None)
+        if 'order' in snapshot:
+            self.order = snapshot['order']
+        elif snapshot['removed']:
+            self.order = [element_id for element_id in self.order if element_id in self.elements]
+        if snapshot.get('mutated', True):
+            self.epoch += 1
+        self.document_id = snapshot['documentId']
+        self.version = snapshot['version']
+
+    def selector_map(self) -> Dict[int, DOMElementNode]:
+        """Elements in document order."""
+        return {element_id: self.elements[element_id] for element_id in self.order if element_id in self.elements}
+
+    def clickable_elements_to_string(self, include_attributes: list[str] | None = None) -> str:
+        lines = []
+        for element_id, element in self.selector_map().items():
+            if element_id not in self._lines:
+                self._lines[element_id] = element.clickable_elements_to_string(include_attributes)
+            lines.append(self._lines[element_id])
+        return '\n'.join(lines) if lines else "No interactive elements found"
+
+    def interactive_elements(self) -> List[Dict[str, Any]]:
+        """Simplified description of every element, as returned to the tool."""
+        summaries = []
+        for element_id, element in self.selector_map().items():
+            if element_id not in self._summaries:
+                element_info = {
+                    'index': element_id,
+                    'tag_name': element.tag_name,
+                    'text': element.get_all_text_till_next_clickable_element(),
+                    'is_in_viewport': element.is_in_viewport
+                }
+                for attr_name in ['id', 'href', 'src', 'alt', 'placeholder', 'name', 'role', 'title', 'type']:
+                    if attr_name in element.attributes:
+                        element_info[attr_name] = element.attributes[attr_name]
+                self._summaries[element_id] = element_info
+            summaries.append(self._summaries[element_id])
+        return summaries
+
+#######################################################
+# Screenshots
+#######################################################
+
+SCREENSHOT_FRAME_DIR = "/tmp/browser_frames"
+SCREENSHOT_FRAMES_KEPT = 32  # Recent frames kept in memory and on disk for clients to fetch
+SCREENSHOT_MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+OCR_WORKERS = int(os.getenv("BROWSER_OCR_WORKERS", "2"))
+OCR_CACHE_SIZE = 256  # OCR results kept, by image content hash and region
+
+# Per-request screenshot settings override (X-Screenshot-Settings header)
+screenshot_settings_override: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "screenshot_settings_override", default=None
+)
+
+DOM_QUIET_JS = """
+({quietMs, timeoutMs}) => new Promise((resolve) => {
+    let quietTimer = null;
+    const done = () => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(limitTimer);
+        resolve();
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(done, quietMs);
+    });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    quietTimer = setTimeout(done, quietMs);
+    const limitTimer = setTimeout(done, timeoutMs);
+})
+"""
+
+@dataclass
+class Screenshot:
+    id: str
+    data: bytes
+    format: str
+    phash: int
+    dom_key: Optional[tuple] = None  # DOM snapshot the frame was taken at: (document id, epoch)
+    scale: float = 1.0  # Image pixels per CSS pixel
+    unchanged: bool = False  # Same as the client's known frame; data is not sent
+
+    @property
+    def media_type(self) -> str:
+        return SCREENSHOT_MEDIA_TYPES.get(self.format, "application/octet-stream")
+
+
+def ocr_image(image_bytes: bytes, box: Optional[tuple] = None) -> str:
+    """OCR of an encoded image, or of the (left, top, right, bottom) box of it. Runs in the OCR process pool."""
+    image = Image.open(io.BytesIO(image_bytes))
+    if box:
+        image = image.crop(box)
+    return pytesseract.image_to_string(image).strip()
+
+
+def perceptual_hash(image_bytes: bytes, size: int = 16) -> int:
+    """Difference hash (dHash) of size*size bits: robust to re-encoding and tiny rendering noise.
+
+    Too coarse to see a few changed characters, so it is only trusted for pages whose DOM
+    did not change (canvas, video and CSS animations).
+    """
+    image = Image.open(io.BytesIO(image_bytes)).convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = list(image.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            bits = (bits << 1) | (pixels[row * (size + 1) + col] > pixels[row * (size + 1) + col + 1])
+    return bits
+
+#######################################################
+# Browser Sessions
+#######################################################
+
+# Run Chromium without a window (nothing to watch over VNC, less memory and CPU)
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
+BROWSER_MAX_SESSIONS = int(os.getenv("BROWSER_MAX_SESSIONS", "8"))
+# Sessions unused this long are closed; 0 keeps them until they are evicted to make room
+BROWSER_SESSION_IDLE_SECONDS = int(os.getenv("BROWSER_SESSION_IDLE_SECONDS", "21600"))
+BROWSER_VIEWPORT = {'width': 1024, 'height': 768}
+BROWSER_START_URL = os.getenv("BROWSER_START_URL", "https://www.google.com")
+BROWSER_LAUNCH_ARGS = shlex.split(os.getenv("BROWSER_LAUNCH_ARGS", ""))  # Extra Chromium command line switches
+DEFAULT_SESSION_ID = "default"  # Used by requests without an X-Browser-Session header; never reaped
+CLOSED_SESSIONS_REMEMBERED = 1024  # Ids of reaped or evicted sessions, to report when they are reopened
+
+TEXT_ONLY_BLOCKED_TYPES = ("image", "media", "font", "stylesheet")
+TRACKER_DOMAINS = [
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "googletagservices.com", "adservice.google.com", "facebook.net",
+    "amazon-adsystem.com", "adnxs.com", "criteo.com", "criteo.net",
+    "taboola.com", "outbrain.com", "scorecardresearch.com", "quantserve.com", "hotjar.com",
+    "segment.io", "segment.com", "mixpanel.com", "branch.io", "adsrvr.org", "rubiconproject.com",
+    "pubmatic.com", "openx.net", "moatads.com", "chartbeat.com", "newrelic.com", "nr-data.net",
+]
+
+# Session of the current request (X-Browser-Session header)
+browser_session_id: contextvars.ContextVar[str] = contextvars.ContextVar("browser_session_id", default=DEFAULT_SESSION_ID)
+
+@dataclass
+class BrowserSession:
+    """Tabs, cookies and storage of one client, isolated in their own browser context"""
+    id: str
+    context: BrowserContext
+    pages: List[Page] = field(default_factory=list)
+    current_page_index: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)  # One action at a time per session
+    routing_policy: Optional["RoutingPolicy"] = None
+    screenshot_settings: ScreenshotSettings = field(default_factory=ScreenshotSettings)
+    # Routing effect during the current action
+    requests_blocked: int = 0
+    bytes_saved: int = 0  # Known sizes only: capped media; blocked requests are never sized
+    # Why an earlier session with this id was closed ("idle" or "evicted"), until an action reports it
+    reset_reason: Optional[str] = None
+
+    def begin_action(self) -> None:
+        self.last_used = time.monotonic()
+        self.requests_blocked = 0
+        self.bytes_saved = 0
+
+#######################################################
+# Action Timings
+#######################################################
+
+class ActionTimings:
+    """Time spent in each stage of one automation request, reported in the Server-Timing header"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}  # Stage name -> ms
+        self.result_built: Optional[float] = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def server_timing(self) -> str:
+        """Header value with the measured stages, the action itself (the time not in any other
+        stage), serialization of the result and the total"""
+        finished = time.perf_counter()
+        total = (finished - self.started) * 1000
+        stages = dict(self.stages)
+        if self.result_built is not None:
+            stages["serialize"] = (finished - self.result_built) * 1000
+        stages["action"] = max(0.0, total - sum(stages.values()))
+        stages["total"] = total
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in stages.items())
+
+# Timings of the current request, set by the report_action_timings middleware
+action_timings: contextvars.ContextVar[Optional[ActionTimings]] = contextvars.ContextVar("action_timings", default=None)
+
+def timed_stage(name: str):
+    """Count the enclosed code as stage `name` of the current request"""
+    timings = action_timings.get()
+    return timings.stage(name) if timings else contextlib.nullcontext()
+
 #######################################################
 # Browser Action Result Model
 #######################################################
@@ -260,6 +814,10 @@ class BrowserActionResult(BaseModel):
     title: Optional[str] = None
     elements: Optional[str] = None  # Formatted string of clickable elements
     screenshot_base64: Optional[str] = None
+    screenshot_id: Optional[str] = None  # Fetch the image with GET /automation/screenshots/{screenshot_id}
+    screenshot_format: Optional[str] = None
+    screenshot_path: Optional[str] = None  # With the "file" transport
+    screenshot_unchanged: bool = False  # Viewport looks the same as the client's known screenshot
     pixels_above: int = 0
     pixels_below: int = 0
     content: Optional[str] = None
@@ -270,6 +828,11 @@ class BrowserActionResult(BaseModel):
     interactive_elements: Optional[List[Dict[str, Any]]] = None  # Simplified list of interactive elements
     viewport_width: Optional[int] = None
     viewport_height: Optional[int] = None
+    step_results: Optional[List[Dict[str, Any]]] = None  # Per-step outcome of a batch
+    requests_blocked: int = 0  # By the session's routing policy during this action
+    bytes_saved: int = 0
+    # The session was closed by the service ("idle" or "evicted") and reopened without its tabs and cookies
+    session_reset: Optional[str] = None
     
     class Config:
         arbitrary_types_allowed = True
@@ -282,12 +845,20 @@ class BrowserAutomation:
     def __init__(self):
         self.router = APIRouter()
         self.browser: Browser = None
-        self.pages: List[Page] = []
-        self.current_page_index: int = 0
+        self.sessions: Dict[str, BrowserSession] = {}
+        self.sessions_lock = asyncio.Lock()
+        self.closed_sessions: "OrderedDict[str, str]" = OrderedDict()  # Session id -> why it was closed
+        self.reaper_task: Optional[asyncio.Task] = None
         self.logger = logging.getLogger("browser_automation")
         self.include_attributes = ["id", "href", "src", "alt", "aria-label", "placeholder", "name", "role", "title", "value"]
         self.screenshot_dir = os.path.join(os.getcwd(), "screenshots")
+        self.dom_caches: Dict[Page, DOMSnapshotCache] = {}
         os.makedirs(self.screenshot_dir, exist_ok=True)
+        self.frames: "OrderedDict[str, Screenshot]" = OrderedDict()  # Recent screenshots by id
+        self.cdp_sessions: Dict[Page, Any] = {}
+        self.ocr_pool: Optional[ProcessPoolExecutor] = None  # Started on first use
+        self.ocr_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        os.makedirs(SCREENSHOT_FRAME_DIR, exist_ok=True)
         
         # Register routes
         self.router.on_startup.append(self.startup)
@@ -326,6 +897,19 @@ class BrowserAutomation:
         # Drag and drop
         self.router.post("/automation/drag_drop")(self.drag_drop)
 
+        # Several actions, one state capture
+        self.router.post("/automation/batch")(self.batch)
+
+        # Screenshots
+        self.router.post("/automation/screenshot_settings")(self.update_screenshot_settings)
+        self.router.get("/automation/screenshots/{screenshot_id}")(self.get_screenshot)
+        self.router.post("/automation/ocr")(self.ocr)
+
+        # Sessions
+        self.router.get("/automation/sessions")(self.list_sessions)
+        self.router.post("/automation/routing_policy")(self.set_routing_policy)
+        self.router.delete("/automation/sessions/{session_id}")(self.close_session_endpoint)
+
     async def startup(self):
         """Initialize the browser instance on startup"""
         try:
@@ -333,9 +917,10 @@ class BrowserAutomation:
             playwright = await async_playwright().start()
             print("Playwright started, launching browser...")
             
-            # Use non-headless mode for testing with slower timeouts
+            # Non-headless by default so the browser can be watched over VNC
             launch_options = {
-                "headless": False,
+                "headless": BROWSER_HEADLESS,
+                "args": BROWSER_LAUNCH_ARGS,
                 "timeout": 60000
             }
             
@@ -350,21 +935,14 @@ class BrowserAutomation:
                 self.browser = await playwright.chromium.launch(**launch_options)
                 print("Browser launched with minimal options")
 
-            try:
-                await self.get_current_page()
-                print("Found existing page, using it")
-                self.current_page_index = 0
-            except Exception as page_error:
-                print(f"Error finding existing page, creating new one. ( {page_error})")
-                page = await self.browser.new_page(viewport={'width': 1024, 'height': 768})
-                print("New page created successfully")
-                self.pages.append(page)
-                self.current_page_index = 0
-                # Navigate directly to google.com instead of about:blank
-                await page.goto("https://www.google.com", wait_until="domcontentloaded", timeout=30000)
-                print("Navigated to google.com")
-                
-                print("Browser initialization completed successfully")
+            session = await self.open_session(DEFAULT_SESSION_ID)
+            # Navigate directly to google.com instead of about:blank
+            await session.pages[0].goto(BROWSER_START_URL, wait_until="domcontentloaded", timeout=30000)
+            print(f"Navigated to {BROWSER_START_URL}")
+
+            if BROWSER_SESSION_IDLE_SECONDS > 0:
+                self.reaper_task = asyncio.create_task(self.reap_idle_sessions())
+            print("Browser initialization completed successfully")
         except Exception as e:
             print(f"Browser startup error: {str(e)}")
             traceback.print_exc()
@@ -372,144 +950,207 @@ class BrowserAutomation:
             
     async def shutdown(self):
         """Clean up browser instance on shutdown"""
+        if self.reaper_task:
+            self.reaper_task.cancel()
         if self.browser:
             await self.browser.close()
+        if self.ocr_pool:
+            self.ocr_pool.shutdown(wait=False, cancel_futures=True)
     
+    def get_session(self) -> BrowserSession:
+        """Session of the current request, opened by the session middleware"""
+        session_id = browser_session_id.get()
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Browser session {session_id} is not open")
+        return session
+
+    @property
+    def pages(self) -> List[Page]:
+        return self.get_session().pages
+
+    @property
+    def current_page_index(self) -> int:
+        return self.get_session().current_page_index
+
+    @current_page_index.setter
+    def current_page_index(self, index: int) -> None:
+        self.get_session().current_page_index = index
+
+    async def open_session(self, session_id: str) -> BrowserSession:
+        """The session with this id, created in a new browser context if needed"""
+        async with self.sessions_lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                if len(self.sessions) >= BROWSER_MAX_SESSIONS:
+                    # Make room by closing the least recently used idle session
+                    idle = [s for s in self.sessions.values() if s.id != DEFAULT_SESSION_ID and not s.lock.locked()]
+                    if not idle:
+                        raise HTTPException(status_code=503, detail=f"All {BROWSER_MAX_SESSIONS} browser sessions are busy")
+                    await self.close_session(min(idle, key=lambda s: s.last_used).id, reason="evicted")
+                context = await self.browser.new_context(viewport=BROWSER_VIEWPORT)
+                session = BrowserSession(id=session_id, context=context, pages=[await context.new_page()],
+                                         reset_reason=self.closed_sessions.pop(session_id, None))
+                self.sessions[session_id] = session
+                print(f"Opened browser session {session_id} ({len(self.sessions)} open)")
+            session.last_used = time.monotonic()
+            return session
+
+    async def close_session(self, session_id: str, reason: Optional[str] = None) -> bool:
+        """Close a session; with a reason, the client is told when it next uses the session"""
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        if reason:
+            self.closed_sessions[session_id] = reason
+            self.closed_sessions.move_to_end(session_id)
+            while len(self.closed_sessions) > CLOSED_SESSIONS_REMEMBERED:
+                self.closed_sessions.popitem(last=False)
+        try:
+            await session.context.close()
+        except Exception as e:
+            print(f"Error closing browser session {session_id}: {e}")
+        print(f"Closed browser session {session_id}")
+        return True
+
+    async def reap_idle_sessions(self):
+        """Close sessions that were not used for BROWSER_SESSION_IDLE_SECONDS"""
+        while True:
+            await asyncio.sleep(min(60, BROWSER_SESSION_IDLE_SECONDS))
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if (session.id != DEFAULT_SESSION_ID and not session.lock.locked()
+                        and now - session.last_used > BROWSER_SESSION_IDLE_SECONDS):
+                    await self.close_session(session.id, reason="idle")
+
+    async def set_routing_policy(self, policy: RoutingPolicy = Body(...)):
+        """Set which requests the pages of the current session may make"""
+        session = self.get_session()
+        was_routed = session.routing_policy is not None
+        session.routing_policy = None if policy.is_empty() else policy
+        # Routing disables the HTTP cache, so only route while a policy is set
+        if session.routing_policy and not was_routed:
+            await session.context.route("**/*", lambda route: self.route_request(session, route))
+        elif was_routed and not session.routing_policy:
+            await session.context.unroute("**/*")
+        return {"success": True, "session_id": session.id, "routing_policy": session.routing_policy}
+
+    async def route_request(self, session: BrowserSession, route) -> None:
+        """Apply the session's routing policy to one request"""
+        request = route.request
+        policy = session.routing_policy
+        try:
+            if policy is None:
+                await route.continue_()
+                return
+            reason = policy.block_reason(request.resource_type, urlparse(request.url).hostname or "")
+            if reason:
+                session.requests_blocked += 1
+                await route.abort("blockedbyclient")
+            elif policy.max_media_bytes and request.resource_type in ("image", "media"):
+                await self.fetch_capped(session, route, policy.max_media_bytes)
+            else:
+                await route.continue_()
+        except Exception as e:
+            # The page may have closed or navigated away while the request was routed
+            print(f"Routing {request.url[:200]} failed: {e}")
+
+    async def fetch_capped(self, session: BrowserSession, route, max_bytes: int) -> None:
+        """Load an image or media file only if it is at most max_bytes, downloading at most that much.
+
+        The size comes from a HEAD request when the origin reports it; files that fit then load
+        normally. Otherwise the (requested) range is fetched clamped to max_bytes, and a file whose
+        origin ignores the range is only read whole when it does not report its size at all.
+        """
+        headers = route.request.headers
+        requested_range = headers.get("range")
+        byte_range = parse_byte_range(requested_range) if requested_range else (0, None)
+        if byte_range is None:
+            # Suffix and multi-part ranges are rare and bounded by the page itself
+            await route.continue_()
+            return
+        response = None
+        try:
+            head = await route.fetch(method="HEAD", headers={k: v for k, v in headers.items() if k.lower() != "range"})
+            size = head.headers.get("content-length", "") if head.status == 200 else ""
+            if not size.isdigit():
+                start, end = byte_range
+                capped_end = start + max_bytes - 1 if end is None else min(end, start + max_bytes - 1)
+                response = await route.fetch(headers={**headers, "range": f"bytes={start}-{capped_end}"})
+                body = await response.body()
+        except Exception as e:
+            print(f"Size-capped fetch of {route.request.url[:200]} failed, loading it normally: {e}")
+            await route.continue_()
+            return
+        if response is None:
+            if int(size) > max_bytes:
+                session.requests_blocked += 1
+                session.bytes_saved += int(size)
+                await route.abort("blockedbyclient")
+            else:
+                await route.continue_()
+            return
+
+        total = len(body)
+        content_range = response.headers.get("content-range", "")
+        if response.status == 206 and "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+            total = int(content_range.rsplit("/", 1)[1])
+        if total > max_bytes:
+            session.requests_blocked += 1
+            session.bytes_saved += total - len(body)
+            await route.abort("blockedbyclient")
+            return
+        if requested_range and response.status == 206:
+            # The whole requested range was within the cap
+            await route.fulfill(status=206, headers=response.headers, body=body)
+            return
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in ("content-range", "content-length")}
+        await route.fulfill(status=200 if response.status == 206 else response.status, headers=headers, body=body)
+
+    async def list_sessions(self):
+        now = time.monotonic()
+        return {"sessions": [
+            {"session_id": session.id, "tabs": len(session.pages), "idle_seconds": round(now - session.last_used)}
+            for session in self.sessions.values()
+        ]}
+
+    async def close_session_endpoint(self, session_id: str):
+        """Close a session and all its tabs"""
+        if session_id == DEFAULT_SESSION_ID:
+            raise HTTPException(status_code=400, detail="The default session cannot be closed")
+        if not await self.close_session(session_id):
+            raise HTTPException(status_code=404, detail=f"Browser session {session_id} is not open")
+        return {"success": True, "session_id": session_id}
+
     async def get_current_page(self) -> Page:
         """Get the current active page"""
         if not self.pages:
             raise HTTPException(status_code=500, detail="No browser pages available")
         return self.pages[self.current_page_index]
     
+    def get_dom_cache(self, page: Page) -> DOMSnapshotCache:
+        """The DOM snapshot cache of a page"""
+        if page not in self.dom_caches:
+            self.dom_caches[page] = DOMSnapshotCache()
+            page.on("close", lambda closed_page: self.dom_caches.pop(closed_page, None))
+        return self.dom_caches[page]
+
     async def get_selector_map(self) -> Dict[int, DOMElementNode]:
-        """Get a map of selectable elements on the page"""
+        """Get a map of selectable elements on the page, updated from the in-page tracker's changes since the last call"""
         page = await self.get_current_page()
-        
-        # Create a selector map for interactive elements
-        selector_map = {}
+        cache = self.get_dom_cache(page)
         
         try:
-            # More comprehensive JavaScript to find interactive elements
-            elements_js = """
-            (() => {
-                // Helper function to get all attributes as an object
-                function getAttributes(el) {
-                    const attributes = {};
-                    for (const attr of el.attributes) {
-                        attributes[attr.name] = attr.value;
-                    }
-                    return attributes;
-                }
-                
-                // Find all potentially interactive elements
-                const interactiveElements = Array.from(document.querySelectorAll(
-                    'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
-                ));
-                
-                // Filter for visible elements
-                const visibleElements = interactiveElements.filter(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    return style.display !== 'none' && 
-                           style.visibility !== 'hidden' && 
-                           style.opacity !== '0' &&
-                           rect.width > 0 && 
-                           rect.height > 0;
-                });
-                
-                // Map to our expected structure
-                return visibleElements.map((el, index) => {
-                    const rect = el.getBoundingClientRect();
-                    const isInViewport = rect.top >= 0 && 
-                                      rect.left >= 0 && 
-                                      rect.bottom <= window.innerHeight &&
-                                      rect.right <= window.innerWidth;
-                    
-                    return {
-                        index: index + 1,
-                        tagName: el.tagName.toLowerCase(),
-                        text: el.innerText || el.value || '',
-                        attributes: getAttributes(el),
-                        isVisible: true,
-                        isInteractive: true,
-                        pageCoordinates: {
-                            x: rect.left + window.scrollX,
-                            y: rect.top + window.scrollY,
-                            width: rect.width,
-                            height: rect.height
-                        },
-                        viewportCoordinates: {
-                            x: rect.left,
-                            y: rect.top,
-                            width: rect.width,
-                            height: rect.height
-                        },
-                        isInViewport: isInViewport
-                    };
-                });
-            })();
-            """
-            
-            elements = await page.evaluate(elements_js)
-            print(f"Found {len(elements)} interactive elements in selector map")
-            
-            # Create a root element for the tree
-            root = DOMElementNode(
-                is_visible=True,
-                tag_name="body",
-                is_interactive=False,
-                is_top_element=True
-            )
-            
-            # Create element nodes for each element
-            for idx, el in enumerate(elements):
-                # Create coordinate sets
-                page_coordinates = None
-                viewport_coordinates = None
-                
-                if 'pageCoordinates' in el:
-                    coords = el['pageCoordinates']
-                    page_coordinates = CoordinateSet(
-                        x=coords.get('x', 0),
-                        y=coords.get('y', 0),
-                        width=coords.get('width', 0),
-                        height=coords.get('height', 0)
-                    )
-                
-                if 'viewportCoordinates' in el:
-                    coords = el['viewportCoordinates']
-                    viewport_coordinates = CoordinateSet(
-                        x=coords.get('x', 0),
-                        y=coords.get('y', 0),
-                        width=coords.get('width', 0),
-                        height=coords.get('height', 0)
-                    )
-                
-                # Create the element node
-                element_node = DOMElementNode(
-                    is_visible=el.get('isVisible', True),
-                    tag_name=el.get('tagName', 'div'),
-                    attributes=el.get('attributes', {}),
-                    is_interactive=el.get('isInteractive', True),
-                    is_in_viewport=el.get('isInViewport', False),
-                    highlight_index=el.get('index', idx + 1),
-                    page_coordinates=page_coordinates,
-                    viewport_coordinates=viewport_coordinates
-                )
-                
-                # Add a text node if there's text content
-                if el.get('text'):
-                    text_node = DOMTextNode(is_visible=True, text=el.get('text', ''))
-                    text_node.parent = element_node
-                    element_node.children.append(text_node)
-                
-                selector_map[el.get('index', idx + 1)] = element_node
-                root.children.append(element_node)
-                element_node.parent = root
-                
+            snapshot = await page.evaluate(DOM_TRACKER_JS, cache.since())
+            cache.apply(snapshot)
+            kind = "full" if snapshot['full'] else "incremental"
+            print(f"DOM snapshot ({kind}): +{len(snapshot['added'])} ~{len(snapshot['changed'])} -{len(snapshot['removed'])}, {len(cache.elements)} interactive elements")
+            return cache.selector_map()
         except Exception as e:
             print(f"Error getting selector map: {e}")
             traceback.print_exc()
+            # The page (or its tracker) is gone, e.g. mid-navigation: start over with a full snapshot next time
+            self.dom_caches.pop(page, None)
             # Create a dummy element to avoid breaking tests
             dummy = DOMElementNode(
                 is_visible=True,
@@ -521,9 +1162,15 @@ class BrowserAutomation:
             dummy_text = DOMTextNode(is_visible=True, text="Dummy Element")
             dummy_text.parent = dummy
             dummy.children.append(dummy_text)
-            selector_map[1] = dummy
-        
-        return selector_map
+            return {1: dummy}
+
+    async def get_element_handle(self, index: int):
+        """Handle of the element with the given index in the latest snapshot, or None if it is gone"""
+        page = await self.get_current_page()
+        handle = await page.evaluate_handle("(id) => window.__agentpressDom ? window.__agentpressDom.get(id) : null", index)
+        if await handle.evaluate("node => node === null"):
+            return None
+        return handle
     
     async def get_current_dom_state(self) -> DOMState:
         """Get the current DOM state including element tree and selector map"""
@@ -541,9 +1188,8 @@ class BrowserAutomation:
             
             # Add all elements from selector map as children of root
             for element in selector_map.values():
-                if element.parent is None:
-                    element.parent = root
-                    root.children.append(element)
+                element.parent = root
+                root.children.append(element)
             
             # Get basic page info
             url = page.url
@@ -614,35 +1260,131 @@ class BrowserAutomation:
                 pixels_below=0
             )
     
-    async def take_screenshot(self) -> str:
-        """Take a screenshot and return as base64 encoded string"""
+    def current_screenshot_settings(self) -> ScreenshotSettings:
+        """Screenshot settings for this request: the session's defaults plus any header override"""
+        session = self.sessions.get(browser_session_id.get())
+        defaults = session.screenshot_settings if session else ScreenshotSettings()
+        override = screenshot_settings_override.get()
+        if not override:
+            return defaults
+        return ScreenshotSettings(**{**defaults.dict(), **override})
+
+    async def update_screenshot_settings(self, settings: ScreenshotSettings = Body(...)):
+        """Change the default screenshot settings of the current session"""
+        self.get_session().screenshot_settings = settings
+        return settings
+
+    async def get_screenshot(self, screenshot_id: str):
+        """Binary image of a recent screenshot"""
+        screenshot = self.frames.get(screenshot_id)
+        if not screenshot:
+            raise HTTPException(status_code=404, detail="Screenshot not found or expired")
+        return Response(content=screenshot.data, media_type=screenshot.media_type)
+
+    async def ocr(self, action: OCRAction = Body(...)):
+        """OCR text of a recent screenshot, or of a region of it"""
+        if action.screenshot_id:
+            screenshot = self.frames.get(action.screenshot_id)
+            if not screenshot:
+                raise HTTPException(status_code=404, detail="Screenshot not found or expired")
+        else:
+            screenshot = await self.take_screenshot()
+            if not screenshot:
+                raise HTTPException(status_code=500, detail="Could not take a screenshot")
+
+        box = None
+        if action.region:
+            region, scale = action.region, screenshot.scale
+            box = (round(region.x * scale), round(region.y * scale),
+                   round((region.x + region.width) * scale), round((region.y + region.height) * scale))
+        ocr_text = await self.extract_ocr_text_from_screenshot(screenshot.data, box)
+        return {"success": True, "screenshot_id": screenshot.id, "ocr_text": ocr_text}
+
+    async def settle(self, page: Page, settings: Optional[ScreenshotSettings] = None) -> None:
+        """Wait, within a bounded time, for the page to stop changing after an action"""
+        settings = settings or self.current_screenshot_settings()
+        try:
+            if settings.settle == "dom_quiet":
+                await asyncio.wait_for(
+                    page.evaluate(DOM_QUIET_JS, {"quietMs": settings.quiet_window_ms, "timeoutMs": settings.settle_timeout_ms}),
+                    timeout=settings.settle_timeout_ms / 1000 + 1,
+                )
+            elif settings.settle == "network_quiet":
+                await page.wait_for_load_state("networkidle", timeout=settings.settle_timeout_ms)
+            elif settings.settle == "networkidle":
+                await page.wait_for_load_state("networkidle", timeout=60000)
+        except Exception as e:
+            print(f"Warning: page did not settle ({settings.settle}), proceeding anyway: {e}")
+
+    async def capture_viewport(self, page: Page, settings: ScreenshotSettings) -> tuple:
+        """Encoded viewport image in the configured format and size, returns (bytes, format, scale)"""
+        try:
+            session = self.cdp_sessions.get(page)
+            if session is None:
+                session = await page.context.new_cdp_session(page)
+                self.cdp_sessions[page] = session
+                page.on("close", lambda closed_page: self.cdp_sessions.pop(closed_page, None))
+            params: Dict[str, Any] = {"format": settings.format, "quality": settings.quality}
+            if settings.max_width:
+                metrics = await page.evaluate(
+                    "() => ({x: window.scrollX, y: window.scrollY, width: window.innerWidth, height: window.innerHeight})"
+                )
+                if metrics["width"] > settings.max_width:
+                    # Clip coordinates are relative to the document, so offset by the scroll position
+                    params["clip"] = {**metrics, "scale": settings.max_width / metrics["width"]}
+            result = await session.send("Page.captureScreenshot", params)
+            return base64.b64decode(result["data"]), settings.format, params.get("clip", {}).get("scale", 1.0)
+        except Exception as e:
+            print(f"CDP screenshot failed, falling back to a JPEG page screenshot: {e}")
+            self.cdp_sessions.pop(page, None)
+            data = await page.screenshot(type='jpeg', quality=settings.quality, full_page=False, timeout=30000)
+            return data, "jpeg", 1.0
+
+    async def take_screenshot(self) -> Optional[Screenshot]:
+        """Take a screenshot of the current viewport
+
+        Returns None on error. When the client already has a frame that looks the same,
+        the returned screenshot is that frame, marked unchanged.
+        """
         try:
             page = await self.get_current_page()
-            
-            # Wait for network to be idle and DOM to be stable
-            try:
-                await page.wait_for_load_state("networkidle", timeout=60000)  # Increased timeout to 60s
-            except Exception as e:
-                print(f"Warning: Network idle timeout, proceeding anyway: {e}")
-            
-            # Wait for any animations to complete
-            # await page.wait_for_timeout(1000)  # Wait 1 second for animations
-            
-            # Take screenshot with increased timeout and better options
-            screenshot_bytes = await page.screenshot(
-                type='jpeg',
-                quality=60,
-                full_page=False,
-                timeout=60000,  # Increased timeout to 60s
-                scale='device'  # Use device scale factor
-            )
-            
-            return base64.b64encode(screenshot_bytes).decode('utf-8')
+            settings = self.current_screenshot_settings()
+            data, image_format, scale = await self.capture_viewport(page, settings)
+            phash = await asyncio.to_thread(perceptual_hash, data)
+            cache = self.dom_caches.get(page)
+            dom_key = (cache.document_id, cache.epoch) if cache else None
+
+            known = self.frames.get(settings.known_screenshot_id) if settings.known_screenshot_id else None
+            if (settings.skip_unchanged and known and dom_key and known.dom_key == dom_key
+                    and bin(known.phash ^ phash).count("1") <= settings.hash_threshold):
+                return Screenshot(id=known.id, data=known.data, format=known.format, phash=known.phash,
+                                  dom_key=dom_key, scale=known.scale, unchanged=True)
+
+            screenshot = Screenshot(id=hashlib.sha1(data).hexdigest()[:16], data=data, format=image_format,
+                                    phash=phash, dom_key=dom_key, scale=scale)
+            self.remember_frame(screenshot, write_file=settings.transport == "file")
+            return screenshot
         except Exception as e:
             print(f"Error taking screenshot: {e}")
             traceback.print_exc()
-            # Return an empty string rather than failing
-            return ""
+            return None
+
+    def frame_path(self, screenshot: Screenshot) -> str:
+        return os.path.join(SCREENSHOT_FRAME_DIR, f"{screenshot.id}.{screenshot.format}")
+
+    def remember_frame(self, screenshot: Screenshot, write_file: bool = False) -> None:
+        """Keep a screenshot fetchable by id, forgetting the oldest beyond SCREENSHOT_FRAMES_KEPT"""
+        self.frames[screenshot.id] = screenshot
+        self.frames.move_to_end(screenshot.id)
+        if write_file:
+            with open(self.frame_path(screenshot), "wb") as f:
+                f.write(screenshot.data)
+        while len(self.frames) > SCREENSHOT_FRAMES_KEPT:
+            _, expired = self.frames.popitem(last=False)
+            try:
+                os.remove(self.frame_path(expired))
+            except FileNotFoundError:
+                pass
     
     async def save_screenshot_to_file(self) -> str:
         """Take a screenshot and save to file, returning the path"""
@@ -659,24 +1401,34 @@ class BrowserAutomation:
             print(f"Error saving screenshot: {e}")
             return ""
     
-    async def extract_ocr_text_from_screenshot(self, screenshot_base64: str) -> str:
-        """Extract text from screenshot using OCR"""
-        if not screenshot_base64:
+    async def extract_ocr_text_from_screenshot(self, image_bytes: bytes, box: Optional[tuple] = None) -> str:
+        """Extract text from screenshot (or a box of it, in image pixels) using OCR
+
+        OCR runs in a process pool so it never blocks other requests, and results are
+        cached by image content, so an unchanged page is read only once.
+        """
+        if not image_bytes:
             return ""
             
+        key = (hashlib.sha1(image_bytes).hexdigest(), box)
+        if key in self.ocr_cache:
+            self.ocr_cache.move_to_end(key)
+            return self.ocr_cache[key]
+
         try:
-            # Decode base64 to image
-            image_bytes = base64.b64decode(screenshot_base64)
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Extract text using pytesseract
-            ocr_text = pytesseract.image_to_string(image)
-            
-            # Clean up the text
-            ocr_text = ocr_text.strip()
-            
+            if self.ocr_pool is None:
+                self.ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            ocr_text = await asyncio.get_running_loop().run_in_executor(self.ocr_pool, ocr_image, image_bytes, box)
+            
+            self.ocr_cache[key] = ocr_text
+            while len(self.ocr_cache) > OCR_CACHE_SIZE:
+                self.ocr_cache.popitem(last=False)
             return ocr_text
         except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. out of memory): start a new pool next time
+                self.ocr_pool = None
             print(f"Error performing OCR: {e}")
             traceback.print_exc()
             return ""
@@ -686,66 +1438,65 @@ class BrowserAutomation:
         Returns a tuple of (dom_state, screenshot, elements, metadata)
         """
         try:
-            # Wait a moment for any potential async processes to settle
-            await asyncio.sleep(0.5)
+            # Wait (bounded) for the page to settle after the action
+            with timed_stage("settle"):
+                await self.settle(await self.get_current_page())
             
             # Get updated state
-            dom_state = await self.get_current_dom_state()
-            screenshot = await self.take_screenshot()
-            
-            # Format elements for output
-            elements = dom_state.element_tree.clickable_elements_to_string(
-                include_attributes=self.include_attributes
-            )
+            with timed_stage("dom"):
+                dom_state = await self.get_current_dom_state()
+            with timed_stage("screenshot"):
+                screenshot = await self.take_screenshot()
             
             # Collect additional metadata
-            page = await self.get_current_page()
             metadata = {}
             
-            # Get element count
-            metadata['element_count'] = len(dom_state.selector_map)
-            
-            # Create simplified interactive elements list
-            interactive_elements = []
-            for idx, element in dom_state.selector_map.items():
-                element_info = {
-                    'index': idx,
-                    'tag_name': element.tag_name,
-                    'text': element.get_all_text_till_next_clickable_element(),
-                    'is_in_viewport': element.is_in_viewport
-                }
+            page = await self.get_current_page()
+            cache = self.dom_caches.get(page)
+            with timed_stage("dom"):
+                # Format elements for output (only changed elements are formatted again)
+                if cache:
+                    elements = cache.clickable_elements_to_string(include_attributes=self.include_attributes)
+                else:
+                    elements = dom_state.element_tree.clickable_elements_to_string(
+                        include_attributes=self.include_attributes
+                    )
                 
-                # Add key attributes
-                for attr_name in ['id', 'href', 'src', 'alt', 'placeholder', 'name', 'role', 'title', 'type']:
-                    if attr_name in element.attributes:
-                        element_info[attr_name] = element.attributes[attr_name]
+                # Get element count
+                metadata['element_count'] = len(dom_state.selector_map)
                 
-                interactive_elements.append(element_info)
-            
-            metadata['interactive_elements'] = interactive_elements
+                # Create simplified interactive elements list
+                if cache:
+                    metadata['interactive_elements'] = cache.interactive_elements()
+                else:
+                    metadata['interactive_elements'] = []
             
-            # Get viewport dimensions - Fix syntax error in JavaScript
+            # Get viewport dimensions and how much text the DOM has
+            text_length = 0
             try:
                 viewport = await page.evaluate("""
                 () => {
                     return {
                         width: window.innerWidth,
-                        height: window.innerHeight
+                        height: window.innerHeight,
+                        textLength: document.body ? document.body.innerText.length : 0
                     };
                 }
                 """)
                 metadata['viewport_width'] = viewport.get('width', 0)
                 metadata['viewport_height'] = viewport.get('height', 0)
+                text_length = viewport.get('textLength', 0)
             except Exception as e:
                 print(f"Error getting viewport dimensions: {e}")
                 metadata['viewport_width'] = 0
                 metadata['viewport_height'] = 0
             
-            # Extract OCR text from screenshot if available
-            ocr_text = ""
-            if screenshot:
-                ocr_text = await self.extract_ocr_text_from_screenshot(screenshot)
-                metadata['ocr_text'] = ocr_text
+            # OCR only when asked for, or when the page's text is not in the DOM
+            settings = self.current_screenshot_settings()
+            if screenshot and (settings.ocr == "always" or
+                               (settings.ocr == "auto" and text_length < settings.ocr_min_dom_text)):
+                with timed_stage("ocr"):
+                    metadata['ocr_text'] = await self.extract_ocr_text_from_screenshot(screenshot.data)
             
             print(f"Got updated state after {action_name}: {len(dom_state.selector_map)} elements")
             return dom_state, screenshot, elements, metadata
@@ -753,24 +1504,51 @@ class BrowserAutomation:
             print(f"Error getting updated state after {action_name}: {e}")
             traceback.print_exc()
             # Return empty values in case of error
-            return None, "", "", {}
+            return None, None, "", {}
 
-    def build_action_result(self, success: bool, message: str, dom_state, screenshot: str, 
+    def build_action_result(self, success: bool, message: str, dom_state, screenshot: Optional[Screenshot],
                               elements: str, metadata: dict, error: str = "", content: str = None,
                               fallback_url: str = None) -> BrowserActionResult:
         """Helper method to build a consistent BrowserActionResult"""
         # Ensure elements is never None to avoid display issues
         if elements is None:
             elements = ""
+
+        screenshot_fields = {}
+        if screenshot:
+            screenshot_fields = {
+                "screenshot_id": screenshot.id,
+                "screenshot_format": screenshot.format,
+                "screenshot_unchanged": screenshot.unchanged,
+            }
+            transport = self.current_screenshot_settings().transport
+            if not screenshot.unchanged:
+                if transport == "file":
+                    screenshot_fields["screenshot_path"] = self.frame_path(screenshot)
+                elif transport == "inline":
+                    screenshot_fields["screenshot_base64"] = base64.b64encode(screenshot.data).decode('utf-8')
+            
+        session_fields = {}
+        session = self.sessions.get(browser_session_id.get())
+        if session:
+            session_fields = {"requests_blocked": session.requests_blocked, "bytes_saved": session.bytes_saved,
+                              "session_reset": session.reset_reason}
+            session.reset_reason = None  # Reported once
+
+        timings = action_timings.get()
+        if timings:
+            # Everything from here until the response is out counts as serialization
+            timings.result_built = time.perf_counter()
             
         return BrowserActionResult(
+            **session_fields,
             success=success,
             message=message,
             error=error,
             url=dom_state.url if dom_state else fallback_url or "",
             title=dom_state.title if dom_state else "",
             elements=elements,
-            screenshot_base64=screenshot,
+            **screenshot_fields,
             pixels_above=dom_state.pixels_above if dom_state else 0,
             pixels_below=dom_state.pixels_below if dom_state else 0,
             content=content,
@@ -788,7 +1566,6 @@ class BrowserAutomation:
         try:
             page = await self.get_current_page()
             await page.goto(action.url, wait_until="domcontentloaded")
-            await page.wait_for_load_state("networkidle", timeout=10000)
             
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"navigate_to({action.url})")
@@ -955,9 +1732,6 @@ class BrowserAutomation:
             # Perform the click at the specified coordinates
             await page.mouse.click(action.x, action.y)
             
-            # Give time for any navigation or DOM updates to occur
-            await page.wait_for_load_state("networkidle", timeout=5000)
-            
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_coordinates({action.x}, {action.y})")
             
@@ -1025,36 +1799,13 @@ class BrowserAutomation:
             element_to_click = selector_map[action.index]
             print(f"Attempting to click element: {element_to_click}")
 
-            # Construct a more reliable selector using JavaScript evaluation
-            # Find the element based on its properties captured in selector_map
-            js_selector_script = """
-            (targetElementInfo) => {
-                const interactiveElements = Array.from(document.querySelectorAll(
-                    'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
-                ));
-                
-                const visibleElements = interactiveElements.filter(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    return style.display !== 'none' && style.visibility !== 'hidden' && style.opacity !== '0' && rect.width > 0 && rect.height > 0;
-                });
-
-                if (targetElementInfo.index > 0 && targetElementInfo.index <= visibleElements.length) {
-                    // Return the element at the specified index (1-based)
-                    return visibleElements[targetElementInfo.index - 1];
-                }
-                return null; // Element not found at the expected index
-            }
-            """
-            
-            element_info = {'index': action.index} # Pass the target index to the script
-            
-            target_element_handle = await page.evaluate_handle(js_selector_script, element_info)
+            # Look the element up by its stable ID in the in-page tracker
+            target_element_handle = await self.get_element_handle(action.index)
 
             click_success = False
             error_message = ""
 
-            if await target_element_handle.evaluate("node => node !== null"):
+            if target_element_handle is not None:
                 try:
                     # Use Playwright's recommended way: click the handle
                     # Add timeout and wait for element to be stable
@@ -1067,17 +1818,10 @@ class BrowserAutomation:
                     # Optional: Add fallback methods here if needed
                     # e.g., target_element_handle.dispatch_event('click')
             else:
-                 error_message = f"Could not locate the target element handle for index {action.index} using JS script."
+                 error_message = f"Element with index {action.index} is no longer on the page."
                  print(error_message)
 
 
-            # Wait for potential page changes/network activity
-            try:
-                await page.wait_for_load_state("networkidle", timeout=5000)
-            except Exception as wait_error:
-                print(f"Timeout or error waiting for network idle after click: {wait_error}")
-                await asyncio.sleep(1) # Fallback wait
-
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_element({action.index})")
 
@@ -1144,22 +1888,20 @@ class BrowserAutomation:
                     error=f"Element with index {action.index} not found"
                 )
             
-            # In a real implementation, we would use the selector map to get the element's
-            # properties and use them to find and type into the element
-            element = selector_map[action.index]
+            element_handle = await self.get_element_handle(action.index)
+            if element_handle is None:
+                return self.build_action_result(
+                    False,
+                    f"Element with index {action.index} is no longer on the page",
+                    None,
+                    "",
+                    "",
+                    {},
+                    error=f"Element with index {action.index} is no longer on the page"
+                )
             
-            # Use CSS selector or XPath to locate and type into the element
             await page.wait_for_timeout(500)  # Small delay before typing
-            
-            # Demo implementation - would use proper selectors in production
-            if element.attributes.get("id"):
-                await page.fill(f"#{element.attributes['id']}", action.text)
-            elif element.attributes.get("class"):
-                class_selector = f".{element.attributes['class'].replace(' ', '.')}"
-                await page.fill(class_selector, action.text)
-            else:
-                # Fallback to xpath
-                await page.fill(f"//{element.tag_name}[{action.index}]", action.text)
+            await element_handle.fill(action.text)
             
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"input_text({action.index}, '{action.text}')")
@@ -1267,12 +2009,11 @@ class BrowserAutomation:
         try:
             print(f"Attempting to open new tab with URL: {action.url}")
             # Create new page in same browser instance
-            new_page = await self.browser.new_page()
+            new_page = await self.get_session().context.new_page()
             print(f"New page created successfully")
             
             # Navigate to the URL
             await new_page.goto(action.url, wait_until="domcontentloaded")
-            await new_page.wait_for_load_state("networkidle", timeout=10000)
             print(f"Navigated to URL in new tab: {action.url}")
             
             # Add to page list and make it current
@@ -1595,21 +2336,23 @@ class BrowserAutomation:
             
             # Try to get the options - in a real implementation, we would use appropriate selectors
             try:
+                element_handle = await self.get_element_handle(index)
+                if element_handle is None:
+                    raise ValueError(f"Element with index {index} is no longer on the page")
                 if element.tag_name.lower() == 'select':
                     # For <select> elements, get options using JavaScript
-                    options_js = f"""
-                    Array.from(document.querySelectorAll('select')[{index-1}].options)
+                    options = await element_handle.evaluate("""
+                    (select) => Array.from(select.options)
                         .map((option, index) => ({
                             index: index,
                             text: option.text,
                             value: option.value
-                        }));
-                    """
-                    options = await page.evaluate(options_js)
+                        }))
+                    """)
                 else:
                     # For other dropdown types, try to get options using a more generic approach
                     # Example for custom dropdowns - would need refinement in real implementation
-                    await page.click(f"#{element.attributes.get('id')}") if element.attributes.get('id') else None
+                    await element_handle.click()
                     await page.wait_for_timeout(500)
                     
                     options_js = """
@@ -1680,22 +2423,26 @@ class BrowserAutomation:
                 )
             
             element = selector_map[index]
+            element_handle = await self.get_element_handle(index)
+            if element_handle is None:
+                return self.build_action_result(
+                    False,
+                    f"Element with index {index} is no longer on the page",
+                    None,
+                    "",
+                    "",
+                    {},
+                    error=f"Element with index {index} is no longer on the page"
+                )
             
             # Try to select the option - implementation varies by dropdown type
             if element.tag_name.lower() == 'select':
                 # For standard <select> elements
-                selector = f"select option:has-text('{option_text}')"
-                await page.select_option(
-                    f"#{element.attributes.get('id')}" if element.attributes.get('id') else f"//select[{index}]", 
-                    label=option_text
-                )
+                await element_handle.select_option(label=option_text)
             else:
                 # For custom dropdowns
                 # First click to open the dropdown
-                if element.attributes.get('id'):
-                    await page.click(f"#{element.attributes.get('id')}")
-                else:
-                    await page.click(f"//{element.tag_name}[{index}]")
+                await element_handle.click()
                 
                 await page.wait_for_timeout(500)
                 
@@ -1815,6 +2562,88 @@ class BrowserAutomation:
                 content=None
             )
 
+    # Batched Actions
+
+    async def run_batch_step(self, page: Page, step: BatchStep) -> str:
+        """Perform one batch step without capturing state; returns a description, raises on failure"""
+        if step.action in ("input_text", "click_element"):
+            if step.index is None:
+                raise ValueError(f"{step.action} needs an index")
+            handle = await self.get_element_handle(step.index)
+            if handle is None:
+                raise ValueError(f"Element with index {step.index} is not on the page")
+            if step.action == "input_text":
+                await handle.fill(step.text or "", timeout=step.timeout_ms)
+                return f"Input '{step.text}' into element {step.index}"
+            await handle.click(timeout=step.timeout_ms)
+            return f"Clicked element {step.index}"
+        if step.action == "click_coordinates":
+            if step.x is None or step.y is None:
+                raise ValueError("click_coordinates needs x and y")
+            await page.mouse.click(step.x, step.y)
+            return f"Clicked at ({step.x}, {step.y})"
+        if step.action == "send_keys":
+            if not step.keys:
+                raise ValueError("send_keys needs keys")
+            await page.keyboard.press(step.keys)
+            return f"Sent keys: {step.keys}"
+        if step.action in ("scroll_down", "scroll_up"):
+            sign = 1 if step.action == "scroll_down" else -1
+            if step.amount is not None:
+                await page.evaluate("(dy) => window.scrollBy(0, dy)", sign * step.amount)
+            else:
+                await page.evaluate("(sign) => window.scrollBy(0, sign * window.innerHeight)", sign)
+            return f"Scrolled {step.action[len('scroll_'):]} by {f'{step.amount} pixels' if step.amount is not None else 'one page'}"
+        if step.action == "wait_for_selector":
+            if not step.selector:
+                raise ValueError("wait_for_selector needs a selector")
+            await page.wait_for_selector(step.selector, state="visible", timeout=step.timeout_ms)
+            return f"'{step.selector}' is visible"
+        if step.action == "wait":
+            seconds = min(step.seconds if step.seconds is not None else 1, 30)
+            await asyncio.sleep(seconds)
+            return f"Waited for {seconds} seconds"
+        raise ValueError(f"Unknown batch action '{step.action}'")
+
+    async def batch(self, action: BatchAction = Body(...)):
+        """Perform a sequence of actions and capture the browser state once, at the end"""
+        page = await self.get_current_page()
+        step_results = []
+        failed = None
+        for position, step in enumerate(action.steps):
+            if failed is not None and action.stop_on_error:
+                step_results.append({"step": position, "action": step.action, "success": False, "skipped": True})
+                continue
+            try:
+                message = await self.run_batch_step(page, step)
+                step_results.append({"step": position, "action": step.action, "success": True, "message": message})
+            except Exception as e:
+                print(f"Batch step {position} ({step.action}) failed: {e}")
+                step_results.append({"step": position, "action": step.action, "success": False, "error": str(e)})
+                if failed is None:
+                    failed = step_results[-1]
+
+        done = sum(1 for result in step_results if result["success"])
+        if failed is None:
+            message = f"Completed all {len(step_results)} steps"
+        else:
+            message = f"Completed {done} of {len(step_results)} steps; step {failed['step']} ({failed['action']}) failed: {failed['error']}"
+
+        dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"batch({len(action.steps)} steps)")
+        result = self.build_action_result(
+            failed is None,
+            message,
+            dom_state,
+            screenshot,
+            elements,
+            metadata,
+            error=failed["error"] if failed else "",
+            content=None,
+            fallback_url=page.url
+        )
+        result.step_results = step_results
+        return result
+
 # Create singleton instance
 automation_service = BrowserAutomation()
 
@@ -1825,6 +2654,58 @@ api_app = FastAPI()
 async def health_check():
     return {"status": "ok", "message": "API server is running"}
 
+@api_app.middleware("http")
+async def report_action_timings(request: Request, call_next):
+    """Server-Timing header with the stages of automation requests (innermost, so waiting
+    for the session is not counted)"""
+    if request.method != "POST" or not request.url.path.startswith("/api/automation/"):
+        return await call_next(request)
+    timings = ActionTimings()
+    token = action_timings.set(timings)
+    try:
+        response = await call_next(request)
+        response.headers["Server-Timing"] = timings.server_timing()
+        return response
+    finally:
+        action_timings.reset(token)
+
+@api_app.middleware("http")
+async def use_browser_session(request: Request, call_next):
+    """Run automation requests in the browser session named by the X-Browser-Session header"""
+    # Screenshots and session management are not tied to a session
+    if request.method != "POST" or not request.url.path.startswith("/api/automation/"):
+        return await call_next(request)
+    session_id = request.headers.get("x-browser-session") or DEFAULT_SESSION_ID
+    try:
+        session = await automation_service.open_session(session_id)
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+    token = browser_session_id.set(session_id)
+    try:
+        async with session.lock:
+            session.begin_action()
+            response = await call_next(request)
+            session.last_used = time.monotonic()
+            return response
+    finally:
+        browser_session_id.reset(token)
+
+@api_app.middleware("http")
+async def read_screenshot_settings_header(request: Request, call_next):
+    """Per-request screenshot settings from the X-Screenshot-Settings JSON header"""
+    header = request.headers.get("x-screenshot-settings")
+    try:
+        override = json.loads(header) if header else None
+        if override is not None:
+            ScreenshotSettings(**override)
+    except (TypeError, ValueError) as e:
+        return Response(status_code=400, content=f"Invalid X-Screenshot-Settings header: {e}")
+    token = screenshot_settings_override.set(override)
+    try:
+        return await call_next(request)
+    finally:
+        screenshot_settings_override.reset(token)
+
 # Include automation service router with /api prefix
 api_app.include_router(automation_service.router, prefix="/api")
 
@@ -0,0 +1,359 @@
+"""
+Long-lived command agent running inside the sandbox.
+
+Accepts multiplexed requests over persistent TCP connections so the backend can
+run commands and touch files with one framed message instead of a Docker exec
+round trip per operation.
+
+Protocol: newline-delimited JSON frames. The first frame on a connection must be
+{"op": "auth", "token": "..."} carrying EXEC_AGENT_TOKEN; the agent does not start without one. Every later request carries a client-chosen "id";
+all response frames echo it, so many requests can be in flight on one connection.
+
+Requests:
+    {"id": 1, "op": "run", "command": "ls", "cwd": "/workspace", "timeout": 60, "stream": false}
+    {"id": 2, "op": "read_file", "path": "/workspace/a.txt", "offset": 0, "length": 4194304}
+    {"id": 3, "op": "write_file", "path": "/workspace/a.txt", "content_b64": "...", "mode": 420}
+    {"id": 4, "op": "stat", "path": "/workspace/a.txt"}
+    {"id": 5, "op": "list", "path": "/workspace"}
+    {"id": 6, "op": "manifest", "root": "/workspace", "since_version": 3, "manifest_id": "...",
+     "exclude_dirs": [...], "exclude_files": [...], "exclude_exts": [...]}
+
+The manifest op can also be run without the server, for callers that only have a
+plain exec into the container:
+    python /app/exec_agent.py manifest '{"root": "/workspace", ...}'
+
+Responses:
+    {"id": 1, "event": "output", "stream": "stdout", "data": "..."}   (run with stream=true only)
+    {"id": 1, "event": "result", ...op specific fields...}
+    {"id": 1, "event": "error", "error": "message"}
+"""
+
+import asyncio
+import base64
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import signal
+import stat as stat_module
+import sys
+import uuid
+
+HOST = "0.0.0.0"
+PORT = int(os.getenv("EXEC_AGENT_PORT", "8004"))
+TOKEN = os.getenv("EXEC_AGENT_TOKEN", "")
+FRAME_LIMIT = 64 * 1024 * 1024  # Max size of a single frame (file transfers are base64 in one frame)
+READ_FILE_MAX_CHUNK = 16 * 1024 * 1024  # Largest read_file answer; bigger files are read by offset/length
+READ_CHUNK = 64 * 1024
+MANIFEST_DIR = "/tmp/.workspace_manifests"
+MANIFEST_MAX_TOMBSTONES = 10000  # Deleted paths remembered for diffs; older ones force a full resync
+HASH_CHUNK = 1024 * 1024
+
+
+def _entry_type(mode: int) -> str:
+    if stat_module.S_ISDIR(mode):
+        return "directory"
+    if stat_module.S_ISREG(mode):
+        return "file"
+    if stat_module.S_ISLNK(mode):
+        return "symlink"
+    return "other"
+
+
+def _stat_record(path: str, name: str = None) -> dict:
+    st = os.lstat(path)
+    return {
+        "name": name if name is not None else os.path.basename(path),
+        "path": path,
+        "type": _entry_type(st.st_mode),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "mode": stat_module.S_IMODE(st.st_mode),
+    }
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_state_path(root: str, exclude_dirs, exclude_files, exclude_exts) -> str:
+    # One manifest per root and exclusion set, since both decide which files it tracks
+    key = json.dumps([root, sorted(exclude_dirs), sorted(exclude_files), sorted(exclude_exts)])
+    return os.path.join(MANIFEST_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def scan_manifest(root: str, since_version: int = 0, manifest_id: str = None,
+                  exclude_dirs=(), exclude_files=(), exclude_exts=()) -> dict:
+    """Refresh the hash manifest of the regular files under root and diff it against since_version.
+
+    Files whose size and mtime match the stored entry keep their hash without being
+    read, so a refresh costs one stat per file plus a hash per changed file. Every
+    entry records the manifest version in which it last changed, and deletions leave
+    tombstones, so the diff contains only what changed after since_version.
+
+    If manifest_id does not match the stored manifest (it was reset or the caller
+    never synced) or since_version predates the oldest tombstone, the result is a
+    full listing and "full" is true.
+    """
+    exclude_dirs = set(exclude_dirs)
+    exclude_files = set(exclude_files)
+    exclude_exts = {ext.lower() for ext in exclude_exts}
+    state_path = _manifest_state_path(root, exclude_dirs, exclude_files, exclude_exts)
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+
+    with open(state_path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {"id": uuid.uuid4().hex, "version": 0, "tombstone_floor": 0, "files": {}, "deleted": {}}
+
+        files = state["files"]
+        deleted = state["deleted"]
+        next_version = state["version"] + 1
+        changed = False
+        seen = set()
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if name not in exclude_dirs]
+            for name in filenames:
+                if name in exclude_files or os.path.splitext(name)[1].lower() in exclude_exts:
+                    continue
+                full_path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full_path)
+                    if not stat_module.S_ISREG(st.st_mode):
+                        continue
+                    rel_path = os.path.relpath(full_path, root)
+                    seen.add(rel_path)
+                    entry = files.get(rel_path)
+                    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                        continue
+                    file_hash = _hash_file(full_path)
+                except OSError:
+                    continue  # Removed or unreadable while scanning
+                if entry and entry["hash"] == file_hash:
+                    # Touched but not modified: remember the new mtime, report nothing
+                    entry["mtime_ns"] = st.st_mtime_ns
+                    continue
+                files[rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": file_hash, "version": next_version}
+                deleted.pop(rel_path, None)
+                changed = True
+
+        for rel_path in [path for path in files if path not in seen]:
+            del files[rel_path]
+            deleted[rel_path] = next_version
+            changed = True
+
+        if changed:
+            state["version"] = next_version
+        if len(deleted) > MANIFEST_MAX_TOMBSTONES:
+            by_age = sorted(deleted.items(), key=lambda item: item[1])
+            dropped = by_age[:len(deleted) - MANIFEST_MAX_TOMBSTONES]
+            state["tombstone_floor"] = max(version for _, version in dropped)
+            state["deleted"] = deleted = dict(by_age[len(dropped):])
+
+        tmp_path = f"{state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    full = manifest_id != state["id"] or since_version < state["tombstone_floor"]
+    if full:
+        since_version = 0
+    return {
+        "manifest_id": state["id"],
+        "version": state["version"],
+        "full": full,
+        "file_count": len(files),
+        "changed": [
+            {"path": path, "size": entry["size"], "mtime": entry["mtime_ns"] / 1e9, "hash": entry["hash"]}
+            for path, entry in sorted(files.items()) if entry["version"] > since_version
+        ],
+        "deleted": [] if full else sorted(path for path, version in deleted.items() if version > since_version),
+    }
+
+
+class Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.write_lock = asyncio.Lock()
+        self.tasks = set()
+
+    async def send(self, frame: dict):
+        data = (json.dumps(frame) + "\n").encode("utf-8")
+        async with self.write_lock:
+            self.writer.write(data)
+            await self.writer.drain()
+
+    async def serve(self):
+        try:
+            auth_line = await self.reader.readline()
+            auth = json.loads(auth_line or b"{}")
+            # Without a token every connection is refused: the agent runs commands as root
+            if auth.get("op") != "auth" or not TOKEN or not hmac.compare_digest(str(auth.get("token") or ""), TOKEN):
+                await self.send({"id": auth.get("id"), "event": "error", "error": "unauthorized"})
+                return
+            await self.send({"id": auth.get("id"), "event": "result", "ok": True})
+
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    await self.send({"id": None, "event": "error", "error": "malformed frame"})
+                    continue
+                task = asyncio.create_task(self.handle(request))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        finally:
+            for task in list(self.tasks):
+                task.cancel()
+            self.writer.close()
+
+    async def handle(self, request: dict):
+        request_id = request.get("id")
+        op = request.get("op")
+        try:
+            if op == "run":
+                await self.op_run(request_id, request)
+            elif op == "read_file":
+                offset = int(request.get("offset") or 0)
+                length = request.get("length")
+                with open(request["path"], "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if length is None and size > READ_FILE_MAX_CHUNK:
+                        raise ValueError(f"file is {size} bytes, read it in chunks of at most {READ_FILE_MAX_CHUNK}")
+                    f.seek(offset)
+                    content = f.read(min(int(length), READ_FILE_MAX_CHUNK) if length is not None else -1)
+                await self.send({"id": request_id, "event": "result", "size": size,
+                                 "content_b64": base64.b64encode(content).decode("ascii")})
+            elif op == "write_file":
+                path = request["path"]
+                os.makedirs(os.path.dirname(path) or "/", exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(base64.b64decode(request.get("content_b64", "")))
+                if request.get("mode") is not None:
+                    os.chmod(path, int(request["mode"]))
+                await self.send({"id": request_id, "event": "result", "ok": True})
+            elif op == "stat":
+                await self.send({"id": request_id, "event": "result", **_stat_record(request["path"])})
+            elif op == "list":
+                path = request["path"]
+                entries = []
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            entries.append(_stat_record(entry.path, entry.name))
+                        except FileNotFoundError:
+                            continue  # Removed while listing
+                await self.send({"id": request_id, "event": "result", "entries": entries})
+            elif op == "manifest":
+                # Scanning touches every file: keep it off the event loop
+                result = await asyncio.to_thread(
+                    scan_manifest,
+                    request.get("root") or "/workspace",
+                    int(request.get("since_version") or 0),
+                    request.get("manifest_id"),
+                    request.get("exclude_dirs") or (),
+                    request.get("exclude_files") or (),
+                    request.get("exclude_exts") or (),
+                )
+                await self.send({"id": request_id, "event": "result", **result})
+            else:
+                await self.send({"id": request_id, "event": "error", "error": f"unknown op: {op}"})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.send({"id": request_id, "event": "error", "error": f"{type(e).__name__}: {e}"})
+
+    async def op_run(self, request_id, request: dict):
+        stream = bool(request.get("stream"))
+        timeout = request.get("timeout")
+        proc = await asyncio.create_subprocess_shell(
+            request["command"],
+            cwd=request.get("cwd") or "/workspace",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        collected = {"stdout": [], "stderr": []}
+
+        async def pump(pipe, name):
+            while True:
+                chunk = await pipe.read(READ_CHUNK)
+                if not chunk:
+                    break
+                text = chunk.decode("utf-8", errors="replace")
+                if stream:
+                    await self.send({"id": request_id, "event": "output", "stream": name, "data": text})
+                else:
+                    collected[name].append(text)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(pump(proc.stdout, "stdout"), pump(proc.stderr, "stderr"), proc.wait()),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            timed_out = True
+            _kill_process_group(proc)
+            await proc.wait()
+        except asyncio.CancelledError:
+            # The connection that asked for it is gone: do not leave the command running
+            _kill_process_group(proc)
+            raise
+
+        await self.send({
+            "id": request_id, "event": "result",
+            "exit_code": -1 if timed_out else proc.returncode,
+            "timed_out": timed_out,
+            "stdout": "".join(collected["stdout"]),
+            "stderr": "".join(collected["stderr"]),
+        })
+
+
+def _kill_process_group(proc) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def _on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    await Connection(reader, writer).serve()
+
+
+async def main():
+    if not TOKEN:
+        sys.exit("exec_agent: EXEC_AGENT_TOKEN is not set, refusing to start")
+    os.makedirs("/workspace", exist_ok=True)
+    server = await asyncio.start_server(_on_connect, HOST, PORT, limit=FRAME_LIMIT)
+    print(f"exec_agent listening on {HOST}:{PORT}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "manifest":
+        params = json.loads(sys.argv[2])
+        print(json.dumps(scan_manifest(
+            params.get("root") or "/workspace",
+            int(params.get("since_version") or 0),
+            params.get("manifest_id"),
+            params.get("exclude_dirs") or (),
+            params.get("exclude_files") or (),
+            params.get("exclude_exts") or (),
+        )))
+    else:
+        asyncio.run(main())
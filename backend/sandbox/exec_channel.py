@@ -0,0 +1,209 @@
+"""
+Client for the in-sandbox exec agent (sandbox/docker/exec_agent.py).
+
+Keeps one persistent connection per sandbox and multiplexes requests over it by
+request ID, so running a command or reading a file costs one framed message
+instead of a Docker exec round trip.
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Tuple
+
+from utils.logger import logger
+
+FRAME_LIMIT = 64 * 1024 * 1024  # Must match the agent's frame limit
+CONNECT_TIMEOUT_SECONDS = 5
+READ_FILE_CHUNK = 4 * 1024 * 1024  # Bytes per read_file request, well below FRAME_LIMIT once base64 encoded
+
+
+class ExecChannelError(Exception):
+    """Raised when the exec agent is unreachable, stops responding or reports an error for a request."""
+    pass
+
+
+class ExecChannelUnavailable(ExecChannelError):
+    """Raised when a request could not be delivered to the exec agent, so it did not run."""
+    pass
+
+
+class ExecChannelClient:
+    """Multiplexed client for a single exec agent connection."""
+
+    def __init__(self, host: str, port: int, token: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Queue] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing() and self._reader_task is not None and not self._reader_task.done()
+
+    async def connect(self) -> None:
+        """Open the connection and authenticate, if not already connected."""
+        async with self._connect_lock:
+            if self.connected:
+                return
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, limit=FRAME_LIMIT),
+                    timeout=CONNECT_TIMEOUT_SECONDS
+                )
+                self._writer.write((json.dumps({"id": 0, "op": "auth", "token": self.token or ""}) + "\n").encode("utf-8"))
+                await self._writer.drain()
+                auth_reply = json.loads(await asyncio.wait_for(self._reader.readline(), timeout=CONNECT_TIMEOUT_SECONDS) or b"{}")
+            except (OSError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+                await self._reset()
+                raise ExecChannelUnavailable(f"Could not connect to exec agent at {self.host}:{self.port}: {e}") from e
+
+            if auth_reply.get("event") != "result":
+                await self._reset()
+                raise ExecChannelUnavailable(f"Exec agent rejected connection: {auth_reply.get('error', 'unknown error')}")
+
+            self._reader_task = asyncio.create_task(self._read_frames())
+            logger.debug(f"Connected to exec agent at {self.host}:{self.port}")
+
+    async def _reset(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader, self._writer = None, None
+
+    async def _read_frames(self) -> None:
+        """Dispatch response frames to the queue of the request they belong to."""
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                frame = json.loads(line)
+                queue = self._pending.get(frame.get("id"))
+                if queue is not None:
+                    queue.put_nowait(frame)
+        except Exception as e:
+            logger.warning(f"Exec agent connection {self.host}:{self.port} failed: {e}")
+        finally:
+            # Fail every in-flight request so callers do not hang
+            for queue in self._pending.values():
+                queue.put_nowait({"event": "error", "error": "exec agent connection closed"})
+            await self._reset()
+
+    async def _request(self, op: str, **params) -> Tuple[int, asyncio.Queue]:
+        await self.connect()
+        request_id = next(self._ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._pending[request_id] = queue
+        frame = {"id": request_id, "op": op, **params}
+        try:
+            async with self._write_lock:
+                self._writer.write((json.dumps(frame) + "\n").encode("utf-8"))
+                await self._writer.drain()
+        except Exception as e:
+            self._pending.pop(request_id, None)
+            raise ExecChannelUnavailable(f"Failed to send '{op}' request to exec agent: {e}") from e
+        return request_id, queue
+
+    async def _call(self, op: str, wait_timeout: Optional[float] = None, **params) -> Dict[str, Any]:
+        """Send a request and wait for its single result frame."""
+        request_id, queue = await self._request(op, **params)
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=wait_timeout)
+                except asyncio.TimeoutError as e:
+                    raise ExecChannelError(f"No response to '{op}' from exec agent within {wait_timeout}s") from e
+                if frame.get("event") == "error":
+                    raise ExecChannelError(frame.get("error", "unknown exec agent error"))
+                if frame.get("event") == "result":
+                    return frame
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def run(self, command: str, cwd: str = "/workspace", timeout: int = 60) -> Tuple[str, str, int]:
+        """Run a command to completion. Returns (stdout, stderr, exit_code)."""
+        # Allow a little slack so the agent's own timeout result arrives first
+        result = await self._call("run", wait_timeout=timeout + 5, command=command, cwd=cwd, timeout=timeout)
+        stderr = result.get("stderr", "")
+        if result.get("timed_out"):
+            stderr = (stderr + "\n" if stderr else "") + f"Command timed out after {timeout} seconds"
+        return result.get("stdout", ""), stderr, result.get("exit_code", -1)
+
+    async def run_stream(self, command: str, cwd: str = "/workspace", timeout: int = 60) -> AsyncGenerator[Dict[str, Any], None]:
+        """Run a command, yielding output frames as they arrive and finally the result frame."""
+        request_id, queue = await self._request("run", command=command, cwd=cwd, timeout=timeout, stream=True)
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=timeout + 5)
+                except asyncio.TimeoutError as e:
+                    raise ExecChannelError(f"No output from exec agent within {timeout + 5}s") from e
+                if frame.get("event") == "error":
+                    raise ExecChannelError(frame.get("error", "unknown exec agent error"))
+                yield frame
+                if frame.get("event") == "result":
+                    return
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def read_file(self, path: str) -> bytes:
+        """Read a file in READ_FILE_CHUNK pieces, so no single frame approaches FRAME_LIMIT."""
+        chunks, offset = [], 0
+        while True:
+            result = await self._call("read_file", path=path, offset=offset, length=READ_FILE_CHUNK)
+            chunk = base64.b64decode(result.get("content_b64", ""))
+            chunks.append(chunk)
+            offset += len(chunk)
+            # Agents that predate chunked reads send the whole file and no size
+            if "size" not in result or not chunk or offset >= result["size"]:
+                return b"".join(chunks)
+
+    async def write_file(self, path: str, content: bytes, mode: Optional[int] = None) -> None:
+        await self._call("write_file", path=path, content_b64=base64.b64encode(content).decode("ascii"), mode=mode)
+
+    async def stat(self, path: str) -> Dict[str, Any]:
+        result = await self._call("stat", path=path)
+        return {k: v for k, v in result.items() if k not in ("id", "event")}
+
+    async def list_dir(self, path: str) -> List[Dict[str, Any]]:
+        result = await self._call("list", path=path)
+        return result.get("entries", [])
+
+    async def manifest(self, root: str, since_version: int = 0, manifest_id: Optional[str] = None,
+                       exclude_dirs: Iterable[str] = (), exclude_files: Iterable[str] = (),
+                       exclude_exts: Iterable[str] = ()) -> Dict[str, Any]:
+        """Refresh the agent's hash manifest of root and return the files changed since since_version."""
+        result = await self._call(
+            "manifest", root=root, since_version=since_version, manifest_id=manifest_id,
+            exclude_dirs=list(exclude_dirs), exclude_files=list(exclude_files), exclude_exts=list(exclude_exts)
+        )
+        return {k: v for k, v in result.items() if k not in ("id", "event")}
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        await self._reset()
+
+
+# One client per (host, port, event loop); connections are reused across tools and runs in this process
+_clients: Dict[Tuple[str, int, int], ExecChannelClient] = {}
+
+
+def get_exec_channel(host: str, port: int, token: Optional[str] = None) -> ExecChannelClient:
+    """Return the shared client for an exec agent endpoint. Connection happens lazily on first request.
+
+    Must be called from a coroutine: the connection is bound to the running event loop.
+    """
+    key = (host, int(port), id(asyncio.get_running_loop()))
+    client = _clients.get(key)
+    if client is None or client.token != token:
+        client = ExecChannelClient(host, int(port), token)
+        _clients[key] = client
+    return client
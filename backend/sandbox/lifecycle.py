@@ -0,0 +1,221 @@
+"""
+Idle-aware sandbox lifecycle scheduler.
+
+Sandboxes that nobody uses still hold host memory until the archive scripts get
+to them. The scheduler tracks the last activity of every sandbox (tool calls and
+sandbox API hits, recorded in Redis so API and worker processes share it) and
+moves idle sandboxes down through the tiers:
+
+    running --(SANDBOX_IDLE_STOP_SECONDS idle)--> stopped --(SANDBOX_ARCHIVE_AFTER_STOP_SECONDS)--> archived
+
+A stopped sandbox keeps its container or Daytona instance and resumes in seconds:
+the next get_or_start_sandbox call starts it again, so callers do not notice.
+Only Daytona sandboxes have an archived tier; stopped local Docker containers
+cost disk only and stay stopped until used or deleted.
+
+Preview traffic goes straight to the container and never reaches the backend, so
+before stopping a local Docker sandbox the sweep looks for open connections to its
+preview ports (a VNC viewer, or a previewed dev server's live-reload socket) and
+counts them as activity. Daytona previews go through Daytona's proxy and are not seen.
+
+Every backend process records activity; the sweep runs in the API processes and a
+Redis lock makes sure only one of them sweeps per interval.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from services import redis
+from utils.config import config
+from utils.logger import logger
+from . import local_docker_handler
+from .sandbox import LocalDockerSandboxWrapper, daytona, sandbox_registry
+
+ACTIVITY_KEY = "sandbox_lifecycle:activity"  # sorted set: sandbox_id -> last activity (unix time)
+SANDBOXES_KEY = "sandbox_lifecycle:sandboxes"  # hash: sandbox_id -> {"type", "project_id", "state", "state_changed_at"}
+COUNTERS_KEY = "sandbox_lifecycle:counters"  # hash: idle_stops, archives, resumes
+SWEEP_LOCK_KEY = "sandbox_lifecycle:sweep_lock"
+SWEEP_INTERVAL_SECONDS = 60
+ACTIVITY_RECORD_INTERVAL_SECONDS = 30  # A process writes activity for a sandbox at most this often
+
+STATE_RUNNING = "running"
+STATE_STOPPED = "stopped"
+STATE_ARCHIVED = "archived"
+
+
+class SandboxLifecycleScheduler:
+    """Stops sandboxes that have been idle for `idle_stop_seconds` and archives long-stopped ones."""
+
+    def __init__(self, idle_stop_seconds: int, archive_after_stop_seconds: int):
+        self.idle_stop_seconds = idle_stop_seconds
+        self.archive_after_stop_seconds = archive_after_stop_seconds
+        self._last_recorded: Dict[str, float] = {}  # sandbox_id -> monotonic time of the last activity write
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.idle_stop_seconds > 0
+
+    async def record_activity(self, sandbox: Any, project_id: Optional[str] = None) -> None:
+        """Mark a sandbox as in use. Cheap to call on every tool call: writes are throttled per process."""
+        if not self.enabled or sandbox is None or not getattr(sandbox, 'id', None):
+            return
+        now = time.monotonic()
+        if now - self._last_recorded.get(sandbox.id, float('-inf')) < ACTIVITY_RECORD_INTERVAL_SECONDS:
+            return
+        self._last_recorded[sandbox.id] = now
+
+        try:
+            redis_client = await redis.get_client()
+            pipe = redis_client.pipeline()
+            pipe.hget(SANDBOXES_KEY, sandbox.id)
+            pipe.zadd(ACTIVITY_KEY, {sandbox.id: time.time()})
+            previous, _ = await pipe.execute()
+            previous_state = json.loads(previous).get("state") if previous else None
+            if previous_state == STATE_RUNNING:
+                return
+
+            sandbox_type = 'local_docker' if isinstance(sandbox, LocalDockerSandboxWrapper) else 'daytona'
+            record = {"type": sandbox_type, "project_id": project_id, "state": STATE_RUNNING, "state_changed_at": time.time()}
+            await redis_client.hset(SANDBOXES_KEY, sandbox.id, json.dumps(record))
+            if previous_state is not None:
+                await redis_client.hincrby(COUNTERS_KEY, "resumes", 1)
+                logger.info(f"Sandbox {sandbox.id} is in use again after being {previous_state}")
+        except Exception as e:
+            # Losing an activity mark only means the sandbox may be stopped a little early
+            logger.warning(f"Failed to record activity for sandbox {sandbox.id}: {e}")
+
+    def start(self) -> None:
+        """Start the periodic idle sweep. Call from the running event loop."""
+        if not self.enabled or self._sweep_task is not None:
+            return
+        self._sweep_task = asyncio.create_task(self._run())
+        logger.info(f"Sandbox lifecycle scheduler started (idle_stop={self.idle_stop_seconds}s, "
+                    f"archive_after_stop={self.archive_after_stop_seconds}s)")
+
+    async def stop(self) -> None:
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                redis_client = await redis.get_client()
+                # Only one process sweeps per interval; the lock expires on its own
+                if await redis_client.set(SWEEP_LOCK_KEY, "1", nx=True, ex=SWEEP_INTERVAL_SECONDS - 1):
+                    await self.sweep()
+                    logger.info(f"Sandbox occupancy: {await self.occupancy()}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Sandbox lifecycle sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+
+    async def sweep(self) -> None:
+        """Stop sandboxes idle past the window and archive the ones stopped past the archive window."""
+        redis_client = await redis.get_client()
+        now = time.time()
+        idle = await redis_client.zrangebyscore(ACTIVITY_KEY, "-inf", now - self.idle_stop_seconds, withscores=True)
+        if not idle:
+            return
+        records = await redis_client.hmget(SANDBOXES_KEY, [sandbox_id for sandbox_id, _ in idle])
+
+        for (sandbox_id, last_activity), raw_record in zip(idle, records):
+            record = json.loads(raw_record) if raw_record else {"type": "local_docker", "state": STATE_RUNNING}
+            if record["state"] == STATE_RUNNING:
+                # Activity may have arrived since the range query
+                latest = await redis_client.zscore(ACTIVITY_KEY, sandbox_id)
+                if latest is not None and latest > now - self.idle_stop_seconds:
+                    continue
+                if record["type"] == 'local_docker' and await local_docker_handler.get_preview_connections_async(sandbox_id):
+                    await redis_client.zadd(ACTIVITY_KEY, {sandbox_id: now})
+                    logger.debug(f"Sandbox {sandbox_id} has open preview connections, keeping it running")
+                    continue
+                if await self._stop_sandbox(sandbox_id, record):
+                    await self._set_state(sandbox_id, record, STATE_STOPPED)
+                    await redis_client.hincrby(COUNTERS_KEY, "idle_stops", 1)
+                    logger.info(f"Stopped sandbox {sandbox_id} after {int(now - last_activity)}s idle")
+            elif (record["state"] == STATE_STOPPED and record["type"] == 'daytona'
+                  and now - record.get("state_changed_at", now) >= self.archive_after_stop_seconds):
+                if await self._archive_sandbox(sandbox_id):
+                    # Nothing left to do for it until it is used again, which re-adds its activity
+                    await redis_client.zrem(ACTIVITY_KEY, sandbox_id)
+                    await self._set_state(sandbox_id, record, STATE_ARCHIVED)
+                    await redis_client.hincrby(COUNTERS_KEY, "archives", 1)
+                    logger.info(f"Archived sandbox {sandbox_id} after {int(now - record['state_changed_at'])}s stopped")
+
+    async def occupancy(self) -> Dict[str, int]:
+        """Sandbox counts per tier plus lifetime counters, for monitoring host density."""
+        redis_client = await redis.get_client()
+        records: List[str] = await redis_client.hvals(SANDBOXES_KEY)
+        counters = await redis_client.hgetall(COUNTERS_KEY)
+        states = [json.loads(raw).get("state") for raw in records]
+        idle_cutoff = time.time() - self.idle_stop_seconds / 2
+        return {
+            "running": states.count(STATE_RUNNING),
+            "stopped": states.count(STATE_STOPPED),
+            "archived": states.count(STATE_ARCHIVED),
+            # Running sandboxes already halfway to being stopped
+            "running_idle": await redis_client.zcount(ACTIVITY_KEY, "-inf", idle_cutoff) - states.count(STATE_STOPPED),
+            "idle_stops_total": int(counters.get("idle_stops", 0)),
+            "archives_total": int(counters.get("archives", 0)),
+            "resumes_total": int(counters.get("resumes", 0)),
+        }
+
+    async def _set_state(self, sandbox_id: str, record: Dict[str, Any], state: str) -> None:
+        redis_client = await redis.get_client()
+        record = {**record, "state": state, "state_changed_at": time.time()}
+        await redis_client.hset(SANDBOXES_KEY, sandbox_id, json.dumps(record))
+        self._last_recorded.pop(sandbox_id, None)  # The next use must be written through to mark the resume
+        if record.get("project_id"):
+            sandbox_registry.invalidate(record["project_id"])
+
+    async def _forget(self, sandbox_id: str) -> None:
+        redis_client = await redis.get_client()
+        await redis_client.zrem(ACTIVITY_KEY, sandbox_id)
+        await redis_client.hdel(SANDBOXES_KEY, sandbox_id)
+
+    async def _stop_sandbox(self, sandbox_id: str, record: Dict[str, Any]) -> bool:
+        if record["type"] == 'local_docker':
+            status = await local_docker_handler.get_sandbox_container_status_async(sandbox_id)
+            if status == 'not_found':
+                logger.info(f"Sandbox {sandbox_id} no longer exists, no longer tracking it")
+                await self._forget(sandbox_id)
+                return False
+            if status != 'running':
+                return status in ('exited', 'created')  # Already stopped elsewhere
+            return await local_docker_handler.stop_sandbox_container_async(sandbox_id)
+
+        if daytona is None:
+            return False
+        try:
+            def stop():
+                daytona.stop(daytona.get_current_sandbox(sandbox_id))
+            await asyncio.to_thread(stop)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to stop Daytona sandbox {sandbox_id}: {e}")
+            return False
+
+    async def _archive_sandbox(self, sandbox_id: str) -> bool:
+        if daytona is None:
+            return False
+        try:
+            await asyncio.to_thread(lambda: daytona.get_current_sandbox(sandbox_id).archive())
+            return True
+        except Exception as e:
+            logger.error(f"Failed to archive Daytona sandbox {sandbox_id}: {e}")
+            return False
+
+
+sandbox_lifecycle = SandboxLifecycleScheduler(
+    idle_stop_seconds=config.SANDBOX_IDLE_STOP_SECONDS,
+    archive_after_stop_seconds=config.SANDBOX_ARCHIVE_AFTER_STOP_SECONDS,
+)
@@ -1,14 +1,107 @@
 import docker
+import json
 import logging
 import os
 import tarfile
 import io
-from typing import Optional, Dict, List, Tuple, Any
+import posixpath
+import shlex
+import time
+import asyncio
+import contextlib
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from docker.utils.socket import STDOUT, frames_iter
+from typing import Optional, Dict, List, Tuple, Any, Callable, Iterable, Iterator, AsyncIterator, Union, BinaryIO
 
 logger = logging.getLogger(__name__) # Or from utils.logger if available and preferred
 
 client: Optional[docker.DockerClient] = None
 
+# docker-py is synchronous. Async callers go through the *_async functions below, which run
+# each Docker API call on this bounded pool so the event loop is never blocked. The pool size
+# is the concurrency limit for the (single) Docker daemon this process talks to; further calls
+# queue until a worker is free.
+DOCKER_IO_MAX_CONCURRENCY = int(os.getenv("LOCAL_DOCKER_MAX_CONCURRENCY", "8"))
+DOCKER_IO_TIMEOUT_SECONDS = float(os.getenv("LOCAL_DOCKER_IO_TIMEOUT", "120"))
+_docker_io_executor = ThreadPoolExecutor(max_workers=DOCKER_IO_MAX_CONCURRENCY, thread_name_prefix="docker-io")
+
+# --- Resource profiles and placement ---
+#
+# Every sandbox container is started with one of these named profiles, which become the
+# container's cgroup limits. tmpfs mounts count towards the memory limit. Operators can add
+# or override profiles with a JSON object in LOCAL_DOCKER_RESOURCE_PROFILES, e.g.
+# {"gpu_heavy": {"cpus": 8, "memory_mb": 16384, "pids_limit": 4096}}.
+
+@dataclass(frozen=True)
+class ResourceProfile:
+    name: str
+    cpus: float  # Hard CPU quota, in cores
+    cpu_shares: int  # Relative CPU weight under contention (Docker default: 1024)
+    memory_mb: int  # Memory limit; swap is disabled
+    pids_limit: int
+    tmpfs_mb: Dict[str, int] = field(default_factory=dict)  # Mount point -> size
+    shm_size_mb: int = 64  # /dev/shm, used by Chrome
+
+    def docker_run_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for containers.run() enforcing this profile."""
+        return {
+            'nano_cpus': int(self.cpus * 1e9),
+            'cpu_shares': self.cpu_shares,
+            'mem_limit': f"{self.memory_mb}m",
+            'memswap_limit': f"{self.memory_mb}m",
+            'pids_limit': self.pids_limit,
+            'shm_size': f"{self.shm_size_mb}m",
+            'tmpfs': {path: f"rw,exec,nosuid,size={size_mb}m" for path, size_mb in self.tmpfs_mb.items()},
+        }
+
+DEFAULT_RESOURCE_PROFILES = {
+    'small': ResourceProfile('small', cpus=1, cpu_shares=512, memory_mb=2048, pids_limit=512,
+                             tmpfs_mb={'/tmp': 256}, shm_size_mb=256),
+    'standard': ResourceProfile('standard', cpus=2, cpu_shares=1024, memory_mb=4096, pids_limit=1024,
+                                tmpfs_mb={'/tmp': 512}, shm_size_mb=512),
+    'large': ResourceProfile('large', cpus=4, cpu_shares=2048, memory_mb=8192, pids_limit=2048,
+                             tmpfs_mb={'/tmp': 1024}, shm_size_mb=1024),
+}
+
+def _load_resource_profiles() -> Dict[str, ResourceProfile]:
+    profiles = dict(DEFAULT_RESOURCE_PROFILES)
+    custom = os.getenv("LOCAL_DOCKER_RESOURCE_PROFILES")
+    if custom:
+        try:
+            for name, values in json.loads(custom).items():
+                base = profiles.get(name, DEFAULT_RESOURCE_PROFILES['standard'])
+                profiles[name] = ResourceProfile(**{**base.__dict__, **values, 'name': name})
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Ignoring invalid LOCAL_DOCKER_RESOURCE_PROFILES: {e}")
+    return profiles
+
+RESOURCE_PROFILES: Dict[str, ResourceProfile] = _load_resource_profiles()
+
+# Placement: a sandbox is only started if the limits of the running sandboxes plus the new one
+# fit the host. Memory is reserved for the host itself and not overcommitted by default; CPU
+# quotas are rarely all saturated at once, so they may be overcommitted.
+HOST_RESERVED_MEMORY_MB = int(os.getenv("LOCAL_DOCKER_RESERVED_MEMORY_MB", "1024"))
+HOST_MEMORY_OVERCOMMIT = float(os.getenv("LOCAL_DOCKER_MEMORY_OVERCOMMIT", "1.0"))
+HOST_CPU_OVERCOMMIT = float(os.getenv("LOCAL_DOCKER_CPU_OVERCOMMIT", "2.0"))
+PLACEMENT_POLL_SECONDS = 2
+_placement_admission_lock = threading.Lock()  # Serializes check-then-reserve
+_placement_lock = threading.Lock()  # Guards _pending_placements
+_pending_placements: List[ResourceProfile] = []  # Admitted by check_placement, container not running yet
+# FIFO order for callers waiting for headroom. asyncio locks belong to one event loop, so each loop gets its own
+_placement_queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+class SandboxPlacementError(Exception):
+    """The host has no headroom left for another sandbox with the requested profile."""
+    pass
+
+def get_resource_profile(name: Optional[str]) -> Optional[ResourceProfile]:
+    """The named profile, or None for an unknown (or no) name."""
+    return RESOURCE_PROFILES.get(name) if name else None
+
 def _get_or_initialize_client() -> Optional[docker.DockerClient]:
     """
     Initializes the Docker client if it's not already initialized.
@@ -41,18 +134,117 @@ def _get_or_initialize_client() -> Optional[docker.DockerClient]:
                 # client remains None if all attempts fail
     return client
 
+def get_host_headroom() -> Optional[Dict[str, Any]]:
+    """
+    Host capacity and the limits committed to running sandboxes, in MB and cores.
+    Returns None if the Docker daemon cannot be queried.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot compute host headroom.")
+        return None
+    try:
+        info = current_client.info()
+        # Sparse listing is a single API call; a container's limits are known from its profile label
+        containers = current_client.containers.list(sparse=True, filters={'label': 'managed_by=agentpress_local_sandbox'})
+    except docker.errors.APIError as e:
+        logger.error(f"Docker API error while computing host headroom: {e}")
+        return None
+
+    profiles = [RESOURCE_PROFILES.get((c.attrs.get('Labels') or {}).get('resource_profile')) for c in containers]
+    with _placement_lock:
+        profiles += _pending_placements
+    memory_committed = sum(p.memory_mb for p in profiles if p)
+    cpus_committed = sum(p.cpus for p in profiles if p)
+    memory_capacity = max(0.0, info.get('MemTotal', 0) / (1024 * 1024) - HOST_RESERVED_MEMORY_MB) * HOST_MEMORY_OVERCOMMIT
+    cpus_capacity = info.get('NCPU', 0) * HOST_CPU_OVERCOMMIT
+    return {
+        'sandboxes': len(containers),
+        'pending': len(profiles) - len(containers),
+        'memory_capacity_mb': round(memory_capacity),
+        'memory_committed_mb': round(memory_committed),
+        'memory_available_mb': round(memory_capacity - memory_committed),
+        'cpus_capacity': cpus_capacity,
+        'cpus_committed': cpus_committed,
+        'cpus_available': cpus_capacity - cpus_committed,
+    }
+
+def check_placement(profile: ResourceProfile) -> Optional[str]:
+    """
+    Whether a sandbox with this profile fits on the host now.
+    Returns None if it does, otherwise the reason it does not.
+    """
+    headroom = get_host_headroom()
+    if headroom is None:
+        return "host headroom unknown (Docker daemon unavailable)"
+    if profile.memory_mb > headroom['memory_available_mb']:
+        return (f"not enough memory for profile '{profile.name}': needs {profile.memory_mb} MB, "
+                f"{headroom['memory_available_mb']} MB of {headroom['memory_capacity_mb']} MB available")
+    if profile.cpus > headroom['cpus_available']:
+        return (f"not enough CPU for profile '{profile.name}': needs {profile.cpus:g} cores, "
+                f"{headroom['cpus_available']:g} of {headroom['cpus_capacity']:g} available")
+    return None
+
 def start_sandbox_container(image_name: str, env_vars: Dict[str, str], project_id: Optional[str] = None,
-                            vnc_port_host: Optional[int] = None, web_port_host: Optional[int] = None) -> Optional[Dict[str, Any]]:
+                            vnc_port_host: Optional[int] = None, web_port_host: Optional[int] = None,
+                            labels: Optional[Dict[str, str]] = None,
+                            resource_profile: Optional[str] = None,
+                            container_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
     Creates and starts a new Docker container locally to act as a sandbox.
     Returns a dictionary with container_id, host_vnc_port, host_web_port.
     Allows specifying host ports for easier local dev, otherwise Docker assigns random ones.
+
+    With a resource_profile, the container gets that profile's limits, and is only started if
+    the host has headroom for it (raises SandboxPlacementError otherwise). Without one, the
+    container is unconstrained. The container is named after the project unless container_name is given.
     """
     current_client = _get_or_initialize_client()
     if not current_client:
         logger.error("Docker client not available. Cannot start sandbox container.")
         return None
 
+    profile = None
+    if resource_profile:
+        profile = get_resource_profile(resource_profile)
+        if not profile:
+            logger.error(f"Unknown sandbox resource profile: {resource_profile}")
+            return None
+
+    if not profile:
+        return _run_sandbox_container(current_client, image_name, env_vars, project_id, vnc_port_host,
+                                      web_port_host, labels, profile, container_name)
+
+    with _placement_reservation(profile, f"sandbox for project_id {project_id}"):
+        return _run_sandbox_container(current_client, image_name, env_vars, project_id, vnc_port_host,
+                                      web_port_host, labels, profile, container_name)
+
+@contextlib.contextmanager
+def _placement_reservation(profile: ResourceProfile, subject: str) -> Iterator[None]:
+    """
+    Admits a sandbox with this profile and counts it as committed until the block exits (by then
+    its container runs and is counted by get_host_headroom). Admission and reservation are atomic,
+    so concurrent starts in this process cannot overcommit the host.
+    Raises SandboxPlacementError if the host has no headroom for it.
+    """
+    with _placement_admission_lock:
+        refusal = check_placement(profile)
+        if refusal:
+            logger.warning(f"Refusing to start {subject}: {refusal}")
+            raise SandboxPlacementError(refusal)
+        with _placement_lock:
+            _pending_placements.append(profile)
+    try:
+        yield
+    finally:
+        with _placement_lock:
+            _pending_placements.remove(profile)
+
+def _run_sandbox_container(current_client: docker.DockerClient, image_name: str, env_vars: Dict[str, str],
+                           project_id: Optional[str], vnc_port_host: Optional[int], web_port_host: Optional[int],
+                           labels: Optional[Dict[str, str]], profile: Optional[ResourceProfile],
+                           container_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+
     logger.info(f"Attempting to create local Docker sandbox for project_id: {project_id} using image: {image_name}")
 
     try:
@@ -72,11 +264,19 @@ def start_sandbox_container(image_name: str, env_vars: Dict[str, str], project_i
         else:
             ports_map['8080/tcp'] = None # Assign a random available host port
 
+        # Exec agent channel and browser automation API: loopback only, random host port
+        ports_map['8004/tcp'] = ('127.0.0.1', None)
+        ports_map['8003/tcp'] = ('127.0.0.1', None)
+
         container_labels = {'managed_by': 'agentpress_local_sandbox'}
         if project_id:
             container_labels['project_id'] = project_id
+        if labels:
+            container_labels.update(labels)
+        if profile:
+            container_labels['resource_profile'] = profile.name
 
-        container_name = f"agentpress_sandbox_{project_id or os.urandom(4).hex()}"
+        container_name = container_name or f"agentpress_sandbox_{project_id or os.urandom(4).hex()}"
 
         container = current_client.containers.run(
             image=image_name,
@@ -85,6 +285,7 @@ def start_sandbox_container(image_name: str, env_vars: Dict[str, str], project_i
             ports=ports_map,
             labels=container_labels,
             name=container_name,
+            **(profile.docker_run_kwargs() if profile else {}),
             # Consider adding remove=True for auto-cleanup if desired,
             # but for sandboxes, manual cleanup via delete_sandbox is typical.
             # remove=True
@@ -101,14 +302,25 @@ def start_sandbox_container(image_name: str, env_vars: Dict[str, str], project_i
         if container.ports.get('8080/tcp'):
             actual_host_web_port = container.ports['8080/tcp'][0]['HostPort']
 
-        logger.info(f"Container {container.id} ports: VNC -> {actual_host_vnc_port}, Web -> {actual_host_web_port}")
+        actual_host_exec_port = None
+        if container.ports.get('8004/tcp'):
+            actual_host_exec_port = container.ports['8004/tcp'][0]['HostPort']
+
+        actual_host_browser_api_port = None
+        if container.ports.get('8003/tcp'):
+            actual_host_browser_api_port = container.ports['8003/tcp'][0]['HostPort']
+
+        logger.info(f"Container {container.id} ports: VNC -> {actual_host_vnc_port}, Web -> {actual_host_web_port}, Exec -> {actual_host_exec_port}, Browser API -> {actual_host_browser_api_port}")
 
         return {
             'container_id': container.id,
             'container_name': container.name,
             'host_vnc_port': actual_host_vnc_port,
             'host_web_port': actual_host_web_port,
-            'status': container.status
+            'host_exec_port': actual_host_exec_port,
+            'host_browser_api_port': actual_host_browser_api_port,
+            'status': container.status,
+            'resource_profile': profile.name if profile else None,
         }
 
     except docker.errors.ImageNotFound:
@@ -149,6 +361,137 @@ def stop_and_remove_sandbox_container(container_id: str, raise_not_found: bool =
         logger.error(f"Unexpected error stopping/removing local Docker sandbox {container_id}: {e}", exc_info=True)
         return False
 
+def rename_sandbox_container(container_id: str, name: str) -> bool:
+    """Renames a sandbox container. Returns False if it is gone or the name is taken."""
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot rename sandbox container.")
+        return False
+    try:
+        current_client.containers.get(container_id).rename(name)
+        return True
+    except docker.errors.NotFound:
+        logger.warning(f"Container {container_id} not found for rename.")
+        return False
+    except docker.errors.APIError as e:
+        logger.error(f"Docker API error renaming container {container_id} to {name}: {e}")
+        return False
+
+def remove_unclaimed_containers(label: str, name_prefix: str, keep_ids: Iterable[str]) -> List[str]:
+    """
+    Stops and removes the containers carrying `label` whose name still starts with `name_prefix`,
+    except those in keep_ids. Containers are claimed by renaming them; each candidate is checked
+    again right before removal so one renamed meanwhile survives. Returns the removed container ids.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot remove unclaimed containers.")
+        return []
+    keep_ids = set(keep_ids)
+    removed = []
+    try:
+        containers = current_client.containers.list(all=True, filters={'label': label})
+    except docker.errors.APIError as e:
+        logger.error(f"Docker API error listing containers labelled {label}: {e}")
+        return []
+    for container in containers:
+        if container.id in keep_ids:
+            continue
+        try:
+            container.reload()
+            if not container.name.startswith(name_prefix):
+                continue
+            container.remove(force=True)
+            removed.append(container.id)
+        except docker.errors.NotFound:
+            continue
+        except docker.errors.APIError as e:
+            logger.error(f"Docker API error removing unclaimed container {container.id}: {e}")
+    return removed
+
+def stop_sandbox_container(container_id: str, timeout_seconds: int = 10) -> bool:
+    """Stops a local Docker sandbox container without removing it, so it can be started again later."""
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot stop sandbox container.")
+        return False
+    try:
+        container = current_client.containers.get(container_id)
+        container.stop(timeout=timeout_seconds)
+        logger.info(f"Container {container.id} stopped.")
+        return True
+    except docker.errors.NotFound:
+        logger.warning(f"Container {container_id} not found for stop.")
+        return False
+    except Exception as e:
+        logger.error(f"Error stopping container {container_id}: {e}", exc_info=True)
+        return False
+
+def restart_sandbox_container(container_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Starts an existing (created/exited) local Docker sandbox container.
+    Returns the same dictionary shape as start_sandbox_container, or None on failure.
+    A container with a resource profile is placed like a new one: SandboxPlacementError is
+    raised if the host has no headroom for it.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot start existing sandbox container.")
+        return None
+    try:
+        container = current_client.containers.get(container_id)
+        profile = get_resource_profile((container.labels or {}).get('resource_profile'))
+        if profile:
+            with _placement_reservation(profile, f"existing container {container_id}"):
+                container.start()
+        else:
+            container.start()
+        container.reload() # To get updated port information
+        logger.info(f"Started existing local Docker container {container.id}.")
+        return {
+            'container_id': container.id,
+            'container_name': container.name,
+            **_host_ports(container),
+            'status': container.status
+        }
+    except SandboxPlacementError:
+        raise
+    except docker.errors.NotFound:
+        logger.error(f"Container {container_id} not found when starting existing sandbox.")
+        return None
+    except Exception as e:
+        logger.error(f"Error starting existing container {container_id}: {e}", exc_info=True)
+        return None
+
+# Published container ports and the container_info keys of their host ports
+HOST_PORT_KEYS = {
+    '6080/tcp': 'host_vnc_port',
+    '8080/tcp': 'host_web_port',
+    '8004/tcp': 'host_exec_port',
+    '8003/tcp': 'host_browser_api_port',
+}
+
+def _host_ports(container) -> Dict[str, Optional[str]]:
+    """Host ports the container's published ports are bound to right now.
+    Ports published without a fixed host port get a new one on every start."""
+    ports = container.ports or {}
+    return {key: ports[port][0]['HostPort'] if ports.get(port) else None for port, key in HOST_PORT_KEYS.items()}
+
+def get_sandbox_container_ports(container_id: str) -> Optional[Dict[str, Optional[str]]]:
+    """Current host ports of a running sandbox container, keyed like start_sandbox_container's result."""
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot get container ports.")
+        return None
+    try:
+        return _host_ports(current_client.containers.get(container_id))
+    except docker.errors.NotFound:
+        logger.warning(f"Container {container_id} not found when reading its ports.")
+        return None
+    except Exception as e:
+        logger.error(f"Error getting ports of container {container_id}: {e}", exc_info=True)
+        return None
+
 def get_sandbox_container_status(container_id: str) -> Optional[str]:
     """Gets the status of a local Docker sandbox container."""
     current_client = _get_or_initialize_client()
@@ -165,6 +508,48 @@ def get_sandbox_container_status(container_id: str) -> Optional[str]:
         logger.error(f"Error getting status for container {container_id}: {e}", exc_info=True)
         return "error"
 
+PREVIEW_PORTS = (6080, 8080)  # noVNC and the web preview, the ports users view a sandbox through
+TCP_ESTABLISHED = '01'  # Connection state code in /proc/net/tcp
+
+def count_established_connections(proc_net_tcp: str, ports: Iterable[int]) -> int:
+    """Counts established connections to the given local ports in /proc/net/tcp(6) text."""
+    ports = set(ports)
+    count = 0
+    for line in proc_net_tcp.splitlines():
+        fields = line.split()
+        if len(fields) < 4 or ':' not in fields[1] or fields[3] != TCP_ESTABLISHED:
+            continue  # Header or malformed line
+        try:
+            local_port = int(fields[1].rsplit(':', 1)[1], 16)
+        except ValueError:
+            continue
+        if local_port in ports:
+            count += 1
+    return count
+
+def get_preview_connections(container_id: str, ports: Iterable[int] = PREVIEW_PORTS) -> Optional[int]:
+    """
+    Number of open connections to the preview ports of a running container, from its
+    /proc/net/tcp and tcp6. Returns None if the container cannot be inspected.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot inspect preview connections.")
+        return None
+    try:
+        container = current_client.containers.get(container_id)
+        exit_code, output_data = container.exec_run(cmd=['cat', '/proc/net/tcp', '/proc/net/tcp6'], workdir="/", demux=True)
+        stdout_bytes = output_data[0] if isinstance(output_data, tuple) else output_data
+        if not stdout_bytes:
+            return None
+        return count_established_connections(stdout_bytes.decode('ascii', errors='replace'), ports)
+    except docker.errors.NotFound:
+        logger.warning(f"Container {container_id} not found when inspecting preview connections.")
+        return None
+    except Exception as e:
+        logger.error(f"Error inspecting preview connections of {container_id}: {e}", exc_info=True)
+        return None
+
 def execute_command_in_container(container_id: str, command: str, workdir: str = "/workspace", timeout_seconds: int = 60) -> Tuple[Optional[str], Optional[str], Optional[int]]:
     """
     Executes a command in the specified local Docker sandbox container.
@@ -307,99 +692,301 @@ def upload_files_to_container(container_id: str, host_path: str, container_path:
         logger.error(f"Error uploading to container {container_id}: {e}", exc_info=True)
         return False
 
-def list_files_in_container(container_id: str, path: str) -> List[Dict[str, Any]]:
+# A file to write into a container: (absolute container path, bytes or a readable binary file object).
+# File objects are streamed in TAR_CHUNK_SIZE pieces and never read into memory as a whole.
+UploadEntry = Tuple[str, Union[bytes, BinaryIO]]
+TAR_CHUNK_SIZE = 256 * 1024
+
+def _entry_size(content: Union[bytes, BinaryIO]) -> int:
+    if isinstance(content, (bytes, bytearray)):
+        return len(content)
+    current = content.tell()
+    content.seek(0, os.SEEK_END)
+    size = content.tell() - current
+    content.seek(current)
+    return size
+
+def _tar_stream(files: List[UploadEntry], mtime: float) -> Iterator[bytes]:
+    """Yields one uncompressed tar archive containing all files, rooted at '/'.
+
+    The archive has no directory entries: extracting one would reset the mode and owner
+    of directories that already exist (e.g. strip the sticky bit of /tmp). Docker creates
+    missing parent directories itself when it extracts the archive.
     """
-    Lists files and directories at the specified path in the local Docker sandbox.
-    Returns a list of dicts with 'name', 'type' ('file'/'directory'), and 'size'.
-    Basic implementation, might not handle all edge cases of ls output.
+    for container_path, content in files:
+        relative_path = posixpath.normpath(container_path).lstrip('/')
+        file_info = tarfile.TarInfo(relative_path)
+        file_info.size = _entry_size(content)
+        file_info.mode = 0o644
+        file_info.mtime = mtime
+        yield file_info.tobuf(format=tarfile.PAX_FORMAT)
+
+        if isinstance(content, (bytes, bytearray)):
+            for offset in range(0, len(content), TAR_CHUNK_SIZE):
+                yield bytes(content[offset:offset + TAR_CHUNK_SIZE])
+        else:
+            remaining = file_info.size
+            while remaining > 0:
+                chunk = content.read(min(TAR_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"Upload source for {container_path} ended {remaining} bytes early")
+                remaining -= len(chunk)
+                yield chunk
+
+        padding = -file_info.size % tarfile.BLOCKSIZE
+        if padding:
+            yield tarfile.NUL * padding
+
+    # End-of-archive marker: two zero blocks
+    yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+
+def put_files_in_container(container_id: str, files: List[UploadEntry]) -> bool:
+    """
+    Writes several files into the container with a single streamed put_archive call.
+    Parent directories are created as needed. Returns True on success.
     """
     current_client = _get_or_initialize_client()
     if not current_client:
-        logger.error("Docker client not available. Cannot list files.")
-        return []
-
-    logger.info(f"Listing files in {container_id}:{path}")
-    # Using ls -l --time-style=long-iso to get details. -A to include dotfiles except . and ..
-    # The output parsing will be basic.
-    # Example line: drwxr-xr-x 2 root root 4096 2023-04-15 10:00 mydir
-    # Example line: -rw-r--r-- 1 root root 1024 2023-04-15 10:01 file.txt
-    # command = f"ls -lA --full-time --time-style=long-iso {path}" # --full-time is GNU specific
-    command = f"ls -lA --time-style=long-iso {path}"
+        logger.error("Docker client not available. Cannot upload files.")
+        return False
+    if not files:
+        return True
 
+    logger.info(f"Uploading {len(files)} file(s) to container {container_id}")
     try:
         container = current_client.containers.get(container_id)
-        exec_result = container.exec_run(cmd=command, workdir="/", demux=True)
-        logger.debug(f"DEBUG: exec_run result in list_files_in_container: {exec_result}") # Or use print if logger is not configured for debug in this context
+        if container.put_archive(path='/', data=_tar_stream(files, time.time())):
+            return True
+        logger.error(f"Failed to upload files to {container_id} (put_archive returned False)")
+        return False
+    except docker.errors.NotFound:
+        logger.error(f"Container {container_id} not found for file upload.")
+        return False
+    except Exception as e:
+        logger.error(f"Error uploading files to container {container_id}: {e}", exc_info=True)
+        return False
 
-        exit_code = exec_result[0]
-        output_data = exec_result[1]
-        stdout_bytes, stderr_bytes = b"", b"" # Initialize by default
+# One NUL-terminated record per entry: type letter, size, mtime (epoch), octal mode and relative path,
+# separated by '/'. The path goes last so the slashes it contains do not shift the other fields.
+FIND_PRINTF_FORMAT = '%y/%s/%T@/%m/%P\\0'
+FIND_TYPES = {'d': 'directory', 'f': 'file', 'l': 'symlink'}
+# Drops records whose path (the text after the fourth '/') is not greater than $LIST_AFTER
+LIST_AFTER_FILTER = (
+    'BEGIN { RS = ORS = "\\0"; after = ENVIRON["LIST_AFTER"] } '
+    '{ path = $0; for (i = 0; i < 4; i++) path = substr(path, index(path, "/") + 1); if (path > after) print }'
+)
 
-        if isinstance(output_data, tuple) and len(output_data) == 2:
-            stdout_bytes = output_data[0] if output_data[0] is not None else b""
-            stderr_bytes = output_data[1] if output_data[1] is not None else b""
-        elif isinstance(output_data, bytes): # Should be less common with demux=True
-            # If demux=True returns raw bytes, it's usually stdout for 'ls', but could be stderr on error.
-            # Given 'ls' primarily outputs to stdout, we'll assign it there and log.
-            stdout_bytes = output_data
-            logger.warning(f"exec_run in list_files_in_container (demux=True) returned raw bytes, expected tuple. Assuming it's stdout.")
-        elif output_data is not None: # Handles cases where output_data is not tuple or bytes but is not None
-            logger.warning(f"WARNING: Unexpected output_data type from exec_run in list_files_in_container: {type(output_data)}. Attempting to capture as stderr.")
-            try:
-                stderr_bytes = str(output_data).encode('utf-8', errors='ignore')
-                # stdout_bytes remains b"" in this specific fallback case
-            except Exception as e_conv_fallback:
-                logger.error(f"Error converting unexpected output_data to string for stderr in list_files_in_container: {e_conv_fallback}")
-                # stderr_bytes remains b"" if conversion fails
-        # If output_data is None, stdout_bytes and stderr_bytes correctly remain b"" from initialization.
+def build_list_command(path: str, max_depth: Optional[int] = 1, prune_dirs: Optional[Iterable[str]] = None,
+                       skip_files: Optional[Iterable[str]] = None, after: Optional[str] = None,
+                       limit: Optional[int] = None) -> List[str]:
+    """
+    Builds a single `find` invocation that prints one structured record per entry under path.
+    Directories named in prune_dirs are listed but not descended into; non-directories matching
+    a skip_files pattern (case-insensitive) are not listed. With after or limit the records are
+    sorted by relative path inside the container, and only the first limit paths greater than
+    after are printed.
+    """
+    command = ['find', path, '-mindepth', '1']
+    if max_depth is not None:
+        command += ['-maxdepth', str(max_depth)]
+    prune_dirs = sorted(prune_dirs or [])
+    if prune_dirs:
+        name_tests = []
+        for name in prune_dirs:
+            name_tests += (['-o'] if name_tests else []) + ['-name', name]
+        command += ['(', '-type', 'd', '(', *name_tests, ')', '-printf', FIND_PRINTF_FORMAT, '-prune', ')', '-o']
+    skip_files = sorted(skip_files or [])
+    if skip_files:
+        name_tests = []
+        for pattern in skip_files:
+            name_tests += (['-o'] if name_tests else []) + ['-iname', pattern]
+        command += ['(', '!', '-type', 'd', '(', *name_tests, ')', ')', '-o']
+    command += ['-printf', FIND_PRINTF_FORMAT]
+    if after is None and limit is None:
+        return command
 
-        if exit_code != 0:
-            stderr_str = stderr_bytes.decode('utf-8', errors='replace') if stderr_bytes else ""
-            logger.error(f"Error listing files in {container_id}:{path}. Exit code: {exit_code}. Stderr: {stderr_str}")
-            return []
+    pipeline = [shlex.join(command), 'LC_ALL=C sort -z -t/ -k5']
+    if after is not None:
+        pipeline.append(f"LIST_AFTER={shlex.quote(after)} LC_ALL=C awk {shlex.quote(LIST_AFTER_FILTER)}")
+    if limit is not None:
+        pipeline.append(f"head -z -n {int(limit)}")
+    return ['sh', '-c', ' | '.join(pipeline)]
 
-        stdout_str = stdout_bytes.decode('utf-8', errors='replace') if stdout_bytes else ""
-        files = []
-        lines = stdout_str.strip().split('\n')
+def parse_list_output(output: str, path: str) -> List[Dict[str, Any]]:
+    """Parses build_list_command output into records sorted by path."""
+    base = path.rstrip('/') or ''
+    entries = []
+    for record in output.split('\0'):
+        fields = record.split('/', 4)
+        if len(fields) < 5 or not fields[4]:
+            continue
+        type_letter, size, mtime, mode, relative_path = fields
+        try:
+            entries.append({
+                "name": posixpath.basename(relative_path),
+                "path": f"{base}/{relative_path}",
+                "type": FIND_TYPES.get(type_letter, "other"),
+                "size": int(size),
+                "mtime": float(mtime),
+                "mode": int(mode, 8),
+                "depth": relative_path.count('/') + 1,
+            })
+        except ValueError:
+            logger.warning(f"Could not parse listing record for '{relative_path}' in {path}")
+    entries.sort(key=lambda entry: entry["path"])
+    return entries
 
-        if lines and "total" in lines[0]: # First line of ls -l is often "total X"
-            lines = lines[1:]
+def list_files_in_container(container_id: str, path: str, max_depth: Optional[int] = 1,
+                            prune_dirs: Optional[Iterable[str]] = None, skip_files: Optional[Iterable[str]] = None,
+                            after: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Lists entries under path in the local Docker sandbox with a single `find` pass.
+    Returns dicts with 'name', 'path', 'type' ('file'/'directory'/'symlink'/'other'),
+    'size', 'mtime', 'mode' and 'depth', sorted by path. max_depth=None recurses fully.
+    after (a full path) and limit page through the listing inside the container.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot list files.")
+        return []
 
-        for line in lines:
-            if not line.strip():
-                continue
-            parts = line.split(None, 8) # Split by whitespace, max 8 splits for ls -l format
-            if len(parts) < 9:
-                logger.warning(f"Could not parse ls line: '{line}' in {container_id}:{path}")
-                continue
+    relative_after = None
+    if after is not None:
+        prefix = path.rstrip('/') + '/'
+        if after.startswith(prefix):
+            relative_after = after[len(prefix):]
+        elif after > prefix:
+            return []  # The cursor is past every entry under path
 
-            permissions = parts[0]
-            size_bytes = int(parts[4])
-            name = parts[8]
-
-            file_type = "unknown"
-            if permissions.startswith('d'):
-                file_type = "directory"
-            elif permissions.startswith('-'):
-                file_type = "file"
-            # Other types like 'l' for symlink, 'c' for char dev, 'b' for block dev etc.
-
-            files.append({
-                "name": name,
-                "type": file_type,
-                "size": size_bytes,
-                # "permissions": permissions,
-                # "last_modified": f"{parts[5]} {parts[6]} {parts[7]}" # Date time parts
-            })
-        return files
+    logger.info(f"Listing files in {container_id}:{path} (max_depth={max_depth}, after={after}, limit={limit})")
+    try:
+        container = current_client.containers.get(container_id)
+        command = build_list_command(path, max_depth=max_depth, prune_dirs=prune_dirs, skip_files=skip_files,
+                                     after=relative_after, limit=limit)
+        exit_code, output_data = container.exec_run(cmd=command, workdir="/", demux=True)
+        stdout_bytes, stderr_bytes = output_data if isinstance(output_data, tuple) else (output_data, b"")
+        stdout_str = (stdout_bytes or b"").decode('utf-8', errors='replace')
+
+        if exit_code != 0:
+            stderr_str = (stderr_bytes or b"").decode('utf-8', errors='replace')
+            logger.error(f"Error listing files in {container_id}:{path}. Exit code: {exit_code}. Stderr: {stderr_str}")
+            if not stdout_str:
+                return []
+            # find exits non-zero on unreadable subdirectories but still lists everything else
+
+        return parse_list_output(stdout_str, path)
 
     except docker.errors.NotFound:
         logger.error(f"Container {container_id} not found for file listing.")
         return []
     except Exception as e:
-        logger.error(f"Error listing files in {container_id}:{path}: {e}", exc_info=True)
+        logger.error(f"Error listing files in container {container_id}:{path}: {e}", exc_info=True)
         return []
 
+def stat_file_in_container(container_id: str, path: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns {'path', 'type', 'size', 'mtime'} for a path in the container (symlinks followed),
+    or None if it does not exist or the container is unavailable.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot stat file.")
+        return None
+    try:
+        container = current_client.containers.get(container_id)
+        exit_code, output_data = container.exec_run(
+            cmd=['find', '-L', path, '-maxdepth', '0', '-printf', '%y\\0%s\\0%T@'], workdir="/", demux=True
+        )
+        stdout_bytes = output_data[0] if isinstance(output_data, tuple) else output_data
+        if exit_code != 0 or not stdout_bytes:
+            return None
+        type_letter, size, mtime = stdout_bytes.decode('utf-8', errors='replace').split('\0')[:3]
+        return {"path": path, "type": FIND_TYPES.get(type_letter, "other"), "size": int(size), "mtime": float(mtime)}
+    except docker.errors.NotFound:
+        logger.error(f"Container {container_id} not found for stat of {path}.")
+        return None
+    except Exception as e:
+        logger.error(f"Error getting file info for {container_id}:{path}: {e}", exc_info=True)
+        return None
+
+def _file_range_command(path: str, offset: int = 0, length: Optional[int] = None) -> List[str]:
+    command = ['dd', f'if={path}', f'bs={TAR_CHUNK_SIZE}', 'status=none', 'iflag=skip_bytes,count_bytes', f'skip={offset}']
+    if length is not None:
+        command.append(f'count={length}')
+    return command
+
+def read_file_from_container(container_id: str, path: str) -> Optional[bytes]:
+    """Reads a whole file from the container. Returns None if it cannot be read."""
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot read file.")
+        return None
+    try:
+        container = current_client.containers.get(container_id)
+        exit_code, output_data = container.exec_run(cmd=['cat', path], workdir="/", demux=True)
+        stdout_bytes, stderr_bytes = output_data if isinstance(output_data, tuple) else (output_data, b"")
+        if exit_code != 0:
+            logger.error(f"Error reading {container_id}:{path}: {(stderr_bytes or b'').decode('utf-8', errors='replace')}")
+            return None
+        return stdout_bytes or b""
+    except docker.errors.NotFound:
+        logger.error(f"Container {container_id} not found for reading {path}.")
+        return None
+    except Exception as e:
+        logger.error(f"Error reading file {container_id}:{path}: {e}", exc_info=True)
+        return None
+
+def open_file_stream_in_container(container_id: str, path: str, offset: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Returns an iterator over the bytes [offset, offset + length) of a file in the container,
+    read in chunks as the consumer iterates. Raises if the container is unavailable.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        raise RuntimeError("Docker client not available. Cannot read file.")
+    container = current_client.containers.get(container_id)
+    # Take the raw exec socket (rather than exec_run's stream) so the connection can be closed early
+    exec_id = current_client.api.exec_create(container.id, _file_range_command(path, offset, length), workdir="/")['Id']
+    return _iter_exec_stdout(current_client.api.exec_start(exec_id, socket=True))
+
+def _iter_exec_stdout(exec_socket) -> Iterator[bytes]:
+    """Yields the stdout chunks of a non-tty exec socket and closes it when exhausted or closed early."""
+    try:
+        for stream_id, data in frames_iter(exec_socket, tty=False):
+            if stream_id == STDOUT and data:
+                yield data
+    finally:
+        exec_socket.close()
+
+EXEC_AGENT_PATH = "/app/exec_agent.py"
+
+def scan_workspace_manifest_in_container(container_id: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Refreshes the in-container hash manifest through a one-off exec of the exec agent script
+    (for containers whose agent is not reachable). params are those of the agent's manifest op.
+    Returns the agent's diff result, or None on failure.
+    """
+    current_client = _get_or_initialize_client()
+    if not current_client:
+        logger.error("Docker client not available. Cannot scan workspace manifest.")
+        return None
+    try:
+        container = current_client.containers.get(container_id)
+        exit_code, output_data = container.exec_run(
+            cmd=['python', EXEC_AGENT_PATH, 'manifest', json.dumps(params)], workdir="/", demux=True
+        )
+        stdout_bytes, stderr_bytes = output_data if isinstance(output_data, tuple) else (output_data, None)
+        if exit_code != 0 or not stdout_bytes:
+            logger.error(f"Manifest scan failed in {container_id} (exit code {exit_code}): {(stderr_bytes or b'').decode('utf-8', errors='replace')}")
+            return None
+        return json.loads(stdout_bytes)
+    except docker.errors.NotFound:
+        logger.error(f"Container {container_id} not found for manifest scan.")
+        return None
+    except Exception as e:
+        logger.error(f"Error scanning workspace manifest in {container_id}: {e}", exc_info=True)
+        return None
+
 def get_container_logs(container_id: str, tail: str = "all") -> Optional[str]:
     """Fetches logs from a container."""
     current_client = _get_or_initialize_client()
@@ -416,3 +1003,242 @@ def get_container_logs(container_id: str, tail: str = "all") -> Optional[str]:
     except Exception as e:
         logger.error(f"Error fetching logs for container {container_id}: {e}", exc_info=True)
         return f"Error fetching logs: {str(e)}"
+
+
+# --- Async (non-blocking) API ---
+
+async def _run_docker_io(func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Runs a blocking docker-py helper on the bounded Docker I/O pool and awaits it.
+    Raises asyncio.TimeoutError if the call does not finish within `timeout` seconds
+    (defaults to DOCKER_IO_TIMEOUT_SECONDS). The worker thread itself cannot be interrupted,
+    so a timed-out call keeps its worker until docker-py returns.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_docker_io_executor, functools.partial(func, *args, **kwargs))
+    return await asyncio.wait_for(future, timeout=timeout or DOCKER_IO_TIMEOUT_SECONDS)
+
+async def start_sandbox_container_async(image_name: str, env_vars: Dict[str, str], project_id: Optional[str] = None,
+                                        vnc_port_host: Optional[int] = None, web_port_host: Optional[int] = None,
+                                        labels: Optional[Dict[str, str]] = None,
+                                        resource_profile: Optional[str] = None,
+                                        placement_wait_seconds: float = 0,
+                                        container_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of start_sandbox_container. With placement_wait_seconds, a sandbox that does
+    not fit the host yet waits (in FIFO order with other waiters) for headroom for up to that
+    long before SandboxPlacementError is raised.
+    """
+    if resource_profile and placement_wait_seconds > 0:
+        refusal = await wait_for_placement_async(resource_profile, placement_wait_seconds)
+        if refusal:
+            raise SandboxPlacementError(refusal)
+    try:
+        return await _run_docker_io(start_sandbox_container, image_name, env_vars, project_id=project_id,
+                                    vnc_port_host=vnc_port_host, web_port_host=web_port_host, labels=labels,
+                                    resource_profile=resource_profile, container_name=container_name)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out starting local Docker sandbox for project_id: {project_id}")
+        return None
+
+async def get_host_headroom_async() -> Optional[Dict[str, Any]]:
+    """Async variant of get_host_headroom."""
+    try:
+        return await _run_docker_io(get_host_headroom)
+    except asyncio.TimeoutError:
+        logger.error("Timed out computing host headroom")
+        return None
+
+async def wait_for_placement_async(resource_profile: Optional[str], timeout_seconds: float) -> Optional[str]:
+    """
+    Queue until a sandbox with this profile fits on the host. Waiters are served in arrival order.
+    Returns None once it fits, or the reason it still does not after timeout_seconds.
+    """
+    if not resource_profile:
+        return None  # Unconstrained sandboxes are not placed
+    profile = get_resource_profile(resource_profile)
+    if not profile:
+        return f"unknown resource profile: {resource_profile}"
+    placement_queue = _placement_queues.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
+    deadline = time.monotonic() + timeout_seconds
+    try:
+        await asyncio.wait_for(placement_queue.acquire(), timeout=timeout_seconds)
+    except asyncio.TimeoutError:
+        return f"no host headroom for profile '{profile.name}' after waiting {timeout_seconds:g}s"
+    try:
+        while True:
+            try:
+                refusal = await _run_docker_io(check_placement, profile)
+            except asyncio.TimeoutError:
+                refusal = "timed out checking host headroom"
+            if refusal is None:
+                return None
+            if time.monotonic() + PLACEMENT_POLL_SECONDS > deadline:
+                return refusal
+            logger.info(f"Waiting for host headroom: {refusal}")
+            await asyncio.sleep(PLACEMENT_POLL_SECONDS)
+    finally:
+        placement_queue.release()
+
+async def stop_sandbox_container_async(container_id: str, timeout_seconds: int = 10) -> bool:
+    """Async variant of stop_sandbox_container."""
+    try:
+        return await _run_docker_io(stop_sandbox_container, container_id, timeout_seconds=timeout_seconds)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out stopping container {container_id}")
+        return False
+
+async def restart_sandbox_container_async(container_id: str, placement_wait_seconds: float = 0) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of restart_sandbox_container. With placement_wait_seconds, a container that
+    does not fit the host yet waits for headroom for up to that long before SandboxPlacementError
+    is raised.
+    """
+    deadline = time.monotonic() + placement_wait_seconds
+    while True:
+        try:
+            return await _run_docker_io(restart_sandbox_container, container_id)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out starting existing container {container_id}")
+            return None
+        except SandboxPlacementError as e:
+            if time.monotonic() + PLACEMENT_POLL_SECONDS > deadline:
+                raise
+            logger.info(f"Waiting for host headroom to start container {container_id}: {e}")
+            await asyncio.sleep(PLACEMENT_POLL_SECONDS)
+
+async def stop_and_remove_sandbox_container_async(container_id: str, raise_not_found: bool = False) -> bool:
+    """Async variant of stop_and_remove_sandbox_container."""
+    try:
+        return await _run_docker_io(stop_and_remove_sandbox_container, container_id, raise_not_found=raise_not_found)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out stopping/removing container {container_id}")
+        return False
+
+async def rename_sandbox_container_async(container_id: str, name: str) -> bool:
+    """Async variant of rename_sandbox_container."""
+    try:
+        return await _run_docker_io(rename_sandbox_container, container_id, name)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out renaming container {container_id}")
+        return False
+
+async def remove_unclaimed_containers_async(label: str, name_prefix: str, keep_ids: Iterable[str]) -> List[str]:
+    """Async variant of remove_unclaimed_containers."""
+    try:
+        return await _run_docker_io(remove_unclaimed_containers, label, name_prefix, list(keep_ids))
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out removing unclaimed containers labelled {label}")
+        return []
+
+async def get_sandbox_container_status_async(container_id: str) -> Optional[str]:
+    """Async variant of get_sandbox_container_status."""
+    try:
+        return await _run_docker_io(get_sandbox_container_status, container_id)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out getting status for container {container_id}")
+        return "error"
+
+async def get_preview_connections_async(container_id: str, ports: Iterable[int] = PREVIEW_PORTS) -> Optional[int]:
+    """Async variant of get_preview_connections."""
+    try:
+        return await _run_docker_io(get_preview_connections, container_id, ports)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out inspecting preview connections of {container_id}")
+        return None
+
+async def get_sandbox_container_ports_async(container_id: str) -> Optional[Dict[str, Optional[str]]]:
+    """Async variant of get_sandbox_container_ports."""
+    try:
+        return await _run_docker_io(get_sandbox_container_ports, container_id)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out getting ports of container {container_id}")
+        return None
+
+async def execute_command_in_container_async(container_id: str, command: str, workdir: str = "/workspace", timeout_seconds: int = 60) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+    """
+    Async variant of execute_command_in_container.
+    Unlike the sync version, timeout_seconds is enforced: the caller gets an error result once it elapses.
+    """
+    try:
+        return await _run_docker_io(execute_command_in_container, container_id, command,
+                                    workdir=workdir, timeout_seconds=timeout_seconds, timeout=timeout_seconds)
+    except asyncio.TimeoutError:
+        logger.error(f"Command in container {container_id} timed out after {timeout_seconds}s: {command}")
+        return None, f"Command timed out after {timeout_seconds} seconds", -1
+
+async def upload_files_to_container_async(container_id: str, host_path: str, container_path: str) -> bool:
+    """Async variant of upload_files_to_container."""
+    try:
+        return await _run_docker_io(upload_files_to_container, container_id, host_path, container_path)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out uploading {host_path} to {container_id}:{container_path}")
+        return False
+
+async def put_files_in_container_async(container_id: str, files: List[UploadEntry]) -> bool:
+    """Async variant of put_files_in_container."""
+    try:
+        return await _run_docker_io(put_files_in_container, container_id, files)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out uploading {len(files)} file(s) to {container_id}")
+        return False
+
+async def stat_file_in_container_async(container_id: str, path: str) -> Optional[Dict[str, Any]]:
+    """Async variant of stat_file_in_container."""
+    try:
+        return await _run_docker_io(stat_file_in_container, container_id, path)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out getting file info for {container_id}:{path}")
+        return None
+
+async def read_file_from_container_async(container_id: str, path: str) -> Optional[bytes]:
+    """Async variant of read_file_from_container."""
+    try:
+        return await _run_docker_io(read_file_from_container, container_id, path)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out reading {container_id}:{path}")
+        return None
+
+async def stream_file_from_container_async(container_id: str, path: str, offset: int = 0,
+                                           length: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Async iterator over a byte range of a container file. Each chunk is pulled from Docker
+    on the I/O pool only when the consumer asks for it, so memory use is one chunk at a time.
+    """
+    chunks = await _run_docker_io(open_file_stream_in_container, container_id, path, offset, length)
+    try:
+        while True:
+            chunk = await _run_docker_io(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # Also runs when the consumer stops early (e.g. an aborted download), so the exec
+        # connection is not left open
+        try:
+            chunks.close()
+        except ValueError:
+            # A read is still in flight on the I/O pool (the consumer was cancelled); the
+            # generator closes the socket when it is garbage-collected after that read returns
+            pass
+
+async def scan_workspace_manifest_in_container_async(container_id: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Async variant of scan_workspace_manifest_in_container."""
+    try:
+        return await _run_docker_io(scan_workspace_manifest_in_container, container_id, params)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out scanning workspace manifest in {container_id}")
+        return None
+
+async def list_files_in_container_async(container_id: str, path: str, max_depth: Optional[int] = 1,
+                                        prune_dirs: Optional[Iterable[str]] = None,
+                                        skip_files: Optional[Iterable[str]] = None, after: Optional[str] = None,
+                                        limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Async variant of list_files_in_container."""
+    try:
+        return await _run_docker_io(list_files_in_container, container_id, path, max_depth=max_depth,
+                                    prune_dirs=prune_dirs, skip_files=skip_files, after=after, limit=limit)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out listing files in {container_id}:{path}")
+        return []
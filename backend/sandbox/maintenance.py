@@ -0,0 +1,283 @@
+"""
+Bulk sandbox maintenance engine.
+
+The maintenance scripts in utils/scripts (archive, delete, stop) all sweep the
+projects table and apply one operation to each project's sandbox. This module
+does the sweeping for them:
+
+- projects are read with keyset pagination on project_id, one page at a time,
+  so memory stays flat and pages stay cheap however large the table is;
+- operations on a page run concurrently, bounded by a concurrency limit and a
+  per-backend (Daytona, local Docker) rate limit;
+- progress is checkpointed to a JSON file after every completed page, so an
+  interrupted sweep resumes after the last finished page;
+- throughput is reported periodically and in the final stats.
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.logger import logger
+from . import local_docker_handler
+from .sandbox import daytona
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE_LIMITS = {'daytona': 5.0, 'local_docker': 20.0}  # Operations per second, per backend
+PROJECT_COLUMNS = ('project_id', 'name', 'created_at', 'account_id', 'sandbox')
+REPORT_INTERVAL_SECONDS = 10
+
+Project = Dict[str, Any]
+SandboxOperation = Callable[[Project], Awaitable[bool]]
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class MaintenanceStats:
+    scanned: int = 0
+    selected: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+    failed_project_ids: List[str] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        """Operations completed per second."""
+        return (self.succeeded + self.failed) / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"scanned {self.scanned} projects, {self.selected} selected: {self.succeeded} succeeded, "
+                f"{self.failed} failed in {self.elapsed_seconds:.1f}s ({self.throughput:.2f} ops/s)")
+
+
+class Checkpoint:
+    """Progress of a sweep in a JSON file: the last fully processed project_id and the stats so far."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, last_project_id: Optional[str], stats: MaintenanceStats) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"last_project_id": last_project_id, "stats": asdict(stats)}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def sandbox_backend(project: Project) -> str:
+    return (project.get('sandbox') or {}).get('type') or 'daytona'
+
+
+async def fetch_project_page(client, after: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                             apply_filters: Optional[Callable[[Any], Any]] = None,
+                             columns=PROJECT_COLUMNS) -> List[Project]:
+    """One page of projects with a sandbox, ordered by project_id and starting after `after`."""
+    query = client.table('projects').select(*columns).not_.is_('sandbox', 'null')
+    if apply_filters:
+        query = apply_filters(query)
+    if after is not None:
+        query = query.gt('project_id', after)
+    result = await query.order('project_id').limit(page_size).execute()
+    return result.data or []
+
+
+async def run_maintenance(client, operation: SandboxOperation, operation_name: str, *,
+                          apply_filters: Optional[Callable[[Any], Any]] = None,
+                          select: Optional[Callable[[Project], bool]] = None,
+                          concurrency: int = DEFAULT_CONCURRENCY,
+                          rate_limits: Optional[Dict[str, float]] = None,
+                          checkpoint: Optional[Checkpoint] = None,
+                          dry_run: bool = False,
+                          page_size: int = DEFAULT_PAGE_SIZE,
+                          on_progress: Optional[Callable[[MaintenanceStats], None]] = None) -> MaintenanceStats:
+    """
+    Apply `operation` to the sandbox of every project matching `apply_filters` (server side,
+    on the projects query) and `select` (client side). Returns the sweep's stats.
+    Progress is logged every REPORT_INTERVAL_SECONDS and also passed to `on_progress`.
+
+    With a checkpoint, a sweep that was interrupted continues after the last completed page.
+    Dry runs neither read nor write the checkpoint.
+    """
+    if dry_run:
+        checkpoint = None
+    stats = MaintenanceStats()
+    after = None
+    if checkpoint and (saved := checkpoint.load()):
+        after = saved.get("last_project_id")
+        stats = MaintenanceStats(**saved.get("stats", {}))
+        logger.info(f"Resuming {operation_name} sweep after project {after} ({stats.summary()})")
+
+    limiters = {backend: RateLimiter(rate) for backend, rate in {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}.items()}
+    semaphore = asyncio.Semaphore(concurrency)
+    started_at = time.monotonic() - stats.elapsed_seconds
+    last_report = time.monotonic()
+
+    async def process(project: Project) -> None:
+        async with semaphore:
+            if dry_run:
+                logger.info(f"DRY RUN: Would {operation_name} sandbox {project['sandbox'].get('id')} of project {project['project_id']}")
+                success = True
+            else:
+                limiter = limiters.get(sandbox_backend(project))
+                if limiter:
+                    await limiter.acquire()
+                try:
+                    success = await operation(project)
+                except Exception as e:
+                    logger.error(f"Failed to {operation_name} sandbox of project {project['project_id']}: {e}")
+                    success = False
+        if success:
+            stats.succeeded += 1
+        else:
+            stats.failed += 1
+            stats.failed_project_ids.append(project['project_id'])
+
+    page = await fetch_project_page(client, after, page_size, apply_filters)
+    while page:
+        # Fetch the next page while this one is being processed
+        next_page = None
+        if len(page) == page_size:
+            next_page = asyncio.create_task(fetch_project_page(client, page[-1]['project_id'], page_size, apply_filters))
+
+        selected = [project for project in page
+                    if (project.get('sandbox') or {}).get('id') and (select is None or select(project))]
+        stats.scanned += len(page)
+        stats.selected += len(selected)
+        await asyncio.gather(*(process(project) for project in selected))
+
+        after = page[-1]['project_id']
+        stats.elapsed_seconds = time.monotonic() - started_at
+        if checkpoint:
+            checkpoint.save(after, stats)
+        if time.monotonic() - last_report >= REPORT_INTERVAL_SECONDS:
+            last_report = time.monotonic()
+            logger.info(f"{operation_name} sweep progress: {stats.summary()}")
+            if on_progress:
+                on_progress(stats)
+        page = await next_page if next_page else []
+
+    stats.elapsed_seconds = time.monotonic() - started_at
+    if checkpoint:
+        checkpoint.clear()
+    return stats
+
+
+# --- Operations ---
+
+async def archive_project_sandbox(project: Project) -> bool:
+    """Archive a stopped Daytona sandbox. Sandboxes in other states, and local Docker sandboxes, are left alone."""
+    sandbox_id = project['sandbox']['id']
+    if sandbox_backend(project) != 'daytona':
+        logger.info(f"Skipping archive of {sandbox_backend(project)} sandbox {sandbox_id}: only Daytona sandboxes are archived")
+        return True
+
+    def archive() -> str:
+        sandbox = daytona.get_current_sandbox(sandbox_id)
+        state = sandbox.info().state
+        if state == "stopped":
+            sandbox.archive()
+        return state
+
+    state = await asyncio.to_thread(archive)
+    if state == "stopped":
+        logger.info(f"Archived sandbox {sandbox_id}")
+    else:
+        logger.info(f"Skipping sandbox {sandbox_id} as it is not in stopped state (current: {state})")
+    return True
+
+
+async def stop_project_sandbox(project: Project) -> bool:
+    sandbox_id = project['sandbox']['id']
+    if sandbox_backend(project) == 'local_docker':
+        status = await local_docker_handler.get_sandbox_container_status_async(sandbox_id)
+        if status != 'running':
+            return status in ('exited', 'created', 'not_found')
+        return await local_docker_handler.stop_sandbox_container_async(sandbox_id)
+
+    await asyncio.to_thread(lambda: daytona.stop(daytona.get_current_sandbox(sandbox_id)))
+    logger.info(f"Stopped sandbox {sandbox_id}")
+    return True
+
+
+async def delete_project_sandbox(project: Project) -> bool:
+    sandbox_id = project['sandbox']['id']
+    if sandbox_backend(project) == 'local_docker':
+        if await local_docker_handler.get_sandbox_container_status_async(sandbox_id) == 'not_found':
+            return True
+        return await local_docker_handler.stop_and_remove_sandbox_container_async(sandbox_id, raise_not_found=False)
+
+    await asyncio.to_thread(lambda: daytona.delete(daytona.get_current_sandbox(sandbox_id)))
+    logger.info(f"Deleted sandbox {sandbox_id}")
+    return True
+
+
+OPERATIONS: Dict[str, SandboxOperation] = {
+    'archive': archive_project_sandbox,
+    'stop': stop_project_sandbox,
+    'delete': delete_project_sandbox,
+}
+
+
+# --- Command line ---
+
+def add_sweep_arguments(parser) -> None:
+    """Add the engine's tuning options to a maintenance script's argument parser."""
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Sandbox operations in flight at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help='Max sandbox operations per second for each backend (default: ' +
+                             ', '.join(f'{backend} {rate:g}' for backend, rate in DEFAULT_RATE_LIMITS.items()) + ')')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f'Projects read per page (default: {DEFAULT_PAGE_SIZE})')
+    parser.add_argument('--checkpoint', default=None,
+                        help='File to record progress in; if it exists, the interrupted sweep is resumed')
+
+
+def sweep_options(args) -> Dict[str, Any]:
+    """run_maintenance keyword arguments from the options added by add_sweep_arguments."""
+    return {
+        "concurrency": args.concurrency,
+        "rate_limits": {backend: args.rate_limit for backend in DEFAULT_RATE_LIMITS} if args.rate_limit else None,
+        "page_size": args.page_size,
+        "checkpoint": Checkpoint(args.checkpoint) if args.checkpoint else None,
+    }
@@ -5,9 +5,12 @@ from dotenv import load_dotenv
 from utils.logger import logger # Direct import
 from utils.config import config, Configuration, EnvMode # Direct import
 from . import local_docker_handler
+from .exec_channel import ExecChannelClient, ExecChannelError, get_exec_channel
+import asyncio
 import os
+import time
 from services.supabase import DBConnection # Direct import
-from typing import Optional, Dict, List, Any # Added for wrapper classes
+from typing import Optional, Dict, List, Any, Iterable, AsyncIterator, Callable # Added for wrapper classes
 
 # Define this at the module level or within the class if preferred,
 # but accessible for type hinting if needed elsewhere.
@@ -26,46 +29,112 @@ class LocalDockerSandboxWrapper:
         self.container_info = container_info
         self.id = container_info.get('container_id') # Critical: provides sandbox.id
         self.name = container_info.get('container_name')
-        self._vnc_password = vnc_password # Store for potential future use
+        self._vnc_password = vnc_password # Also the exec agent token (EXEC_AGENT_TOKEN)
+        self.exec_port = container_info.get('host_exec_port')
+        self.browser_api_port = container_info.get('host_browser_api_port')
 
-        self.fs = LocalDockerFileSystemWrapper(self.id)
+        self.fs = LocalDockerFileSystemWrapper(self.id, exec_channel_factory=self.get_exec_channel)
         self.process = LocalDockerProcessWrapper(self.id)
 
+    def get_exec_channel(self) -> Optional[ExecChannelClient]:
+        '''Returns the persistent exec agent client, or None if this container has no exec port mapped.'''
+        if not self.exec_port:
+            return None
+        return get_exec_channel("127.0.0.1", int(self.exec_port), self._vnc_password)
+
     def get_preview_link(self, port_in_container: int) -> Dict[str, Optional[str]]:
         url = None
         if port_in_container == 6080 and self.container_info.get('host_vnc_port'):
             url = f"http://localhost:{self.container_info['host_vnc_port']}"
         elif port_in_container == 8080 and self.container_info.get('host_web_port'):
             url = f"http://localhost:{self.container_info['host_web_port']}"
+        elif port_in_container == 8003 and self.browser_api_port:
+            url = f"http://127.0.0.1:{self.browser_api_port}"
         else:
             logger.warning(f"Preview link requested for unmapped or unknown port {port_in_container} in local Docker sandbox {self.id}")
         return {"url": url, "token": None}
 
 class LocalDockerFileSystemWrapper:
-    def __init__(self, container_id: str):
+    def __init__(self, container_id: str, exec_channel_factory: Optional[Callable[[], Optional[ExecChannelClient]]] = None):
         self.container_id = container_id
+        self._exec_channel_factory = exec_channel_factory
 
     async def upload_file(self, container_path: str, content: bytes):
         logger.info(f"[LocalDockerFS] upload_file called for {self.container_id}:{container_path}. Content length: {len(content)}")
-        import tempfile
-        host_temp_path = None # Initialize to prevent NameError in finally if NamedTemporaryFile fails
-        try:
-            with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                tmp.write(content)
-                host_temp_path = tmp.name
-
-            success = local_docker_handler.upload_files_to_container(self.container_id, host_temp_path, container_path)
-            if not success:
-                logger.error(f"Failed to upload content to {self.container_id}:{container_path}")
-            return success
-        finally:
-            if host_temp_path and os.path.exists(host_temp_path):
-                os.remove(host_temp_path)
+        return await self.upload_files([(container_path, content)])
+
+    async def upload_files(self, files: List[local_docker_handler.UploadEntry]) -> bool:
+        '''Uploads several files in one streamed tar archive. Entries are (container_path, bytes or binary file object).'''
+        logger.info(f"[LocalDockerFS] upload_files called for {self.container_id} with {len(files)} file(s)")
+        success = await local_docker_handler.put_files_in_container_async(self.container_id, files)
+        if not success:
+            logger.error(f"Failed to upload {len(files)} file(s) to {self.container_id}")
+        return success
 
     def list_files(self, path: str) -> List[Dict[str, Any]]:
         logger.info(f"[LocalDockerFS] list_files called for {self.container_id}:{path}")
         return local_docker_handler.list_files_in_container(self.container_id, path)
 
+    async def list_files_async(self, path: str, max_depth: Optional[int] = 1, prune_dirs: Optional[Iterable[str]] = None,
+                               skip_files: Optional[Iterable[str]] = None, after: Optional[str] = None,
+                               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        '''Non-blocking variant of list_files. Lists up to max_depth levels (None for unlimited), not descending into prune_dirs.
+        skip_files name patterns are left out; after/limit return one page of paths greater than after.'''
+        logger.info(f"[LocalDockerFS] list_files_async called for {self.container_id}:{path}")
+        return await local_docker_handler.list_files_in_container_async(
+            self.container_id, path, max_depth=max_depth, prune_dirs=prune_dirs,
+            skip_files=skip_files, after=after, limit=limit
+        )
+
+    def download_file(self, path: str) -> bytes:
+        logger.info(f"[LocalDockerFS] download_file called for {self.container_id}:{path}")
+        content = local_docker_handler.read_file_from_container(self.container_id, path)
+        if content is None:
+            raise FileNotFoundError(f"Could not read {path} in sandbox {self.container_id}")
+        return content
+
+    async def download_file_async(self, path: str) -> bytes:
+        '''Non-blocking variant of download_file, over the exec channel when the container has one.'''
+        exec_channel = self._exec_channel_factory() if self._exec_channel_factory else None
+        if exec_channel:
+            try:
+                return await exec_channel.read_file(path)
+            except ExecChannelError as e:
+                logger.warning(f"Exec channel unavailable for sandbox {self.container_id}, reading {path} via docker exec: {e}")
+        content = await local_docker_handler.read_file_from_container_async(self.container_id, path)
+        if content is None:
+            raise FileNotFoundError(f"Could not read {path} in sandbox {self.container_id}")
+        return content
+
+    async def get_file_info_async(self, path: str) -> Optional[Dict[str, Any]]:
+        '''Returns {'path', 'type', 'size', 'mtime'} for path, or None if it does not exist.'''
+        return await local_docker_handler.stat_file_in_container_async(self.container_id, path)
+
+    def stream_file_async(self, path: str, offset: int = 0, length: Optional[int] = None) -> AsyncIterator[bytes]:
+        '''Streams length bytes of a file starting at offset (to the end if length is None), one chunk at a time.'''
+        return local_docker_handler.stream_file_from_container_async(self.container_id, path, offset, length)
+
+    async def get_workspace_changes_async(self, root: str, since_version: int = 0, manifest_id: Optional[str] = None,
+                                          exclude_dirs: Iterable[str] = (), exclude_files: Iterable[str] = (),
+                                          exclude_exts: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        '''Refreshes the in-container hash manifest of root and returns the files changed since since_version.
+
+        Result: {'manifest_id', 'version', 'full', 'file_count', 'changed': [{'path', 'size', 'mtime', 'hash'}], 'deleted': [path]}.
+        When 'full' is true the manifest could not be diffed against (manifest_id) and 'changed' lists every file.
+        Returns None if the manifest could not be refreshed.
+        '''
+        params = {
+            "root": root, "since_version": since_version, "manifest_id": manifest_id,
+            "exclude_dirs": sorted(exclude_dirs), "exclude_files": sorted(exclude_files), "exclude_exts": sorted(exclude_exts),
+        }
+        exec_channel = self._exec_channel_factory() if self._exec_channel_factory else None
+        if exec_channel:
+            try:
+                return await exec_channel.manifest(**params)
+            except ExecChannelError as e:
+                logger.warning(f"Exec channel unavailable for sandbox {self.container_id}, scanning manifest via docker exec: {e}")
+        return await local_docker_handler.scan_workspace_manifest_in_container_async(self.container_id, params)
+
 class LocalDockerProcessWrapper:
     def __init__(self, container_id: str):
         self.container_id = container_id
@@ -97,6 +166,17 @@ class LocalDockerProcessWrapper:
         # The SandboxBrowserTool expects `response.result` to be the stdout for JSON decoding
         return ExecResponse(exit_code=exit_code, result=stdout_str, stderr=stderr_str)
 
+    async def execute_async(self, command: str, workdir: str = "/workspace", timeout: int = 60) -> ExecResponse:
+        '''Non-blocking variant of execute for async callers; enforces the timeout.'''
+        logger.info(f"[LocalDockerProcess] execute_async command in {self.container_id} at {workdir}: {command}")
+        stdout_str, stderr_str, exit_code = await local_docker_handler.execute_command_in_container_async(
+            self.container_id,
+            command,
+            workdir=workdir,
+            timeout_seconds=timeout
+        )
+        return ExecResponse(exit_code=exit_code, result=stdout_str, stderr=stderr_str)
+
 load_dotenv()
 
 logger.debug("Initializing Daytona sandbox configuration")
@@ -133,6 +213,24 @@ if config.DAYTONA_API_KEY and config.DAYTONA_SERVER_URL:
 else:
     logger.warning("Daytona client NOT initialized due to missing DAYTONA_API_KEY or DAYTONA_SERVER_URL.")
 
+async def _persist_local_docker_ports(db_client, project_id: str, sandbox_info: Dict[str, Any],
+                                      sandbox: LocalDockerSandboxWrapper) -> None:
+    """Write a local Docker sandbox's current host ports and preview URLs to projects.sandbox if they changed."""
+    updated_info = {
+        **sandbox_info,
+        'vnc_preview': sandbox.get_preview_link(6080)['url'],
+        'sandbox_url': sandbox.get_preview_link(8080)['url'],
+        'exec_port': sandbox.exec_port,
+        'browser_api_port': sandbox.browser_api_port,
+    }
+    if updated_info == sandbox_info:
+        return
+    try:
+        await db_client.table('projects').update({'sandbox': updated_info}).eq('project_id', project_id).execute()
+        logger.info(f"Updated host ports of local Docker sandbox {sandbox.id} for project {project_id}")
+    except Exception as e:
+        logger.warning(f"Failed to record new host ports of sandbox {sandbox.id} for project {project_id}: {e}")
+
 async def get_or_start_sandbox(project_id: str, db_client) -> Optional[Any]:
     """Retrieve a sandbox by project_id, check its state, and prepare it if needed."""
     logger.info(f"Getting or starting sandbox for project_id: {project_id}")
@@ -155,7 +253,7 @@ async def get_or_start_sandbox(project_id: str, db_client) -> Optional[Any]:
             logger.info(f"Handling as local_docker sandbox: {actual_sandbox_id}")
             # Preemptive client check removed, local_docker_handler will attempt init.
 
-            status = local_docker_handler.get_sandbox_container_status(actual_sandbox_id)
+            status = await local_docker_handler.get_sandbox_container_status_async(actual_sandbox_id)
 
             if status is None: # Indicates client was not available in local_docker_handler
                 logger.error(f"Failed to get status for local_docker sandbox {actual_sandbox_id} because Docker client is unavailable.")
@@ -164,11 +262,23 @@ async def get_or_start_sandbox(project_id: str, db_client) -> Optional[Any]:
             logger.info(f"Local Docker container {actual_sandbox_id} status: {status}")
 
             if status == 'running':
+                live_ports = await local_docker_handler.get_sandbox_container_ports_async(actual_sandbox_id)
+                if live_ports:
+                    sandbox = LocalDockerSandboxWrapper(
+                        {'container_id': actual_sandbox_id, 'container_name': sandbox_info.get('name'), **live_ports},
+                        sandbox_info.get('pass'))
+                    # Heals entries written before a restart that was not persisted
+                    await _persist_local_docker_ports(db_client, project_id, sandbox_info, sandbox)
+                    return sandbox
+
+                # Port lookup failed: fall back to the ports recorded in the DB
                 container_details_for_wrapper = {
                     'container_id': actual_sandbox_id,
                     'container_name': sandbox_info.get('name'),
                     'host_vnc_port': sandbox_info.get('vnc_preview', '').split(':')[-1] if sandbox_info.get('vnc_preview') else None,
                     'host_web_port': sandbox_info.get('sandbox_url', '').split(':')[-1] if sandbox_info.get('sandbox_url') else None,
+                    'host_exec_port': sandbox_info.get('exec_port'),
+                    'host_browser_api_port': sandbox_info.get('browser_api_port'),
                 }
                 if container_details_for_wrapper['host_vnc_port']:
                     try: container_details_for_wrapper['host_vnc_port'] = int(container_details_for_wrapper['host_vnc_port'])
@@ -181,54 +291,25 @@ async def get_or_start_sandbox(project_id: str, db_client) -> Optional[Any]:
             elif status in ['created', 'exited', 'stopped']:
                 logger.info(f"Local Docker container {actual_sandbox_id} is not running ({status}). Attempting to start.")
                 try:
-                    # Attempt to get client again, or rely on it being available if status check passed.
-                    # For starting, local_docker_handler doesn't have a direct "start_container" that also inits client.
-                    # This part of the logic might need a small helper in local_docker_handler or careful handling here.
-                    # For now, let's assume if get_sandbox_container_status worked, client is somewhat available.
-                    # However, the original code used local_docker_handler.client directly.
-                    # This implies a direct client access that might be an issue with the new model.
-                    # A better approach would be local_docker_handler.start_container(id) if it existed and handled client init.
-                    # Given the current tools, we'll proceed, but this is a potential refinement area.
-                    # The _get_or_initialize_client is global in local_docker_handler, so subsequent calls in this block
-                    # to local_docker_handler.client (if it were still used) would benefit from the first call's init.
-                    # However, we should use a local_docker_handler function if possible.
-                    # Re-evaluating: local_docker_handler.client is no longer directly accessible in the intended way.
-                    # This block needs to call a function in local_docker_handler that can start the container.
-                    # There isn't one. This reveals a gap.
-                    # For the scope of *this specific subtask*, we are only removing preemptive checks.
-                    # The original code `docker_sdk_client = local_docker_handler.client` will fail if client is None.
-                    # The `_get_or_initialize_client()` is not directly called here.
-                    # This means the start logic might fail if the client wasn't initialized by `get_sandbox_container_status`.
-                    # Let's assume `local_docker_handler.start_sandbox_container` is for *new* containers.
-                    # For existing ones, Docker SDK is used directly.
-                    # This part of the code in `get_or_start_sandbox` might implicitly rely on `client` being populated
-                    # by the `get_sandbox_container_status` call.
-
-                    # Let's assume for now the existing logic for starting an existing container is slightly outside
-                    # the direct "on-demand init" for *new operations*, and might need a follow-up.
-                    # The most direct interpretation of the task is to remove the *initial* check.
-                    # The line `docker_sdk_client = local_docker_handler.client` is problematic.
-                    # It should be: `docker_sdk_client = local_docker_handler._get_or_initialize_client()`
-                    # Or better, local_docker_handler should expose a start_existing_container(id) function.
-                    # Let's make the minimal change to use _get_or_initialize_client() here for now.
-                    docker_sdk_client = local_docker_handler._get_or_initialize_client()
-                    if not docker_sdk_client:
-                        raise LocalDockerUnavailableError("Local Docker client not available to start existing container.")
-
-                    container_obj = docker_sdk_client.containers.get(actual_sandbox_id)
-                    container_obj.start()
+                    restarted_info = await local_docker_handler.restart_sandbox_container_async(
+                        actual_sandbox_id, placement_wait_seconds=config.SANDBOX_PLACEMENT_WAIT_SECONDS
+                    )
+                    if not restarted_info:
+                        raise LocalDockerUnavailableError(f"Could not start existing local Docker container {actual_sandbox_id}.")
                     logger.info(f"Successfully started local Docker container {actual_sandbox_id}.")
-                    container_obj.reload()
-                    host_vnc_port_restarted = container_obj.ports.get('6080/tcp')[0]['HostPort'] if container_obj.ports.get('6080/tcp') else None
-                    host_web_port_restarted = container_obj.ports.get('8080/tcp')[0]['HostPort'] if container_obj.ports.get('8080/tcp') else None
 
                     container_details_restarted = {
                         'container_id': actual_sandbox_id,
                         'container_name': sandbox_info.get('name'),
-                        'host_vnc_port': host_vnc_port_restarted,
-                        'host_web_port': host_web_port_restarted,
+                        'host_vnc_port': restarted_info.get('host_vnc_port'),
+                        'host_web_port': restarted_info.get('host_web_port'),
+                        'host_exec_port': restarted_info.get('host_exec_port'),
+                        'host_browser_api_port': restarted_info.get('host_browser_api_port'),
                     }
-                    return LocalDockerSandboxWrapper(container_details_restarted, sandbox_info.get('pass'))
+                    sandbox = LocalDockerSandboxWrapper(container_details_restarted, sandbox_info.get('pass'))
+                    # Docker picked new host ports for the start, so record them for every later caller
+                    await _persist_local_docker_ports(db_client, project_id, sandbox_info, sandbox)
+                    return sandbox
                 except Exception as e_start:
                     logger.error(f"Failed to start local Docker container {actual_sandbox_id}: {e_start}")
                     return None
@@ -259,6 +340,59 @@ async def get_or_start_sandbox(project_id: str, db_client) -> Optional[Any]:
         logger.error(f"Error in get_or_start_sandbox for project {project_id}: {e}", exc_info=True)
         return None
 
+class SandboxRegistry:
+    """Process-wide cache of resolved sandbox handles, keyed by project_id.
+
+    Every sandbox tool of a run shares one handle. A handle is trusted for
+    SANDBOX_LIVENESS_TTL_SECONDS; after that a local Docker container only gets a
+    status check, other sandbox types are resolved again. Concurrent lookups for
+    the same project share a single get_or_start_sandbox call, so a stopped
+    container is started once.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._handles: Dict[str, Dict[str, Any]] = {}  # project_id -> {"sandbox", "checked_at"}
+        self._pending: Dict[tuple, asyncio.Future] = {}  # (project_id, loop id) -> in-flight resolution
+
+    async def get(self, project_id: str, db_client) -> Optional[Any]:
+        cached = self._handles.get(project_id)
+        if cached is not None:
+            if time.monotonic() - cached["checked_at"] < self.ttl_seconds:
+                return cached["sandbox"]
+            if await self._is_alive(cached["sandbox"]):
+                cached["checked_at"] = time.monotonic()
+                return cached["sandbox"]
+            self.invalidate(project_id)
+
+        key = (project_id, id(asyncio.get_running_loop()))
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(get_or_start_sandbox(project_id, db_client))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        # Shield so one cancelled caller does not cancel the start for everyone else
+        sandbox = await asyncio.shield(pending)
+        if sandbox is not None:
+            self._handles[project_id] = {"sandbox": sandbox, "checked_at": time.monotonic()}
+        return sandbox
+
+    async def _is_alive(self, sandbox: Any) -> bool:
+        if isinstance(sandbox, LocalDockerSandboxWrapper):
+            return await local_docker_handler.get_sandbox_container_status_async(sandbox.id) == 'running'
+        return False
+
+    def invalidate(self, project_id: str) -> None:
+        self._handles.pop(project_id, None)
+
+
+sandbox_registry = SandboxRegistry(ttl_seconds=config.SANDBOX_LIVENESS_TTL_SECONDS)
+
+
+async def get_project_sandbox(project_id: str, db_client) -> Optional[Any]:
+    """Return the shared sandbox handle for a project, starting the sandbox if needed."""
+    return await sandbox_registry.get(project_id, db_client)
+
 def start_supervisord_session(sandbox: Sandbox):
     """Start supervisord in a session."""
 
@@ -281,8 +415,46 @@ def start_supervisord_session(sandbox: Sandbox):
         logger.error(f"Error starting supervisord session: {str(e)}")
         raise e
 
-def create_sandbox(password: str, project_id: str = None) -> Optional[Any]: # Return type Any for now
-    """Create a new sandbox using either local Docker or Daytona."""
+def local_docker_sandbox_env(password: str) -> Dict[str, str]:
+    """Environment for a local Docker sandbox container. The password is both the VNC password and the exec agent token."""
+    return {
+        "VNC_PASSWORD": password,
+        "RESOLUTION": "1024x768x24",
+        # Add other relevant env vars from Configuration or defaults as needed
+        "CHROME_PERSISTENT_SESSION": "true",
+        "RESOLUTION_WIDTH": "1024",
+        "RESOLUTION_HEIGHT": "768",
+        "ANONYMIZED_TELEMETRY": "false", # Default, consider making configurable
+        "CHROME_DEBUGGING_PORT": "9222", # Default, consider making configurable
+        "EXEC_AGENT_TOKEN": password, # Authenticates the persistent exec channel
+    }
+
+def select_resource_profile(agent_config: Optional[Dict[str, Any]] = None, tier_name: Optional[str] = None) -> Optional[str]:
+    """
+    Resource profile for a new local Docker sandbox: the agent's own profile if it sets one,
+    else the profile mapped to the account's subscription tier, else the default profile
+    (None when SANDBOX_RESOURCE_PROFILE is unset: the sandbox is unconstrained).
+    """
+    agent_profile = (agent_config or {}).get('sandbox_resource_profile')
+    if agent_profile:
+        if local_docker_handler.get_resource_profile(agent_profile):
+            return agent_profile
+        logger.warning(f"Agent {agent_config.get('agent_id')} requests unknown resource profile '{agent_profile}', ignoring it")
+
+    if tier_name and config.SANDBOX_TIER_RESOURCE_PROFILES:
+        for mapping in config.SANDBOX_TIER_RESOURCE_PROFILES.split(','):
+            tier, _, profile = mapping.partition(':')
+            if tier.strip() == tier_name and local_docker_handler.get_resource_profile(profile.strip()):
+                return profile.strip()
+
+    return config.SANDBOX_RESOURCE_PROFILE
+
+async def create_sandbox(password: str, project_id: str = None, resource_profile: Optional[str] = None) -> Optional[Any]: # Return type Any for now
+    """
+    Create a new sandbox using either local Docker or Daytona.
+    Local Docker sandboxes get resource_profile (default: SANDBOX_RESOURCE_PROFILE); if the host
+    has no headroom for it, local_docker_handler.SandboxPlacementError is raised.
+    """
     
     sandbox_provider = config.get('SANDBOX_TYPE', 'daytona') # Default to 'daytona'
 
@@ -291,20 +463,11 @@ def create_sandbox(password: str, project_id: str = None) -> Optional[Any]: # Re
 
         # Preemptive client check removed, local_docker_handler.start_sandbox_container will attempt init.
 
-        env_vars = {
-            "VNC_PASSWORD": password,
-            "RESOLUTION": "1024x768x24",
-            # Add other relevant env vars from Configuration or defaults as needed
-            "CHROME_PERSISTENT_SESSION": "true",
-            "RESOLUTION_WIDTH": "1024",
-            "RESOLUTION_HEIGHT": "768",
-            "ANONYMIZED_TELEMETRY": "false", # Default, consider making configurable
-            "CHROME_DEBUGGING_PORT": "9222", # Default, consider making configurable
-        }
-        container_info = local_docker_handler.start_sandbox_container(
+        container_info = await local_docker_handler.start_sandbox_container_async(
             image_name=Configuration.SANDBOX_IMAGE_NAME,
-            env_vars=env_vars,
-            project_id=project_id
+            env_vars=local_docker_sandbox_env(password),
+            project_id=project_id,
+            resource_profile=resource_profile or config.SANDBOX_RESOURCE_PROFILE
             # Optionally pass vnc_port_host, web_port_host if specific host ports are needed
         )
         if container_info:
@@ -353,13 +516,15 @@ def create_sandbox(password: str, project_id: str = None) -> Optional[Any]: # Re
                 "CHROME_USER_DATA": "",
                 "CHROME_DEBUGGING_PORT": "9222",
                 "CHROME_DEBUGGING_HOST": "localhost",
-                "CHROME_CDP": ""
+                "CHROME_CDP": "",
+                "EXEC_AGENT_TOKEN": password, # Authenticates the persistent exec channel
             },
             resources={"cpu": 2, "memory": 4, "disk": 5}
         )
-        daytona_sandbox_obj = daytona.create(params)
+        # The Daytona SDK is synchronous; keep the event loop free while it provisions
+        daytona_sandbox_obj = await asyncio.to_thread(daytona.create, params)
         logger.debug(f"Daytona Sandbox created with ID: {daytona_sandbox_obj.id}")
-        start_supervisord_session(daytona_sandbox_obj)
+        await asyncio.to_thread(start_supervisord_session, daytona_sandbox_obj)
         logger.debug(f"Daytona Sandbox environment successfully initialized")
         return daytona_sandbox_obj
 
@@ -391,7 +556,7 @@ async def delete_sandbox(project_id: str, db_client) -> bool:
             logger.info(f"Deleting local_docker sandbox: {actual_sandbox_id}")
             # Preemptive client check removed, local_docker_handler.stop_and_remove_sandbox_container will attempt init.
             # The function stop_and_remove_sandbox_container returns False if client is not available.
-            deleted_successfully = local_docker_handler.stop_and_remove_sandbox_container(actual_sandbox_id, raise_not_found=False)
+            deleted_successfully = await local_docker_handler.stop_and_remove_sandbox_container_async(actual_sandbox_id, raise_not_found=False)
             if not deleted_successfully and local_docker_handler._get_or_initialize_client() is None: # Check if failure was due to client
                  logger.error("Failed to delete local_docker sandbox because Docker client is unavailable.")
                  # deleted_successfully is already False, this log gives more context.
@@ -423,6 +588,7 @@ async def delete_sandbox(project_id: str, db_client) -> bool:
             await db_client.table('projects').update({'sandbox': None}).eq('project_id', project_id).execute()
             return False
 
+        sandbox_registry.invalidate(project_id)
         if deleted_successfully:
             logger.info(f"Clearing sandbox info from DB for project {project_id} after successful deletion.")
             await db_client.table('projects').update({'sandbox': None}).eq('project_id', project_id).execute()
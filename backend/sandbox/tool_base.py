@@ -5,7 +5,8 @@ from agentpress.thread_manager import ThreadManager # Direct import
 from agentpress.tool import Tool # Direct import
 # Sandbox type can be Daytona's or our wrapper, so using Any for now, or a common base if defined
 from typing import Any
-from .sandbox import get_or_start_sandbox # Relative import
+from .sandbox import get_project_sandbox, sandbox_registry # Relative import
+from .lifecycle import sandbox_lifecycle
 from utils.logger import logger # Direct import
 from utils.files_utils import clean_path # Direct import
 from utils.config import config # Direct import
@@ -38,10 +39,10 @@ class SandboxToolsBase(Tool):
                 
                 # Project ID is already available as self.project_id
                 # Get or start the sandbox using the updated signature
-                self._sandbox = await get_or_start_sandbox(self.project_id, client) # Corrected call
+                self._sandbox = await get_project_sandbox(self.project_id, client) # Shared across all tools of the project
 
                 if self._sandbox is None:
-                    # get_or_start_sandbox might return None if it fails internally
+                    # get_project_sandbox might return None if it fails internally
                     raise ValueError(f"Failed to get or start sandbox for project {self.project_id}")
 
                 # Store sandbox id and pass if sandbox object is successfully retrieved
@@ -74,9 +75,22 @@ class SandboxToolsBase(Tool):
             except Exception as e:
                 logger.error(f"Error ensuring sandbox for project {self.project_id}: {str(e)}", exc_info=True)
                 raise e # Re-raise after logging
-        
+        elif sandbox_lifecycle.enabled and self.project_id is not None:
+            # The sandbox may have been stopped for idleness since it was resolved. The registry
+            # answers from its cache while the handle is fresh and resumes the sandbox otherwise.
+            client = await self.thread_manager.db.client
+            self._sandbox = await get_project_sandbox(self.project_id, client) or self._sandbox
+
+        await sandbox_lifecycle.record_activity(self._sandbox, self.project_id)
         return self._sandbox
 
+    async def _refresh_sandbox(self) -> Any:
+        """Drop the cached sandbox handle and look it up again, e.g. after its ports stopped answering."""
+        if self.project_id is not None:
+            sandbox_registry.invalidate(self.project_id)
+            self._sandbox = None
+        return await self._ensure_sandbox()
+
     @property
     def sandbox(self) -> Any: # Return type Any
         """Get the sandbox instance, ensuring it exists."""
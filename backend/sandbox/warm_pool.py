@@ -0,0 +1,241 @@
+"""
+Warm pool of pre-started local Docker sandboxes.
+
+Starting a sandbox (container create, supervisord, browser startup) is the
+slowest part of creating a project. The pool keeps a few unassigned sandboxes
+running and ready; a new project takes one instead of waiting for a cold start,
+and the pool refills itself in the background.
+
+The pool is shared by all backend processes on the host. The ready sandboxes are
+a Redis list, so any process can take one and each is handed out exactly once
+(LPOP). One process, elected with a Redis lock, owns the pool: it refills it,
+replaces idle sandboxes and, when it takes over, removes pool containers nobody
+claimed (left behind by a crashed owner). Pool containers are named with
+WARM_POOL_NAME_PREFIX and renamed after their project when they are handed out,
+which is what marks them as claimed. Pool sandboxes use the default resource
+profile, so only projects using that profile take from the pool.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from services import redis
+from utils.config import config, Configuration
+from utils.logger import logger
+from . import local_docker_handler
+from .exec_channel import ExecChannelError
+from .sandbox import LocalDockerSandboxWrapper, local_docker_sandbox_env
+
+WARM_POOL_LABEL = 'agentpress_warm_pool'
+WARM_POOL_NAME_PREFIX = 'agentpress_warm_pool_'  # Unclaimed pool containers; renamed when handed out
+READY_KEY = "sandbox_warm_pool:ready"  # list of JSON WarmSandbox records
+OWNER_KEY = "sandbox_warm_pool:owner"  # token of the process maintaining the pool
+READY_TIMEOUT_SECONDS = 180  # Give up on a pool sandbox whose services never come up
+READY_POLL_SECONDS = 1
+MAINTENANCE_INTERVAL_SECONDS = 30
+OWNER_TTL_SECONDS = 3 * MAINTENANCE_INTERVAL_SECONDS  # Another process takes over after this long without renewal
+
+
+@dataclass
+class WarmSandbox:
+    sandbox: LocalDockerSandboxWrapper
+    password: str
+    created_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps({"container_info": self.sandbox.container_info, "password": self.password,
+                           "created_at": self.created_at})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "WarmSandbox":
+        record = json.loads(raw)
+        return cls(sandbox=LocalDockerSandboxWrapper(record["container_info"], record["password"]),
+                   password=record["password"], created_at=record["created_at"])
+
+
+class LocalDockerWarmPool:
+    """Keeps `size` ready, unassigned local Docker sandboxes."""
+
+    def __init__(self, size: int, max_idle_seconds: int):
+        self.size = size
+        self.max_idle_seconds = max_idle_seconds
+        self._token = uuid.uuid4().hex
+        self._is_owner = False
+        self._provisioning = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and config.SANDBOX_TYPE == 'local_docker'
+
+    def start(self) -> None:
+        """Start background refill and idle reaping. Call from the running event loop."""
+        if not self.enabled or self._maintenance_task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._maintenance_task = asyncio.create_task(self._maintain())
+        logger.info(f"Local Docker warm pool started (size={self.size}, max_idle={self.max_idle_seconds}s)")
+
+    async def stop(self) -> None:
+        """Stop maintenance and hand ownership over. Ready sandboxes stay for the next owner."""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+        if self._is_owner:
+            redis_client = await redis.get_client()
+            if await redis_client.get(OWNER_KEY) == self._token:
+                await redis_client.delete(OWNER_KEY)
+            self._is_owner = False
+
+    async def acquire(self, project_id: str) -> Optional[WarmSandbox]:
+        """Take a ready sandbox out of the pool for a project, or None if none is ready."""
+        redis_client = await redis.get_client()
+        while True:
+            raw = await redis_client.lpop(READY_KEY)
+            if raw is None:
+                return None
+            warm = WarmSandbox.from_json(raw)
+            self._request_refill()
+            # Claim it right away, so a new owner does not take it for an orphan
+            name = f"agentpress_sandbox_{project_id}"
+            if await local_docker_handler.rename_sandbox_container_async(warm.sandbox.id, name):
+                warm.sandbox.name = warm.sandbox.container_info['container_name'] = name
+                status = await local_docker_handler.get_sandbox_container_status_async(warm.sandbox.id)
+            else:
+                status = None
+            if status == 'running':
+                logger.info(f"Assigned warm sandbox {warm.sandbox.id} to project {project_id}")
+                return warm
+            logger.warning(f"Warm sandbox {warm.sandbox.id} is no longer running ({status}), discarding")
+            await self._discard(warm)
+
+    def _request_refill(self) -> None:
+        # Only wakes this process; other owners notice within MAINTENANCE_INTERVAL_SECONDS
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim_ownership(self) -> bool:
+        """Take or renew the pool ownership lock; True if this process owns the pool."""
+        redis_client = await redis.get_client()
+        if await redis_client.set(OWNER_KEY, self._token, nx=True, ex=OWNER_TTL_SECONDS):
+            return True
+        if await redis_client.get(OWNER_KEY) == self._token:
+            await redis_client.expire(OWNER_KEY, OWNER_TTL_SECONDS)
+            return True
+        return False
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                was_owner, self._is_owner = self._is_owner, await self._claim_ownership()
+                if self._is_owner:
+                    if not was_owner:
+                        logger.info("This process now maintains the warm pool")
+                        await self._remove_orphans()
+                    await self._reap_idle()
+                    ready = await (await redis.get_client()).llen(READY_KEY)
+                    missing = self.size - ready - self._provisioning
+                    if missing > 0:
+                        await asyncio.gather(*[self._provision_one() for _ in range(missing)])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Warm pool maintenance failed: {e}", exc_info=True)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=MAINTENANCE_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _ready_sandboxes(self) -> List[WarmSandbox]:
+        redis_client = await redis.get_client()
+        return [WarmSandbox.from_json(raw) for raw in await redis_client.lrange(READY_KEY, 0, -1)]
+
+    async def _remove_orphans(self) -> None:
+        """Remove pool containers that are neither ready in the pool nor claimed by a project."""
+        ready_ids = [warm.sandbox.id for warm in await self._ready_sandboxes()]
+        removed = await local_docker_handler.remove_unclaimed_containers_async(
+            f"{WARM_POOL_LABEL}=true", WARM_POOL_NAME_PREFIX, ready_ids
+        )
+        if removed:
+            logger.info(f"Removed {len(removed)} orphaned warm pool containers")
+
+    async def _reap_idle(self) -> None:
+        redis_client = await redis.get_client()
+        now = time.time()
+        for raw in await redis_client.lrange(READY_KEY, 0, -1):
+            warm = WarmSandbox.from_json(raw)
+            # LREM decides the race with acquire: whoever removes the record owns the sandbox
+            if now - warm.created_at > self.max_idle_seconds and await redis_client.lrem(READY_KEY, 1, raw):
+                logger.info(f"Reaping idle warm sandbox {warm.sandbox.id}")
+                await self._discard(warm)
+
+    async def _provision_one(self) -> None:
+        self._provisioning += 1
+        try:
+            password = str(uuid.uuid4())
+            try:
+                container_info = await local_docker_handler.start_sandbox_container_async(
+                    image_name=Configuration.SANDBOX_IMAGE_NAME,
+                    env_vars=local_docker_sandbox_env(password),
+                    labels={WARM_POOL_LABEL: 'true'},
+                    resource_profile=config.SANDBOX_RESOURCE_PROFILE,
+                    container_name=f"{WARM_POOL_NAME_PREFIX}{uuid.uuid4().hex[:8]}"
+                )
+            except local_docker_handler.SandboxPlacementError as e:
+                # Never queue for headroom: the pool must not crowd out sandboxes of real projects
+                logger.warning(f"Warm pool not refilling: {e}")
+                return
+            if not container_info:
+                logger.error("Warm pool could not start a sandbox container")
+                return
+
+            warm = WarmSandbox(sandbox=LocalDockerSandboxWrapper(container_info, password), password=password)
+            if await self._wait_until_ready(warm.sandbox):
+                redis_client = await redis.get_client()
+                ready = await redis_client.rpush(READY_KEY, warm.to_json())
+                logger.info(f"Warm sandbox {warm.sandbox.id} ready ({ready}/{self.size})")
+            else:
+                logger.error(f"Warm sandbox {warm.sandbox.id} did not become ready in {READY_TIMEOUT_SECONDS}s, discarding")
+                await self._discard(warm)
+        finally:
+            self._provisioning -= 1
+
+    async def _wait_until_ready(self, sandbox: LocalDockerSandboxWrapper) -> bool:
+        """Wait until the browser automation API inside the sandbox answers."""
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        probe = "curl -sf -o /dev/null http://localhost:8003/api"
+        while time.monotonic() < deadline:
+            exec_channel = sandbox.get_exec_channel()
+            try:
+                if exec_channel:
+                    _, _, exit_code = await exec_channel.run(probe, timeout=10)
+                else:
+                    _, _, exit_code = await local_docker_handler.execute_command_in_container_async(
+                        sandbox.id, f"/bin/sh -c '{probe}'", timeout_seconds=10
+                    )
+            except ExecChannelError:
+                exit_code = None  # Exec agent not listening yet
+            if exit_code == 0:
+                return True
+            await asyncio.sleep(READY_POLL_SECONDS)
+        return False
+
+    async def _discard(self, warm: WarmSandbox) -> None:
+        await local_docker_handler.stop_and_remove_sandbox_container_async(warm.sandbox.id, raise_not_found=False)
+
+
+warm_pool = LocalDockerWarmPool(
+    size=config.SANDBOX_WARM_POOL_SIZE,
+    max_idle_seconds=config.SANDBOX_WARM_POOL_MAX_IDLE_SECONDS,
+)
@@ -0,0 +1,7 @@
+BEGIN;
+
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS sandbox_resource_profile TEXT;
+
+COMMENT ON COLUMN agents.sandbox_resource_profile IS 'Named resource profile (CPU, memory, pids and tmpfs limits) for sandboxes started for this agent; NULL uses the tier or default profile';
+
+COMMIT;
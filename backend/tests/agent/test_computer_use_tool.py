@@ -0,0 +1,76 @@
+import asyncio
+import base64
+import io
+import unittest
+from unittest import mock
+
+from PIL import Image, ImageDraw
+
+from agent.tools.computer_use_tool import ComputerUseTool, changed_regions
+
+
+def png_base64(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class TestComputerUseTool(unittest.TestCase):
+
+    def setUp(self):
+        sandbox = mock.MagicMock()
+        sandbox.get_preview_link.return_value = "http://sandbox:8000"
+        self.tool = ComputerUseTool(sandbox, frame_diff=True)
+        self.screen = Image.new("RGB", (640, 480), "white")
+        self.tool._api_request = mock.AsyncMock(side_effect=self._respond)
+        self.requests = []
+
+    async def _respond(self, method, endpoint, data=None):
+        self.requests.append((endpoint, data))
+        if endpoint == "/automation/screenshot":
+            return {"image": png_base64(self.screen)}
+        if endpoint == "/automation/actions":
+            return {"detail": "Not Found"}
+        return {"success": True}
+
+    def test_changed_regions_boxes_each_separate_change(self):
+        changed = self.screen.copy()
+        draw = ImageDraw.Draw(changed)
+        draw.rectangle((10, 10, 20, 20), fill="black")
+        draw.rectangle((500, 400, 600, 420), fill="black")
+        self.assertEqual(changed_regions(self.screen, changed), [(0, 0, 64, 64), (448, 384, 640, 448)])
+        self.assertEqual(changed_regions(self.screen, self.screen.copy()), [])
+
+    def test_screenshots_after_the_first_only_carry_changed_regions(self):
+        first = asyncio.run(self.tool.get_screenshot_base64())
+        self.assertTrue(first["full_frame"])
+        self.assertNotIn("filename", first)  # Disk persistence is opt-in
+
+        ImageDraw.Draw(self.screen).rectangle((100, 100, 150, 120), fill="black")
+        second = asyncio.run(self.tool.get_screenshot_base64())
+        self.assertFalse(second["full_frame"])
+        self.assertEqual([(r["x"], r["y"], r["width"], r["height"]) for r in second["regions"]], [(64, 64, 128, 64)])
+
+        self.assertEqual(asyncio.run(self.tool.get_screenshot_base64())["regions"], [])
+
+    def test_actions_fall_back_to_one_request_each_without_the_composite_endpoint(self):
+        result = asyncio.run(self.tool.perform_actions(
+            '[{"action": "click", "x": 40.4, "y": 60}, {"action": "typing", "text": "hi"}, {"action": "press", "key": "Enter"}]'))
+
+        self.assertTrue(result.success)
+        self.assertEqual(self.requests[0], ("/automation/actions", {"actions": [
+            {"type": "mouse/click", "x": 40, "y": 60, "clicks": 1, "button": "left"},
+            {"type": "keyboard/write", "message": "hi", "interval": 0.01},
+            {"type": "keyboard/press", "keys": "enter", "presses": 1},
+        ]}))
+        self.assertEqual([endpoint for endpoint, _ in self.requests[1:]],
+                         ["/automation/mouse/click", "/automation/keyboard/write", "/automation/keyboard/press"])
+        self.assertEqual((self.tool.mouse_x, self.tool.mouse_y), (40, 60))
+
+    def test_invalid_actions_are_rejected_before_any_request(self):
+        self.assertFalse(asyncio.run(self.tool.perform_actions([{"action": "teleport"}])).success)
+        self.assertEqual(self.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import httpx
+
+from agent.tools.sb_browser_tool import SandboxBrowserTool, screenshot_settings_for_model
+
+
+class TestSandboxBrowserToolScreenshots(unittest.TestCase):
+
+    def setUp(self):
+        self.tool = SandboxBrowserTool(project_id=None, thread_id="thread-1", thread_manager=None,
+                                       model_name="anthropic/claude-sonnet-4")
+        self.tool._sandbox = mock.MagicMock()
+        self.tool._sandbox.id = "sandbox-1"
+        self.tool._sandbox.get_preview_link.return_value = {"url": None, "token": None}  # No mapped API port
+        self.tool._sandbox.fs.download_file.return_value = b"webp-bytes"
+        self.tool.thread_manager = mock.MagicMock()
+        self.tool.thread_manager.add_message = mock.AsyncMock(return_value={"message_id": "m1"})
+        self.tool._ensure_sandbox = mock.AsyncMock()
+        self.upload = mock.AsyncMock(side_effect=["https://storage/1.webp", "https://storage/2.webp"])
+        self.upload_patch = mock.patch("agent.tools.sb_browser_tool.screenshot_store.store", self.upload)
+        self.upload_patch.start()
+
+    def tearDown(self):
+        self.upload_patch.stop()
+
+    def _store(self, response_json):
+        asyncio.run(self.tool._store_screenshot(response_json))
+        return response_json
+
+    def test_settings_follow_the_model(self):
+        self.assertEqual(screenshot_settings_for_model("anthropic/claude-sonnet-4")["format"], "webp")
+        self.assertEqual(screenshot_settings_for_model("some/local-model")["format"], "jpeg")
+
+    def test_unchanged_screenshot_reuses_the_previous_upload(self):
+        first = self._store({"screenshot_id": "a1", "screenshot_format": "webp",
+                             "screenshot_path": "/tmp/browser_frames/a1.webp"})
+        self.assertEqual(first["image_url"], "https://storage/1.webp")
+        self.assertNotIn("screenshot_path", first)
+        self.upload.assert_awaited_once_with(b"webp-bytes", "image/webp", scope="thread-1")
+        self.assertEqual(json.loads(self.tool._screenshot_header("file"))["known_screenshot_id"], "a1")
+
+        second = self._store({"screenshot_id": "a1", "screenshot_format": "webp", "screenshot_unchanged": True})
+        self.assertEqual(second["image_url"], "https://storage/1.webp")
+        self.assertEqual(self.upload.await_count, 1)
+        self.tool._sandbox.fs.download_file.assert_called_once()
+
+    def test_inline_screenshot_from_older_browser_service(self):
+        stored = self._store({"screenshot_base64": "anBlZw=="})
+        self.assertEqual(stored["image_url"], "https://storage/1.webp")
+        self.assertNotIn("screenshot_base64", stored)
+        self.upload.assert_awaited_once_with(b"jpeg", "image/jpeg", scope="thread-1")
+
+    def test_screen_text_is_not_recorded_as_browser_state(self):
+        self.tool.sandbox_type = "local_docker"
+        self.tool._sandbox.process.execute_async = mock.AsyncMock(return_value=mock.MagicMock(
+            exit_code=0, result='{"success": true, "screenshot_id": "a1", "ocr_text": "Total: 42"}', stderr=""))
+
+        result = asyncio.run(self.tool.browser_read_screen_text(x=0, y=0, width=100, height=50))
+
+        self.assertTrue(result.success)
+        self.assertIn("Total: 42", result.output)
+        self.tool.thread_manager.add_message.assert_not_called()
+        command = self.tool._sandbox.process.execute_async.call_args.args[0]
+        self.assertIn('"region": {"x": 0, "y": 0, "width": 100, "height": 50}', command)
+
+    def test_actions_go_over_http_when_the_api_port_is_mapped(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if request.url.path == "/api/automation/screenshots/b2":
+                return httpx.Response(200, content=b"webp-bytes", headers={"content-type": "image/webp"})
+            return httpx.Response(200, json={"success": True, "url": "https://example.com", "session_reset": "idle",
+                                             "screenshot_id": "b2", "screenshot_format": "webp"})
+
+        self.tool._sandbox.get_preview_link.return_value = {"url": "http://127.0.0.1:49153", "token": None}
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with mock.patch("sandbox.browser_client._http_client", return_value=client):
+                return await self.tool.browser_navigate_to("https://example.com")
+
+        result = asyncio.run(run())
+
+        self.assertTrue(result.success)
+        self.assertIn("closed after being idle", json.loads(result.output)["session_reset"])
+        action, screenshot = requests
+        self.assertEqual(str(action.url), "http://127.0.0.1:49153/api/automation/navigate_to")
+        self.assertEqual(json.loads(action.content), {"url": "https://example.com"})
+        self.assertEqual(json.loads(action.headers["x-screenshot-settings"])["transport"], "reference")
+        self.assertEqual(action.headers["x-browser-session"], "thread-1")
+        self.assertEqual(screenshot.url.path, "/api/automation/screenshots/b2")
+        self.upload.assert_awaited_once_with(b"webp-bytes", "image/webp", scope="thread-1")
+        self.tool._sandbox.process.execute_async.assert_not_called()
+
+    def test_unreachable_api_port_falls_back_to_the_sandbox_and_rebuilds_the_client(self):
+        def handler(request):
+            raise httpx.ConnectError("Connection refused", request=request)
+
+        self.tool.sandbox_type = "local_docker"
+        self.tool._sandbox.get_preview_link.return_value = {"url": "http://127.0.0.1:49153", "token": None}
+        self.tool._sandbox.process.execute_async = mock.AsyncMock(return_value=mock.MagicMock(
+            exit_code=0, stderr="", result='{"success": true, "url": "https://example.com"}'))
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with mock.patch("sandbox.browser_client._http_client", return_value=client):
+                return await self.tool.browser_navigate_to("https://example.com")
+
+        result = asyncio.run(run())
+
+        self.assertTrue(result.success)
+        self.assertIn("/api/automation/navigate_to", self.tool._sandbox.process.execute_async.call_args.args[0])
+        self.assertIsNone(self.tool._browser_api_sandbox_id)  # Next action looks the ports up again
+        self.assertEqual(self.tool._ensure_sandbox.await_count, 2)
+
+    def test_error_after_the_request_was_sent_is_not_replayed(self):
+        def handler(request):
+            raise httpx.ReadError("Connection reset by peer", request=request)
+
+        self.tool.sandbox_type = "local_docker"
+        self.tool._sandbox.get_preview_link.return_value = {"url": "http://127.0.0.1:49153", "token": None}
+        self.tool._sandbox.process.execute_async = mock.AsyncMock()
+
+        async def run():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            with mock.patch("sandbox.browser_client._http_client", return_value=client):
+                return await self.tool.browser_click_element(3)
+
+        result = asyncio.run(run())
+
+        self.assertFalse(result.success)
+        self.tool._sandbox.process.execute_async.assert_not_called()
+
+    def test_batch_sends_steps_in_one_request(self):
+        self.tool.sandbox_type = "local_docker"
+        self.tool._sandbox.process.execute_async = mock.AsyncMock(return_value=mock.MagicMock(
+            exit_code=0, stderr="", result=json.dumps({
+                "success": False, "message": "Completed 1 of 2 steps",
+                "step_results": [{"step": 0, "action": "input_text", "success": True},
+                                 {"step": 1, "action": "click_element", "success": False, "error": "gone"}]})))
+
+        result = asyncio.run(self.tool.browser_batch(
+            '[{"action": "input_text", "index": 3, "text": "it\'s me"}, {"action": "click_element", "index": 7}]'))
+
+        self.tool._sandbox.process.execute_async.assert_awaited_once()
+        command = self.tool._sandbox.process.execute_async.call_args.args[0]
+        self.assertIn("/api/automation/batch", command)
+        self.assertIn("it'\"'\"'s me", command)  # Quoted for the shell
+        self.assertEqual(len(json.loads(result.output)["step_results"]), 2)
+
+    def test_batch_rejects_malformed_steps(self):
+        self.assertFalse(asyncio.run(self.tool.browser_batch("not json")).success)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from agentpress.tool import ToolResult
+from agent.tools.sb_shell_tool import SandboxShellTool
+from sandbox.exec_channel import ExecChannelError, ExecChannelUnavailable
+
+
+@unittest.skipIf(shutil.which("tmux") is None, "tmux is not installed")
+class TestSandboxShellToolBlocking(unittest.TestCase):
+    """Runs blocking commands through a real tmux server on the host instead of a sandbox."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # Private tmux socket directory so the test never touches a developer's tmux server
+        self.env_patch = mock.patch.dict(os.environ, {"TMUX_TMPDIR": self.tmpdir.name, "SHELL": "/bin/sh"})
+        self.env_patch.start()
+        self.tool = SandboxShellTool(project_id=None, thread_manager=None)
+        self.tool._sandbox = mock.MagicMock()
+        self.tool.sandbox_type = "local_docker"
+        self.tool.workspace_path = self.tmpdir.name
+        self.tool._execute_raw_command = self._run_on_host
+
+    def tearDown(self):
+        os.system("tmux kill-server 2>/dev/null")
+        self.env_patch.stop()
+        self.tmpdir.cleanup()
+
+    async def _run_on_host(self, command, timeout=60):
+        proc = await asyncio.create_subprocess_shell(
+            command, cwd=self.tmpdir.name, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        return {"output": stdout.decode(), "exit_code": proc.returncode}
+
+    def _check_until(self, text, **kwargs):
+        async def run():
+            for _ in range(50):
+                result = await self.tool.check_command_output(**kwargs)
+                if text in result.output:
+                    return result
+                await asyncio.sleep(0.1)
+            return result
+        return asyncio.run(run())
+
+    def _execute(self, **kwargs):
+        async def run():
+            return [item async for item in self.tool.execute_command(**kwargs)]
+        return asyncio.run(run())
+
+    def test_quick_command_returns_promptly_with_exit_code(self):
+        start = time.monotonic()
+        items = self._execute(command="echo quick-output", blocking=True)
+        elapsed = time.monotonic() - start
+
+        result = items[-1]
+        self.assertIsInstance(result, ToolResult)
+        self.assertTrue(result.success)
+        self.assertIn('"exit_code": 0', result.output)
+        self.assertIn("quick-output", result.output)
+        self.assertLess(elapsed, 1.5)
+
+    def test_failing_command_reports_real_exit_code(self):
+        items = self._execute(command="sh -c 'exit 7'", blocking=True)
+        self.assertIn('"exit_code": 7', items[-1].output)
+        self.assertIn('"completed": true', items[-1].output)
+
+    def test_timeout_terminates_command(self):
+        items = self._execute(command="sleep 30", blocking=True, timeout=1)
+        self.assertIn('"exit_code": null', items[-1].output)
+        self.assertIn('"completed": false', items[-1].output)
+
+    def test_check_command_output_returns_only_new_output(self):
+        self._execute(command="echo first-line", session_name="incremental")
+        first = self._check_until("first-line", session_name="incremental")
+        self.assertIn('"cursor"', first.output)
+
+        self._execute(command="echo second-line", session_name="incremental")
+        second = self._check_until("second-line", session_name="incremental")
+        self.assertNotIn("first-line", second.output)
+
+        everything = asyncio.run(self.tool.check_command_output(session_name="incremental", from_start=True, kill_session=True))
+        self.assertIn("first-line", everything.output)
+        self.assertIn("second-line", everything.output)
+        self.assertNotIn("incremental", self.tool._output_cursors)
+
+    def test_check_command_output_grep_and_tail(self):
+        self._execute(command="printf 'ok 1\\nerror 2\\nok 3\\nerror 4\\n'; echo finished", session_name="filtered")
+        self._check_until("finished", session_name="filtered", from_start=True)
+
+        result = asyncio.run(self.tool.check_command_output(
+            session_name="filtered", from_start=True, grep="^error", tail_lines=1
+        ))
+        self.assertIn("error 4", result.output)
+        self.assertNotIn("error 2", result.output)
+        self.assertNotIn("ok 1", result.output)
+
+
+class TestSandboxShellToolExecChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.tool = SandboxShellTool(project_id=None, thread_manager=None)
+        self.tool._ensure_sandbox = mock.AsyncMock()
+        self.tool._sandbox = mock.MagicMock()
+        self.tool._sandbox.id = "sandbox-1"
+        self.tool.sandbox_type = "local_docker"
+        self.channel = self.tool._sandbox.get_exec_channel.return_value
+        self.docker_exec = mock.AsyncMock(return_value=("via docker\n", "", 0))
+        self.docker_exec_patch = mock.patch(
+            "agent.tools.sb_shell_tool.local_docker_handler.execute_command_in_container_async", self.docker_exec)
+        self.docker_exec_patch.start()
+
+    def tearDown(self):
+        self.docker_exec_patch.stop()
+
+    def test_undelivered_request_falls_back_to_docker_exec(self):
+        self.channel.run = mock.AsyncMock(side_effect=ExecChannelUnavailable("connection refused"))
+        result = asyncio.run(self.tool._execute_raw_command("echo hi"))
+        self.assertEqual(result, {"output": "via docker\n", "exit_code": 0})
+
+    def test_request_that_may_have_run_is_not_repeated(self):
+        self.channel.run = mock.AsyncMock(side_effect=ExecChannelError("exec agent connection closed"))
+        result = asyncio.run(self.tool.list_commands())
+        self.assertFalse(result.success)
+        self.assertIn("exec agent connection closed", result.output)
+        self.docker_exec.assert_not_awaited()
+
+
+if __name__ == '__main__':
+    unittest.main()
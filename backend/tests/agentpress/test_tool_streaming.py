@@ -0,0 +1,81 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from agentpress.response_processor import ResponseProcessor
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool import Tool, ToolResult, ToolProgress
+
+
+class StreamingMockTool(Tool):
+    async def long_action(self, steps: int = 3):
+        for i in range(steps):
+            yield self.progress_response(f"step {i}", output=f"line {i}\n")
+            await asyncio.sleep(0)
+        yield self.success_response("done")
+
+    async def no_result_action(self):
+        yield self.progress_response("working")
+
+    async def plain_action(self):
+        return self.success_response("plain")
+
+
+class TestToolStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = ResponseProcessor(
+            tool_registry=ToolRegistry(),
+            add_message_callback=MagicMock(),
+            trace=MagicMock()
+        )
+        self.tool = StreamingMockTool()
+        self.tool_call = {"function_name": "long_action", "xml_tag_name": "long-action", "arguments": {}}
+
+    def test_streaming_tool_progress_is_queued_and_result_returned(self):
+        async def run():
+            queue = asyncio.Queue()
+            result = await self.processor._consume_tool_output(self.tool.long_action(), self.tool_call, queue)
+            events = []
+            while not queue.empty():
+                events.append(queue.get_nowait())
+            return result, events
+
+        result, events = asyncio.run(run())
+        self.assertTrue(result.success)
+        self.assertEqual(result.output, "done")
+        self.assertEqual([progress.output for _, progress in events], ["line 0\n", "line 1\n", "line 2\n"])
+        self.assertTrue(all(isinstance(progress, ToolProgress) for _, progress in events))
+
+    def test_plain_tool_is_awaited(self):
+        result = asyncio.run(self.processor._consume_tool_output(self.tool.plain_action(), self.tool_call, None))
+        self.assertEqual(result.output, "plain")
+
+    def test_streaming_tool_without_result_fails(self):
+        result = asyncio.run(self.processor._consume_tool_output(self.tool.no_result_action(), self.tool_call, None))
+        self.assertFalse(result.success)
+
+    def test_forward_tool_progress_yields_transient_messages(self):
+        async def run():
+            queue = asyncio.Queue()
+            task = asyncio.create_task(
+                self.processor._consume_tool_output(self.tool.long_action(), self.tool_call, queue)
+            )
+            messages = [msg async for msg in self.processor._forward_tool_progress([task], queue, "thread-1", "run-1")]
+            return task.result(), messages
+
+        result, messages = asyncio.run(run())
+        self.assertIsInstance(result, ToolResult)
+        self.assertEqual(len(messages), 3)
+        for msg in messages:
+            self.assertIsNone(msg["message_id"])
+            self.assertEqual(msg["type"], "status")
+            content = json.loads(msg["content"])
+            self.assertEqual(content["status_type"], "tool_progress")
+            self.assertEqual(content["xml_tag_name"], "long-action")
+        self.processor.add_message.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from benchmarks.results import BenchmarkResults, compare, percentile
+
+
+class TestBenchmarkResults(unittest.TestCase):
+
+    def test_percentiles_use_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 95), 95)
+        self.assertEqual(percentile([7.0], 99), 7.0)
+
+    def test_compare_flags_regressions_in_the_worse_direction(self):
+        baseline = BenchmarkResults("sandbox")
+        baseline.add_samples("exec_rtt.docker_exec", [40.0] * 10)
+        baseline.add_value("upload.docker.1MiB", 200.0, "MiB/s")
+        baseline.add_value("download.docker.1MiB", 100.0, "MiB/s")
+
+        candidate = BenchmarkResults("sandbox")
+        candidate.add_samples("exec_rtt.docker_exec", [20.0] * 10)  # Faster
+        candidate.add_value("upload.docker.1MiB", 150.0, "MiB/s")  # Slower
+        candidate.add_value("download.docker.1MiB", 105.0, "MiB/s")  # Within threshold
+
+        rows = {row["name"]: row for row in compare(baseline.document, candidate.document, threshold_pct=10)}
+        self.assertFalse(rows["exec_rtt.docker_exec"]["regressed"])
+        self.assertAlmostEqual(rows["exec_rtt.docker_exec"]["change_pct"], -50.0)
+        self.assertTrue(rows["upload.docker.1MiB"]["regressed"])
+        self.assertFalse(rows["download.docker.1MiB"]["regressed"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+import urllib.request
+
+from benchmarks.browser_benchmark import FixtureServer, fixture_pages, parse_server_timing
+
+
+class TestBrowserBenchmark(unittest.TestCase):
+
+    def test_parse_server_timing(self):
+        stages = parse_server_timing("settle;dur=250.5, dom;dur=12.0, serialize;dur=0.8, total;dur=280.1")
+        self.assertEqual(stages, {"settle": 250.5, "dom": 12.0, "serialize": 0.8, "total": 280.1})
+        self.assertEqual(parse_server_timing(None), {})
+
+    def test_fixture_server_serves_pages_and_delayed_resources(self):
+        with FixtureServer(fixture_pages(table_rows=10, slow_ms=1)) as server:
+            with urllib.request.urlopen(f"{server.base_url}/table.html") as response:
+                self.assertEqual(response.read().decode().count("<tr>"), 11)  # Header and 10 rows
+            with urllib.request.urlopen(f"{server.base_url}/slow/1/hero.png") as response:
+                self.assertEqual(response.headers["Content-Type"], "image/png")
+
+
+if __name__ == '__main__':
+    unittest.main()
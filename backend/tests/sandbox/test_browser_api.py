@@ -0,0 +1,337 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+BROWSER_API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "sandbox", "docker"))
+if BROWSER_API_DIR not in sys.path:
+    sys.path.insert(0, BROWSER_API_DIR)
+try:
+    import browser_api
+except ImportError:  # Playwright and pytesseract are only installed in the sandbox image
+    browser_api = None
+
+
+class FakeContext:
+
+    def __init__(self):
+        self.closed = False
+
+    async def new_page(self):
+        return mock.MagicMock()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+
+    async def new_context(self, **kwargs):
+        return FakeContext()
+
+
+@unittest.skipIf(browser_api is None, "browser service dependencies are not installed")
+class TestBrowserSessions(unittest.TestCase):
+
+    def setUp(self):
+        self.automation = browser_api.BrowserAutomation()
+        self.automation.browser = FakeBrowser()
+
+    def _result_for(self, session_id):
+        token = browser_api.browser_session_id.set(session_id)
+        try:
+            return self.automation.build_action_result(True, "ok", None, None, "", {})
+        finally:
+            browser_api.browser_session_id.reset(token)
+
+    def test_reopened_session_reports_why_it_was_reset_once(self):
+        async def run():
+            await self.automation.open_session("thread-1")
+            await self.automation.close_session("thread-1", reason="idle")
+            await self.automation.open_session("thread-1")
+        asyncio.run(run())
+
+        self.assertEqual(self._result_for("thread-1").session_reset, "idle")
+        self.assertIsNone(self._result_for("thread-1").session_reset)
+
+    def test_evicting_the_least_recently_used_session_is_reported(self):
+        async def run():
+            with mock.patch.object(browser_api, "BROWSER_MAX_SESSIONS", 2):
+                first = await self.automation.open_session("thread-1")
+                await self.automation.open_session("thread-2")
+                first.last_used -= 10
+                await self.automation.open_session("thread-3")
+                await self.automation.open_session("thread-1")
+        asyncio.run(run())
+
+        self.assertNotIn("thread-2", self.automation.sessions)
+        self.assertEqual(self._result_for("thread-1").session_reset, "evicted")
+        self.assertIsNone(self._result_for("thread-3").session_reset)
+
+    def test_sessions_closed_on_request_are_not_reported(self):
+        async def run():
+            await self.automation.open_session("thread-1")
+            await self.automation.close_session_endpoint("thread-1")
+            await self.automation.open_session("thread-1")
+        asyncio.run(run())
+
+        self.assertIsNone(self._result_for("thread-1").session_reset)
+
+    def test_screenshot_settings_are_kept_per_session(self):
+        async def run():
+            await self.automation.open_session("thread-1")
+            await self.automation.open_session("thread-2")
+            token = browser_api.browser_session_id.set("thread-1")
+            try:
+                await self.automation.update_screenshot_settings(browser_api.ScreenshotSettings(format="webp"))
+            finally:
+                browser_api.browser_session_id.reset(token)
+
+        asyncio.run(run())
+        formats = []
+        for session_id in ("thread-1", "thread-2"):
+            token = browser_api.browser_session_id.set(session_id)
+            try:
+                formats.append(self.automation.current_screenshot_settings().format)
+            finally:
+                browser_api.browser_session_id.reset(token)
+        self.assertEqual(formats, ["webp", "jpeg"])
+
+
+class FakeResponse:
+
+    def __init__(self, status, headers=None, body=b""):
+        self.status = status
+        self.headers = headers or {}
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRoute:
+    """Playwright route serving one file of `size` bytes, honouring Range unless `ranges` is False"""
+
+    def __init__(self, size, request_headers=None, head_length=True, ranges=True):
+        self.size = size
+        self.request = mock.MagicMock(url="https://example.com/video.mp4", headers=request_headers or {})
+        self.head_length = head_length
+        self.ranges = ranges
+        self.fetches = []
+        self.outcome = None
+
+    async def fetch(self, method="GET", headers=None):
+        self.fetches.append((method, dict(headers or {})))
+        if method == "HEAD":
+            return FakeResponse(200, {"content-length": str(self.size)} if self.head_length else {})
+        span = browser_api.parse_byte_range(headers["range"]) if self.ranges else None
+        if span is None:
+            return FakeResponse(200, {"content-length": str(self.size)}, b"x" * self.size)
+        start, end = span[0], min(span[1], self.size - 1)
+        return FakeResponse(206, {"content-range": f"bytes {start}-{end}/{self.size}"}, b"x" * (end - start + 1))
+
+    async def continue_(self):
+        self.outcome = ("continue",)
+
+    async def abort(self, error_code):
+        self.outcome = ("abort", error_code)
+
+    async def fulfill(self, status, headers, body):
+        self.outcome = ("fulfill", status, len(body), headers)
+
+
+@unittest.skipIf(browser_api is None, "browser service dependencies are not installed")
+class TestRoutingPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.automation = browser_api.BrowserAutomation()
+        self.session = browser_api.BrowserSession(id="thread-1", context=None)
+
+    def _fetch_capped(self, route, max_bytes=1000):
+        asyncio.run(self.automation.fetch_capped(self.session, route, max_bytes))
+        return route.outcome
+
+    def test_blocked_domains_include_subdomains_only(self):
+        policy = browser_api.RoutingPolicy(blocked_domains=["example.com"])
+        self.assertEqual(policy.block_reason("script", "cdn.example.com"), "domain:example.com")
+        self.assertEqual(policy.block_reason("script", "example.com"), "domain:example.com")
+        self.assertIsNone(policy.block_reason("script", "notexample.com"))
+
+    def test_text_only_blocks_heavy_resource_types(self):
+        policy = browser_api.RoutingPolicy(text_only=True)
+        self.assertEqual(policy.block_reason("image", "example.com"), "type:image")
+        self.assertEqual(policy.block_reason("font", "example.com"), "type:font")
+        self.assertIsNone(policy.block_reason("document", "example.com"))
+        self.assertIsNone(policy.block_reason("xhr", "example.com"))
+
+    def test_trackers_are_blocked_only_when_asked(self):
+        self.assertIsNone(browser_api.RoutingPolicy().block_reason("script", "www.google-analytics.com"))
+        policy = browser_api.RoutingPolicy(block_trackers=True)
+        self.assertEqual(policy.block_reason("script", "www.google-analytics.com"), "domain:google-analytics.com")
+        self.assertFalse(policy.is_empty())
+
+    def test_parse_byte_range(self):
+        self.assertEqual(browser_api.parse_byte_range("bytes=0-"), (0, None))
+        self.assertEqual(browser_api.parse_byte_range("bytes=100-199"), (100, 199))
+        self.assertIsNone(browser_api.parse_byte_range("bytes=-500"))
+        self.assertIsNone(browser_api.parse_byte_range("bytes=0-10, 20-30"))
+
+    def test_size_reported_by_head_decides_without_downloading(self):
+        small = FakeRoute(500)
+        self.assertEqual(self._fetch_capped(small), ("continue",))
+        large = FakeRoute(5000)
+        self.assertEqual(self._fetch_capped(large), ("abort", "blockedbyclient"))
+        self.assertEqual([method for method, _ in small.fetches + large.fetches], ["HEAD", "HEAD"])
+        self.assertEqual((self.session.requests_blocked, self.session.bytes_saved), (1, 5000))
+
+    def test_unknown_size_fetches_at_most_the_cap(self):
+        route = FakeRoute(5000, head_length=False)
+        self.assertEqual(self._fetch_capped(route), ("abort", "blockedbyclient"))
+        self.assertEqual(route.fetches[1][1]["range"], "bytes=0-999")
+        self.assertEqual(self.session.bytes_saved, 4000)
+
+        route = FakeRoute(500, head_length=False)
+        status, length = self._fetch_capped(route)[1:3]
+        self.assertEqual((status, length), (200, 500))
+
+    def test_page_ranges_are_clamped_to_the_cap(self):
+        route = FakeRoute(5000, request_headers={"range": "bytes=0-"}, head_length=False)
+        self.assertEqual(self._fetch_capped(route), ("abort", "blockedbyclient"))
+        self.assertEqual(route.fetches[1][1]["range"], "bytes=0-999")
+
+        route = FakeRoute(800, request_headers={"range": "bytes=100-"}, head_length=False)
+        status, length, headers = self._fetch_capped(route)[1:]
+        self.assertEqual((status, length, headers["content-range"]), (206, 700, "bytes 100-799/800"))
+
+    def test_origin_ignoring_ranges_is_capped_by_its_full_size(self):
+        route = FakeRoute(5000, head_length=False, ranges=False)
+        self.assertEqual(self._fetch_capped(route), ("abort", "blockedbyclient"))
+
+
+
+def tracked(index, text="", y=0):
+    """Element description as reported by DOM_TRACKER_JS"""
+    return {"index": index, "tagName": "button", "text": text, "attributes": {}, "isVisible": True,
+            "isInteractive": True, "isInViewport": True,
+            "pageCoordinates": {"x": 10, "y": y, "width": 100, "height": 20}}
+
+
+def snapshot(version, full=False, added=(), changed=(), removed=(), order=None, mutated=True,
+             document_id="doc-1", scroll_y=0):
+    result = {"documentId": document_id, "version": version, "full": full, "mutated": mutated,
+              "scroll": {"x": 0, "y": scroll_y}, "added": list(added), "changed": list(changed),
+              "removed": list(removed)}
+    if order is not None:
+        result["order"] = order
+    return result
+
+
+@unittest.skipIf(browser_api is None, "browser service dependencies are not installed")
+class TestDOMSnapshotCache(unittest.TestCase):
+
+    def test_incremental_snapshots_patch_the_selector_map(self):
+        cache = browser_api.DOMSnapshotCache()
+        self.assertEqual(cache.since(), {"documentId": None, "version": None})
+
+        cache.apply(snapshot(1, full=True, added=[tracked(1, "Home"), tracked(2, "Cart"), tracked(3, "Pay")],
+                             order=[1, 2, 3]))
+        self.assertEqual(cache.since(), {"documentId": "doc-1", "version": 1})
+        self.assertEqual(list(cache.selector_map()), [1, 2, 3])
+        cache.clickable_elements_to_string()
+        home_line = cache._lines[1]
+
+        cache.apply(snapshot(2, added=[tracked(4, "Help")], order=[1, 4, 2, 3]))
+        self.assertEqual(list(cache.selector_map()), [1, 4, 2, 3])
+        self.assertIs(cache._lines[1], home_line)  # Unchanged elements keep their formatted line
+
+        cache.apply(snapshot(3, changed=[tracked(3, "Checkout")], removed=[2]))
+        self.assertEqual(list(cache.selector_map()), [1, 4, 3])  # Removal without a new order
+        text = cache.clickable_elements_to_string()
+        self.assertIn("Checkout", text)
+        self.assertNotIn("Cart", text)
+        self.assertEqual(cache.epoch, 3)
+
+        cache.apply(snapshot(4, order=[3, 1, 4], mutated=False))
+        self.assertEqual(list(cache.selector_map()), [3, 1, 4])
+        self.assertEqual(cache.epoch, 3)  # Nothing on the page changed
+        self.assertEqual(cache.since(), {"documentId": "doc-1", "version": 4})
+
+        # A new document is always reported in full and replaces everything
+        cache.apply(snapshot(1, full=True, added=[tracked(1, "Sign in")], order=[1], document_id="doc-2"))
+        self.assertEqual(list(cache.selector_map()), [1])
+        self.assertIn("Sign in", cache.clickable_elements_to_string())
+        self.assertEqual(cache.since(), {"documentId": "doc-2", "version": 1})
+
+    def test_viewport_coordinates_follow_the_scroll_position(self):
+        node = browser_api.element_node_from_snapshot(tracked(5, "Buy", y=1200), {"x": 0, "y": 1000})
+        self.assertEqual((node.page_coordinates.x, node.page_coordinates.y), (10, 1200))
+        self.assertEqual((node.viewport_coordinates.x, node.viewport_coordinates.y), (10, 200))
+        self.assertEqual((node.viewport_coordinates.width, node.viewport_coordinates.height), (100, 20))
+        self.assertEqual(node.highlight_index, 5)
+        self.assertEqual([child.text for child in node.children], ["Buy"])
+
+        bare = browser_api.element_node_from_snapshot({"index": 6}, {"x": 0, "y": 0})
+        self.assertIsNone(bare.page_coordinates)
+        self.assertIsNone(bare.viewport_coordinates)
+        self.assertEqual(bare.children, [])
+
+
+@unittest.skipIf(browser_api is None, "browser service dependencies are not installed")
+class TestDOMTrackerInChromium(unittest.TestCase):
+    """DOM_TRACKER_JS in a real page; skipped where Chromium is not installed."""
+
+    def test_tracker_reports_only_what_changed(self):
+        async def run():
+            from playwright.async_api import async_playwright
+            async with async_playwright() as playwright:
+                try:
+                    browser = await playwright.chromium.launch(headless=True)
+                except Exception as e:
+                    self.skipTest(f"Chromium is not available: {e}")
+                try:
+                    page = await browser.new_page()
+                    await page.set_content('<button id="b1">Home</button><button id="b2">Cart</button>'
+                                           '<button id="b3">Pay</button><div id="plain">text</div>')
+                    cache = browser_api.DOMSnapshotCache()
+                    full = await page.evaluate(browser_api.DOM_TRACKER_JS, cache.since())
+                    cache.apply(full)
+
+                    await page.evaluate("""() => {
+                        document.getElementById('b2').remove();
+                        document.getElementById('b3').textContent = 'Checkout';
+                        document.body.insertAdjacentHTML('beforeend', '<a id="l1" href="/more">More</a>');
+                    }""")
+                    incremental = await page.evaluate(browser_api.DOM_TRACKER_JS, cache.since())
+                    cache.apply(incremental)
+
+                    unchanged = await page.evaluate(browser_api.DOM_TRACKER_JS, cache.since())
+
+                    await page.set_content('<button>Sign in</button>')
+                    reloaded = await page.evaluate(browser_api.DOM_TRACKER_JS, cache.since())
+                    return full, incremental, unchanged, reloaded, cache
+                finally:
+                    await browser.close()
+
+        full, incremental, unchanged, reloaded, cache = asyncio.run(run())
+
+        self.assertTrue(full["full"])
+        self.assertEqual([el["text"] for el in full["added"]], ["Home", "Cart", "Pay"])
+        home, cart, pay = (el["index"] for el in full["added"])
+
+        self.assertFalse(incremental["full"])
+        self.assertEqual(incremental["removed"], [cart])
+        self.assertEqual([(el["index"], el["text"]) for el in incremental["changed"]], [(pay, "Checkout")])
+        self.assertEqual([el["tagName"] for el in incremental["added"]], ["a"])
+        self.assertEqual(list(cache.selector_map()), [home, pay, incremental["added"][0]["index"]])
+
+        self.assertFalse(unchanged["mutated"])
+        self.assertEqual((unchanged["added"], unchanged["changed"], unchanged["removed"]), ([], [], []))
+
+        self.assertTrue(reloaded["full"])
+        self.assertNotEqual(reloaded["documentId"], full["documentId"])
+        self.assertEqual([el["text"] for el in reloaded["added"]], ["Sign in"])
+
+
+if __name__ == '__main__':
+    unittest.main()
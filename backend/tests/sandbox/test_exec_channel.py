@@ -0,0 +1,161 @@
+import asyncio
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from sandbox import exec_channel
+from sandbox.exec_channel import ExecChannelClient, ExecChannelError
+
+AGENT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'sandbox', 'docker', 'exec_agent.py')
+
+
+def _load_exec_agent():
+    spec = importlib.util.spec_from_file_location("exec_agent", AGENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestExecChannel(unittest.TestCase):
+    """Runs the real in-sandbox exec agent on a local port and talks to it through the client."""
+
+    def setUp(self):
+        self.exec_agent = _load_exec_agent()
+        self.exec_agent.TOKEN = "secret"
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _with_agent(self, scenario, token="secret"):
+        async def run():
+            server = await asyncio.start_server(self.exec_agent._on_connect, "127.0.0.1", 0, limit=self.exec_agent.FRAME_LIMIT)
+            port = server.sockets[0].getsockname()[1]
+            client = ExecChannelClient("127.0.0.1", port, token)
+            try:
+                return await scenario(client)
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(run())
+
+    def test_run_returns_output_and_exit_code(self):
+        async def scenario(client):
+            return await client.run("echo hello && echo oops >&2 && exit 3", cwd=self.tmpdir.name)
+
+        stdout, stderr, exit_code = self._with_agent(scenario)
+        self.assertEqual(stdout, "hello\n")
+        self.assertEqual(stderr, "oops\n")
+        self.assertEqual(exit_code, 3)
+
+    def test_concurrent_requests_are_multiplexed_on_one_connection(self):
+        async def scenario(client):
+            results = await asyncio.gather(*[
+                client.run(f"sleep 0.{3 - i % 3}; echo {i}", cwd=self.tmpdir.name) for i in range(6)
+            ])
+            return [stdout.strip() for stdout, _, _ in results]
+
+        self.assertEqual(self._with_agent(scenario), [str(i) for i in range(6)])
+
+    def test_file_operations(self):
+        path = os.path.join(self.tmpdir.name, "nested", "a.txt")
+
+        async def scenario(client):
+            await client.write_file(path, b"content")
+            data = await client.read_file(path)
+            info = await client.stat(path)
+            entries = await client.list_dir(os.path.dirname(path))
+            return data, info, entries
+
+        data, info, entries = self._with_agent(scenario)
+        self.assertEqual(data, b"content")
+        self.assertEqual(info["type"], "file")
+        self.assertEqual(info["size"], 7)
+        self.assertEqual([e["name"] for e in entries], ["a.txt"])
+
+    def test_large_files_are_read_in_chunks(self):
+        path = os.path.join(self.tmpdir.name, "big.bin")
+        content = os.urandom(10_000)
+        with open(path, "wb") as f:
+            f.write(content)
+        self.exec_agent.READ_FILE_MAX_CHUNK = 4096
+
+        async def scenario(client):
+            with mock.patch.object(exec_channel, "READ_FILE_CHUNK", 3000):
+                data = await client.read_file(path)
+            # A whole-file read past the agent's limit is refused instead of sent as one huge frame
+            with self.assertRaises(ExecChannelError):
+                await client._call("read_file", path=path)
+            return data, await client.run("echo still connected", cwd=self.tmpdir.name)
+
+        data, (stdout, _, _) = self._with_agent(scenario)
+        self.assertEqual(data, content)
+        self.assertEqual(stdout, "still connected\n")
+
+    def test_abandoned_command_is_killed(self):
+        pid_file = os.path.join(self.tmpdir.name, "pid")
+
+        async def scenario(client):
+            asyncio.create_task(client.run(f"echo $$ > {pid_file}; exec sleep 30", cwd=self.tmpdir.name))
+            for _ in range(50):
+                if os.path.exists(pid_file) and os.path.getsize(pid_file):
+                    break
+                await asyncio.sleep(0.02)
+            await client.close()  # The agent cancels the connection's requests
+            await asyncio.sleep(0.2)
+            with open(pid_file) as f:
+                return int(f.read())
+
+        pid = self._with_agent(scenario)
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+
+    def test_run_timeout(self):
+        async def scenario(client):
+            return await client.run("sleep 5", cwd=self.tmpdir.name, timeout=0.2)
+
+        _, stderr, exit_code = self._with_agent(scenario)
+        self.assertEqual(exit_code, -1)
+        self.assertIn("timed out", stderr)
+
+    def test_unresponsive_agent_raises_exec_channel_error(self):
+        async def silent_agent(reader, writer):
+            await reader.readline()
+            writer.write(b'{"id": 0, "event": "result"}\n')  # Accepts the connection, then never answers
+            await writer.drain()
+            await reader.read()
+
+        async def run():
+            server = await asyncio.start_server(silent_agent, "127.0.0.1", 0)
+            client = ExecChannelClient("127.0.0.1", server.sockets[0].getsockname()[1], "secret")
+            try:
+                with self.assertRaises(ExecChannelError):
+                    await client._call("stat", wait_timeout=0.1, path=self.tmpdir.name)
+            finally:
+                await client.close()
+                server.close()
+
+        asyncio.run(run())
+
+    def test_bad_token_is_rejected(self):
+        async def scenario(client):
+            await client.run("echo hi", cwd=self.tmpdir.name)
+
+        with self.assertRaises(ExecChannelError):
+            self._with_agent(scenario, token="wrong")
+
+    def test_agent_without_a_token_rejects_every_connection(self):
+        self.exec_agent.TOKEN = ""
+
+        async def scenario(client):
+            await client.run("echo hi", cwd=self.tmpdir.name)
+
+        with self.assertRaises(ExecChannelError):
+            self._with_agent(scenario, token="")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from sandbox.api import _parse_range_header, _stream_file_response
+
+CONTENT = bytes(range(256)) * 4  # 1 KiB
+
+
+class FakeFileSystem:
+    """Serves CONTENT like LocalDockerFileSystemWrapper, recording every range that is streamed."""
+
+    def __init__(self):
+        self.streamed_ranges = []
+
+    async def get_file_info_async(self, path):
+        return {"path": path, "type": "file", "size": len(CONTENT), "mtime": 1700000000.25}
+
+    async def stream_file_async(self, path, offset=0, length=None):
+        self.streamed_ranges.append((offset, length))
+        end = len(CONTENT) if length is None else offset + length
+        for position in range(offset, end, 100):
+            yield CONTENT[position:min(position + 100, end)]
+
+
+class TestRangeHeader(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(_parse_range_header("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(_parse_range_header("bytes=900-", 1000), (900, 999))
+        self.assertEqual(_parse_range_header("bytes=-100", 1000), (900, 999))
+        self.assertEqual(_parse_range_header("bytes=-5000", 1000), (0, 999))
+        self.assertEqual(_parse_range_header("bytes=990-2000", 1000), (990, 999))
+
+    def test_ignored_ranges(self):
+        self.assertIsNone(_parse_range_header("items=0-1", 1000))
+        self.assertIsNone(_parse_range_header("bytes=0-1,5-6", 1000))
+        self.assertIsNone(_parse_range_header("bytes=abc", 1000))
+        self.assertIsNone(_parse_range_header("bytes=10-5", 1000))
+
+    def test_unsatisfiable_ranges(self):
+        with self.assertRaises(ValueError):
+            _parse_range_header("bytes=1000-", 1000)
+        with self.assertRaises(ValueError):
+            _parse_range_header("bytes=-0", 1000)
+
+
+class TestStreamFileResponse(unittest.TestCase):
+
+    def setUp(self):
+        self.sandbox = mock.MagicMock()
+        self.sandbox.fs = FakeFileSystem()
+
+    def _respond(self, headers):
+        request = mock.MagicMock()
+        request.headers = {name.lower(): value for name, value in headers.items()}
+
+        async def run():
+            response = await _stream_file_response(self.sandbox, "sandbox_1", "/workspace/data.bin", request, "attachment")
+            body = b""
+            if hasattr(response, "body_iterator"):
+                async for chunk in response.body_iterator:
+                    body += chunk
+            return response, body
+
+        return asyncio.run(run())
+
+    def test_full_download_is_streamed_with_etag(self):
+        response, body = self._respond({})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+        self.assertEqual(response.headers["content-length"], str(len(CONTENT)))
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+        self.assertTrue(response.headers["etag"].startswith('"'))
+
+    def test_range_request_reads_only_the_range(self):
+        response, body = self._respond({"Range": "bytes=-100"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, CONTENT[-100:])
+        self.assertEqual(response.headers["content-range"], f"bytes {len(CONTENT) - 100}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        self.assertEqual(self.sandbox.fs.streamed_ranges, [(len(CONTENT) - 100, 100)])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self._respond({})[0].headers["etag"]
+        self.sandbox.fs.streamed_ranges.clear()
+
+        response, body = self._respond({"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.sandbox.fs.streamed_ranges, [])
+
+    def test_stale_if_range_sends_whole_file(self):
+        response, body = self._respond({"Range": "bytes=0-9", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+
+    def test_unsatisfiable_range(self):
+        response, _ = self._respond({"Range": f"bytes={len(CONTENT)}-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], f"bytes */{len(CONTENT)}")
+
+
+if __name__ == '__main__':
+    unittest.main()
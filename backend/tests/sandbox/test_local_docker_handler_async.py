@@ -0,0 +1,101 @@
+import asyncio
+import socket
+import struct
+import time
+import unittest
+from unittest import mock
+
+patch_target_docker = 'sandbox.local_docker_handler.docker'
+EXEC_SECONDS = 0.5
+
+
+def _slow_exec_run(*args, **kwargs):
+    # Simulates a blocking docker-py exec_run call
+    time.sleep(EXEC_SECONDS)
+    return (0, (b"ok", b""))
+
+
+@mock.patch(patch_target_docker)
+@mock.patch('sandbox.local_docker_handler.logger', mock.MagicMock())
+class TestLocalDockerHandlerAsync(unittest.TestCase):
+
+    def setUp(self):
+        from sandbox import local_docker_handler
+        self.local_docker_handler = local_docker_handler
+        self.mock_client = mock.MagicMock()
+        self.mock_container = mock.MagicMock()
+        self.mock_container.exec_run.side_effect = _slow_exec_run
+        self.mock_client.containers.get.return_value = self.mock_container
+        local_docker_handler.client = self.mock_client
+
+    def tearDown(self):
+        self.local_docker_handler.client = None
+
+    def test_concurrent_execs_do_not_block_each_other_or_the_loop(self, passed_docker_mock):
+        passed_docker_mock.errors.DockerException = Exception
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker_task = asyncio.create_task(ticker())
+            start = time.monotonic()
+            results = await asyncio.gather(*[
+                self.local_docker_handler.execute_command_in_container_async(f"container_{i}", "echo ok")
+                for i in range(4)
+            ])
+            elapsed = time.monotonic() - start
+            ticker_task.cancel()
+            return results, elapsed, ticks
+
+        results, elapsed, ticks = asyncio.run(run())
+        self.assertEqual(results, [("ok", "", 0)] * 4)
+        # Four 0.5s execs run side by side instead of taking 2s back to back
+        self.assertLess(elapsed, EXEC_SECONDS * 2)
+        # The event loop kept running other coroutines while the execs were in flight
+        self.assertGreater(ticks, 10)
+
+    def test_exec_timeout_returns_error_result(self, passed_docker_mock):
+        passed_docker_mock.errors.DockerException = Exception
+
+        stdout, stderr, exit_code = asyncio.run(
+            self.local_docker_handler.execute_command_in_container_async("container_t", "sleep 10", timeout_seconds=0.1)
+        )
+        self.assertIsNone(stdout)
+        self.assertEqual(exit_code, -1)
+        self.assertIn("timed out", stderr)
+
+    def test_aborted_file_stream_closes_the_exec_socket(self, passed_docker_mock):
+        exec_socket, docker_end = socket.socketpair()
+        for chunk in (b"first", b"second"):
+            docker_end.sendall(struct.pack('>BxxxL', 1, len(chunk)) + chunk)  # Multiplexed stdout frames
+        self.mock_client.api.exec_create.return_value = {'Id': 'exec_1'}
+        self.mock_client.api.exec_start.return_value = exec_socket
+
+        async def run():
+            chunks = self.local_docker_handler.stream_file_from_container_async("container_1", "/workspace/big.bin")
+            first = await chunks.__anext__()
+            await chunks.aclose()  # The client went away mid-download
+            return first
+
+        self.assertEqual(asyncio.run(run()), b"first")
+        self.mock_client.api.exec_start.assert_called_once_with('exec_1', socket=True)
+        self.assertEqual(exec_socket.fileno(), -1)
+        docker_end.close()
+
+    def test_status_async(self, passed_docker_mock):
+        passed_docker_mock.errors.DockerException = Exception
+        self.mock_container.status = "running"
+
+        status = asyncio.run(self.local_docker_handler.get_sandbox_container_status_async("container_s"))
+        self.assertEqual(status, "running")
+        self.mock_client.containers.get.assert_called_with("container_s")
+
+
+if __name__ == '__main__':
+    unittest.main()
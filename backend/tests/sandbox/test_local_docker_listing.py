@@ -0,0 +1,105 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+patch_target_docker = 'sandbox.local_docker_handler.docker'
+
+
+@unittest.skipIf(shutil.which("find") is None, "find is not installed")
+@mock.patch(patch_target_docker)
+@mock.patch('sandbox.local_docker_handler.logger', mock.MagicMock())
+class TestListFilesInContainer(unittest.TestCase):
+    """Runs the generated find command on a host directory in place of the container."""
+
+    def setUp(self):
+        from sandbox import local_docker_handler
+        self.local_docker_handler = local_docker_handler
+        self.tmpdir = tempfile.TemporaryDirectory()
+        root = self.tmpdir.name
+        os.makedirs(os.path.join(root, "src", "lib"))
+        os.makedirs(os.path.join(root, "node_modules", "react"))
+        with open(os.path.join(root, "src", "main.py"), "w") as f:
+            f.write("print('hi')\n")
+        with open(os.path.join(root, "src", "lib", "util.py"), "w") as f:
+            f.write("")
+        with open(os.path.join(root, "node_modules", "react", "index.js"), "w") as f:
+            f.write("")
+        with open(os.path.join(root, "name with spaces.txt"), "w") as f:
+            f.write("abc")
+
+        def exec_run(cmd, workdir, demux):
+            completed = subprocess.run(cmd, capture_output=True)
+            return completed.returncode, (completed.stdout, completed.stderr)
+
+        self.mock_container = mock.MagicMock()
+        self.mock_container.exec_run.side_effect = exec_run
+        self.mock_client = mock.MagicMock()
+        self.mock_client.containers.get.return_value = self.mock_container
+        local_docker_handler.client = self.mock_client
+
+    def tearDown(self):
+        self.local_docker_handler.client = None
+        self.tmpdir.cleanup()
+
+    def _relative_paths(self, entries):
+        return [entry["path"][len(self.tmpdir.name) + 1:] for entry in entries]
+
+    def test_single_level_listing_returns_structured_records(self, passed_docker_mock):
+        passed_docker_mock.errors.NotFound = type('NotFound', (Exception,), {})
+        entries = self.local_docker_handler.list_files_in_container("container_1", self.tmpdir.name)
+
+        self.assertEqual(self._relative_paths(entries), ["name with spaces.txt", "node_modules", "src"])
+        by_name = {entry["name"]: entry for entry in entries}
+        self.assertEqual(by_name["name with spaces.txt"]["type"], "file")
+        self.assertEqual(by_name["name with spaces.txt"]["size"], 3)
+        self.assertEqual(by_name["src"]["type"], "directory")
+        self.assertIsInstance(by_name["src"]["mtime"], float)
+        self.assertEqual(by_name["src"]["mode"], os.stat(os.path.join(self.tmpdir.name, "src")).st_mode & 0o7777)
+
+    def test_recursive_listing_prunes_excluded_directories(self, passed_docker_mock):
+        passed_docker_mock.errors.NotFound = type('NotFound', (Exception,), {})
+        entries = self.local_docker_handler.list_files_in_container(
+            "container_1", self.tmpdir.name, max_depth=None, prune_dirs={"node_modules"}
+        )
+
+        self.assertEqual(self._relative_paths(entries), [
+            "name with spaces.txt", "node_modules", "src", "src/lib", "src/lib/util.py", "src/main.py"
+        ])
+        self.assertEqual({entry["name"]: entry["depth"] for entry in entries}["util.py"], 3)
+
+    def test_depth_limit(self, passed_docker_mock):
+        passed_docker_mock.errors.NotFound = type('NotFound', (Exception,), {})
+        entries = self.local_docker_handler.list_files_in_container("container_1", self.tmpdir.name, max_depth=2)
+
+        self.assertIn("src/main.py", self._relative_paths(entries))
+        self.assertNotIn("src/lib/util.py", self._relative_paths(entries))
+
+    @unittest.skipIf(shutil.which("awk") is None, "awk is not installed")
+    def test_pages_are_cut_inside_the_container(self, passed_docker_mock):
+        passed_docker_mock.errors.NotFound = type('NotFound', (Exception,), {})
+        with open(os.path.join(self.tmpdir.name, "src", "logo.PNG"), "w") as f:
+            f.write("")
+
+        def list_page(after):
+            return self.local_docker_handler.list_files_in_container(
+                "container_1", self.tmpdir.name, max_depth=None, prune_dirs={"node_modules"},
+                skip_files={"*.png"}, after=after, limit=3
+            )
+
+        first = self._relative_paths(list_page(None))
+        second = self._relative_paths(list_page(os.path.join(self.tmpdir.name, first[-1])))
+
+        self.assertEqual(first, ["name with spaces.txt", "node_modules", "src"])
+        self.assertEqual(second, ["src/lib", "src/lib/util.py", "src/main.py"])
+        self.assertEqual(list_page(os.path.join(self.tmpdir.name, "src/main.py")), [])
+        self.assertEqual(list_page(self.tmpdir.name + "0"), [])  # Sorts after everything under the directory
+        command = self.mock_container.exec_run.call_args_list[0].kwargs['cmd']
+        self.assertEqual(command[:2], ['sh', '-c'])
+        self.assertIn("head -z -n 3", command[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
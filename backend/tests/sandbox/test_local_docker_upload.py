@@ -0,0 +1,78 @@
+import io
+import tarfile
+import unittest
+from unittest import mock
+
+patch_target_docker = 'sandbox.local_docker_handler.docker'
+
+
+class TrackingReader(io.BytesIO):
+    """BytesIO that records the largest single read, to check uploads are streamed."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.largest_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.largest_read = max(self.largest_read, len(chunk))
+        return chunk
+
+
+@mock.patch(patch_target_docker)
+@mock.patch('sandbox.local_docker_handler.logger', mock.MagicMock())
+class TestPutFilesInContainer(unittest.TestCase):
+
+    def setUp(self):
+        from sandbox import local_docker_handler
+        self.local_docker_handler = local_docker_handler
+        self.mock_container = mock.MagicMock()
+        self.archives = []
+
+        def put_archive(path, data):
+            # Consume the stream like the Docker API client would
+            self.archives.append((path, b"".join(data)))
+            return True
+
+        self.mock_container.put_archive.side_effect = put_archive
+        self.mock_client = mock.MagicMock()
+        self.mock_client.containers.get.return_value = self.mock_container
+        local_docker_handler.client = self.mock_client
+
+    def tearDown(self):
+        self.local_docker_handler.client = None
+
+    def test_multiple_files_go_into_one_archive(self, passed_docker_mock):
+        passed_docker_mock.errors.NotFound = type('NotFound', (Exception,), {})
+        big_content = b"x" * (self.local_docker_handler.TAR_CHUNK_SIZE * 3 + 17)
+        reader = TrackingReader(big_content)
+
+        result = self.local_docker_handler.put_files_in_container("container_1", [
+            ("/workspace/a.txt", b"hello"),
+            ("/workspace/nested/dir/b.bin", reader),
+        ])
+
+        self.assertTrue(result)
+        self.assertEqual(len(self.archives), 1)
+        path, data = self.archives[0]
+        self.assertEqual(path, '/')
+
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            members = {member.name: member for member in tar.getmembers()}
+            # Only files: directory entries would reset existing directories' mode and owner
+            self.assertEqual(sorted(members), ["workspace/a.txt", "workspace/nested/dir/b.bin"])
+            self.assertEqual(tar.extractfile("workspace/a.txt").read(), b"hello")
+            self.assertEqual(tar.extractfile("workspace/nested/dir/b.bin").read(), big_content)
+
+        # The file object was read in bounded chunks, never as a whole
+        self.assertLessEqual(reader.largest_read, self.local_docker_handler.TAR_CHUNK_SIZE)
+
+    def test_missing_container_returns_false(self, passed_docker_mock):
+        passed_docker_mock.errors.NotFound = type('NotFound', (Exception,), {})
+        self.mock_client.containers.get.side_effect = passed_docker_mock.errors.NotFound()
+
+        self.assertFalse(self.local_docker_handler.put_files_in_container("missing", [("/workspace/a.txt", b"a")]))
+
+
+if __name__ == '__main__':
+    unittest.main()
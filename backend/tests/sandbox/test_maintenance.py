@@ -0,0 +1,154 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+from sandbox.maintenance import Checkpoint, RateLimiter, run_maintenance
+
+
+class FakeProjectsQuery:
+    """Evaluates the subset of the PostgREST query builder used by fetch_project_page on a list of rows."""
+
+    def __init__(self, table):
+        self.table = table
+        self.filters = []
+        self.page_size = None
+
+    def select(self, *columns):
+        return self
+
+    @property
+    def not_(self):
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None)
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, page_size):
+        self.page_size = page_size
+        return self
+
+    async def execute(self):
+        self.table.queries += 1
+        if self.table.fail_on_query == self.table.queries:
+            raise ConnectionError("connection lost")
+        rows = sorted((row for row in self.table.rows if all(f(row) for f in self.filters)), key=lambda row: row['project_id'])
+        return SimpleNamespace(data=rows[:self.page_size])
+
+
+class FakeClient:
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+        self.fail_on_query = None
+
+    def table(self, name):
+        return FakeProjectsQuery(self)
+
+
+def _projects(count):
+    return [
+        {'project_id': f'p{i:03d}', 'account_id': 'a1' if i % 2 else 'a2',
+         'sandbox': {'id': f'sb{i:03d}', 'type': 'local_docker'}}
+        for i in range(count)
+    ] + [{'project_id': 'p999', 'account_id': 'a1', 'sandbox': None}]
+
+
+class TestRunMaintenance(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_pages_through_all_projects_with_bounded_concurrency(self):
+        client = FakeClient(_projects(25))
+        in_flight = {"now": 0, "max": 0}
+        processed = []
+
+        async def operation(project):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            processed.append(project['project_id'])
+            return project['project_id'] != 'p003'
+
+        stats = asyncio.run(run_maintenance(
+            client, operation, "archive", concurrency=3, page_size=10,
+            select=lambda project: project['account_id'] == 'a1', rate_limits={'local_docker': 0}
+        ))
+
+        self.assertEqual(sorted(processed), [f'p{i:03d}' for i in range(1, 25, 2)])
+        self.assertEqual(in_flight["max"], 3)
+        self.assertEqual((stats.scanned, stats.selected, stats.succeeded, stats.failed), (25, 12, 11, 1))
+        self.assertEqual(stats.failed_project_ids, ['p003'])
+        self.assertGreater(stats.throughput, 0)
+
+    def test_interrupted_sweep_resumes_from_checkpoint(self):
+        client = FakeClient(_projects(25))
+        checkpoint = Checkpoint(os.path.join(self.tmpdir.name, "sweep.json"))
+        processed = []
+
+        async def operation(project):
+            processed.append(project['project_id'])
+            return True
+
+        # The third page query fails: the first two pages are done and checkpointed
+        client.fail_on_query = 3
+        with self.assertRaises(ConnectionError):
+            asyncio.run(run_maintenance(client, operation, "delete", page_size=10, checkpoint=checkpoint,
+                                        rate_limits={'local_docker': 0}))
+        self.assertEqual(checkpoint.load()["last_project_id"], 'p019')
+        self.assertEqual(len(processed), 20)
+
+        client.fail_on_query = None
+        stats = asyncio.run(run_maintenance(client, operation, "delete", page_size=10, checkpoint=checkpoint,
+                                            rate_limits={'local_docker': 0}))
+        self.assertEqual(sorted(processed), [f'p{i:03d}' for i in range(25)])
+        self.assertEqual(stats.succeeded, 25)
+        self.assertIsNone(checkpoint.load())
+
+    def test_dry_run_does_not_call_the_operation(self):
+        client = FakeClient(_projects(5))
+
+        async def operation(project):
+            raise AssertionError("must not run")
+
+        stats = asyncio.run(run_maintenance(client, operation, "archive", dry_run=True))
+        self.assertEqual(stats.succeeded, 5)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_acquisitions_are_spaced_by_rate(self):
+        limiter = RateLimiter(rate=50, burst=1)
+
+        async def run():
+            start = time.monotonic()
+            for _ in range(6):
+                await limiter.acquire()
+            return time.monotonic() - start
+
+        # First token is available immediately, the other five wait 20ms each
+        self.assertGreaterEqual(asyncio.run(run()), 0.09)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from unittest import mock
+
+patch_target_docker = 'sandbox.local_docker_handler.docker'
+
+GB = 1024 * 1024 * 1024
+
+
+def _sandbox(profile):
+    container = mock.MagicMock()
+    container.attrs = {'Labels': {'managed_by': 'agentpress_local_sandbox', 'resource_profile': profile}}
+    return container
+
+
+@mock.patch(patch_target_docker)
+@mock.patch('sandbox.local_docker_handler.logger', mock.MagicMock())
+class TestResourceProfiles(unittest.TestCase):
+
+    def setUp(self):
+        from sandbox import local_docker_handler
+        self.local_docker_handler = local_docker_handler
+        self.running = []
+        self.mock_client = mock.MagicMock()
+        # 10 GB host: 9 GB left for sandboxes after the 1 GB reservation
+        self.mock_client.info.return_value = {'MemTotal': 10 * GB, 'NCPU': 4}
+        self.mock_client.containers.list.side_effect = lambda **kwargs: list(self.running)
+        self.mock_client.containers.run.return_value.ports = {}
+        local_docker_handler.client = self.mock_client
+
+    def tearDown(self):
+        self.local_docker_handler.client = None
+
+    def test_profile_limits_are_applied_at_container_start(self, passed_docker_mock):
+        info = self.local_docker_handler.start_sandbox_container("img", {}, project_id="p1", resource_profile="small")
+
+        kwargs = self.mock_client.containers.run.call_args.kwargs
+        self.assertEqual(kwargs['nano_cpus'], 1_000_000_000)
+        self.assertEqual((kwargs['mem_limit'], kwargs['memswap_limit']), ('2048m', '2048m'))
+        self.assertEqual(kwargs['pids_limit'], 512)
+        self.assertEqual(kwargs['tmpfs'], {'/tmp': 'rw,exec,nosuid,size=256m'})
+        self.assertEqual(kwargs['labels']['resource_profile'], 'small')
+        self.assertEqual(info['resource_profile'], 'small')
+
+    def test_unknown_profile_is_not_started(self, passed_docker_mock):
+        self.assertIsNone(self.local_docker_handler.start_sandbox_container("img", {}, resource_profile="huge"))
+        self.mock_client.containers.run.assert_not_called()
+
+    def test_placement_is_refused_when_memory_is_committed(self, passed_docker_mock):
+        self.running = [_sandbox('standard'), _sandbox('standard')]  # 8 GB of 9 GB committed
+
+        headroom = self.local_docker_handler.get_host_headroom()
+        self.assertEqual((headroom['memory_capacity_mb'], headroom['memory_available_mb']), (9216, 1024))
+        tiny = self.local_docker_handler.ResourceProfile('tiny', cpus=0.5, cpu_shares=256, memory_mb=512, pids_limit=128)
+        self.assertIsNone(self.local_docker_handler.check_placement(tiny))
+
+        with self.assertRaises(self.local_docker_handler.SandboxPlacementError):
+            self.local_docker_handler.start_sandbox_container("img", {}, resource_profile="small")
+        self.mock_client.containers.run.assert_not_called()
+
+    def test_resumed_container_is_placed_like_a_new_one(self, passed_docker_mock):
+        self.running = [_sandbox('large')]  # 8 GB of 9 GB committed
+        stopped = self.mock_client.containers.get.return_value
+        stopped.labels = {'resource_profile': 'standard'}
+
+        with self.assertRaises(self.local_docker_handler.SandboxPlacementError):
+            self.local_docker_handler.restart_sandbox_container("c1")
+        stopped.start.assert_not_called()
+
+        stopped.labels = {}  # Unconstrained containers always start
+        self.assertIsNotNone(self.local_docker_handler.restart_sandbox_container("c1"))
+        stopped.start.assert_called_once()
+
+    def test_no_profile_needs_no_placement(self, passed_docker_mock):
+        self.assertIsNone(asyncio.run(self.local_docker_handler.wait_for_placement_async(None, timeout_seconds=0)))
+
+    def test_waiting_sandbox_is_placed_once_headroom_frees_up(self, passed_docker_mock):
+        self.running = [_sandbox('large')]  # 8 GB of 9 GB committed
+        handler = self.local_docker_handler
+
+        async def run():
+            async def free_host():
+                await asyncio.sleep(0.05)
+                self.running.clear()
+
+            with mock.patch.object(handler, 'PLACEMENT_POLL_SECONDS', 0.01):
+                asyncio.get_running_loop().create_task(free_host())
+                placed = await handler.wait_for_placement_async('standard', timeout_seconds=5)
+                self.running = [_sandbox('large')]
+                refused = await handler.wait_for_placement_async('standard', timeout_seconds=0.05)
+            return placed, refused
+
+        placed, refused = asyncio.run(run())
+        self.assertIsNone(placed)
+        self.assertIn("not enough memory", refused)
+
+        self.running = []
+        self.assertIsNone(asyncio.run(handler.wait_for_placement_async('standard', timeout_seconds=1)))  # A new event loop
+
+
+if __name__ == '__main__':
+    unittest.main()
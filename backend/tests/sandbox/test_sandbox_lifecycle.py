@@ -0,0 +1,207 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from sandbox import lifecycle as lifecycle_module
+from sandbox.lifecycle import SandboxLifecycleScheduler
+from sandbox.sandbox import LocalDockerSandboxWrapper
+
+
+class FakeRedis:
+    """In-memory stand-in for the few Redis hash and sorted set commands the scheduler uses."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.zsets = {}
+
+    def pipeline(self):
+        redis = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            async def execute(self):
+                return [await getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+        return Pipeline()
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+    async def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    async def hvals(self, key):
+        return list(self.hashes.get(key, {}).values())
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    async def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    async def zrangebyscore(self, key, low, high, withscores=False):
+        members = sorted((score, member) for member, score in self.zsets.get(key, {}).items() if score <= high)
+        return [(member, score) if withscores else member for score, member in members]
+
+    async def zcount(self, key, low, high):
+        return len(await self.zrangebyscore(key, low, high))
+
+
+class TestSandboxLifecycleScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.status = mock.AsyncMock(return_value='running')
+        self.stop = mock.AsyncMock(return_value=True)
+        self.preview_connections = mock.AsyncMock(return_value=0)
+        handler = lifecycle_module.local_docker_handler
+        self.patches = [
+            mock.patch.object(lifecycle_module.redis, 'get_client', mock.AsyncMock(return_value=self.redis)),
+            mock.patch.object(handler, 'get_sandbox_container_status_async', self.status),
+            mock.patch.object(handler, 'stop_sandbox_container_async', self.stop),
+            mock.patch.object(handler, 'get_preview_connections_async', self.preview_connections),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.scheduler = SandboxLifecycleScheduler(idle_stop_seconds=600, archive_after_stop_seconds=3600)
+        self.sandbox = LocalDockerSandboxWrapper({'container_id': 'container_1'}, 'secret')
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def _age_activity(self, seconds):
+        activity = self.redis.zsets[lifecycle_module.ACTIVITY_KEY]
+        activity['container_1'] -= seconds
+
+    def test_idle_sandbox_is_stopped_and_counted_as_resumed_on_next_use(self):
+        async def run():
+            await self.scheduler.record_activity(self.sandbox, "project_1")
+            await self.scheduler.sweep()
+            self.stop.assert_not_awaited()  # Recently active
+
+            self._age_activity(601)
+            with mock.patch.object(lifecycle_module.sandbox_registry, 'invalidate') as invalidate:
+                await self.scheduler.sweep()
+            self.stop.assert_awaited_once_with('container_1')
+            invalidate.assert_called_once_with("project_1")
+            stopped = await self.scheduler.occupancy()
+
+            await self.scheduler.record_activity(self.sandbox, "project_1")
+            return stopped, await self.scheduler.occupancy()
+
+        stopped, resumed = asyncio.run(run())
+        self.assertEqual((stopped["running"], stopped["stopped"], stopped["idle_stops_total"]), (0, 1, 1))
+        self.assertEqual((resumed["running"], resumed["stopped"], resumed["resumes_total"]), (1, 0, 1))
+
+    def test_activity_writes_are_throttled(self):
+        async def run():
+            await self.scheduler.record_activity(self.sandbox, "project_1")
+            first = await self.redis.zscore(lifecycle_module.ACTIVITY_KEY, 'container_1')
+            await asyncio.sleep(0.01)
+            await self.scheduler.record_activity(self.sandbox, "project_1")
+            return first, await self.redis.zscore(lifecycle_module.ACTIVITY_KEY, 'container_1')
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, second)
+
+    def test_open_preview_connection_keeps_sandbox_running(self):
+        self.preview_connections.return_value = 1
+
+        async def run():
+            await self.scheduler.record_activity(self.sandbox, "project_1")
+            self._age_activity(601)
+            await self.scheduler.sweep()
+            return await self.scheduler.occupancy()
+
+        occupancy = asyncio.run(run())
+        self.stop.assert_not_awaited()
+        self.preview_connections.assert_awaited_once_with('container_1')
+        self.assertEqual(occupancy["running"], 1)
+        latest = self.redis.zsets[lifecycle_module.ACTIVITY_KEY]['container_1']
+        self.assertGreater(latest, time.time() - 5)  # Counted as fresh activity
+
+    def test_removed_container_is_forgotten(self):
+        self.status.return_value = 'not_found'
+
+        async def run():
+            await self.scheduler.record_activity(self.sandbox, "project_1")
+            self._age_activity(601)
+            await self.scheduler.sweep()
+            return await self.scheduler.occupancy()
+
+        occupancy = asyncio.run(run())
+        self.stop.assert_not_awaited()
+        self.assertEqual(occupancy["running"] + occupancy["stopped"], 0)
+
+    def test_long_stopped_daytona_sandbox_is_archived(self):
+        daytona = mock.MagicMock()
+        daytona_sandbox = mock.MagicMock()
+        daytona_sandbox.id = 'daytona_1'
+
+        async def run():
+            with mock.patch.object(lifecycle_module, 'daytona', daytona):
+                await self.scheduler.record_activity(daytona_sandbox, "project_2")
+                self.redis.zsets[lifecycle_module.ACTIVITY_KEY]['daytona_1'] -= 601
+                await self.scheduler.sweep()
+                daytona.stop.assert_called_once()
+
+                # Still within the stopped-but-warm window
+                await self.scheduler.sweep()
+                daytona.get_current_sandbox.return_value.archive.assert_not_called()
+
+                record = lifecycle_module.json.loads(self.redis.hashes[lifecycle_module.SANDBOXES_KEY]['daytona_1'])
+                record["state_changed_at"] = time.time() - 3601
+                self.redis.hashes[lifecycle_module.SANDBOXES_KEY]['daytona_1'] = lifecycle_module.json.dumps(record)
+                await self.scheduler.sweep()
+                daytona.get_current_sandbox.return_value.archive.assert_called_once()
+                return await self.scheduler.occupancy()
+
+        occupancy = asyncio.run(run())
+        self.assertEqual((occupancy["archived"], occupancy["archives_total"]), (1, 1))
+
+    def test_disabled_scheduler_does_not_touch_redis(self):
+        scheduler = SandboxLifecycleScheduler(idle_stop_seconds=0, archive_after_stop_seconds=3600)
+        asyncio.run(scheduler.record_activity(self.sandbox, "project_1"))
+        self.assertEqual(self.redis.zsets, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestPreviewConnections(unittest.TestCase):
+
+    def test_counts_established_connections_on_preview_ports(self):
+        proc_net_tcp = "\n".join([
+            "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode",
+            "   0: 00000000:1F90 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 1",  # 8080 listening
+            "   1: 0200A8C0:1F90 0100A8C0:D431 01 00000000:00000000 00:00000000 00000000  1000        0 2",  # 8080 established
+            "   2: 0200A8C0:17C0 0100A8C0:D432 01 00000000:00000000 00:00000000 00000000  1000        0 3",  # 6080 established
+            "   3: 0200A8C0:1F44 0100A8C0:D433 01 00000000:00000000 00:00000000 00000000  1000        0 4",  # 8004 established
+            "   4: 0200A8C0:17C0 0100A8C0:D434 06 00000000:00000000 00:00000000 00000000  1000        0 5",  # 6080 time wait
+        ])
+        count = lifecycle_module.local_docker_handler.count_established_connections(proc_net_tcp, (6080, 8080))
+        self.assertEqual(count, 2)
@@ -0,0 +1,151 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from sandbox import sandbox as sandbox_module
+from sandbox.sandbox import LocalDockerSandboxWrapper, SandboxRegistry
+
+
+def _local_sandbox(container_id="container_1"):
+    return LocalDockerSandboxWrapper({'container_id': container_id, 'container_name': 'sandbox'}, 'pass')
+
+
+class TestSandboxRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.resolve_calls = 0
+        self.registry = SandboxRegistry(ttl_seconds=60)
+
+    async def _slow_resolve(self, project_id, db_client):
+        self.resolve_calls += 1
+        await asyncio.sleep(0.05)
+        return _local_sandbox()
+
+    def test_concurrent_lookups_share_one_resolution(self):
+        async def run():
+            return await asyncio.gather(*[self.registry.get("project_1", None) for _ in range(8)])
+
+        with mock.patch.object(sandbox_module, 'get_or_start_sandbox', self._slow_resolve):
+            handles = asyncio.run(run())
+            # Within the TTL the cached handle is returned without another lookup
+            again = asyncio.run(self.registry.get("project_1", None))
+
+        self.assertEqual(self.resolve_calls, 1)
+        self.assertTrue(all(handle is handles[0] for handle in handles))
+        self.assertIs(again, handles[0])
+
+    def test_expired_handle_only_rechecks_container_status(self):
+        self.registry.ttl_seconds = 0
+        status = mock.AsyncMock(return_value='running')
+        with mock.patch.object(sandbox_module, 'get_or_start_sandbox', self._slow_resolve), \
+                mock.patch.object(sandbox_module.local_docker_handler, 'get_sandbox_container_status_async', status):
+            first = asyncio.run(self.registry.get("project_1", None))
+            second = asyncio.run(self.registry.get("project_1", None))
+
+        self.assertIs(first, second)
+        self.assertEqual(self.resolve_calls, 1)
+        status.assert_awaited_once_with("container_1")
+
+    def test_dead_handle_is_resolved_again(self):
+        self.registry.ttl_seconds = 0
+        status = mock.AsyncMock(return_value='exited')
+        with mock.patch.object(sandbox_module, 'get_or_start_sandbox', self._slow_resolve), \
+                mock.patch.object(sandbox_module.local_docker_handler, 'get_sandbox_container_status_async', status):
+            first = asyncio.run(self.registry.get("project_1", None))
+            second = asyncio.run(self.registry.get("project_1", None))
+
+        self.assertIsNot(first, second)
+        self.assertEqual(self.resolve_calls, 2)
+
+    def test_failed_resolution_is_not_cached(self):
+        async def failing_resolve(project_id, db_client):
+            self.resolve_calls += 1
+            return None
+
+        with mock.patch.object(sandbox_module, 'get_or_start_sandbox', failing_resolve):
+            self.assertIsNone(asyncio.run(self.registry.get("project_1", None)))
+            self.assertIsNone(asyncio.run(self.registry.get("project_1", None)))
+        self.assertEqual(self.resolve_calls, 2)
+
+
+
+class FakeProjectsTable:
+    """Records updates to projects.sandbox and serves the current value."""
+
+    def __init__(self, sandbox_info):
+        self.sandbox_info = sandbox_info
+        self.updates = []
+        self._update = None
+
+    def table(self, name):
+        return self
+
+    def select(self, *columns):
+        self._update = None
+        return self
+
+    def update(self, values):
+        self._update = values
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def maybe_single(self):
+        return self
+
+    async def execute(self):
+        if self._update is not None:
+            self.updates.append(self._update)
+            self.sandbox_info = self._update['sandbox']
+            return mock.MagicMock(data=[self._update])
+        return mock.MagicMock(data={'sandbox': self.sandbox_info})
+
+
+class TestGetOrStartLocalSandbox(unittest.TestCase):
+
+    def setUp(self):
+        self.db = FakeProjectsTable({
+            'id': 'container_1', 'type': 'local_docker', 'pass': 'pass', 'name': 'sandbox',
+            'vnc_preview': 'http://localhost:49001', 'sandbox_url': 'http://localhost:49002',
+            'exec_port': '49003', 'browser_api_port': '49004',
+        })
+        self.new_ports = {'host_vnc_port': '50001', 'host_web_port': '50002',
+                          'host_exec_port': '50003', 'host_browser_api_port': '50004'}
+        handler = sandbox_module.local_docker_handler
+        self.status = mock.AsyncMock(return_value='exited')
+        self.patches = [
+            mock.patch.object(handler, 'get_sandbox_container_status_async', self.status),
+            mock.patch.object(handler, 'restart_sandbox_container_async',
+                              mock.AsyncMock(return_value={'container_id': 'container_1', **self.new_ports})),
+            mock.patch.object(handler, 'get_sandbox_container_ports_async', mock.AsyncMock(return_value=self.new_ports)),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_resume_records_the_new_host_ports(self):
+        sandbox = asyncio.run(sandbox_module.get_or_start_sandbox("project_1", self.db))
+
+        self.assertEqual(sandbox.exec_port, '50003')
+        self.assertEqual(self.db.sandbox_info['exec_port'], '50003')
+        self.assertEqual(self.db.sandbox_info['browser_api_port'], '50004')
+        self.assertEqual(self.db.sandbox_info['vnc_preview'], 'http://localhost:50001')
+        self.assertEqual(self.db.sandbox_info['sandbox_url'], 'http://localhost:50002')
+
+    def test_running_container_uses_its_live_ports(self):
+        self.status.return_value = 'running'
+
+        sandbox = asyncio.run(sandbox_module.get_or_start_sandbox("project_1", self.db))
+        self.assertEqual(sandbox.browser_api_port, '50004')
+        self.assertEqual(len(self.db.updates), 1)  # Stale entry corrected
+
+        asyncio.run(sandbox_module.get_or_start_sandbox("project_1", self.db))
+        self.assertEqual(len(self.db.updates), 1)  # Nothing to write once it matches
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import asyncio
+import itertools
+import unittest
+from unittest import mock
+
+from sandbox import warm_pool as warm_pool_module
+from sandbox.warm_pool import LocalDockerWarmPool
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis string and list commands the pool uses."""
+
+    def __init__(self):
+        self.strings = {}
+        self.lists = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def expire(self, key, seconds):
+        return key in self.strings
+
+    async def delete(self, key):
+        self.strings.pop(key, None)
+
+    async def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+        return len(self.lists[key])
+
+    async def lpop(self, key):
+        items = self.lists.get(key)
+        return items.pop(0) if items else None
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    async def lrem(self, key, count, value):
+        items = self.lists.get(key, [])
+        if value in items:
+            items.remove(value)
+            return 1
+        return 0
+
+
+class TestLocalDockerWarmPool(unittest.TestCase):
+
+    def setUp(self):
+        counter = itertools.count(1)
+
+        async def start_container(**kwargs):
+            container_id = f"warm_{next(counter)}"
+            return {'container_id': container_id, 'container_name': kwargs['container_name'], 'host_exec_port': None}
+
+        self.redis = FakeRedis()
+        self.start = mock.AsyncMock(side_effect=start_container)
+        self.status = mock.AsyncMock(return_value='running')
+        self.remove = mock.AsyncMock(return_value=True)
+        self.rename = mock.AsyncMock(return_value=True)
+        self.remove_unclaimed = mock.AsyncMock(return_value=[])
+        handler = warm_pool_module.local_docker_handler
+        self.patches = [
+            mock.patch.object(warm_pool_module.redis, 'get_client', mock.AsyncMock(return_value=self.redis)),
+            mock.patch.object(handler, 'start_sandbox_container_async', self.start),
+            mock.patch.object(handler, 'get_sandbox_container_status_async', self.status),
+            mock.patch.object(handler, 'stop_and_remove_sandbox_container_async', self.remove),
+            mock.patch.object(handler, 'rename_sandbox_container_async', self.rename),
+            mock.patch.object(handler, 'remove_unclaimed_containers_async', self.remove_unclaimed),
+            mock.patch.object(LocalDockerWarmPool, '_wait_until_ready', mock.AsyncMock(return_value=True)),
+            mock.patch.object(warm_pool_module.config, 'SANDBOX_TYPE', 'local_docker'),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_pool_fills_hands_out_and_refills(self):
+        pool = LocalDockerWarmPool(size=2, max_idle_seconds=3600)
+
+        async def run():
+            pool.start()
+            await asyncio.sleep(0.05)
+            filled = await self.redis.llen(warm_pool_module.READY_KEY)
+            first = await pool.acquire("project-1")
+            second = await pool.acquire("project-2")
+            await asyncio.sleep(0.05)
+            refilled = await self.redis.llen(warm_pool_module.READY_KEY)
+            await pool.stop()
+            return filled, first, second, refilled
+
+        filled, first, second, refilled = asyncio.run(run())
+        self.assertEqual(filled, 2)
+        self.assertNotEqual(first.sandbox.id, second.sandbox.id)
+        # The password handed out is the one the container was started with
+        self.assertEqual(first.password, self.start.call_args_list[0].kwargs['env_vars']['VNC_PASSWORD'])
+        self.assertTrue(self.start.call_args_list[0].kwargs['container_name'].startswith(warm_pool_module.WARM_POOL_NAME_PREFIX))
+        # Handed-out sandboxes are renamed after their project, which claims them
+        self.rename.assert_any_await(first.sandbox.id, "agentpress_sandbox_project-1")
+        self.assertEqual(first.sandbox.name, "agentpress_sandbox_project-1")
+        self.assertEqual(refilled, 2)
+        # Ready sandboxes outlive the process for the next owner; ownership is released
+        self.remove.assert_not_awaited()
+        self.assertNotIn(warm_pool_module.OWNER_KEY, self.redis.strings)
+
+    def test_only_the_owner_refills_and_it_removes_orphans_on_takeover(self):
+        owner = LocalDockerWarmPool(size=2, max_idle_seconds=3600)
+        other = LocalDockerWarmPool(size=2, max_idle_seconds=3600)
+
+        async def run():
+            owner.start()
+            await asyncio.sleep(0.05)
+            other.start()
+            await asyncio.sleep(0.05)
+            await other.stop()
+            await owner.stop()
+
+        asyncio.run(run())
+        self.assertEqual(self.start.await_count, 2)  # Not 2 per process
+        self.remove_unclaimed.assert_awaited_once_with(
+            f"{warm_pool_module.WARM_POOL_LABEL}=true", warm_pool_module.WARM_POOL_NAME_PREFIX, [])
+
+    def test_dead_sandbox_is_skipped(self):
+        pool = LocalDockerWarmPool(size=2, max_idle_seconds=3600)
+        self.status.side_effect = ['exited', 'running']
+
+        async def run():
+            await asyncio.gather(pool._provision_one(), pool._provision_one())
+            return await pool.acquire("project-1")
+
+        warm = asyncio.run(run())
+        self.assertEqual(warm.sandbox.id, "warm_2")
+        self.remove.assert_awaited_once_with("warm_1", raise_not_found=False)
+
+    def test_idle_sandboxes_are_reaped(self):
+        pool = LocalDockerWarmPool(size=1, max_idle_seconds=0)
+
+        async def run():
+            await pool._provision_one()
+            await asyncio.sleep(0.01)
+            await pool._reap_idle()
+
+        asyncio.run(run())
+        self.assertEqual(self.redis.lists[warm_pool_module.READY_KEY], [])
+        self.remove.assert_awaited_once_with("warm_1", raise_not_found=False)
+
+    def test_empty_pool_returns_none(self):
+        pool = LocalDockerWarmPool(size=0, max_idle_seconds=3600)
+        self.assertFalse(pool.enabled)
+        self.assertIsNone(asyncio.run(pool.acquire("project-1")))
+
+
+if __name__ == '__main__':
+    unittest.main()
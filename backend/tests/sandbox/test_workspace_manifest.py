@@ -0,0 +1,142 @@
+import asyncio
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from agent.tools.sb_files_tool import SandboxFilesTool
+
+AGENT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'sandbox', 'docker', 'exec_agent.py')
+
+
+def _load_exec_agent():
+    spec = importlib.util.spec_from_file_location("exec_agent", AGENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ManifestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.exec_agent = _load_exec_agent()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmpdir.name, "workspace")
+        os.makedirs(os.path.join(self.root, "src"))
+        os.makedirs(os.path.join(self.root, "node_modules", "react"))
+        self.exec_agent.MANIFEST_DIR = os.path.join(self.tmpdir.name, "manifests")
+        self._write("src/main.py", "print('hi')\n")
+        self._write("README.md", "# readme\n")
+        self._write("node_modules/react/index.js", "module.exports = {}\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, rel_path, content, mtime=None):
+        path = os.path.join(self.root, rel_path)
+        with open(path, "w") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def _scan(self, since_version=0, manifest_id=None):
+        return self.exec_agent.scan_manifest(self.root, since_version, manifest_id, exclude_dirs=["node_modules"])
+
+
+class TestScanManifest(ManifestTestCase):
+    """Runs the in-sandbox manifest scan on a host directory."""
+
+    def test_first_scan_lists_everything(self):
+        result = self._scan()
+        self.assertTrue(result["full"])
+        self.assertEqual([entry["path"] for entry in result["changed"]], ["README.md", "src/main.py"])
+        self.assertEqual(result["file_count"], 2)
+        self.assertEqual(len(result["changed"][0]["hash"]), 64)
+
+    def test_diff_reports_only_changes_since_version(self):
+        first = self._scan()
+        unchanged = self._scan(first["version"], first["manifest_id"])
+        self.assertFalse(unchanged["full"])
+        self.assertEqual(unchanged["changed"], [])
+        self.assertEqual(unchanged["version"], first["version"])
+
+        self._write("src/main.py", "print('changed')\n", mtime=1)
+        os.remove(os.path.join(self.root, "README.md"))
+        self._write("src/new.py", "x = 1\n")
+        diff = self._scan(first["version"], first["manifest_id"])
+
+        self.assertEqual(diff["version"], first["version"] + 1)
+        self.assertEqual([entry["path"] for entry in diff["changed"]], ["src/main.py", "src/new.py"])
+        self.assertEqual(diff["deleted"], ["README.md"])
+        # Older versions still get the complete diff
+        self.assertEqual(self._scan(0, first["manifest_id"])["deleted"], ["README.md"])
+
+    def test_touched_file_is_not_reported(self):
+        first = self._scan()
+        self._write("src/main.py", "print('hi')\n", mtime=12345)
+        with mock.patch.object(self.exec_agent, "_hash_file", wraps=self.exec_agent._hash_file) as hash_file:
+            diff = self._scan(first["version"], first["manifest_id"])
+            again = self._scan(first["version"], first["manifest_id"])
+        self.assertEqual(diff["changed"], [])
+        self.assertEqual(again["version"], first["version"])
+        # Hashed once after the touch, then the new mtime is trusted
+        self.assertEqual(hash_file.call_count, 1)
+
+    def test_unknown_manifest_id_gets_full_listing(self):
+        first = self._scan()
+        result = self._scan(first["version"], "some-other-manifest")
+        self.assertTrue(result["full"])
+        self.assertEqual(len(result["changed"]), 2)
+
+
+class TestWorkspaceState(ManifestTestCase):
+    """Syncs SandboxFilesTool's workspace state from a manifest scanned on the host."""
+
+    def setUp(self):
+        super().setUp()
+        self.downloads = []
+
+        async def get_workspace_changes_async(root, since_version=0, manifest_id=None, **exclusions):
+            return self.exec_agent.scan_manifest(self.root, since_version, manifest_id, **exclusions)
+
+        async def download_file_async(path):
+            self.downloads.append(path)
+            with open(os.path.join(self.root, path[len("/workspace/"):]), "rb") as f:
+                return f.read()
+
+        self.tool = SandboxFilesTool(project_id=None, thread_manager=None)
+        self.tool._sandbox = mock.MagicMock()
+        self.tool._sandbox.fs.get_workspace_changes_async = get_workspace_changes_async
+        self.tool._sandbox.fs.download_file_async = download_file_async
+
+    def test_only_changed_files_are_downloaded(self):
+        state = asyncio.run(self.tool.get_workspace_state())
+        self.assertEqual(sorted(state), ["README.md", "src/main.py"])
+        self.assertEqual(state["src/main.py"]["content"], "print('hi')\n")
+        self.assertEqual(len(self.downloads), 2)
+
+        self.downloads.clear()
+        self._write("src/main.py", "print('changed')\n", mtime=1)
+        state = asyncio.run(self.tool.get_workspace_state())
+        self.assertEqual(state["src/main.py"]["content"], "print('changed')\n")
+        self.assertEqual(self.downloads, ["/workspace/src/main.py"])
+
+        self.downloads.clear()
+        os.remove(os.path.join(self.root, "README.md"))
+        state = asyncio.run(self.tool.get_workspace_state())
+        self.assertEqual(sorted(state), ["src/main.py"])
+        self.assertEqual(self.downloads, [])
+
+    def test_full_resync_reuses_cached_content(self):
+        asyncio.run(self.tool.get_workspace_state())
+        self.downloads.clear()
+        self.tool._workspace_manifest_id = None
+
+        state = asyncio.run(self.tool.get_workspace_state())
+        self.assertEqual(sorted(state), ["README.md", "src/main.py"])
+        self.assertEqual(self.downloads, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from utils.s3_upload_utils import ScreenshotStore
+
+
+class FakeBucket:
+
+    def __init__(self, existing=()):
+        self.objects = set(existing)
+        self.uploads = []
+        self.removed = []
+        self.release_uploads = asyncio.Event()
+
+    async def get_public_url(self, key):
+        return f"https://storage/object/public/browser-screenshots/{key}"
+
+    async def exists(self, key):
+        return key in self.objects
+
+    async def upload(self, key, data, options):
+        await self.release_uploads.wait()
+        self.uploads.append(key)
+        self.objects.add(key)
+
+    async def remove(self, keys):
+        self.removed.append(list(keys))
+        self.objects -= set(keys)
+
+    async def list(self, prefix, options):
+        names = sorted(key[len(prefix) + 1:] for key in self.objects if key.startswith(f"{prefix}/"))
+        return [{"name": name} for name in names[options["offset"]:options["offset"] + options["limit"]]]
+
+
+class FakeMessages:
+    """The messages table, newest last, behind the query builder calls end_run makes."""
+
+    def __init__(self):
+        self.rows = []
+        self.filters = {}
+        self.update_values = None
+
+    def table(self, name):
+        self.filters, self.update_values = {}, None
+        return self
+
+    def select(self, columns):
+        return self
+
+    def update(self, values):
+        self.update_values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    async def execute(self):
+        rows = [row for row in self.rows if all(row[column] == value for column, value in self.filters.items())]
+        if self.update_values is not None:
+            for row in rows:
+                row.update(self.update_values)
+        return mock.MagicMock(data=list(reversed(rows)))
+
+    def add_browser_state(self, image_url):
+        self.rows.append({"message_id": f"m{len(self.rows)}", "thread_id": "thread-1", "type": "browser_state",
+                          "content": {"url": "https://example.com", "image_url": image_url}})
+
+
+class TestScreenshotStore(unittest.TestCase):
+
+    def _run(self, existing=(), scenario=None):
+        async def run():
+            store = ScreenshotStore()
+            bucket = FakeBucket(existing)
+            self.messages = FakeMessages()
+            connection = mock.MagicMock()
+            type(connection).client = mock.PropertyMock(side_effect=lambda: asyncio.sleep(0, result=self.messages))
+            with mock.patch.object(ScreenshotStore, "_bucket", mock.AsyncMock(return_value=bucket)), \
+                    mock.patch("utils.s3_upload_utils.DBConnection", return_value=connection):
+                await scenario(store, bucket)
+        asyncio.run(run())
+
+    def test_store_returns_the_url_before_the_upload_finishes(self):
+        async def scenario(store, bucket):
+            url = await store.store(b"frame", "image/webp", scope="thread-1")
+            key = ScreenshotStore.image_key(b"frame", "image/webp", "thread-1")
+            self.assertEqual(url, f"https://storage/object/public/browser-screenshots/{key}")
+            self.assertTrue(key.startswith("thread-1/") and key.endswith(".webp"))
+            self.assertEqual(bucket.uploads, [])
+
+            self.assertEqual(await store.store(b"frame", "image/webp", scope="thread-1"), url)
+            bucket.release_uploads.set()
+            self.assertTrue(await store.wait_for(url))
+            self.assertEqual(bucket.uploads, [key])  # Same content uploaded once
+
+        self._run(scenario=scenario)
+
+    def test_existing_objects_are_not_uploaded_again(self):
+        key = ScreenshotStore.image_key(b"frame", "image/jpeg", "thread-1")
+
+        async def scenario(store, bucket):
+            url = await store.store(b"frame", "image/jpeg", scope="thread-1")
+            self.assertTrue(await store.wait_for(url))
+            self.assertEqual(bucket.uploads, [])
+
+        self._run(existing={key}, scenario=scenario)
+
+    def test_end_run_keeps_the_newest_screenshots_of_the_thread_across_workers(self):
+        async def scenario(store, bucket):
+            bucket.release_uploads.set()
+            other_worker = ScreenshotStore()
+            for worker, frame in ((other_worker, b"one"), (store, b"two"), (other_worker, b"three"), (store, b"one")):
+                url = await worker.store(frame, "image/webp", scope="thread-1")
+                await worker.wait_for(url)
+                self.messages.add_browser_state(url)
+            await store.end_run("thread-1", keep_latest=2)
+
+            # "two" is removed although the other worker's screenshots were never tracked by this one
+            self.assertEqual(bucket.removed, [[ScreenshotStore.image_key(b"two", "image/webp", "thread-1")]])
+            self.assertEqual(len(bucket.uploads), 3)
+            states = [row["content"] for row in self.messages.rows]
+            self.assertEqual([state.get("screenshot_removed", False) for state in states], [False, True, False, False])
+            self.assertNotIn("image_url", states[1])
+            self.assertEqual(states[0]["image_url"], states[3]["image_url"])  # Still the newest image
+
+        self._run(scenario=scenario)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -167,6 +167,15 @@ class Configuration:
     # Sandbox configuration
     SANDBOX_IMAGE_NAME = "kortix/suna:0.1.2.8"
     SANDBOX_ENTRYPOINT = "/usr/bin/supervisord -n -c /etc/supervisor/conf.d/supervisord.conf"
+    SANDBOX_LIVENESS_TTL_SECONDS: int = 15  # How long a resolved sandbox handle is trusted before re-checking it
+    SANDBOX_WARM_POOL_SIZE: int = 0  # Pre-started local Docker sandboxes kept ready for new projects (0 disables the pool)
+    SANDBOX_WARM_POOL_MAX_IDLE_SECONDS: int = 1800  # Unassigned warm sandboxes older than this are replaced
+    SANDBOX_IDLE_STOP_SECONDS: int = 0  # Stop sandboxes with no tool calls, sandbox API hits or open preview connections (local Docker) for this long (0 disables auto-stop)
+    SANDBOX_ARCHIVE_AFTER_STOP_SECONDS: int = 86400  # Archive (Daytona) sandboxes that stayed stopped this long
+    SANDBOX_RESOURCE_PROFILE: Optional[str] = None  # Default local Docker resource profile (small, standard, large or a custom one); unset leaves sandboxes unconstrained
+    SANDBOX_TIER_RESOURCE_PROFILES: Optional[str] = None  # Per subscription tier overrides, e.g. "free:small,tier_25_200:large"
+    SANDBOX_PLACEMENT_WAIT_SECONDS: int = 30  # How long a new sandbox waits for host headroom before it is refused
+    BROWSER_SCREENSHOT_KEEP_PER_THREAD: int = 0  # Browser screenshots kept per thread when a run ends, older ones are deleted and their browser_state messages marked screenshot_removed (0 keeps all)
 
     # LangFuse configuration
     LANGFUSE_PUBLIC_KEY: Optional[str] = None
@@ -2,12 +2,22 @@
 Utility functions for handling image operations.
 """
 
+import asyncio
 import base64
+import hashlib
+import json
 import uuid
+from collections import OrderedDict
 from datetime import datetime
+from typing import Dict, List, Optional, Set
 from .logger import logger # Relative import
+from .config import config # Relative import
 from services.supabase import DBConnection # Direct import
 
+IMAGE_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+REMOVE_BATCH_SIZE = 1000  # Storage API limit on paths per remove call
+LIST_BATCH_SIZE = 1000  # Objects per storage list call
+
 async def upload_base64_image(base64_data: str, bucket_name: str = "browser-screenshots") -> str:
     """Upload a base64 encoded image to Supabase storage and return the URL.
     
@@ -25,11 +35,31 @@ async def upload_base64_image(base64_data: str, bucket_name: str = "browser-scre
         
         # Decode base64 data
         image_data = base64.b64decode(base64_data)
+    except Exception as e:
+        logger.error(f"Error decoding base64 image: {e}")
+        raise RuntimeError(f"Failed to upload image: {str(e)}")
+
+    return await upload_image_bytes(image_data, "image/png", bucket_name)
+
+
+async def upload_image_bytes(image_data: bytes, content_type: str = "image/png",
+                             bucket_name: str = "browser-screenshots") -> str:
+    """Upload raw image bytes to Supabase storage and return the URL.
+    
+    Args:
+        image_data (bytes): Encoded image
+        content_type (str): MIME type of the image, which also picks the file extension
+        bucket_name (str): Name of the storage bucket to upload to
         
+    Returns:
+        str: Public URL of the uploaded image
+    """
+    try:
         # Generate unique filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_id = str(uuid.uuid4())[:8]
-        filename = f"image_{timestamp}_{unique_id}.png"
+        extension = IMAGE_EXTENSIONS.get(content_type, "png")
+        filename = f"image_{timestamp}_{unique_id}.{extension}"
         
         # Upload to Supabase storage
         db = DBConnection()
@@ -37,7 +67,7 @@ async def upload_base64_image(base64_data: str, bucket_name: str = "browser-scre
         storage_response = await client.storage.from_(bucket_name).upload(
             filename,
             image_data,
-            {"content-type": "image/png"}
+            {"content-type": content_type}
         )
         
         # Get public URL
@@ -47,5 +77,167 @@ async def upload_base64_image(base64_data: str, bucket_name: str = "browser-scre
         return public_url
         
     except Exception as e:
-        logger.error(f"Error uploading base64 image: {e}")
-        raise RuntimeError(f"Failed to upload image: {str(e)}") 
\ No newline at end of file
+        logger.error(f"Error uploading image: {e}")
+        raise RuntimeError(f"Failed to upload image: {str(e)}")
+
+
+class ScreenshotStore:
+    """Content-addressed screenshot storage with background uploads.
+
+    Keys are derived from the image hash, so a screenshot that was already stored is not uploaded
+    again, and the public URL is known before the upload finishes. Anything that fetches the URL
+    (the LLM) must first wait for it with wait_for().
+    """
+
+    def __init__(self, bucket_name: str = "browser-screenshots", max_concurrent_uploads: int = 4):
+        self.bucket_name = bucket_name
+        self._upload_slots = asyncio.Semaphore(max_concurrent_uploads)
+        self._uploads: Dict[str, asyncio.Task] = {}  # Key -> upload in progress
+        self._stored: Set[str] = set()  # Keys known to exist in the bucket
+        self._keys_by_url: Dict[str, str] = {}
+        self._keys_by_scope: Dict[str, OrderedDict] = {}  # Scope -> keys, least recently stored first
+
+    @staticmethod
+    def image_key(image_data: bytes, content_type: str, scope: Optional[str] = None) -> str:
+        """Deterministic object key of an image, under its scope (thread) if given"""
+        digest = hashlib.sha256(image_data).hexdigest()[:40]
+        key = f"{digest}.{IMAGE_EXTENSIONS.get(content_type, 'png')}"
+        return f"{scope}/{key}" if scope else key
+
+    async def _bucket(self):
+        client = await DBConnection().client
+        return client.storage.from_(self.bucket_name)
+
+    async def store(self, image_data: bytes, content_type: str = "image/png", scope: Optional[str] = None) -> str:
+        """Start storing an image and return its public URL without waiting for the upload.
+        
+        Args:
+            image_data (bytes): Encoded image
+            content_type (str): MIME type of the image
+            scope (str, optional): Owner of the image (a thread id), used for retention
+            
+        Returns:
+            str: Public URL the image will be served from
+        """
+        key = self.image_key(image_data, content_type, scope)
+        url = await (await self._bucket()).get_public_url(key)
+        self._keys_by_url[url] = key
+        if scope:
+            scope_keys = self._keys_by_scope.setdefault(scope, OrderedDict())
+            scope_keys[key] = None
+            scope_keys.move_to_end(key)
+
+        if key in self._stored or key in self._uploads:
+            logger.debug(f"Screenshot {key} already stored")
+        else:
+            task = asyncio.create_task(self._upload(key, image_data, content_type))
+            self._uploads[key] = task
+            task.add_done_callback(lambda _task, key=key: self._uploads.pop(key, None))
+        return url
+
+    async def _upload(self, key: str, image_data: bytes, content_type: str) -> bool:
+        async with self._upload_slots:
+            try:
+                bucket = await self._bucket()
+                if await bucket.exists(key):
+                    logger.debug(f"Screenshot {key} exists in {self.bucket_name}, skipping upload")
+                else:
+                    # Upsert: a concurrent upload of the same key has the same content
+                    await bucket.upload(key, image_data, {"content-type": content_type, "upsert": "true",
+                                                          "cache-control": "31536000"})
+                    logger.debug(f"Uploaded screenshot {key} to {self.bucket_name}")
+                self._stored.add(key)
+                return True
+            except Exception as e:
+                logger.error(f"Error uploading screenshot {key}: {e}")
+                return False
+
+    async def wait_for(self, url: str) -> bool:
+        """Wait for the upload behind a URL returned by store(). Returns False if it failed.
+        URLs this store did not hand out are assumed to be stored."""
+        key = self._keys_by_url.get(url)
+        if key is None or key in self._stored:
+            return True
+        task = self._uploads.get(key)
+        return bool(task and await asyncio.shield(task))
+
+    async def end_run(self, scope: str, keep_latest: Optional[int] = None) -> None:
+        """Finish a run's uploads and apply the retention policy to its scope (thread).
+        
+        Retention follows the thread's browser_state messages rather than what this process
+        uploaded, so screenshots stored by other workers are trimmed too: the screenshots of the
+        newest messages are kept up to keep_latest distinct images, and every other object under
+        the scope is deleted in batched remove calls. Messages whose screenshot is deleted have
+        their image_url replaced by screenshot_removed, so the thread history does not show
+        broken images.
+        
+        Args:
+            scope (str): Thread id the run stored its screenshots under
+            keep_latest (int, optional): Screenshots to keep, 0 keeps all. Defaults to
+                config.BROWSER_SCREENSHOT_KEEP_PER_THREAD.
+        """
+        scope_keys = self._keys_by_scope.pop(scope, OrderedDict())
+        pending = [self._uploads[key] for key in scope_keys if key in self._uploads]
+        if pending:
+            await asyncio.gather(*(asyncio.shield(task) for task in pending))
+        self._forget(scope_keys)
+
+        if keep_latest is None:
+            keep_latest = config.BROWSER_SCREENSHOT_KEEP_PER_THREAD
+        if not keep_latest:
+            return
+
+        try:
+            client = await DBConnection().client
+            messages = await client.table('messages').select('message_id, content').eq('thread_id', scope).eq(
+                'type', 'browser_state').order('created_at', desc=True).execute()
+            kept, expired_messages = set(), []
+            for message in messages.data or []:
+                content = message["content"]
+                state = json.loads(content) if isinstance(content, str) else content
+                key = self._key_from_url(state.get("image_url")) if isinstance(state, dict) else None
+                if key is None:
+                    continue
+                if key in kept or len(kept) < keep_latest:
+                    kept.add(key)
+                else:
+                    expired_messages.append((message["message_id"], content, state))
+
+            for message_id, content, state in expired_messages:
+                state.pop("image_url", None)
+                state["screenshot_removed"] = True
+                await client.table('messages').update(
+                    {"content": json.dumps(state) if isinstance(content, str) else state}
+                ).eq('message_id', message_id).execute()
+
+            bucket = await self._bucket()
+            expired = [key for key in await self._list_scope(bucket, scope) if key not in kept]
+            for start in range(0, len(expired), REMOVE_BATCH_SIZE):
+                await bucket.remove(expired[start:start + REMOVE_BATCH_SIZE])
+            logger.debug(f"Removed {len(expired)} screenshots of {scope} from {self.bucket_name}")
+        except Exception as e:
+            logger.error(f"Error removing screenshots of {scope}: {e}")
+
+    async def _list_scope(self, bucket, scope: str) -> List[str]:
+        """Keys of every object stored under a scope"""
+        keys = []
+        while True:
+            objects = await bucket.list(scope, {"limit": LIST_BATCH_SIZE, "offset": len(keys)})
+            keys += [f"{scope}/{obj['name']}" for obj in objects]
+            if len(objects) < LIST_BATCH_SIZE:
+                return keys
+
+    def _key_from_url(self, url: Optional[str]) -> Optional[str]:
+        """Object key behind a public URL of this bucket, or None for other URLs"""
+        marker = f"/object/public/{self.bucket_name}/"
+        if not url or marker not in url:
+            return None
+        return url.split(marker, 1)[1].split('?', 1)[0]
+
+    def _forget(self, keys) -> None:
+        keys = set(keys)
+        self._stored -= keys
+        self._keys_by_url = {url: key for url, key in self._keys_by_url.items() if key not in keys}
+
+
+screenshot_store = ScreenshotStore()
@@ -3,12 +3,15 @@
 Script to archive sandboxes for projects whose account_id is not associated with an active billing customer.
 
 Usage:
-    python archive_inactive_sandboxes.py
+    python archive_inactive_sandboxes.py [--dry-run] [--concurrency N] [--rate-limit N] [--checkpoint FILE]
 
 This script:
 1. Gets all active account_ids from basejump.billing_customers (active=TRUE)
-2. Gets all projects from the projects table
-3. Archives sandboxes for any project whose account_id is not in the active billing customers list
+2. Pages through all projects with sandboxes
+3. Archives sandboxes for any project whose account_id is not in the active billing customers list,
+   several at a time (see sandbox/maintenance.py)
+
+Pass --checkpoint to be able to resume an interrupted sweep.
 
 Make sure your environment variables are properly set:
 - SUPABASE_URL
@@ -20,14 +23,14 @@ import asyncio
 import sys
 import os
 import argparse
-from typing import List, Dict, Any, Set
+from typing import Set
 from dotenv import load_dotenv
 
 # Load script-specific environment variables
 load_dotenv(".env")
 
 from services.supabase import DBConnection
-from sandbox.sandbox import daytona
+from sandbox.maintenance import MaintenanceStats, add_sweep_arguments, archive_project_sandbox, run_maintenance, sweep_options
 from utils.logger import logger
 
 # Global DB connection to reuse
@@ -69,176 +72,26 @@ async def get_active_billing_customer_account_ids() -> Set[str]:
     return active_account_ids
 
 
-async def get_all_projects() -> List[Dict[str, Any]]:
+async def process_sandboxes(active_account_ids: Set[str], dry_run: bool, **options) -> MaintenanceStats:
     """
-    Query all projects with sandbox information.
-    
-    Returns:
-        List of projects with their sandbox information
-    """
-    global db_connection
-    if db_connection is None:
-        db_connection = DBConnection()
-    
-    client = await db_connection.client
-    
-    # Initialize variables for pagination
-    all_projects = []
-    page_size = 1000
-    current_page = 0
-    has_more = True
-    
-    logger.info("Starting to fetch all projects (paginated)")
-    
-    # Paginate through all projects
-    while has_more:
-        # Query projects with pagination
-        start_range = current_page * page_size
-        end_range = start_range + page_size - 1
-        
-        logger.info(f"Fetching projects page {current_page+1} (range: {start_range}-{end_range})")
-        
-        result = await client.table('projects').select(
-            'project_id',
-            'name',
-            'account_id',
-            'sandbox'
-        ).range(start_range, end_range).execute()
-        
-        if not result.data:
-            has_more = False
-        else:
-            all_projects.extend(result.data)
-            current_page += 1
-            
-            # Progress update
-            logger.info(f"Loaded {len(all_projects)} projects so far")
-            print(f"Loaded {len(all_projects)} projects so far...")
-            
-            # Check if we've reached the end
-            if len(result.data) < page_size:
-                has_more = False
-    
-    # Print the query result
-    total_projects = len(all_projects)
-    print(f"Found {total_projects} projects in database")
-    logger.info(f"Total projects found in database: {total_projects}")
-    
-    if not all_projects:
-        logger.info("No projects found in database")
-        return []
-    
-    # Filter projects that have sandbox information
-    projects_with_sandboxes = [
-        project for project in all_projects
-        if project.get('sandbox') and project['sandbox'].get('id')
-    ]
-    
-    logger.info(f"Found {len(projects_with_sandboxes)} projects with sandboxes")
-    return projects_with_sandboxes
-
-
-async def archive_sandbox(project: Dict[str, Any], dry_run: bool) -> bool:
-    """
-    Archive a single sandbox.
-    
-    Args:
-        project: Project information containing sandbox to archive
-        dry_run: If True, only simulate archiving
-        
-    Returns:
-        True if successful, False otherwise
-    """
-    sandbox_id = project['sandbox'].get('id')
-    project_name = project.get('name', 'Unknown')
-    project_id = project.get('project_id', 'Unknown')
-    
-    try:
-        logger.info(f"Checking sandbox {sandbox_id} for project '{project_name}' (ID: {project_id})")
-        
-        if dry_run:
-            logger.info(f"DRY RUN: Would archive sandbox {sandbox_id}")
-            print(f"Would archive sandbox {sandbox_id} for project '{project_name}'")
-            return True
-        
-        # Get the sandbox
-        sandbox = daytona.get_current_sandbox(sandbox_id)
-        
-        # Check sandbox state - it must be stopped before archiving
-        sandbox_info = sandbox.info()
-        
-        # Log the current state
-        logger.info(f"Sandbox {sandbox_id} is in '{sandbox_info.state}' state")
-        
-        # Only archive if the sandbox is in the stopped state
-        if sandbox_info.state == "stopped":
-            logger.info(f"Archiving sandbox {sandbox_id} as it is in stopped state")
-            sandbox.archive()
-            logger.info(f"Successfully archived sandbox {sandbox_id}")
-            return True
-        else:
-            logger.info(f"Skipping sandbox {sandbox_id} as it is not in stopped state (current: {sandbox_info.state})")
-            return True
-            
-    except Exception as e:
-        import traceback
-        error_type = type(e).__name__
-        stack_trace = traceback.format_exc()
-        
-        # Log detailed error information
-        logger.error(f"Error processing sandbox {sandbox_id}: {str(e)}")
-        logger.error(f"Error type: {error_type}")
-        logger.error(f"Stack trace:\n{stack_trace}")
-        
-        # If the exception has a response attribute (like in HTTP errors), log it
-        if hasattr(e, 'response'):
-            try:
-                response_data = e.response.json() if hasattr(e.response, 'json') else str(e.response)
-                logger.error(f"Response data: {response_data}")
-            except Exception:
-                logger.error(f"Could not parse response data from error")
-        
-        print(f"Failed to process sandbox {sandbox_id}: {error_type} - {str(e)}")
-        return False
+    Archive the sandboxes of all projects whose account has no active billing customer.
 
-
-async def process_sandboxes(inactive_projects: List[Dict[str, Any]], dry_run: bool) -> tuple[int, int]:
-    """
-    Process all sandboxes sequentially.
-    
     Args:
-        inactive_projects: List of projects without active billing
+        active_account_ids: Account IDs with an active billing customer
         dry_run: Whether to actually archive sandboxes or just simulate
-        
+        options: Sweep options for run_maintenance (concurrency, rate_limits, checkpoint, page_size)
+
     Returns:
-        Tuple of (processed_count, failed_count)
+        Stats of the sweep
     """
-    processed_count = 0
-    failed_count = 0
-    
-    if dry_run:
-        logger.info(f"DRY RUN: Would archive {len(inactive_projects)} sandboxes")
-    else:
-        logger.info(f"Archiving {len(inactive_projects)} sandboxes")
-    
-    print(f"Processing {len(inactive_projects)} sandboxes...")
-    
-    # Process each sandbox sequentially
-    for i, project in enumerate(inactive_projects):
-        success = await archive_sandbox(project, dry_run)
-        
-        if success:
-            processed_count += 1
-        else:
-            failed_count += 1
-        
-        # Print progress periodically
-        if (i + 1) % 20 == 0 or (i + 1) == len(inactive_projects):
-            progress = (i + 1) / len(inactive_projects) * 100
-            print(f"Progress: {i + 1}/{len(inactive_projects)} sandboxes processed ({progress:.1f}%)")
-            print(f"  - Processed: {processed_count}, Failed: {failed_count}")
-    
-    return processed_count, failed_count
+    client = await db_connection.client
+    return await run_maintenance(
+        client, archive_project_sandbox, "archive",
+        select=lambda project: project.get('account_id') not in active_account_ids,
+        dry_run=dry_run,
+        on_progress=lambda stats: print(f"Progress: {stats.summary()}"),
+        **options
+    )
 
 
 async def main():
@@ -246,6 +99,7 @@ async def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Archive sandboxes for projects without active billing')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be archived without actually archiving')
+    add_sweep_arguments(parser)
     args = parser.parse_args()
 
     logger.info("Starting sandbox cleanup for projects without active billing")
@@ -264,34 +118,6 @@ async def main():
         # Get all account_ids that have an active billing customer
         active_billing_customer_account_ids = await get_active_billing_customer_account_ids()
         
-        # Get all projects with sandboxes
-        all_projects = await get_all_projects()
-        
-        if not all_projects:
-            logger.info("No projects with sandboxes to process")
-            return
-        
-        # Filter projects whose account_id is not in the active billing customers list
-        inactive_projects = [
-            project for project in all_projects
-            if project.get('account_id') not in active_billing_customer_account_ids
-        ]
-        
-        # Print summary of what will be processed
-        active_projects_count = len(all_projects) - len(inactive_projects)
-        print("\n===== SANDBOX CLEANUP SUMMARY =====")
-        print(f"Total projects found: {len(all_projects)}")
-        print(f"Projects with active billing accounts: {active_projects_count}")
-        print(f"Projects without active billing accounts: {len(inactive_projects)}")
-        print(f"Sandboxes that will be archived: {len(inactive_projects)}")
-        print("===================================")
-        
-        logger.info(f"Found {len(inactive_projects)} projects without an active billing customer account")
-        
-        if not inactive_projects:
-            logger.info("No projects to archive sandboxes for")
-            return
-        
         # Ask for confirmation before proceeding
         if not args.dry_run:
             print("\n⚠️  WARNING: You are about to archive sandboxes for inactive accounts ⚠️")
@@ -306,36 +132,25 @@ async def main():
             print("\nProceeding with sandbox archiving...\n")
             logger.info("User confirmed sandbox archiving")
         
-        # List all projects to be processed
-        for i, project in enumerate(inactive_projects[:5]):  # Just show first 5 for brevity
-            account_id = project.get('account_id', 'Unknown')
-            project_name = project.get('name', 'Unknown')
-            project_id = project.get('project_id', 'Unknown')
-            sandbox_id = project['sandbox'].get('id')
-            
-            print(f"{i+1}. Project: {project_name}")
-            print(f"   Project ID: {project_id}")
-            print(f"   Account ID: {account_id}")
-            print(f"   Sandbox ID: {sandbox_id}")
-            
-        if len(inactive_projects) > 5:
-            print(f"   ... and {len(inactive_projects) - 5} more projects")
-        
-        # Process all sandboxes
-        processed_count, failed_count = await process_sandboxes(inactive_projects, args.dry_run)
+        stats = await process_sandboxes(active_billing_customer_account_ids, args.dry_run, **sweep_options(args))
         
         # Print final summary
-        print("\nSandbox Cleanup Summary:")
-        print(f"Total projects without active billing: {len(inactive_projects)}")
-        print(f"Total sandboxes processed: {len(inactive_projects)}")
+        print("\n===== SANDBOX CLEANUP SUMMARY =====")
+        print(f"Projects with sandboxes scanned: {stats.scanned}")
+        print(f"Projects with active billing accounts: {stats.scanned - stats.selected}")
+        print(f"Projects without active billing accounts: {stats.selected}")
         
         if args.dry_run:
             print(f"DRY RUN: No sandboxes were actually archived")
         else:
-            print(f"Successfully processed: {processed_count}")
-            print(f"Failed to process: {failed_count}")
+            print(f"Successfully processed: {stats.succeeded}")
+            print(f"Failed to process: {stats.failed}")
+            if stats.failed_project_ids:
+                print(f"Failed project IDs: {', '.join(stats.failed_project_ids)}")
+        print(f"Throughput: {stats.throughput:.2f} sandboxes/s over {stats.elapsed_seconds:.1f}s")
+        print("===================================")
         
-        logger.info("Sandbox cleanup completed")
+        logger.info(f"Sandbox cleanup completed: {stats.summary()}")
             
     except Exception as e:
         logger.error(f"Error during sandbox cleanup: {str(e)}")